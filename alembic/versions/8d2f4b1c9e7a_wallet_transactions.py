@@ -0,0 +1,71 @@
+"""wallet transactions
+
+Revision ID: 8d2f4b1c9e7a
+Revises: 316d64c075e4
+Create Date: 2026-10-18 10:12:41.118306
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d2f4b1c9e7a'
+down_revision = '316d64c075e4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('wallet_transactions',
+    sa.Column('id', sa.BigInteger(), nullable=False),
+    sa.Column('wallet', sa.String(), nullable=False),
+    sa.Column('network', sa.String(), nullable=False),
+    sa.Column('txid', sa.String(), nullable=False),
+    sa.Column('ledger_index', sa.Integer(), nullable=False),
+    sa.Column('tx_index', sa.Integer(), nullable=False),
+    sa.Column('date', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('kind', sa.String(), nullable=False),
+    sa.Column('tx_type', sa.String(), nullable=False),
+    sa.Column('result', sa.String(), nullable=False),
+    sa.Column('direction', sa.String(), nullable=False),
+    sa.Column('sender', sa.String(), nullable=False),
+    sa.Column('receiver', sa.String(), nullable=True),
+    sa.Column('counterparty', sa.String(), nullable=True),
+    sa.Column('currency', sa.String(), nullable=True),
+    sa.Column('issuer', sa.String(), nullable=True),
+    sa.Column('amount', sa.String(), nullable=True),
+    sa.Column('fee', sa.String(), nullable=False),
+    sa.Column('details', sa.JSON(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('wallet', 'network', 'txid', name='uq_wallet_transactions_wallet_txid')
+    )
+    op.create_index('ix_wallet_transactions_order', 'wallet_transactions', ['wallet', 'network', 'ledger_index', 'tx_index'], unique=False)
+    op.create_index('ix_wallet_transactions_type', 'wallet_transactions', ['wallet', 'network', 'tx_type', 'ledger_index'], unique=False)
+    op.create_index('ix_wallet_transactions_kind', 'wallet_transactions', ['wallet', 'network', 'kind', 'ledger_index'], unique=False)
+    op.create_index('ix_wallet_transactions_currency', 'wallet_transactions', ['wallet', 'network', 'currency', 'issuer', 'ledger_index'], unique=False)
+    op.create_index('ix_wallet_transactions_counterparty', 'wallet_transactions', ['wallet', 'network', 'counterparty', 'ledger_index'], unique=False)
+    op.create_index('ix_wallet_transactions_date', 'wallet_transactions', ['wallet', 'network', 'date'], unique=False)
+    op.create_table('indexed_wallets',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('wallet', sa.String(), nullable=False),
+    sa.Column('network', sa.String(), nullable=False),
+    sa.Column('marker', sa.JSON(), nullable=True),
+    sa.Column('complete', sa.Boolean(), nullable=False),
+    sa.Column('newest_ledger', sa.Integer(), nullable=True),
+    sa.Column('oldest_ledger', sa.Integer(), nullable=True),
+    sa.Column('updated', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('wallet', 'network', name='uq_indexed_wallets_wallet')
+    )
+
+
+def downgrade():
+    op.drop_table('indexed_wallets')
+    op.drop_index('ix_wallet_transactions_date', table_name='wallet_transactions')
+    op.drop_index('ix_wallet_transactions_counterparty', table_name='wallet_transactions')
+    op.drop_index('ix_wallet_transactions_currency', table_name='wallet_transactions')
+    op.drop_index('ix_wallet_transactions_kind', table_name='wallet_transactions')
+    op.drop_index('ix_wallet_transactions_type', table_name='wallet_transactions')
+    op.drop_index('ix_wallet_transactions_order', table_name='wallet_transactions')
+    op.drop_table('wallet_transactions')
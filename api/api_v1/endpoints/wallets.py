@@ -1,22 +1,10 @@
-import time
 import asyncio
-from typing import Any, Dict, List
-from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 
-import models, schemas
-from api import deps
-from blockchain.xrp_client import XRPWalletClient
+from blockchain.xrp.Accounts import account_hub
 
 router = APIRouter()
 
-manager = deps.ConnectionManager()
-
-async def aync_func(manager: manager, frequency: int, message, websocket: WebSocket):
-    while True:
-        await manager.send_personal_message()
-        time.sleep(frequency - time.time() % frequency)
-
 
 @router.websocket("/check")
 async def websocket_endpoint(websocket: WebSocket):
@@ -39,42 +27,30 @@ async def websocket_endpoint(websocket: WebSocket):
         print("Client disconnected")
 
 @router.websocket("/{wallet_address}")
-async def get_wallet_balance(websocket: WebSocket, wallet_address: str):
-    client = XRPWalletClient()
-
+async def get_wallet_balance(websocket: WebSocket, wallet_address: str, mainnet: bool = False):
+    """push the wallet's balances, a snapshot first and then every validated change
+    to xrp or a trust line; send "close" to end. {"type": "stale"} says the balances
+    stopped following the ledger, a new snapshot comes once they follow it again"""
     await websocket.accept()
-    
-    try:
-        # wallets = client.get_balance(wallet_address)    
-        print("got here")
-        # rets = await asyncio.gather(*client.get_balance(wallet_address))
 
+    async def push():
+        try:
+            async with account_hub.watch(wallet_address, mainnet) as subscription:
+                async for update in subscription:
+                    await websocket.send_json(update)
+        except WebSocketDisconnect:
+            pass
+        except Exception as exception:
+            await websocket.send_json({"error": str(exception)})
+
+    pusher = asyncio.create_task(push())
+    try:
         while True:
             msg = await websocket.receive_text()
             if msg.lower() == "close":
                 await websocket.close()
                 break
-            # msg = await websocket.receive_text()
-            # if msg.lower() == "close":
-            #     await websocket.close()
-            #     break
-            # else:
-            #     print(f'CLIENT says - {msg}')
-            #     await websocket.send_text(f"Your message was: {msg}")
-            
-            await websocket.send_json(client.get_balance(wallet_address))
-    except WebSocketDisconnect:
-        print("Client disconnected")
-
-
-@router.websocket("/{wallet_address}")
-async def get_wallet_transactions(websocket: WebSocket, wallet_address: str):
-    await manager.connect(websocket)
-    try:
-        client = XRPWalletClient()
-        transactions = client.get_transactions(wallet_address)
-        await manager.send_personal_message(transactions, websocket)
     except WebSocketDisconnect:
-        manager.disconnect(websocket)
-        await manager.send_personal_message(f"Please refresh your browser", websocket)
-
+        pass
+    finally:
+        pusher.cancel()
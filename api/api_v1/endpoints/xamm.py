@@ -1,5 +1,7 @@
+import json
+import re
 from typing import Any, Dict, Union, List
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, WebSocket, WebSocketDisconnect
 from fastapi.encoders import jsonable_encoder
 from sqlalchemy.orm import Session
 import crud
@@ -10,7 +12,8 @@ from api import deps
 
 from schemas import xamm
 
-from blockchain.xrp_client import XammFinance
+from blockchain.xrp_client import XammFinance, xamm_finance
+from notification.websocket_manager import COALESCE, manager
 
 from blockchain.xrp.x_constants import XURLS_
 
@@ -21,6 +24,8 @@ main_url = XURLS_["MAINNET_URL"]
 main_txns = XURLS_["MAINNET_TXNS"]
 main_account = XURLS_["MAINNET_ACCOUNT"]
 
+TXID = re.compile("[0-9A-Fa-f]{64}")
+
 router = APIRouter()
 
 
@@ -29,10 +34,7 @@ def cancel_offer(
     *,
     transaction: xamm.CancelOffer
     ):
-    if transaction.network == "testnet":
-        client = XammFinance(test_url, test_account, test_txns)
-    else:
-        client = XammFinance(main_url, main_account, main_txns)
+    client = xamm_finance(transaction.network)
     try:
         return client.cancel_offer(
             transaction.sender_addr,
@@ -48,10 +50,7 @@ def create_order_book_liquidity(
     transaction: xamm.CreateOrderBookLiquidity
     ):
 
-    if transaction.network == "testnet":
-        client = XammFinance(test_url, test_account, test_txns)
-    else:
-        client = XammFinance(main_url, main_account, main_txns)
+    client = xamm_finance(transaction.network)
     try:
         return client.create_order_book_liquidity(
             transaction.sender_addr,
@@ -68,19 +67,16 @@ def create_order_book_liquidity(
         raise HTTPException(status_code=400, detail=str(exception))
 
 @router.get("/get-account-order-book-liquidity/{network}/{wallet_addr}/{limit}", response_model=Any)   
-def get_account_order_book_liquidity(
+async def get_account_order_book_liquidity(
     *,
     network: str,
     wallet_addr: str,
     limit : int = 30
     ):
 
-    if network == "testnet":
-        client = XammFinance(test_url, test_account, test_txns)
-    else:
-        client = XammFinance(main_url, main_account, main_txns)
+    client = xamm_finance(network)
     try:
-        return client.get_account_order_book_liquidity(
+        return await client.async_get_account_order_book_liquidity(
             wallet_addr,
             limit,
         )
@@ -89,16 +85,27 @@ def get_account_order_book_liquidity(
 
 
 @router.post("/order-book-swap/", response_model=Any)
-def order_book_swap(
+async def order_book_swap(
     *,
     transaction: xamm.OrderBookSwap
     ):
+    """builds the OfferCreate, when `max_slippage` is set the book is quoted first
+    and the swap refused if it would be killed or slip more than that"""
     try:
-        if transaction.network == "testnet":
-            client = XammFinance(test_url, test_account, test_txns)
-        else:
-            client = XammFinance(main_url, main_account, main_txns)
-        
+        client = xamm_finance(transaction.network)
+        if transaction.max_slippage is not None:
+            await client.check_order_book_swap(
+                transaction.buy,
+                transaction.sell,
+                transaction.tf_sell,
+                transaction.buy_type,
+                transaction.sell_type,
+                transaction.buy_issuer,
+                transaction.sell_issuer,
+                transaction.max_slippage,
+                transaction.network != "testnet"
+            )
+
         return client.order_book_swap(
             transaction.sender_addr,
             transaction.buy,
@@ -120,17 +127,17 @@ def order_book_swap(
     '/token-balance/{wallet_address}/{name}/{issuer_address}',
     response_model=Any
 )
-def token_balance(wallet_address: str, name: str, issuer_address: str):
-    client = XammFinance(main_url, main_account, main_txns)
+async def token_balance(wallet_address: str, name: str, issuer_address: str):
+    client = xamm_finance("mainnet")
     try:
-        return client.token_balance(wallet_address, name, issuer_address)
+        return await client.async_token_balance(wallet_address, name, issuer_address)
     except Exception as exception:
         raise HTTPException(400, detail=exception)
     
 @router.get('/status/{txid}/', response_model=Any)
-def status(txid: str):
-    client = XammFinance(main_url, main_account, main_txns)
-    reponse = client.status(txid)
+async def status(txid: str):
+    client = xamm_finance("mainnet")
+    reponse = await client.async_status(txid)
     if reponse:
         if reponse.get("status_code") == 400:
             return HTTPException(status_code=400, detail="Transaction not found")
@@ -138,17 +145,173 @@ def status(txid: str):
     return HTTPException(status_code=400, detail="Transaction not found")
 
 @router.get('/token-exists/{token}/{issuer}/{network}', response_model=Any)
-def token_exists(token: str, issuer: str, network: str = "mainnet"):
-    if network == "mainnet":
-        client = XammFinance(main_url, main_account, main_txns)
-    else:
-        client = XammFinance(test_url, test_account, test_txns)
-    return client.token_exists(token, issuer)
+async def token_exists(token: str, issuer: str, network: str = "mainnet"):
+    client = xamm_finance(network)
+    return await client.async_token_exists(token, issuer)
 
 @router.get('/pending-offers/{wallet_addr}/{network}', response_model=Any)
-def token_exists(wallet_addr: str, network: str = "mainnet"):
-    if network == "mainnet":
-        client = XammFinance(main_url, main_account, main_txns)
-    else:
-        client = XammFinance(test_url, test_account, test_txns)
-    return client.pending_offers(wallet_addr)
+async def token_exists(wallet_addr: str, network: str = "mainnet"):
+    client = xamm_finance(network)
+    return await client.async_pending_offers(wallet_addr)
+
+@router.get('/order-book/{network}', response_model=Any)
+async def order_book(
+    network: str,
+    buy: str,
+    sell: str,
+    buy_issuer: str = None,
+    sell_issuer: str = None,
+    limit: int = None
+    ):
+    client = xamm_finance(network)
+    try:
+        return await client.order_book(
+            buy, sell, buy_issuer, sell_issuer, network != "testnet", limit
+        )
+    except Exception as exception:
+        raise HTTPException(status_code=400, detail=str(exception))
+
+@router.get('/quote/{network}', response_model=Any)
+async def quote_swap(
+    network: str,
+    buy: str,
+    sell: str,
+    amount: float,
+    side: str = "buy",
+    buy_issuer: str = None,
+    sell_issuer: str = None
+    ):
+    """fill, prices and slippage of swapping `sell` into `buy`, `amount` is received (buy) or spent (sell)"""
+    client = xamm_finance(network)
+    try:
+        return await client.quote_swap(
+            buy, sell, amount, side, buy_issuer, sell_issuer, network != "testnet"
+        )
+    except Exception as exception:
+        raise HTTPException(status_code=400, detail=str(exception))
+
+@router.get('/path-quote/{network}', response_model=Any)
+async def path_quote(
+    network: str,
+    buy: str,
+    sell: str,
+    amount: float,
+    buy_issuer: str = None,
+    sell_issuer: str = None,
+    account: str = None
+    ):
+    """multi-hop paths for receiving `amount` of `buy` paying `sell`, cheapest first.
+    `account` is the one paying, the server's XRPL_PATH_ACCOUNT when left out"""
+    client = xamm_finance(network)
+    try:
+        return await client.path_quote(
+            buy, sell, amount, buy_issuer, sell_issuer, account, network != "testnet"
+        )
+    except Exception as exception:
+        raise HTTPException(status_code=400, detail=str(exception))
+
+@router.get('/route/{network}', response_model=Any)
+async def route_quote(
+    network: str,
+    buy: str,
+    sell: str,
+    amount: float,
+    side: str = "buy",
+    buy_issuer: str = None,
+    sell_issuer: str = None
+    ):
+    """like /quote but across the pair's amm and order book, with how much each one fills"""
+    client = xamm_finance(network)
+    try:
+        return await client.route_quote(
+            buy, sell, amount, side, buy_issuer, sell_issuer, network != "testnet"
+        )
+    except Exception as exception:
+        raise HTTPException(status_code=400, detail=str(exception))
+
+@router.post('/route-swap/', response_model=Any)
+async def route_swap(
+    *,
+    transaction: xamm.RouteSwap
+    ):
+    """the route quote and the single OfferCreate to sign for it"""
+    client = xamm_finance(transaction.network)
+    try:
+        return await client.route_swap(
+            transaction.sender_addr,
+            transaction.buy,
+            transaction.sell,
+            transaction.amount,
+            transaction.side,
+            transaction.buy_issuer,
+            transaction.sell_issuer,
+            transaction.tolerance,
+            transaction.fee,
+            transaction.network != "testnet"
+        )
+    except Exception as exception:
+        raise HTTPException(status_code=400, detail=str(exception))
+
+@router.post('/submit/', response_model=Any)
+async def submit(*, transaction: xamm.SubmitTx):
+    """submit a signed blob, the final result comes back without polling /status"""
+    client = xamm_finance(transaction.network)
+    try:
+        return await client.submit(transaction.tx_blob, transaction.wait, transaction.network != "testnet")
+    except Exception as exception:
+        raise HTTPException(status_code=400, detail=str(exception))
+
+@router.get('/tx-result/{txid}/{network}', response_model=Any)
+async def tx_result(txid: str, network: str = "mainnet", last_ledger_sequence: int = None, timeout: float = 30.0):
+    """waits up to `timeout` seconds for the final result, "pending" if it isn't in by then"""
+    client = xamm_finance(network)
+    try:
+        return await client.tx_result(txid, last_ledger_sequence, min(timeout, 60.0), network != "testnet")
+    except Exception as exception:
+        raise HTTPException(status_code=400, detail=str(exception))
+
+def _follow_request(text: str) -> tuple:
+    """txid and last_ledger_sequence of a follow_tx message, ValueError when it isn't one"""
+    try:
+        data = json.loads(text)
+    except ValueError:
+        raise ValueError("expected json")
+    if not isinstance(data, dict) or not isinstance(data.get("txid"), str) or not TXID.fullmatch(data["txid"]):
+        raise ValueError("txid must be a 64 character hex transaction hash")
+    last_ledger_sequence = data.get("last_ledger_sequence")
+    if last_ledger_sequence is not None and (isinstance(last_ledger_sequence, bool) or not isinstance(last_ledger_sequence, int)):
+        raise ValueError("last_ledger_sequence must be a ledger index")
+    return data["txid"].upper(), last_ledger_sequence
+
+
+@router.websocket('/tx/{network}')
+async def follow_tx(websocket: WebSocket, network: str = "mainnet"):
+    """send {txid, last_ledger_sequence?} for every transaction to follow, each gets
+    a pending status and then its final result, a message that isn't one gets {error}"""
+    await manager.connect(websocket)
+    client = xamm_finance(network)
+    mainnet = network != "testnet"
+    try:
+        while True:
+            try:
+                txid, last_ledger_sequence = _follow_request(await websocket.receive_text())
+            except ValueError as exception:
+                manager.send(websocket, {"error": str(exception)})
+                continue
+            manager.subscribe(
+                websocket, f"tx:{network}:{txid}",
+                lambda txid=txid, last=last_ledger_sequence: client.follow_tx(txid, last, mainnet), COALESCE
+            )
+    except WebSocketDisconnect:
+        pass
+    finally:
+        manager.disconnect(websocket)
+
+@router.get('/pending-offers/{wallet_addr}/{network}/page', response_model=Any)
+async def pending_offers_page(wallet_addr: str, network: str = "mainnet", limit: int = None, cursor: str = None):
+    """one page, pass the returned `cursor` back for the next; it is null on the last page"""
+    client = xamm_finance(network)
+    try:
+        return await client.pending_offers_page(wallet_addr, limit, cursor)
+    except Exception as exception:
+        raise HTTPException(status_code=400, detail=str(exception))
@@ -1,6 +1,7 @@
+from datetime import datetime
 from typing import Any, Dict, List
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 
 from api import deps
 
@@ -10,6 +11,16 @@ from blockchain.xrp_client import (
     XRPWalletClient, XRPAssetClient,
     XRPObjectClient
 )
+from blockchain.xrp.Misc import currency_cache
+from blockchain.xrp.Paths import path_cache
+from blockchain.xrp.Router import router_cache
+from blockchain.xrp.Tracker import tx_tracker
+from blockchain.xrp.Indexer import tx_indexer
+from blockchain.xrp.DataApi import data_api
+from blockchain.xrp.Media import nft_media, servable
+from blockchain.xrp.NftOffers import TooManyRequests, nft_offer_cache
+from blockchain.xrp.x_constants import HISTORY_LIMIT
+from blockchain.xrp.Pool import xrpl_pool
 
 from schemas import xrp, transaction as transaction_schema
 
@@ -20,63 +31,113 @@ import models
 router = APIRouter()
 
 
+@router.get("/pool-stats", response_model=Any)
+async def pool_stats() -> Dict:
+    """request coalescing, response cache, currency cache, swap router and path quote hit rates, tracked transactions, indexed wallets, data api cache, nft media, nft offer summaries"""
+    return {
+        **xrpl_pool.stats(), "currencies": currency_cache.stats(), "routes": router_cache.stats(),
+        "paths": path_cache.stats(), "transactions": tx_tracker.stats(), "history": tx_indexer.stats(),
+        "data_api": data_api.stats(), "nft_media": nft_media.stats(),
+        "nft_offers": nft_offer_cache.stats(),
+    }
+
+
 @router.get("/get_balance/{wallet_address}", response_model=Any)
-def get_balance(
+async def get_balance(
     wallet_address: str,
     
     ) -> Dict:
     client = XRPWalletClient()
-    balance = client.get_balance(wallet_address)
+    balance = await client.async_get_balance(wallet_address)
     return balance
 
+@router.post("/get_balances/", response_model=List)
+async def get_balances(
+    balances_in: xrp.BatchBalances,
+    ) -> List:
+    """xrp and token balances of many wallets in one call"""
+    client = XRPWalletClient()
+    tokens = [token.dict() for token in balances_in.tokens] if balances_in.tokens is not None else None
+    try:
+        return await client.async_get_balances(balances_in.wallets, tokens, balances_in.mainnet)
+    except Exception as exception:
+        raise HTTPException(status_code=400, detail=str(exception))
+
 @router.get("/get_tokens/{wallet_address}", response_model=List)
-def get_wallet_tokens(
+async def get_wallet_tokens(
     wallet_address: str,
     ) -> List:
     client = XRPWalletClient()
     try:
-        tokens = client.get_tokens(wallet_address)
+        tokens = await client.async_get_tokens(wallet_address)
     except Exception as exception:
         raise HTTPException(status_code=400, detail=str(exception))
     return tokens
 
 @router.get("/get_nfts/{wallet_address}", response_model=List)
-def get_wallet_nfts(
+async def get_wallet_nfts(
     wallet_address: str,
     
     ) -> List:
     client = XRPWalletClient()
     try:
-        nfts = client.get_tokens(wallet_address)
+        nfts = await client.async_get_tokens(wallet_address)
     except Exception as exception:
         raise HTTPException(status_code=400, detail=str(exception))
     return nfts
 
 @router.get("/get-transactions/{wallet_address}", response_model=Dict)
-def get_wallet_transactions(
+async def get_wallet_transactions(
     wallet_address: str,
     
     ) -> Dict:
     client = XRPWalletClient()
     try:
-        transactions = client.get_transactions(wallet_address)
+        transactions = await client.async_get_transactions(wallet_address)
     except Exception as exception:
         raise HTTPException(status_code=400, detail=str(exception))
     return transactions
 
 @router.get("/get-token-transactions/{wallet_address}", response_model=Dict)
-def get_token_transactions(
+async def get_token_transactions(
     wallet_address: str,
     
     ) -> Dict:
     client = XRPWalletClient()
     try:
-        token_transactions = client.get_token_transactions(wallet_address)
+        token_transactions = await client.async_get_token_transactions(wallet_address)
     except Exception as exception:
         raise HTTPException(status_code=400, detail=str(exception))
     return token_transactions  
 
 
+@router.get("/history/{wallet_address}", response_model=Dict)
+async def get_wallet_history(
+    wallet_address: str,
+    network: str = "mainnet",
+    kind: str = None,
+    tx_type: str = None,
+    currency: str = None,
+    issuer: str = None,
+    counterparty: str = None,
+    direction: str = None,
+    start: datetime = None,
+    end: datetime = None,
+    limit: int = HISTORY_LIMIT,
+    cursor: str = None,
+    ) -> Dict:
+    """indexed history, newest first, pass the returned cursor for the next page\n
+    the first call starts indexing the wallet, `index` says how far it got. direction is sent, received or other,
+    kind is payment_xrp, payment_token, offer, nft, escrow, check, trust_set, amm or other"""
+    try:
+        return await tx_indexer.history(
+            wallet_address, network != "testnet", limit=limit, cursor=cursor, start=start, end=end,
+            kind=kind, tx_type=tx_type, currency=currency, issuer=issuer, counterparty=counterparty, direction=direction,
+        )
+    except Exception as exception:
+        raise HTTPException(status_code=400, detail=str(exception))
+
+
 @router.post("/send-xrp/", response_model=transaction_schema.Transaction)
 def send_xrp(
     *,
@@ -251,14 +312,14 @@ def create_xrp_check(
     return xrp_check
 
 @router.get("/account-checks/", response_model=Dict)
-def get_account_checks(
+async def get_account_checks(
     wallet_address: str,
     limit: int = None,
     
     ) -> Dict:
     client = XRPObjectClient()
     try:
-        account_checks = client.account_checks(
+        account_checks = await client.async_account_checks(
         wallet_addr=wallet_address,
         limit=limit
     )
@@ -269,14 +330,14 @@ def get_account_checks(
     return account_checks
 
 @router.get("/account-escrow/", response_model=Dict)
-def get_account_escrows(
+async def get_account_escrows(
     wallet_address: str,
     limit: int = None,
     
     ) -> Dict:
     client = XRPObjectClient()
     try:
-        account_escrows = client.account_xrp_escrows(
+        account_escrows = await client.async_account_xrp_escrows(
         wallet_addr=wallet_address,
         limit=limit
     )
@@ -309,14 +370,14 @@ def create_offer(
         raise HTTPException(status_code=400, detail=str(exception))
 
 @router.get("/account-offers/", response_model=Dict)
-def account_offers(
+async def account_offers(
     wallet_addr: str,
     limit: int,
     
     ) -> Dict:
     client = XRPObjectClient()
     try:
-        offers = client.account_offers(
+        offers = await client.async_account_offers(
         wallet_addr=wallet_addr,
         limit=limit
     )
@@ -341,7 +402,7 @@ def cancel_offer(
     return cancel
 
 @router.get("/all-offers/", response_model=Dict)
-def all_offers(
+async def all_offers(
     pay: float,
     receive: float,
     limit: int,
@@ -349,7 +410,7 @@ def all_offers(
     ) -> list:
     client = XRPObjectClient()
     try:
-        offers = client.all_offers(
+        offers = await client.async_all_offers(
         pay=pay,
         receive=receive,
         limit=limit
@@ -357,3 +418,148 @@ def all_offers(
     except Exception as exception:
         raise HTTPException(status_code=400, detail=str(exception))
     return offers
+
+
+@router.get("/get_tokens/{wallet_address}/page", response_model=Dict)
+async def get_wallet_tokens_page(
+    wallet_address: str,
+    limit: int = None,
+    cursor: str = None,
+    ) -> Dict:
+    """one page, pass the returned `cursor` back for the next; it is null on the last page"""
+    client = XRPWalletClient()
+    try:
+        return await client.get_tokens_page(wallet_address, limit, cursor)
+    except Exception as exception:
+        raise HTTPException(status_code=400, detail=str(exception))
+
+
+@router.get("/get_nfts/{wallet_address}/page", response_model=Dict)
+async def get_wallet_nfts_page(
+    wallet_address: str,
+    limit: int = None,
+    cursor: str = None,
+    ) -> Dict:
+    """one page, pass the returned `cursor` back for the next; it is null on the last page"""
+    client = XRPWalletClient()
+    try:
+        return await client.get_nfts_page(wallet_address, limit, cursor)
+    except Exception as exception:
+        raise HTTPException(status_code=400, detail=str(exception))
+
+
+@router.get("/nft-gallery/{wallet_address}", response_model=Dict)
+async def get_wallet_nft_gallery(
+    wallet_address: str,
+    network: str = "mainnet",
+    limit: int = None,
+    cursor: str = None,
+    ) -> Dict:
+    """one page of nfts with metadata, `image` and `thumbnail` link to /nft-media, `source` is the original\n
+    media is fetched once and served from cache after that"""
+    client = XRPWalletClient()
+    try:
+        return await client.get_nft_gallery_page(wallet_address, limit, cursor, network != "testnet")
+    except Exception as exception:
+        raise HTTPException(status_code=400, detail=str(exception))
+
+
+@router.get("/nft-media/{digest}")
+async def get_nft_media(digest: str) -> Response:
+    """an nft image or thumbnail by the digest the gallery returned"""
+    media = await nft_media.media(digest)
+    if media is None or not servable(media[0]):
+        raise HTTPException(status_code=404, detail="unknown media")
+    content_type, body = media
+    return Response(content=body, media_type=content_type, headers={
+        "Cache-Control": "public, max-age=31536000, immutable",
+        "X-Content-Type-Options": "nosniff",
+        # an svg opened on its own can't run scripts
+        "Content-Security-Policy": "default-src 'none'; style-src 'unsafe-inline'; sandbox",
+    })
+
+
+@router.post("/nft-offers/", response_model=List)
+async def get_nft_offers(
+    offers_in: xrp.BatchNftOffers,
+    request: Request,
+    ) -> List:
+    """floor, best bid (in xrp) and offer counts of many nfts in one call, in the order asked\n
+    an nft that fails gets an `error` entry instead of failing the batch, a client asking for too many gets a 429"""
+    caller = request.client.host if request.client is not None else None
+    try:
+        return await nft_offer_cache.summaries(offers_in.nftoken_ids, offers_in.mainnet, caller=caller)
+    except TooManyRequests as exception:
+        raise HTTPException(status_code=429, detail=str(exception))
+    except Exception as exception:
+        raise HTTPException(status_code=400, detail=str(exception))
+
+
+@router.get("/get-transactions/{wallet_address}/page", response_model=Dict)
+async def get_wallet_transactions_page(
+    wallet_address: str,
+    limit: int = None,
+    cursor: str = None,
+    ) -> Dict:
+    """one page, pass the returned `cursor` back for the next; it is null on the last page"""
+    client = XRPWalletClient()
+    try:
+        return await client.get_transactions_page(wallet_address, limit, cursor)
+    except Exception as exception:
+        raise HTTPException(status_code=400, detail=str(exception))
+
+
+@router.get("/get-token-transactions/{wallet_address}/page", response_model=Dict)
+async def get_token_transactions_page(
+    wallet_address: str,
+    limit: int = None,
+    cursor: str = None,
+    ) -> Dict:
+    """one page, pass the returned `cursor` back for the next; it is null on the last page"""
+    client = XRPWalletClient()
+    try:
+        return await client.get_token_transactions_page(wallet_address, limit, cursor)
+    except Exception as exception:
+        raise HTTPException(status_code=400, detail=str(exception))
+
+
+@router.get("/account-checks/page", response_model=Dict)
+async def get_account_checks_page(
+    wallet_address: str,
+    limit: int = None,
+    cursor: str = None,
+    ) -> Dict:
+    """one page, pass the returned `cursor` back for the next; it is null on the last page"""
+    client = XRPObjectClient()
+    try:
+        return await client.account_checks_page(wallet_address, limit, cursor)
+    except Exception as exception:
+        raise HTTPException(status_code=400, detail=str(exception))
+
+
+@router.get("/account-escrow/page", response_model=Dict)
+async def get_account_escrows_page(
+    wallet_address: str,
+    limit: int = None,
+    cursor: str = None,
+    ) -> Dict:
+    """one page, pass the returned `cursor` back for the next; it is null on the last page"""
+    client = XRPObjectClient()
+    try:
+        return await client.account_xrp_escrows_page(wallet_address, limit, cursor)
+    except Exception as exception:
+        raise HTTPException(status_code=400, detail=str(exception))
+
+
+@router.get("/account-offers/page", response_model=Dict)
+async def account_offers_page(
+    wallet_addr: str,
+    limit: int = None,
+    cursor: str = None,
+    ) -> Dict:
+    """one page, pass the returned `cursor` back for the next; it is null on the last page"""
+    client = XRPObjectClient()
+    try:
+        return await client.account_offers_page(wallet_addr, limit, cursor)
+    except Exception as exception:
+        raise HTTPException(status_code=400, detail=str(exception))
@@ -0,0 +1,130 @@
+import asyncio
+import json
+import time
+from typing import Callable, Dict, List
+
+import httpx
+import websockets
+
+from . import fixtures
+
+"""
+in-process rippled json rpc, served through httpx transports so the pool,
+the xrpl-py models and every wrapper parser run exactly as in production
+and only the network is taken out. list calls page with markers like rippled
+
+the same commands are answered over a local websocket (`serve`) for the
+stream consumers, which can also be pushed stream messages
+"""
+
+DEFAULT_LIMIT = 200
+MAX_LIMIT = 400
+
+
+class FakeRippled:
+    def __init__(self, book_size: int = 2000, tx_count: int = 10000, line_count: int = 2000, offer_count: int = 1000, latency: float = 0.0):
+        self.latency = latency
+        self.book = fixtures.book_offers(book_size)
+        self.transactions = fixtures.account_tx(tx_count)
+        self.lines = fixtures.account_lines(line_count)
+        self.offers = fixtures.account_offers(offer_count)
+        self.calls = 0
+        self.server = None
+        self.connections = set()
+        self.handlers: Dict[str, Callable[[dict], dict]] = {
+            "account_info": self.account_info,
+            "account_lines": lambda params: self._page(params, "lines", self.lines),
+            "account_offers": lambda params: self._page(params, "offers", self.offers),
+            "account_tx": lambda params: self._page(params, "transactions", self.transactions),
+            "book_offers": self.book_offers,
+            "gateway_balances": self.gateway_balances,
+            "subscribe": self.subscribe,
+            "unsubscribe": lambda params: {},
+        }
+
+    def _page(self, params: dict, field: str, items: List[dict]) -> dict:
+        start = params.get("marker") or 0
+        limit = min(params.get("limit") or DEFAULT_LIMIT, MAX_LIMIT)
+        result = {"account": params.get("account"), "ledger_index": 80000000, "validated": True, field: items[start:start + limit]}
+        if start + limit < len(items):
+            result["marker"] = start + limit
+        return result
+
+    def account_info(self, params: dict) -> dict:
+        return {"ledger_index": 80000000, "validated": True, "account_data": {
+            "Account": params["account"], "Balance": "250000000", "Flags": 0, "OwnerCount": 12, "Sequence": 1}}
+
+    def book_offers(self, params: dict) -> dict:
+        limit = params.get("limit")
+        return {"ledger_index": 80000000, "validated": True, "offers": self.book[:limit] if limit else self.book}
+
+    def gateway_balances(self, params: dict) -> dict:
+        return {"account": params["account"], "ledger_index": 80000000, "obligations": {"USD": "1000000", fixtures.HEX_CURRENCY: "5000"}}
+
+    def subscribe(self, params: dict) -> dict:
+        # a books snapshot is the side's offers, like rippled
+        if any(book.get("snapshot") for book in params.get("books", [])):
+            return {"offers": self.book}
+        return {}
+
+    def respond(self, request: httpx.Request) -> httpx.Response:
+        self.calls += 1
+        body = json.loads(request.content)
+        handler = self.handlers.get(body["method"])
+        if handler is None:
+            result = {"status": "error", "error": "unknownCmd"}
+        else:
+            result = {"status": "success", **handler(body["params"][0])}
+        return httpx.Response(200, json={"result": result})
+
+    def transport(self) -> httpx.MockTransport:
+        def handler(request: httpx.Request) -> httpx.Response:
+            if self.latency:
+                time.sleep(self.latency)
+            return self.respond(request)
+        return httpx.MockTransport(handler)
+
+    def async_transport(self) -> httpx.MockTransport:
+        async def handler(request: httpx.Request) -> httpx.Response:
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            return self.respond(request)
+        return httpx.MockTransport(handler)
+
+    @property
+    def url(self) -> str:
+        port = self.server.sockets[0].getsockname()[1]
+        return f"ws://127.0.0.1:{port}"
+
+    async def serve(self) -> str:
+        """start the websocket on the running loop, returns its url"""
+        self.server = await websockets.serve(self._serve, "127.0.0.1", 0, max_size=None)
+        return self.url
+
+    async def close(self) -> None:
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+
+    async def _serve(self, ws) -> None:
+        self.connections.add(ws)
+        try:
+            async for raw in ws:
+                command = json.loads(raw)
+                self.calls += 1
+                if self.latency:
+                    await asyncio.sleep(self.latency)
+                handler = self.handlers.get(command["command"])
+                if handler is None:
+                    reply = {"id": command["id"], "type": "response", "status": "error", "error": "unknownCmd"}
+                else:
+                    reply = {"id": command["id"], "type": "response", "status": "success", "result": handler(command)}
+                await ws.send(json.dumps(reply))
+        finally:
+            self.connections.discard(ws)
+
+    async def push(self, message: dict) -> None:
+        text = json.dumps(message)
+        for ws in list(self.connections):
+            await ws.send(text)
@@ -0,0 +1,86 @@
+import random
+from typing import List
+
+"""
+rippled shaped fixtures for the benchmarks
+
+generated from a fixed seed so every run sees the same ledger: deep books,
+accounts with 10k+ transactions, wallets with thousands of trust lines
+"""
+
+ACCOUNT = "rPT1Sjq2YGrBMTttX4GZHjKu9dyfzbpAYe"
+ISSUER = "rhub8VRN55s94qWKDv6jmDy1pUykJzF3wq"
+PEER = "rLNaPoKeeBjZe2qs6x52yVPZpZ8td4dc6w"
+# a 40 char currency, decoded on every line like real non standard tokens
+HEX_CURRENCY = "534F4C4F00000000000000000000000000000000"
+
+
+def _address(rng: random.Random) -> str:
+    return "r" + "".join(rng.choice("123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz") for _ in range(33))
+
+
+def _hash(rng: random.Random) -> str:
+    return "".join(rng.choice("0123456789ABCDEF") for _ in range(64))
+
+
+def _token(rng: random.Random, value: float) -> dict:
+    return {"currency": rng.choice(["USD", HEX_CURRENCY]), "issuer": ISSUER, "value": f"{value:.6f}"}
+
+
+def book_offers(count: int, seed: int = 1) -> List[dict]:
+    """one side of an XRP/USD book, TakerGets USD, TakerPays XRP, unsorted"""
+    rng = random.Random(seed)
+    offers = []
+    for _ in range(count):
+        gets = rng.uniform(1, 5000)
+        pays = int(gets * rng.uniform(1.5, 2.5) * 1000000)
+        offers.append({
+            "Account": _address(rng), "BookDirectory": _hash(rng), "BookNode": "0", "Flags": 0,
+            "LedgerEntryType": "Offer", "OwnerNode": "0", "PreviousTxnID": _hash(rng), "PreviousTxnLgrSeq": 80000000,
+            "Sequence": rng.randint(1, 10 ** 7), "index": _hash(rng),
+            "TakerGets": {"currency": "USD", "issuer": ISSUER, "value": f"{gets:.6f}"}, "TakerPays": str(pays),
+            "owner_funds": f"{gets * 2:.6f}", "quality": str(pays / gets),
+        })
+    return offers
+
+
+def account_tx(count: int, seed: int = 2) -> List[dict]:
+    """payment heavy history of ACCOUNT, newest first, with some offers and trust sets mixed in"""
+    rng = random.Random(seed)
+    transactions = []
+    for i in range(count):
+        kind = rng.random()
+        sender, receiver = (ACCOUNT, PEER) if rng.random() < 0.5 else (PEER, ACCOUNT)
+        tx = {"Account": sender, "Fee": "12", "Sequence": count - i, "date": 740000000 + (count - i) * 4,
+              "hash": _hash(rng), "ledger_index": 80000000 - i}
+        meta = {"TransactionIndex": 0, "TransactionResult": "tesSUCCESS", "AffectedNodes": []}
+        if kind < 0.7:
+            amount = _token(rng, rng.uniform(1, 1000)) if rng.random() < 0.5 else str(rng.randint(1, 10 ** 9))
+            tx.update({"TransactionType": "Payment", "Destination": receiver, "Amount": amount})
+            meta["delivered_amount"] = amount
+        elif kind < 0.9:
+            tx.update({"TransactionType": "OfferCreate", "TakerGets": str(rng.randint(1, 10 ** 9)),
+                       "TakerPays": _token(rng, rng.uniform(1, 1000))})
+        else:
+            tx.update({"TransactionType": "TrustSet", "LimitAmount": _token(rng, 10 ** 9)})
+        transactions.append({"meta": meta, "tx": tx, "validated": True})
+    return transactions
+
+
+def account_lines(count: int, seed: int = 3) -> List[dict]:
+    rng = random.Random(seed)
+    return [{
+        "account": _address(rng) if i else ISSUER, "balance": f"{rng.uniform(0, 10 ** 6):.6f}",
+        "currency": HEX_CURRENCY if i % 3 == 0 else "USD", "limit": "1000000000", "limit_peer": "0",
+        "no_ripple": True, "no_ripple_peer": False, "quality_in": 0, "quality_out": 0,
+    } for i in range(count)]
+
+
+def account_offers(count: int, seed: int = 4) -> List[dict]:
+    rng = random.Random(seed)
+    offers = []
+    for i in range(count):
+        gets = rng.uniform(1, 5000)
+        offers.append({"flags": 0, "seq": i + 1, "quality": str(gets * 2), "taker_gets": _token(rng, gets),
+                       "taker_pays": str(int(gets * 2 * 1000000))})
+    return offers
@@ -0,0 +1,334 @@
+import argparse
+import asyncio
+import json
+import platform
+import statistics
+import sys
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List
+
+from xrpl.models import XRP, IssuedCurrency
+
+from blockchain.xrp.Books import BookManager, OrderBook
+from blockchain.xrp.Pool import xrpl_pool
+from blockchain.xrp.Quote import QuoteBook
+from blockchain.xrp.Router import AmmPool, SwapRouter
+from blockchain.xrp.Stream import XrplStream
+from blockchain.xrp.Wallet import xWallet
+from blockchain.xrp.x_constants import XURLS_
+from blockchain.xrp.xamm import sort_best_offer, two_sided_book, xObject
+from notification.messaging_bq import MemoryMailboxes, Notifications
+from notification.websocket_manager import COALESCE, Broadcaster
+
+from . import fixtures
+from .fake_rippled import FakeRippled
+
+"""
+benchmarks for the wrapper layer and the api, against benchmarks.fake_rippled
+
+    python -m benchmarks.run --json results.json
+    python -m benchmarks.run --json new.json --compare results.json --threshold 0.2
+
+--compare exits 1 when a benchmark's median is more than `threshold` slower
+than in the baseline, so a ci job can gate on it
+"""
+
+URL = XURLS_["MAINNET_URL"]
+USD = IssuedCurrency(currency="USD", issuer=fixtures.ISSUER)
+
+
+class Benchmark:
+    def __init__(self, name: str, group: str, fn: Callable, items: int = 1, is_async: bool = False, teardown: Callable = None):
+        self.name = name
+        self.group = group
+        self.fn = fn
+        self.items = items
+        self.is_async = is_async
+        self.teardown = teardown
+
+    def run(self, rounds: int) -> List[float]:
+        if self.is_async:
+            return asyncio.run(self._run_async(rounds))
+        self.fn()  # warm up
+        timings = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            self.fn()
+            timings.append(time.perf_counter() - start)
+        return timings
+
+    async def _run_async(self, rounds: int) -> List[float]:
+        await self.fn()
+        timings = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            await self.fn()
+            timings.append(time.perf_counter() - start)
+        if self.teardown is not None:
+            await self.teardown()
+        await xrpl_pool.aclose()
+        return timings
+
+
+def summarize(benchmark: Benchmark, timings: List[float]) -> Dict[str, Any]:
+    ordered = sorted(timings)
+    median = statistics.median(ordered)
+    return {
+        "name": benchmark.name,
+        "group": benchmark.group,
+        "rounds": len(ordered),
+        "min": ordered[0],
+        "max": ordered[-1],
+        "mean": statistics.fmean(ordered),
+        "median": median,
+        "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        "stddev": statistics.pstdev(ordered),
+        "ops_per_sec": 1 / median if median else None,
+        "items_per_sec": benchmark.items / median if median else None,
+    }
+
+
+def wrapper_benchmarks(rippled: FakeRippled) -> List[Benchmark]:
+    wallet = xWallet(URL, XURLS_["MAINNET_ACCOUNT"], XURLS_["MAINNET_TXNS"])
+    amm = xObject(URL, XURLS_["MAINNET_ACCOUNT"], XURLS_["MAINNET_TXNS"])
+
+    async def payment_history():
+        async for _ in wallet.payment_transactions_pages(fixtures.ACCOUNT, limit=400):
+            pass
+
+    quotes = QuoteBook.from_book(OrderBook(rippled.book))
+
+    def quote_keystrokes():
+        for amount in range(1, 101):
+            quotes.quote(amount * 37.5)
+
+    router = SwapRouter(quotes, AmmPool(quotes.cum_pays[-1], quotes.depth, 500))
+
+    def route_keystrokes():
+        for amount in range(1, 101):
+            router.route(amount * 37.5)
+
+    async def token_exists_burst():
+        await asyncio.gather(*[amm.async_token_exists("USD", fixtures.ISSUER) for _ in range(50)])
+
+    return [
+        Benchmark("sort_best_offer", "books", lambda: sort_best_offer(XRP(), USD, best_buy=True, mainnet=True), len(rippled.book), True),
+        Benchmark("quote_x100", "books", quote_keystrokes, 100),
+        Benchmark("route_x100", "books", route_keystrokes, 100),
+        Benchmark("quote_book_build", "books", lambda: QuoteBook.from_book(OrderBook(rippled.book)), len(rippled.book)),
+        Benchmark("two_sided_book", "books", lambda: two_sided_book(XRP(), USD, mainnet=True), 2 * len(rippled.book), True),
+        Benchmark("payment_transactions", "wallet", lambda: wallet.payment_transactions(fixtures.ACCOUNT, limit=400), 400),
+        Benchmark("payment_transactions_pages", "wallet", payment_history, len(rippled.transactions), True),
+        Benchmark("account_tokens", "wallet", lambda: wallet.account_tokens(fixtures.ACCOUNT), 200),
+        Benchmark("async_balances", "wallet", lambda: wallet.async_balances(fixtures.ACCOUNT), len(rippled.lines), True),
+        Benchmark("pending_offers", "xamm", lambda: amm.async_pending_offers(fixtures.ACCOUNT), 200, True),
+        Benchmark("token_exists_x50", "xamm", token_exists_burst, 50, True),
+    ]
+
+
+def stream_benchmarks(rippled: FakeRippled, updates: int = 100) -> List[Benchmark]:
+    """the websocket side, requests over one XrplStream and a watched book taking offer updates"""
+    state = {}
+
+    async def connect() -> dict:
+        if state.get("loop") is not asyncio.get_running_loop():
+            # the server and the stream live on the benchmark's loop, set up in the warm up round
+            state["loop"] = asyncio.get_running_loop()
+            state["stream"] = XrplStream(await rippled.serve(), reconnect_delay=0.01)
+        return state
+
+    async def close():
+        if "watch" in state:
+            await state.pop("watch").__aexit__(None, None, None)
+        await state.pop("stream").close()
+        await rippled.close()
+        state.clear()
+
+    async def book_offers_burst():
+        stream = (await connect())["stream"]
+        request = {"command": "book_offers", "taker_gets": {"currency": "USD", "issuer": fixtures.ISSUER},
+                   "taker_pays": {"currency": "XRP"}, "limit": 50}
+        await asyncio.gather(*[stream.request(dict(request)) for _ in range(50)])
+
+    async def book_updates():
+        if "feed" not in (await connect()):
+            manager = BookManager(stream_factory=lambda mainnet: state["stream"])
+            state["watch"] = manager.watch(USD, XRP())
+            state["feed"] = (await state["watch"].__aenter__()).feed
+            state["ledger_index"] = 80000000
+        feed = state["feed"]
+        offers = feed.book.depth()
+        for n in range(updates):
+            state["ledger_index"] += 1
+            offer = offers[n % len(offers)]
+            fields = {"Account": offer["Account"], "TakerGets": offer["TakerGets"], "TakerPays": str(int(offer["TakerPays"]) + 1)}
+            await rippled.push({
+                "type": "transaction", "validated": True, "ledger_index": state["ledger_index"],
+                "transaction": {"TransactionType": "OfferCreate"},
+                "meta": {"TransactionResult": "tesSUCCESS", "AffectedNodes": [
+                    {"ModifiedNode": {"LedgerEntryType": "Offer", "LedgerIndex": offer["index"], "FinalFields": fields}},
+                ]},
+            })
+        while feed.ledger_index < state["ledger_index"]:
+            await asyncio.sleep(0)
+
+    return [
+        Benchmark("stream_book_offers_x50", "stream", book_offers_burst, 50, True, close),
+        Benchmark(f"stream_book_updates_x{updates}", "stream", book_updates, updates, True, close),
+    ]
+
+
+class NullSocket:
+    def __init__(self, counter: List[int]):
+        self.counter = counter
+
+    async def send_text(self, text: str) -> None:
+        self.counter[0] += 1
+
+
+def broadcast_benchmarks(sockets: int = 50000) -> List[Benchmark]:
+    """one book snapshot published to `sockets` subscribers and written out by their writers"""
+    state = {}
+    counter = [0]
+    snapshot = {"asks": fixtures.book_offers(20)}
+
+    async def broadcast():
+        if state.get("loop") is not asyncio.get_running_loop():
+            # connecting is set up, in the warm up round
+            state["loop"] = asyncio.get_running_loop()
+            state["broadcaster"] = broadcaster = Broadcaster()
+            for _ in range(sockets):
+                socket = NullSocket(counter)
+                await broadcaster.connect(socket, accept=False)
+                broadcaster.subscribe(socket, "book:XRP/USD")
+        target = counter[0] + sockets
+        state["broadcaster"].publish("book:XRP/USD", snapshot, COALESCE)
+        while counter[0] < target:
+            await asyncio.sleep(0)
+
+    return [Benchmark(f"broadcast_{sockets // 1000}k", "notification", broadcast, sockets, True)]
+
+
+class UserSocket:
+    """counts delivered notifications, `gone` is the user disconnecting"""
+
+    def __init__(self, counter: List[int], gone: asyncio.Event):
+        self.counter = counter
+        self.gone = gone
+
+    async def send_text(self, text: str) -> None:
+        self.counter[0] += text.count('"n":')
+
+    async def receive(self) -> dict:
+        await self.gone.wait()
+        return {"type": "websocket.disconnect", "code": 1000}
+
+
+def notification_benchmarks(users: int = 5000, backlog: int = 20) -> List[Benchmark]:
+    """`users` come back online to `backlog` queued notifications each, timed until
+    every notification is delivered and acked"""
+    counter = [0]
+    offer = fixtures.book_offers(1)[0]
+    queued = [json.dumps({"n": n, "type": "offer_filled", "offer": offer}) for n in range(backlog)]
+
+    async def reconnect():
+        mailboxes = MemoryMailboxes()
+        # what notify() left while they were away
+        mailboxes.ready = {user: deque(queued) for user in range(users)}
+        notifications = Notifications(mailboxes)
+        gone = asyncio.Event()
+        target = counter[0] + users * backlog
+        sessions = [asyncio.create_task(notifications.serve(UserSocket(counter, gone), user)) for user in range(users)]
+        while counter[0] < target:
+            await asyncio.sleep(0.001)
+        gone.set()
+        await asyncio.gather(*sessions)
+
+    return [Benchmark(f"notifications_{users // 1000}k_users", "notification", reconnect, users * backlog, True)]
+
+
+def endpoint_benchmarks(rippled: FakeRippled) -> List[Benchmark]:
+    """the api end to end through an in-process asgi client, needs the app settings in the environment"""
+    import httpx
+    from main import app
+
+    def get(path: str) -> Callable:
+        async def call():
+            async with httpx.AsyncClient(app=app, base_url="http://bench") as client:
+                response = await client.get(path)
+                response.raise_for_status()
+        return call
+
+    prefix = "/api/v1"
+    return [
+        Benchmark("GET /xamm/order-book", "api", get(f"{prefix}/xamm/order-book/mainnet?buy=xrp&sell=USD&sell_issuer={fixtures.ISSUER}&limit=50"), 50, True),
+        Benchmark("GET /xamm/pending-offers", "api", get(f"{prefix}/xamm/pending-offers/{fixtures.ACCOUNT}/mainnet"), 200, True),
+        Benchmark("GET /xrp/get_tokens", "api", get(f"{prefix}/xrp/get_tokens/{fixtures.ACCOUNT}"), 200, True),
+        Benchmark("GET /xrp/get-transactions", "api", get(f"{prefix}/xrp/get-transactions/{fixtures.ACCOUNT}"), 200, True),
+    ]
+
+
+def compare(results: List[Dict[str, Any]], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """names of the benchmarks whose median regressed by more than `threshold`"""
+    before = {(entry["group"], entry["name"]): entry["median"] for entry in baseline["benchmarks"]}
+    regressions = []
+    for entry in results:
+        previous = before.get((entry["group"], entry["name"]))
+        if previous and entry["median"] > previous * (1 + threshold):
+            regressions.append(f"{entry['group']}/{entry['name']}: {previous * 1000:.2f}ms -> {entry['median'] * 1000:.2f}ms")
+    return regressions
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--filter", default="", help="only run benchmarks whose name contains this")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every fake rippled response")
+    parser.add_argument("--json", help="write the results here")
+    parser.add_argument("--compare", help="baseline results to gate against")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    rippled = FakeRippled(latency=args.latency)
+    xrpl_pool.configure(transport=rippled.transport(), async_transport=rippled.async_transport(), cache=None)
+    benchmarks = wrapper_benchmarks(rippled) + stream_benchmarks(rippled) + broadcast_benchmarks() + notification_benchmarks()
+    skipped = []
+    try:
+        benchmarks += endpoint_benchmarks(rippled)
+    except Exception as exception:
+        skipped.append({"group": "api", "reason": str(exception)})
+
+    results = []
+    for benchmark in benchmarks:
+        if args.filter not in benchmark.name:
+            continue
+        summary = summarize(benchmark, benchmark.run(args.rounds))
+        results.append(summary)
+        print(f"{benchmark.group:8} {benchmark.name:30} median {summary['median'] * 1000:9.3f}ms  p95 {summary['p95'] * 1000:9.3f}ms  {summary['items_per_sec']:12.0f} items/s")
+    for skip in skipped:
+        print(f"skipped {skip['group']}: {skip['reason']}")
+
+    report = {
+        "machine": {"python": platform.python_version(), "platform": platform.platform(), "processor": platform.processor()},
+        "timestamp": time.time(),
+        "rounds": args.rounds,
+        "latency": args.latency,
+        "benchmarks": results,
+        "skipped": skipped,
+    }
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(report, file, indent=2)
+    if args.compare:
+        with open(args.compare) as file:
+            regressions = compare(results, json.load(file), args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
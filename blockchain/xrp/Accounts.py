@@ -0,0 +1,322 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Dict, List, Set, Tuple
+
+from .Misc import currency_cache
+from .Pool import xrpl_pool
+from .Stream import XrplStream, xrpl_stream
+from .Wallet import xWallet
+from .x_constants import XURLS_
+
+"""
+live wallet balances off the shared rippled stream
+
+every watched address is subscribed once (`accounts`) on the network's stream,
+however many sockets watch it. after a snapshot over http the balances are
+kept up to date from the metadata of each validated transaction touching the
+account, the AccountRoot for xrp and the RippleState nodes for trust lines,
+so nothing is polled and no rippled call is made per update
+
+an address that can't be subscribed again after a reconnect is stale, its
+sockets get a "stale" message and it is retried until it is reloaded
+"""
+
+logger = logging.getLogger(__name__)
+
+LOW_NO_RIPPLE = 0x00020000
+HIGH_NO_RIPPLE = 0x00040000
+LOW_FREEZE = 0x00400000
+HIGH_FREEZE = 0x00800000
+
+TokenKey = Tuple[str, str]
+
+
+def trust_line(address: str, fields: dict) -> Tuple[TokenKey, dict]:
+    """a RippleState's fields as the account_lines style entry of `address`, None when
+    the currency doesn't decode (lp tokens)"""
+    low = fields["LowLimit"]["issuer"] == address
+    own, peer = ("LowLimit", "HighLimit") if low else ("HighLimit", "LowLimit")
+    symbol, decodes = currency_cache.lookup(fields["Balance"]["currency"])
+    if not decodes:
+        return None, None
+    # Balance is from the low account's side
+    balance = fields["Balance"]["value"]
+    if not low:
+        balance = balance[1:] if balance.startswith("-") else ("-" + balance if balance != "0" else balance)
+    flags = fields.get("Flags", 0)
+    issuer = fields[peer]["issuer"]
+    return (symbol, issuer), {
+        "token": symbol,
+        "issuer": issuer,
+        "amount": balance,
+        "limit": fields[own]["value"],
+        "freeze_status": bool(flags & (LOW_FREEZE if low else HIGH_FREEZE)),
+        "ripple_status": bool(flags & (LOW_NO_RIPPLE if low else HIGH_NO_RIPPLE)),
+    }
+
+
+class AccountState:
+    """balances of one watched address"""
+
+    def __init__(self, address: str, mainnet: bool):
+        self.address = address
+        self.mainnet = mainnet
+        self.account_data: dict = {}
+        self.tokens: Dict[TokenKey, dict] = {}
+        self.ledger_index = 0
+        self.watchers: Set["AccountSubscription"] = set()
+        self.subscribed = False
+        self.ready = asyncio.Event()
+        self.error: Exception = None
+        # why the balances stopped following the ledger, None while they do
+        self.stale: str = None
+
+    def mark_stale(self, exception: Exception) -> None:
+        self.stale = str(exception) or type(exception).__name__
+        for watcher in self.watchers:
+            watcher.reset()
+
+    def load(self, snapshot: dict) -> None:
+        """replace everything with an async_balances result"""
+        self.stale = None
+        self.account_data = snapshot.get("account_data", {})
+        self.tokens = {(token["token"], token["issuer"]): token for token in snapshot["tokens"]}
+        for watcher in self.watchers:
+            watcher.reset()
+
+    def apply(self, message: dict) -> bool:
+        """fold a validated transaction in, True when something of this account changed"""
+        changed: Set[TokenKey] = set()
+        account_changed = False
+        for affected in message["meta"].get("AffectedNodes", []):
+            for node_type, node in affected.items():
+                entry_type = node.get("LedgerEntryType")
+                fields = node.get("FinalFields") or node.get("NewFields") or {}
+                if entry_type == "AccountRoot" and fields.get("Account") == self.address:
+                    if node_type == "DeletedNode":
+                        self.account_data = {}
+                    else:
+                        self.account_data = {**self.account_data, **{key: fields[key] for key in ("Balance", "OwnerCount") if key in fields}}
+                    account_changed = True
+                elif entry_type == "RippleState" and self.address in (
+                    fields.get("LowLimit", {}).get("issuer"), fields.get("HighLimit", {}).get("issuer")
+                ):
+                    key, line = trust_line(self.address, fields)
+                    if key is None:
+                        continue
+                    if node_type == "DeletedNode":
+                        self.tokens.pop(key, None)
+                        line["amount"] = "0"
+                        line["removed"] = True
+                    else:
+                        self.tokens[key] = line
+                    changed.add(key)
+                    for watcher in self.watchers:
+                        if node_type == "DeletedNode":
+                            watcher.removed[key] = line
+                        else:
+                            watcher.removed.pop(key, None)
+        if not account_changed and not changed:
+            return False
+        self.ledger_index = message.get("ledger_index", self.ledger_index)
+        transaction = message.get("transaction", {}).get("hash")
+        for watcher in self.watchers:
+            watcher.notify(changed, transaction)
+        return True
+
+
+class AccountSubscription:
+    """one socket's view of an address, iterating yields the snapshot first and then
+    what changed since the last yield; a slow socket gets updates merged, not queued"""
+
+    def __init__(self, state: AccountState, wallet: xWallet):
+        self.state = state
+        self.wallet = wallet
+        self.changed: Set[TokenKey] = set()
+        self.removed: Dict[TokenKey, dict] = {}
+        self.transactions: List[str] = []
+        self.snapshot = True
+        self._event = asyncio.Event()
+        self._event.set()
+
+    def reset(self) -> None:
+        self.snapshot = True
+        self._event.set()
+
+    def notify(self, changed: Set[TokenKey], transaction: str) -> None:
+        self.changed |= changed
+        if transaction:
+            self.transactions.append(transaction)
+        self._event.set()
+
+    def __aiter__(self) -> AsyncIterator[dict]:
+        return self
+
+    async def __anext__(self) -> dict:
+        await self._event.wait()
+        self._event.clear()
+        state = self.state
+        if state.stale is not None:
+            # a snapshot follows once it is reloaded
+            return {"type": "stale", "address": state.address, "error": state.stale, "ledger_index": state.ledger_index}
+        message = {
+            "type": "snapshot" if self.snapshot else "update",
+            "address": state.address,
+            "xrp": self.wallet._xrp_balance({"account_data": state.account_data} if state.account_data else {}),
+            "ledger_index": state.ledger_index,
+        }
+        if self.snapshot:
+            message["tokens"] = list(state.tokens.values())
+        else:
+            message["tokens"] = [state.tokens.get(key) or self.removed.get(key) for key in self.changed]
+            message["transactions"] = self.transactions
+        self.snapshot = False
+        self.changed = set()
+        self.removed = {}
+        self.transactions = []
+        return message
+
+
+def _wallet(mainnet: bool) -> xWallet:
+    prefix = "MAINNET" if mainnet else "TESTNET"
+    return xWallet(xrpl_pool.network_url(mainnet), XURLS_[f"{prefix}_ACCOUNT"], XURLS_[f"{prefix}_TXNS"])
+
+
+class AccountHub:
+    """shares one `accounts` subscription per address and network between sockets"""
+
+    def __init__(self, stream_factory: Callable[[bool], XrplStream] = xrpl_stream, wallet_factory: Callable[[bool], xWallet] = _wallet):
+        self.stream_factory = stream_factory
+        self.wallet_factory = wallet_factory
+        self._states: Dict[Tuple[str, str], AccountState] = {}
+        self._streams: Dict[str, XrplStream] = {}
+        self._resubscribing: Dict[str, asyncio.Task] = {}
+
+    def _stream(self, mainnet: bool) -> XrplStream:
+        stream = self.stream_factory(mainnet)
+        if stream.url not in self._streams:
+            self._streams[stream.url] = stream
+            stream.on("transaction", lambda message: self._on_transaction(stream.url, message))
+            stream.on("connected", lambda message: self._resubscribe(stream))
+        return stream
+
+    @asynccontextmanager
+    async def watch(self, address: str, mainnet: bool = True) -> AsyncIterator[AccountSubscription]:
+        """watch an address, subscribing upstream if nobody else is"""
+        stream = self._stream(mainnet)
+        state = await self._acquire(stream, address, mainnet)
+        subscription = AccountSubscription(state, self.wallet_factory(mainnet))
+        state.watchers.add(subscription)
+        try:
+            yield subscription
+        finally:
+            state.watchers.discard(subscription)
+            if not state.watchers:
+                await self._release(stream, state)
+
+    def watching(self, mainnet: bool = True) -> List[str]:
+        url = self.stream_factory(mainnet).url
+        return [address for (state_url, address), state in self._states.items() if state_url == url and state.subscribed]
+
+    async def _snapshot(self, state: AccountState) -> None:
+        balances = await self.wallet_factory(state.mainnet).async_balances(state.address)
+        xrp = balances["xrp"]
+        state.load({"account_data": {"Balance": str(xrp["balance"]), "OwnerCount": xrp["object_count"]}, "tokens": balances["tokens"]})
+
+    async def _acquire(self, stream: XrplStream, address: str, mainnet: bool) -> AccountState:
+        key = (stream.url, address)
+        state = self._states.get(key)
+        if state is None:
+            state = self._states[key] = AccountState(address, mainnet)
+            try:
+                # subscribe before the snapshot so nothing in between is missed
+                await stream.subscribe(accounts=[address])
+                state.subscribed = True
+                await self._snapshot(state)
+            except Exception as exception:
+                state.error = exception
+                self._states.pop(key, None)
+                if state.subscribed:
+                    state.subscribed = False
+                    await self._unsubscribe(stream, address)
+            state.ready.set()
+        await state.ready.wait()
+        if state.error is not None:
+            raise state.error
+        return state
+
+    async def _release(self, stream: XrplStream, state: AccountState) -> None:
+        key = (stream.url, state.address)
+        if self._states.get(key) is not state:
+            return
+        del self._states[key]
+        if state.subscribed:
+            state.subscribed = False
+            await self._unsubscribe(stream, state.address)
+
+    async def _unsubscribe(self, stream: XrplStream, address: str) -> None:
+        try:
+            await stream.unsubscribe(accounts=[address])
+        except Exception as exception:
+            logger.warning("unsubscribing %s on %s failed: %r", address, stream.url, exception)
+
+    async def _resubscribe(self, stream: XrplStream) -> None:
+        """subscribe every watched address again after a reconnect and reload its balances,
+        transactions may have gone by while we were away. what fails is marked stale and
+        retried with the stream's backoff, a newer connect starts over"""
+        previous = self._resubscribing.get(stream.url)
+        if previous is not None:
+            previous.cancel()
+        self._resubscribing[stream.url] = task = asyncio.current_task()
+        delay = stream.reconnect_delay
+        try:
+            states = [state for (url, _), state in list(self._states.items()) if url == stream.url and state.subscribed]
+            while states:
+                states = await self._reload(stream, states)
+                if states:
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, stream.max_reconnect_delay)
+                    # only what is still watched
+                    states = [state for state in states if self._states.get((stream.url, state.address)) is state]
+        finally:
+            if self._resubscribing.get(stream.url) is task:
+                del self._resubscribing[stream.url]
+
+    async def _reload(self, stream: XrplStream, states: List[AccountState]) -> List[AccountState]:
+        """the states that couldn't be subscribed and reloaded, marked stale"""
+        try:
+            await stream.subscribe(accounts=[state.address for state in states])
+        except Exception as exception:
+            logger.warning("resubscribing %s accounts on %s failed: %r", len(states), stream.url, exception)
+            for state in states:
+                state.mark_stale(exception)
+            return states
+        failed = []
+        results = await asyncio.gather(*[self._snapshot(state) for state in states], return_exceptions=True)
+        for state, result in zip(states, results):
+            if isinstance(result, Exception):
+                logger.warning("reloading %s on %s failed: %r", state.address, stream.url, result)
+                state.mark_stale(result)
+                failed.append(state)
+        return failed
+
+    def _on_transaction(self, url: str, message: dict) -> None:
+        if not message.get("validated") or "meta" not in message:
+            return
+        touched = set()
+        for affected in message["meta"].get("AffectedNodes", []):
+            for node in affected.values():
+                fields = node.get("FinalFields") or node.get("NewFields") or {}
+                if node.get("LedgerEntryType") == "AccountRoot":
+                    touched.add(fields.get("Account"))
+                elif node.get("LedgerEntryType") == "RippleState":
+                    touched.add(fields.get("LowLimit", {}).get("issuer"))
+                    touched.add(fields.get("HighLimit", {}).get("issuer"))
+        for address in touched:
+            state = self._states.get((url, address))
+            if state is not None and state.subscribed:
+                state.apply(message)
+
+
+account_hub = AccountHub()
@@ -6,6 +6,7 @@ from xrpl.models import (AccountSet, AccountSetFlag, IssuedCurrencyAmount,
 from .Misc import (mm, nft_fee_to_xrp_format, symbol_to_hex,
                   transfer_fee_to_xrp_format, validate_symbol_to_hex)
 from .x_constants import M_SOURCE_TAG
+from .Pool import xrpl_pool
 
 """create tokens, nfts"""
 
@@ -14,20 +15,23 @@ class xAsset(JsonRpcClient):
         self.network_url = network_url
         self.account_url = account_url
         self.txn_url = txn_url
-        self.client = JsonRpcClient(network_url)
+        self.client = xrpl_pool.client(network_url)
+        self.async_client = xrpl_pool.async_client(network_url)
 
     def toTestnet(self) -> bool:
         self.network_url = "https://s.altnet.rippletest.net:51234"
         self.account_url = "https://testnet.xrpl.org/accounts/"
         self.txn_url = "https://testnet.xrpl.org/transactions/"
-        self.client = JsonRpcClient(self.network_url)
+        self.client = xrpl_pool.client(self.network_url)
+        self.async_client = xrpl_pool.async_client(self.network_url)
         return True
 
     def toMainnet(self) -> bool:
         self.network_url = "https://xrplcluster.com"
         self.account_url = "https://livenet.xrpl.org/accounts/"
         self.txn_url = "https://livenet.xrpl.org/transactions/"
-        self.client = JsonRpcClient(self.network_url)
+        self.client = xrpl_pool.client(self.network_url)
+        self.async_client = xrpl_pool.async_client(self.network_url)
         return True
     
     """steps to creating a token; must use 2 new accounts"""
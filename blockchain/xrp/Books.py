@@ -0,0 +1,367 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from decimal import Decimal
+from typing import AsyncIterator, Dict, Iterable, List, Set, Tuple, Union
+
+from sortedcontainers import SortedDict
+from xrpl.models import XRP, IssuedCurrency
+
+from .Misc import symbol_to_hex
+from .Stream import XrplStream, xrpl_stream
+
+"""
+server side order books fed by the rippled `books` stream
+
+every (taker_gets, taker_pays) pair is subscribed once per network, with a
+snapshot, and kept current from the offer nodes in each validated
+transaction's metadata. any number of browser sockets can watch the same book
+"""
+
+logger = logging.getLogger(__name__)
+
+# book_offers fields that only hold for the ledger the snapshot was read at
+FUNDED_FIELDS = ("owner_funds", "taker_gets_funded", "taker_pays_funded")
+
+
+def currency_code(currency: str) -> str:
+    """ledger form of a currency code, 3 letters or 40 hex chars"""
+    if len(currency) == 40:
+        return currency.upper()
+    return symbol_to_hex(currency)
+
+
+def book_side(amount: Union[str, dict, XRP, IssuedCurrency]) -> str:
+    """key for one side of a book: `XRP` or `CODE.issuer`"""
+    if isinstance(amount, (XRP, IssuedCurrency)):
+        amount = amount.to_dict()
+    if isinstance(amount, str) or amount.get("currency") == "XRP":
+        return "XRP"
+    return f"{currency_code(amount['currency'])}.{amount['issuer']}"
+
+
+def book_spec(currency: Union[XRP, IssuedCurrency]) -> dict:
+    """`taker_gets`/`taker_pays` entry of a books subscription"""
+    if isinstance(currency, XRP):
+        return {"currency": "XRP"}
+    return {"currency": currency_code(currency.currency), "issuer": currency.issuer}
+
+
+def _amount_value(amount: Union[str, dict]) -> Decimal:
+    """drops for xrp, value for tokens, which is what rippled's `quality` is based on"""
+    if isinstance(amount, str):
+        return Decimal(amount)
+    return Decimal(amount["value"])
+
+
+def offer_quality(offer: dict) -> Decimal:
+    """TakerPays / TakerGets of an offer"""
+    if "quality" in offer:
+        return Decimal(offer["quality"])
+    gets = _amount_value(offer["TakerGets"])
+    if gets == 0:
+        return Decimal(0)
+    return _amount_value(offer["TakerPays"]) / gets
+
+
+class OrderBook:
+    """one side of a book (a BookOffers result) ordered by numeric quality\n
+    the best offer for the taker, lowest TakerPays/TakerGets, comes first.
+    inserts, updates and deletes are O(log n), totals are kept as we go. running
+    totals are prefix sums built once per book version, on the first read after a
+    change, so liquidity and cumulative are binary searches like Quote's"""
+
+    def __init__(self, offers: Iterable[dict] = ()):
+        self._levels: SortedDict = SortedDict()  # (quality, index) -> offer
+        self._keys: Dict[str, Tuple[Decimal, str]] = {}  # index -> (quality, index)
+        self.total_gets = Decimal(0)
+        self.total_pays = Decimal(0)
+        # running TakerGets/TakerPays totals in book order, None when the book changed since
+        self._sums: Tuple[List[Decimal], List[Decimal]] = None
+        self.load(offers)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, index: str) -> bool:
+        return index in self._keys
+
+    def __iter__(self):
+        return iter(self._levels.values())
+
+    def get(self, index: str) -> dict:
+        key = self._keys.get(index)
+        return self._levels[key] if key is not None else None
+
+    def load(self, offers: Iterable[dict]) -> None:
+        """replace every offer, e.g. with a snapshot"""
+        self._levels.clear()
+        self._keys.clear()
+        self._sums = None
+        self.total_gets = Decimal(0)
+        self.total_pays = Decimal(0)
+        for offer in offers:
+            self.upsert(offer)
+
+    def upsert(self, offer: dict) -> None:
+        index = offer["index"]
+        self.remove(index)
+        key = (offer_quality(offer), index)
+        self._levels[key] = offer
+        self._keys[index] = key
+        self._sums = None
+        self.total_gets += _amount_value(offer["TakerGets"])
+        self.total_pays += _amount_value(offer["TakerPays"])
+
+    def remove(self, index: str) -> dict:
+        key = self._keys.pop(index, None)
+        if key is None:
+            return None
+        offer = self._levels.pop(key)
+        self._sums = None
+        self.total_gets -= _amount_value(offer["TakerGets"])
+        self.total_pays -= _amount_value(offer["TakerPays"])
+        return offer
+
+    def apply(self, node_type: str, node: dict) -> None:
+        """apply one Offer node from transaction metadata"""
+        index = node["LedgerIndex"]
+        if node_type == "DeletedNode":
+            self.remove(index)
+            return
+        fields = node.get("NewFields") or node.get("FinalFields") or {}
+        offer = dict(self.get(index) or {})
+        offer.update(fields)
+        offer["index"] = index
+        # funding was read with the snapshot, a fill moved it, quotes fall back to TakerGets
+        for key in FUNDED_FIELDS:
+            offer.pop(key, None)
+        offer.pop("quality", None)
+        offer["quality"] = str(offer_quality(offer))
+        self.upsert(offer)
+
+    def best(self) -> dict:
+        """best offer for the taker, None if the book is empty"""
+        return self._levels.peekitem(0)[1] if self._levels else None
+
+    def worst(self) -> dict:
+        return self._levels.peekitem(-1)[1] if self._levels else None
+
+    def best_quality(self) -> Decimal:
+        return self._levels.peekitem(0)[0][0] if self._levels else None
+
+    def depth(self, n: int = None, reverse: bool = False) -> List[dict]:
+        """first `n` offers (all when None), worst first when `reverse`"""
+        keys = self._levels.keys()
+        if reverse:
+            keys = reversed(keys)
+        offers = []
+        for key in keys:
+            if n is not None and len(offers) >= n:
+                break
+            offers.append(self._levels[key])
+        return offers
+
+    def _prefix(self) -> Tuple[List[Decimal], List[Decimal]]:
+        if self._sums is None:
+            gets, pays = [], []
+            total_gets = Decimal(0)
+            total_pays = Decimal(0)
+            for offer in self._levels.values():
+                total_gets += _amount_value(offer["TakerGets"])
+                total_pays += _amount_value(offer["TakerPays"])
+                gets.append(total_gets)
+                pays.append(total_pays)
+            self._sums = (gets, pays)
+        return self._sums
+
+    def _level_end(self, quality: Decimal) -> int:
+        """position after the last offer at or better than `quality`"""
+        return self._levels.bisect_right((quality, "\uffff"))
+
+    def cumulative(self, n: int = None) -> List[dict]:
+        """best `n` price levels with the running TakerGets/TakerPays totals"""
+        gets, pays = self._prefix()
+        keys = self._levels.keys()
+        levels = []
+        start = 0
+        while start < len(keys) and (n is None or len(levels) < n):
+            quality = keys[start][0]
+            stop = self._level_end(quality)
+            levels.append({"quality": quality, "count": stop - start, "gets": gets[stop - 1], "pays": pays[stop - 1]})
+            start = stop
+        return levels
+
+    def liquidity(self, max_quality: Decimal = None) -> Tuple[Decimal, Decimal]:
+        """TakerGets/TakerPays available at or better than `max_quality`, whole book when None"""
+        if max_quality is None:
+            return self.total_gets, self.total_pays
+        stop = self._level_end(max_quality)
+        if not stop:
+            return Decimal(0), Decimal(0)
+        gets, pays = self._prefix()
+        return gets[stop - 1], pays[stop - 1]
+
+
+class BookFeed:
+    """one subscribed book, shared by every watcher"""
+
+    def __init__(self, taker_gets: Union[XRP, IssuedCurrency], taker_pays: Union[XRP, IssuedCurrency]):
+        self.taker_gets = taker_gets
+        self.taker_pays = taker_pays
+        self.key = (book_side(taker_gets), book_side(taker_pays))
+        self.book = OrderBook()
+        self.ledger_index = 0
+        self.watchers: Set["BookSubscription"] = set()
+        self.subscribed = False
+        self.ready = asyncio.Event()
+        self.error: Exception = None
+
+    def spec(self) -> dict:
+        return {"taker_gets": book_spec(self.taker_gets), "taker_pays": book_spec(self.taker_pays), "snapshot": True}
+
+    def load(self, offers: List[dict]) -> None:
+        """replace the book with a snapshot"""
+        self.book.load(offers)
+        self.publish()
+
+    def apply(self, node_type: str, node: dict) -> None:
+        self.book.apply(node_type, node)
+
+    def publish(self) -> None:
+        for watcher in self.watchers:
+            watcher.notify()
+
+
+class BookSubscription:
+    """a watcher's view of a feed, iterating yields the feed after every change\n
+    updates are coalesced, a slow watcher only ever sees the latest book"""
+
+    def __init__(self, feed: BookFeed):
+        self.feed = feed
+        self._changed = asyncio.Event()
+        self._changed.set()
+
+    def notify(self) -> None:
+        self._changed.set()
+
+    def __aiter__(self) -> AsyncIterator[BookFeed]:
+        return self
+
+    async def __anext__(self) -> BookFeed:
+        await self._changed.wait()
+        self._changed.clear()
+        if self.feed.error is not None:
+            raise self.feed.error
+        return self.feed
+
+
+class BookManager:
+    """shares one books subscription per pair and network between watchers"""
+
+    def __init__(self, stream_factory=xrpl_stream):
+        self.stream_factory = stream_factory
+        self._feeds: Dict[Tuple[str, str, str], BookFeed] = {}
+        self._streams: Dict[str, XrplStream] = {}
+
+    def _stream(self, mainnet: bool) -> XrplStream:
+        stream = self.stream_factory(mainnet)
+        if stream.url not in self._streams:
+            self._streams[stream.url] = stream
+            stream.on("transaction", lambda message: self._on_transaction(stream.url, message))
+            stream.on("connected", lambda message: self._resubscribe(stream))
+        return stream
+
+    @asynccontextmanager
+    async def watch(self, taker_gets: Union[XRP, IssuedCurrency], taker_pays: Union[XRP, IssuedCurrency], mainnet: bool = True) -> AsyncIterator[BookSubscription]:
+        """watch a book, subscribing upstream if nobody else is"""
+        stream = self._stream(mainnet)
+        feed = await self._acquire(stream, BookFeed(taker_gets, taker_pays))
+        subscription = BookSubscription(feed)
+        feed.watchers.add(subscription)
+        try:
+            yield subscription
+        finally:
+            feed.watchers.discard(subscription)
+            if not feed.watchers:
+                await self._release(stream, feed)
+
+    def book(self, taker_gets: Union[XRP, IssuedCurrency], taker_pays: Union[XRP, IssuedCurrency], mainnet: bool = True) -> BookFeed:
+        """the live feed for a pair if someone is watching it, else None"""
+        stream = self.stream_factory(mainnet)
+        feed = self._feeds.get((stream.url, book_side(taker_gets), book_side(taker_pays)))
+        if feed is not None and feed.subscribed:
+            return feed
+        return None
+
+    async def _acquire(self, stream: XrplStream, new_feed: BookFeed) -> BookFeed:
+        key = (stream.url, *new_feed.key)
+        feed = self._feeds.get(key)
+        if feed is None:
+            feed = self._feeds[key] = new_feed
+            try:
+                result = await stream.subscribe(books=[feed.spec()])
+                feed.ledger_index = result.get("ledger_index", 0)
+                feed.load(result.get("offers", []))
+                feed.subscribed = True
+            except Exception as exception:
+                feed.error = exception
+                self._feeds.pop(key, None)
+            feed.ready.set()
+        await feed.ready.wait()
+        if feed.error is not None:
+            raise feed.error
+        return feed
+
+    async def _release(self, stream: XrplStream, feed: BookFeed) -> None:
+        key = (stream.url, *feed.key)
+        if self._feeds.get(key) is not feed:
+            return
+        del self._feeds[key]
+        if feed.subscribed:
+            feed.subscribed = False
+            spec = feed.spec()
+            del spec["snapshot"]
+            try:
+                await stream.unsubscribe(books=[spec])
+            except Exception as exception:
+                logger.warning("unsubscribing %s/%s on %s failed: %r", *feed.key, stream.url, exception)
+
+    async def _resubscribe(self, stream: XrplStream) -> None:
+        """reload every live book after a reconnect, offers may have moved while we were away\n
+        a book that can't be reloaded is stale, it is dropped and its watchers get the error,
+        the next watcher (or book() caller) starts from a fresh snapshot"""
+        for key, feed in list(self._feeds.items()):
+            if key[0] == stream.url and feed.subscribed:
+                try:
+                    result = await stream.subscribe(books=[feed.spec()])
+                    feed.load(result.get("offers", []))
+                except Exception as exception:
+                    logger.warning("resubscribing %s/%s on %s failed: %r", *feed.key, stream.url, exception)
+                    feed.subscribed = False
+                    feed.error = exception
+                    if self._feeds.get(key) is feed:
+                        del self._feeds[key]
+                    feed.publish()
+
+    def _on_transaction(self, url: str, message: dict) -> None:
+        if not message.get("validated") or "meta" not in message:
+            return
+        touched = set()
+        for affected in message["meta"].get("AffectedNodes", []):
+            for node_type, node in affected.items():
+                if node.get("LedgerEntryType") != "Offer":
+                    continue
+                fields = node.get("NewFields") or node.get("FinalFields") or {}
+                if "TakerGets" not in fields or "TakerPays" not in fields:
+                    continue
+                feed = self._feeds.get((url, book_side(fields["TakerGets"]), book_side(fields["TakerPays"])))
+                if feed is not None and feed.subscribed:
+                    feed.apply(node_type, node)
+                    touched.add(feed)
+        for feed in touched:
+            feed.ledger_index = message.get("ledger_index", feed.ledger_index)
+            feed.publish()
+
+
+book_manager = BookManager()
@@ -0,0 +1,153 @@
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from xrpl.models.requests.request import Request
+
+from .x_constants import CACHE_MAX_ENTRIES, CACHE_TTL
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # optional, only needed for RedisBackend
+    aioredis = None
+
+"""
+response cache for reads against the validated ledger
+
+a validated result only changes when a ledger closes, every 3-4 seconds, so
+identical reads in between are answered from here. keys carry the network and
+the last validated ledger index seen on the ledger stream (see follow_ledger),
+entries also expire after `ttl` in case the stream is down
+"""
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryBackend:
+    """bounded in-process store, oldest entries are evicted first"""
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            return value
+
+    async def set(self, key: str, value: str, ttl: float) -> None:
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    async def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisBackend:
+    """shared store for multi worker deployments, needs the `redis` package"""
+
+    def __init__(self, url: str, prefix: str = "xrpl:"):
+        if aioredis is None:
+            raise RuntimeError("RedisBackend needs the redis package, pip install redis")
+        self.redis = aioredis.from_url(url)
+        self.prefix = prefix
+
+    async def get(self, key: str) -> Optional[str]:
+        value = await self.redis.get(self.prefix + key)
+        return value.decode() if isinstance(value, bytes) else value
+
+    async def set(self, key: str, value: str, ttl: float) -> None:
+        await self.redis.set(self.prefix + key, value, px=max(int(ttl * 1000), 1))
+
+    async def clear(self) -> None:
+        async for key in self.redis.scan_iter(match=self.prefix + "*"):
+            await self.redis.delete(key)
+
+
+class ResponseCache:
+    """caches successful json rpc responses for requests on the validated ledger"""
+
+    def __init__(self, ttl: float = CACHE_TTL, backend=None):
+        self.ttl = ttl
+        self.backend = backend if backend is not None else MemoryBackend()
+        self.ledgers: Dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, url: str, request: Request) -> Optional[str]:
+        """cache key, None when the request isn't pinned to the validated ledger"""
+        params = request.to_dict()
+        if params.get("ledger_index") != "validated":
+            return None
+        params.pop("id", None)
+        method = params.pop("method")
+        digest = hashlib.sha1(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()
+        return f"{url}:{self.ledgers.get(url, 'ttl')}:{method}:{digest}"
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        value = await self.backend.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(value)
+
+    async def set(self, key: str, response: Dict[str, Any]) -> None:
+        await self.backend.set(key, json.dumps(response), self.ttl)
+
+    def ledger_closed(self, url: str, ledger_index: int) -> None:
+        """new validated ledger on `url`, older keys are no longer reachable"""
+        if ledger_index > self.ledgers.get(url, 0):
+            self.ledgers[url] = ledger_index
+
+    async def follow_ledger(self, stream, url: str) -> None:
+        """key entries on the validated ledger index from a stream's `ledger` subscription\n
+        `url` is the json rpc url the stream's network is read through"""
+
+        async def subscribe(message=None):
+            delay = stream.reconnect_delay
+            while True:
+                try:
+                    result = await stream.subscribe(streams=["ledger"])
+                except Exception as exception:
+                    # the index would stop moving, keys fall back to the ttl alone until this works
+                    self.ledgers.pop(url, None)
+                    logger.warning("ledger stream on %s failed, caching on ttl only, retrying in %ss: %r", stream.url, delay, exception)
+                    if not stream.connected:
+                        # the next connect subscribes again
+                        return
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, stream.max_reconnect_delay)
+                    continue
+                if "ledger_index" in result:
+                    self.ledger_closed(url, result["ledger_index"])
+                return
+
+        stream.on("ledgerClosed", lambda message: self.ledger_closed(url, message["ledger_index"]))
+        stream.on("connected", subscribe)
+        await stream.start()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "ledgers": dict(self.ledgers),
+        }
@@ -0,0 +1,172 @@
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List
+
+from xrpl.utils import drops_to_xrp, ripple_time_to_datetime
+
+from .Misc import validate_hex_to_symbol
+
+"""
+one pass over a wallet's transactions
+
+every account_tx entry (or stream transaction) is decoded once into a compact
+TxRecord: what kind of transaction it is, which way it went for the wallet,
+and the amount that actually moved, delivered_amount from the metadata where
+there is one. the history views (xrp payments, token payments, all payments,
+the indexed history) are projections over the records, nothing is decoded twice
+"""
+
+PAYMENT_XRP = "payment_xrp"
+PAYMENT_TOKEN = "payment_token"
+OFFER = "offer"
+NFT = "nft"
+ESCROW = "escrow"
+CHECK = "check"
+TRUST_SET = "trust_set"
+AMM = "amm"
+OTHER = "other"
+
+SENT = "sent"
+RECEIVED = "received"
+
+_KINDS = {
+    "OfferCreate": OFFER, "OfferCancel": OFFER,
+    "NFTokenMint": NFT, "NFTokenBurn": NFT, "NFTokenCreateOffer": NFT, "NFTokenCancelOffer": NFT, "NFTokenAcceptOffer": NFT,
+    "EscrowCreate": ESCROW, "EscrowFinish": ESCROW, "EscrowCancel": ESCROW,
+    "CheckCreate": CHECK, "CheckCash": CHECK, "CheckCancel": CHECK,
+    "TrustSet": TRUST_SET,
+    "AMMCreate": AMM, "AMMDeposit": AMM, "AMMWithdraw": AMM, "AMMVote": AMM, "AMMBid": AMM, "AMMDelete": AMM,
+}
+
+# the field holding the amount a transaction moves, when the metadata doesn't say
+_AMOUNT_FIELDS = {
+    OFFER: "TakerGets",
+    CHECK: "SendMax",
+    TRUST_SET: "LimitAmount",
+}
+
+
+class TxRecord:
+    """a transaction as seen from one wallet. xrp amounts are in xrp, token
+    currencies are the raw code"""
+    __slots__ = (
+        "kind", "tx_type", "txid", "ledger_index", "tx_index", "date", "result", "direction",
+        "sender", "receiver", "counterparty", "currency", "issuer", "amount", "fee", "details",
+    )
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            setattr(self, name, fields.get(name))
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+def _amount(amount: Any):
+    """(currency, issuer, value) of an xrpl amount"""
+    if isinstance(amount, str):
+        return "XRP", None, str(drops_to_xrp(amount))
+    if isinstance(amount, dict):
+        return amount.get("currency"), amount.get("issuer"), amount.get("value")
+    return None, None, None
+
+
+def classify(tx: Dict[str, Any], meta: Dict[str, Any], wallet: str, ledger_index: int = None) -> TxRecord:
+    """decode one transaction for `wallet`"""
+    tx_type = tx["TransactionType"]
+    kind = _KINDS.get(tx_type, OTHER)
+    # delivered_amount is what a payment or cashed check really moved, partial payments included
+    amount = meta.get("delivered_amount")
+    if amount is None or amount == "unavailable":
+        amount = tx.get(_AMOUNT_FIELDS.get(kind, "Amount"))
+    if kind == CHECK and amount is None:
+        amount = tx.get("Amount", tx.get("DeliverMin"))
+    currency, issuer, value = _amount(amount)
+    if tx_type == "Payment":
+        kind = PAYMENT_XRP if currency == "XRP" else PAYMENT_TOKEN
+
+    sender = tx["Account"]
+    receiver = tx.get("Destination")
+    if sender == wallet:
+        direction = SENT
+        counterparty = issuer if kind == TRUST_SET else receiver
+    elif receiver == wallet:
+        direction, counterparty = RECEIVED, sender
+    else:
+        # an offer crossing or a trust line rippling through the wallet
+        direction, counterparty = OTHER, sender
+
+    details = None
+    if kind == OFFER and "TakerPays" in tx:
+        details = {"taker_pays": tx["TakerPays"]}
+    elif kind == NFT:
+        details = {"nftoken_id": tx.get("NFTokenID", meta.get("nftoken_id"))}
+    elif kind == AMM and "Amount2" in tx:
+        details = {"amount2": tx["Amount2"]}
+
+    return TxRecord(
+        kind=kind,
+        tx_type=tx_type,
+        txid=tx["hash"],
+        ledger_index=tx.get("ledger_index", ledger_index),
+        tx_index=meta.get("TransactionIndex", 0),
+        date=ripple_time_to_datetime(tx["date"]) if "date" in tx else datetime.now(timezone.utc),
+        result=meta["TransactionResult"],
+        direction=direction,
+        sender=sender,
+        receiver=receiver,
+        counterparty=counterparty,
+        currency=currency,
+        issuer=issuer,
+        amount=value,
+        fee=str(drops_to_xrp(tx.get("Fee", "0"))),
+        details=details,
+    )
+
+
+def classify_page(result: Dict[str, Any], wallet: str) -> List[TxRecord]:
+    """the records of an account_tx result, newest first like the result"""
+    return [
+        classify(entry["tx"], entry["meta"], wallet)
+        for entry in result.get("transactions", [])
+        if isinstance(entry.get("meta"), dict)
+    ]
+
+
+def payment_view(record: TxRecord, txn_url: str) -> Dict[str, Any]:
+    """the shape the wallet's payment history endpoints return"""
+    view = {"sender": record.sender, "receiver": record.receiver}
+    if record.kind == PAYMENT_TOKEN:
+        view["token"] = validate_hex_to_symbol(record.currency)
+        view["issuer"] = record.issuer
+    else:
+        view["token"] = "XRP"
+        view["issuer"] = ""
+    view.update({
+        "amount": record.amount,
+        "fee": record.fee,
+        "timestamp": str(record.date),
+        "result": record.result,
+        "txid": record.txid,
+        "link": f"{txn_url}{record.txid}",
+        "tx_type": record.tx_type,
+    })
+    return view
+
+
+def xrp_payment_view(record: TxRecord, txn_url: str) -> Dict[str, Any]:
+    view = payment_view(record, txn_url)
+    del view["token"], view["issuer"]
+    return view
+
+
+def sent_and_received(
+    records: Iterable[TxRecord], wallet: str, txn_url: str, kinds: Iterable[str], view: Callable[[TxRecord, str], Dict[str, Any]] = payment_view,
+) -> Dict[str, List[Dict[str, Any]]]:
+    """{"sent": [...], "received": [...]} of the records of `kinds`, anything the wallet didn't send counts as received"""
+    kinds = frozenset(kinds)
+    sent, received = [], []
+    for record in records:
+        if record.kind in kinds:
+            (sent if record.sender == wallet else received).append(view(record, txn_url))
+    return {"sent": sent, "received": received}
+
@@ -0,0 +1,115 @@
+import asyncio
+import hashlib
+import json
+import threading
+import weakref
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from xrpl.models.requests.request import Request
+
+"""
+singleflight for json rpc reads
+
+concurrent identical requests to the same network share one upstream call,
+e.g. N browsers opening the same token page fire one GatewayBalances instead
+of N. only in flight requests are shared, nothing is kept once the call returns
+"""
+
+# never shared, every caller has to reach rippled
+UNSHARED_METHODS = {"submit", "submit_multisigned", "sign", "sign_for", "ping", "random"}
+
+
+def request_key(url: str, request: Request) -> Optional[str]:
+    """key of identical requests, None for requests that must not be shared"""
+    params = request.to_dict()
+    params.pop("id", None)
+    method = params.pop("method")
+    if method in UNSHARED_METHODS:
+        return None
+    digest = hashlib.sha1(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()
+    return f"{url}:{method}:{digest}"
+
+
+class _Stats:
+    def __init__(self):
+        self.leaders = 0
+        self.followers = 0
+
+    def stats(self) -> Dict[str, Any]:
+        calls = self.leaders + self.followers
+        return {
+            "upstream": self.leaders,
+            "coalesced": self.followers,
+            "hit_rate": self.followers / calls if calls else 0.0,
+        }
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: BaseException = None
+
+
+class Singleflight(_Stats):
+    """thread safe singleflight for the sync clients"""
+
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+            else:
+                self.followers += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as exception:
+            call.error = exception
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+class AsyncSingleflight(_Stats):
+    """singleflight for the async clients, calls are shared per event loop
+
+    the call runs in a task of its own which every caller, the first included, waits
+    on shielded, so a caller that is cancelled never cancels the call for the others"""
+
+    def __init__(self):
+        super().__init__()
+        self._calls: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Task]]" = weakref.WeakKeyDictionary()
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        loop = asyncio.get_running_loop()
+        calls = self._calls.setdefault(loop, {})
+        task = calls.get(key)
+        if task is not None:
+            self.followers += 1
+        else:
+            self.leaders += 1
+            task = calls[key] = loop.create_task(fn())
+            task.add_done_callback(lambda done: self._done(calls, key, done))
+        return await asyncio.shield(task)
+
+    @staticmethod
+    def _done(calls: Dict[str, asyncio.Task], key: str, task: asyncio.Task) -> None:
+        if calls.get(key) is task:
+            del calls[key]
+        if not task.cancelled():
+            task.exception()  # no "never retrieved" warning when every caller went away
@@ -0,0 +1,336 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from json import JSONDecodeError
+from typing import Any, List, Optional, Set, Tuple
+
+import httpx
+
+from .Coalesce import AsyncSingleflight
+from .Pool import retire_async_client
+from .x_constants import (DATA_BACKOFF, DATA_CACHE_MAX_ENTRIES, DATA_CACHE_TTL,
+                          DATA_CONCURRENCY, DATA_MAX_CONNECTIONS, DATA_RETRIES,
+                          DATA_TIMEOUT, XURLS_)
+
+"""
+client for the external data apis, xrpldata (nfts, nft offers) and xrplmeta (token metrics)
+
+one keep-alive http client per event loop (plus one for sync callers), at most
+`concurrency` requests in flight, identical requests share one call, 429s, 5xxs
+and timeouts are retried with full jitter backoff. json answers are kept in
+memory and, when `cache_dir` is set, on disk for `ttl` seconds so a restart
+doesn't cold start every nft gallery
+"""
+
+_RETRY_STATUS = frozenset((429, 500, 502, 503, 504))
+
+
+class DataApiError(ValueError):
+    pass
+
+
+class MemoryTTLCache:
+    """bounded in-process store, oldest entries are evicted first"""
+
+    def __init__(self, max_entries: int = DATA_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """(found, value)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            if entry[1] < time.time():
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+            return True, entry[0]
+
+    def set(self, key: str, value: Any, expires: float) -> None:
+        with self._lock:
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class DiskTTLCache:
+    """one json file per key under `directory`, written atomically"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, hashlib.sha256(key.encode()).hexdigest() + ".json")
+
+    def get(self, key: str) -> Tuple[bool, Any, float]:
+        """(found, value, expires)"""
+        path = self._path(key)
+        try:
+            with open(path) as file:
+                entry = json.load(file)
+        except (OSError, ValueError):
+            return False, None, 0.0
+        if entry["expires"] < time.time():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return False, None, 0.0
+        return True, entry["value"], entry["expires"]
+
+    def set(self, key: str, value: Any, expires: float) -> None:
+        path = self._path(key)
+        partial = f"{path}.{os.getpid()}.{threading.get_ident()}"
+        try:
+            with open(partial, "w") as file:
+                json.dump({"expires": expires, "value": value}, file, separators=(",", ":"))
+            os.replace(partial, path)
+        except OSError:
+            pass
+
+
+class DataApiClient:
+    """pooled, cached json client for xrpldata and xrplmeta\n
+    answers are shared between callers (and the cache), treat them as read only.
+    `transport` and `async_transport` are only meant for tests"""
+
+    def __init__(
+        self,
+        timeout: float = DATA_TIMEOUT,
+        max_connections: int = DATA_MAX_CONNECTIONS,
+        concurrency: int = DATA_CONCURRENCY,
+        retries: int = DATA_RETRIES,
+        backoff: float = DATA_BACKOFF,
+        ttl: float = DATA_CACHE_TTL,
+        max_entries: int = DATA_CACHE_MAX_ENTRIES,
+        cache_dir: str = None,
+        transport: httpx.BaseTransport = None,
+        async_transport: httpx.AsyncBaseTransport = None,
+    ):
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.transport = transport
+        self.async_transport = async_transport
+        self.flights = AsyncSingleflight()
+        self._memory = MemoryTTLCache(max_entries)
+        self._disk = DiskTTLCache(cache_dir) if cache_dir else None
+        self._lock = threading.Lock()
+        self._http: Optional[httpx.Client] = None
+        # an httpx.AsyncClient and a semaphore are bound to the loop they were made on
+        self._async_http: Optional[Tuple[asyncio.AbstractEventLoop, httpx.AsyncClient]] = None
+        # closes of replaced async clients still running
+        self._closing: Set[asyncio.Future] = set()
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.retried = 0
+
+    def configure(self, **options) -> None:
+        """change limits or the cache directory, open http clients are rebuilt lazily"""
+        for key, value in options.items():
+            if not hasattr(self, key) or key.startswith("_"):
+                raise ValueError(f"unknown data api option {key}")
+            setattr(self, key, value)
+        self._memory = MemoryTTLCache(self.max_entries)
+        self._disk = DiskTTLCache(self.cache_dir) if self.cache_dir else None
+        self._semaphores = weakref.WeakKeyDictionary()
+        self.close()
+
+    def xrpldata_url(self, path: str, mainnet: bool = True) -> str:
+        return (XURLS_["MAINNET_XRPLDATA"] if mainnet else XURLS_["TESTNET_XRPLDATA"]) + path
+
+    def xrplmeta_url(self, path: str) -> str:
+        return XURLS_["XRPLMETA"] + path
+
+    def _limits(self) -> httpx.Limits:
+        return httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections)
+
+    def http_client(self) -> httpx.Client:
+        http = self._http
+        if http is None:
+            with self._lock:
+                if self._http is None:
+                    self._http = httpx.Client(
+                        timeout=self.timeout, limits=self._limits(), transport=self.transport, follow_redirects=True
+                    )
+                http = self._http
+        return http
+
+    def async_http_client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        if self._async_http is None or self._async_http[0] is not loop:
+            http = httpx.AsyncClient(
+                timeout=self.timeout, limits=self._limits(), transport=self.async_transport, follow_redirects=True
+            )
+            entry, self._async_http = self._async_http, (loop, http)
+            if entry is not None:
+                retire_async_client(*entry, self._closing)
+        return self._async_http[1]
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.concurrency)
+        return semaphore
+
+    def _delay(self, attempt: int) -> float:
+        # full jitter, retries from many workers don't line up
+        return random.uniform(0, self.backoff * 2 ** attempt)
+
+    @staticmethod
+    def _json(url: str, response: httpx.Response) -> Any:
+        try:
+            return response.json()
+        except JSONDecodeError:
+            raise DataApiError(f"{url} answered {response.status_code} without json")
+
+    def _cached(self, url: str) -> Tuple[bool, Any]:
+        found, value = self._memory.get(url)
+        if found:
+            self.memory_hits += 1
+            return True, value
+        if self._disk is not None:
+            found, value, expires = self._disk.get(url)
+            if found:
+                self.disk_hits += 1
+                self._memory.set(url, value, expires)
+                return True, value
+        return False, None
+
+    def _store(self, url: str, value: Any, ttl: float) -> None:
+        if ttl <= 0:
+            return
+        expires = time.time() + ttl
+        self._memory.set(url, value, expires)
+        if self._disk is not None:
+            self._disk.set(url, value, expires)
+
+    def get(self, url: str, ttl: float = None) -> Any:
+        """the json at `url`, from the cache when it is fresh"""
+        ttl = self.ttl if ttl is None else ttl
+        found, value = self._cached(url)
+        if found:
+            return value
+        self.misses += 1
+        for attempt in range(self.retries + 1):
+            last = attempt == self.retries
+            try:
+                response = self.http_client().get(url)
+            except httpx.TransportError as exception:
+                if last:
+                    raise DataApiError(f"{url} failed, {exception}")
+            else:
+                if response.status_code not in _RETRY_STATUS or last:
+                    value = self._json(url, response)
+                    if response.is_success:
+                        self._store(url, value, ttl)
+                    return value
+            self.retried += 1
+            time.sleep(self._delay(attempt))
+
+    async def async_get(self, url: str, ttl: float = None) -> Any:
+        ttl = self.ttl if ttl is None else ttl
+        found, value = self._memory.get(url)
+        if found:
+            self.memory_hits += 1
+            return value
+        return await self.flights.do(url, lambda: self._async_fetch(url, ttl))
+
+    async def _async_fetch(self, url: str, ttl: float) -> Any:
+        if self._disk is not None:
+            found, value = await asyncio.to_thread(self._cached, url)
+            if found:
+                return value
+        self.misses += 1
+        for attempt in range(self.retries + 1):
+            last = attempt == self.retries
+            try:
+                async with self._semaphore():
+                    response = await self.async_http_client().get(url)
+            except httpx.TransportError as exception:
+                if last:
+                    raise DataApiError(f"{url} failed, {exception}")
+            else:
+                if response.status_code not in _RETRY_STATUS or last:
+                    value = self._json(url, response)
+                    if response.is_success:
+                        if self._disk is not None:
+                            await asyncio.to_thread(self._store, url, value, ttl)
+                        else:
+                            self._store(url, value, ttl)
+                    return value
+            self.retried += 1
+            await asyncio.sleep(self._delay(attempt))
+
+    async def async_get_many(self, urls: List[str], ttl: float = None) -> List[Any]:
+        """the json of every url, `concurrency` at a time, a failed url gives its exception"""
+        return await asyncio.gather(*[self.async_get(url, ttl) for url in urls], return_exceptions=True)
+
+    def xrpldata(self, path: str, mainnet: bool = True) -> Any:
+        return self.get(self.xrpldata_url(path, mainnet))
+
+    async def async_xrpldata(self, path: str, mainnet: bool = True) -> Any:
+        return await self.async_get(self.xrpldata_url(path, mainnet))
+
+    def xrplmeta(self, path: str) -> Any:
+        return self.get(self.xrplmeta_url(path))
+
+    async def async_xrplmeta(self, path: str) -> Any:
+        return await self.async_get(self.xrplmeta_url(path))
+
+    def stats(self) -> dict:
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "retried": self.retried,
+            "coalesced": self.flights.stats(),
+        }
+
+    def close(self) -> None:
+        """close every client, the async one in the background (see aclose)"""
+        with self._lock:
+            http, self._http = self._http, None
+            entry, self._async_http = self._async_http, None
+        if http is not None:
+            http.close()
+        if entry is not None:
+            retire_async_client(*entry, self._closing)
+
+    async def aclose(self) -> None:
+        """close every client, waiting for the one owned by the running loop"""
+        with self._lock:
+            entry = self._async_http
+            if entry is not None and entry[0] is asyncio.get_running_loop():
+                self._async_http = None
+            else:
+                entry = None
+        if entry is not None:
+            await entry[1].aclose()
+        self.close()
+
+
+data_api = DataApiClient()
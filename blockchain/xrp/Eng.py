@@ -1,4 +1,5 @@
-import requests
+import asyncio
+
 from xrpl.clients import JsonRpcClient
 from xrpl.models import (AccountDelete, AccountInfo, AccountSet,
                          AccountSetFlag, GatewayBalances, IssuedCurrencyAmount,
@@ -7,9 +8,11 @@ from xrpl.transaction import (safe_sign_and_autofill_transaction,
                               send_reliable_submission)
 from xrpl.wallet import Wallet
 
+from .DataApi import data_api
 from .Misc import (mm, transfer_fee_to_xrp_format, validate_hex_to_symbol,
                   validate_symbol_to_hex, xrp_format_to_nft_fee, amm_fee_to_xrp_format)
 from .x_constants import M_SOURCE_TAG
+from .Pool import xrpl_pool
 
 
 class xEng(JsonRpcClient):
@@ -17,28 +20,43 @@ class xEng(JsonRpcClient):
         self.network_url = network_url
         self.account_url = account_url
         self.txn_url = txn_url
-        self.client = JsonRpcClient(network_url)
+        self.client = xrpl_pool.client(network_url)
+        self.async_client = xrpl_pool.async_client(network_url)
 
     def toTestnet(self) -> bool:
         self.network_url = "https://s.altnet.rippletest.net:51234"
         self.account_url = "https://testnet.xrpl.org/accounts/"
         self.txn_url = "https://testnet.xrpl.org/transactions/"
-        self.client = JsonRpcClient(self.network_url)
+        self.client = xrpl_pool.client(self.network_url)
+        self.async_client = xrpl_pool.async_client(self.network_url)
         return True
 
     def toMainnet(self) -> bool:
         self.network_url = "https://xrplcluster.com"
         self.account_url = "https://livenet.xrpl.org/accounts/"
         self.txn_url = "https://livenet.xrpl.org/transactions/"
-        self.client = JsonRpcClient(self.network_url)
+        self.client = xrpl_pool.client(self.network_url)
+        self.async_client = xrpl_pool.async_client(self.network_url)
         return True
 
     def created_tokens_issuer(self, wallet_addr: str) -> list:
         """returns all tokens an account has created as the issuer"""
+        result = self.client.request(GatewayBalances(account=wallet_addr, ledger_index="validated")).result
+        account_data = {}
+        if 'obligations' in result:
+            acc_info = AccountInfo(account=wallet_addr, ledger_index="validated")
+            account_data = self.client.request(acc_info).result["account_data"]
+        return self._created_tokens_issuer(result, account_data, wallet_addr)
+
+    async def async_created_tokens_issuer(self, wallet_addr: str) -> list:
+        balances, info = await asyncio.gather(
+            self.async_client.request(GatewayBalances(account=wallet_addr, ledger_index="validated")),
+            self.async_client.request(AccountInfo(account=wallet_addr, ledger_index="validated")),
+        )
+        return self._created_tokens_issuer(balances.result, info.result.get("account_data", {}), wallet_addr)
+
+    def _created_tokens_issuer(self, result: dict, account_data: dict, wallet_addr: str) -> list:
         created_assets = []
-        req = GatewayBalances(account=wallet_addr, ledger_index="validated")
-        response = self.client.request(req)
-        result = response.result
         if 'obligations' in result:
             obligations = result["obligations"]
             for key, value in obligations.items():
@@ -47,8 +65,6 @@ class xEng(JsonRpcClient):
                 asset["amount"] = value
                 asset["issuer"] = wallet_addr
                 asset["domain"] = ""
-                acc_info = AccountInfo(account=wallet_addr, ledger_index="validated")
-                account_data = self.client.request(acc_info).result["account_data"]
                 if "Domain" in account_data:
                     asset["domain"] = validate_hex_to_symbol(
                         account_data["Domain"])
@@ -57,13 +73,29 @@ class xEng(JsonRpcClient):
 
     def created_tokens_manager(self, wallet_addr: str) -> list:
         """returns all tokens an account thas created as the manager"""
+        result = self.client.request(GatewayBalances(account=wallet_addr, ledger_index="validated")).result
+        issuers = {}
+        for issuer in result.get("assets", {}):
+            acc_info = AccountInfo(account=issuer, ledger_index="validated")
+            issuers[issuer] = self.client.request(acc_info).result["account_data"]
+        return self._created_tokens_manager(result, issuers, wallet_addr)
+
+    async def async_created_tokens_manager(self, wallet_addr: str) -> list:
+        result = (await self.async_client.request(GatewayBalances(account=wallet_addr, ledger_index="validated"))).result
+        issuer_list = list(result.get("assets", {}))
+        responses = await asyncio.gather(
+            *[self.async_client.request(AccountInfo(account=issuer, ledger_index="validated")) for issuer in issuer_list]
+        )
+        issuers = {issuer: response.result.get("account_data", {}) for issuer, response in zip(issuer_list, responses)}
+        return self._created_tokens_manager(result, issuers, wallet_addr)
+
+    def _created_tokens_manager(self, result: dict, issuers: dict, wallet_addr: str) -> list:
+        """`issuers` maps each issuer to its account_data, fetched once per issuer"""
         created_assets = []
-        req = GatewayBalances(account=wallet_addr, ledger_index="validated")
-        response = self.client.request(req)
-        result = response.result
         if 'assets' in result:
             assets = result["assets"]
             for issuer, issuings in assets.items():
+                account_data = issuers.get(issuer, {})
                 for iss_cur in issuings:
                     asset = {}
                     asset["issuer"] = issuer
@@ -71,8 +103,6 @@ class xEng(JsonRpcClient):
                     asset["amount"] = iss_cur["value"]
                     asset["manager"] = wallet_addr
                     asset["domain"] = ""
-                    acc_info = AccountInfo(account=asset["cold_address"], ledger_index="validated")
-                    account_data = self.client.request(acc_info).result["account_data"]
                     if "Domain" in account_data:
                         asset["domain"] = validate_hex_to_symbol(account_data["Domain"])
                     created_assets.append(asset)
@@ -80,37 +110,33 @@ class xEng(JsonRpcClient):
 
     def created_nfts(self, wallet_addr: str, mainnet: bool = True) -> list:
         """return all nfts an account created as an issuer \n this method uses an external api"""
-        created_nfts = []
-        result = requests.get(f"https://api.xrpldata.com/api/v1/xls20-nfts/issuer/{wallet_addr}").json() if mainnet else requests.get(f"https://test-api.xrpldata.com/api/v1/xls20-nfts/issuer/{wallet_addr}").json()
-        if "data" in result and "nfts" in result["data"]:
-            nfts = result["data"]["nfts"]
-            for nft in nfts:
-                nft_data = {}
-                nft_data["nftoken_id"] = nft["NFTokenID"]
-                nft_data["issuer"] = nft["Issuer"]
-                nft_data["owner"] = nft["Owner"]
-                nft_data["taxon"] = nft["Taxon"]
-                nft_data["sequence"] = nft["Sequence"]
-                nft_data["transfer_fee"] = xrp_format_to_nft_fee(nft["TransferFee"])
-                nft_data["flags"] = nft["Flags"]
-                nft_data["uri"] = validate_hex_to_symbol(nft["URI"])
-                created_nfts.append(nft_data)
-        return created_nfts
+        return self._created_nfts(data_api.xrpldata(f"xls20-nfts/issuer/{wallet_addr}", mainnet))
+
+    async def async_created_nfts(self, wallet_addr: str, mainnet: bool = True) -> list:
+        return self._created_nfts(await data_api.async_xrpldata(f"xls20-nfts/issuer/{wallet_addr}", mainnet))
 
-    def created_taxons(self, wallet_addr: str) -> list:
+    def created_taxons(self, wallet_addr: str, mainnet: bool = True) -> list:
         """return all taxons an account has used to create nfts"""
+        return self._created_taxons(data_api.xrpldata(f"xls20-nfts/taxon/{wallet_addr}", mainnet))
+
+    async def async_created_taxons(self, wallet_addr: str, mainnet: bool = True) -> list:
+        return self._created_taxons(await data_api.async_xrpldata(f"xls20-nfts/taxon/{wallet_addr}", mainnet))
+
+    def _created_taxons(self, result: dict) -> list:
         taxons = []
-        result = requests.get(
-            f"https://api.xrpldata.com/api/v1/xls20-nfts/taxon/{wallet_addr}").json()
         if "data" in result and "taxons" in result["data"]:
             taxons = result["data"]["taxons"]
         return taxons
 
-    def created_nfts_taxon(self, wallet_addr: str, taxon: int):
+    def created_nfts_taxon(self, wallet_addr: str, taxon: int, mainnet: bool = True):
         """return all nfts with similar taxon an account has created"""
+        return self._created_nfts(data_api.xrpldata(f"xls20-nfts/issuer/{wallet_addr}/taxon/{taxon}", mainnet), flags=False)
+
+    async def async_created_nfts_taxon(self, wallet_addr: str, taxon: int, mainnet: bool = True):
+        return self._created_nfts(await data_api.async_xrpldata(f"xls20-nfts/issuer/{wallet_addr}/taxon/{taxon}", mainnet), flags=False)
+
+    def _created_nfts(self, result: dict, flags: bool = True) -> list:
         created_nfts = []
-        result = requests.get(
-            f"https://api.xrpldata.com/api/v1/xls20-nfts/issuer/{wallet_addr}/taxon/{taxon}").json()
         if "data" in result and "nfts" in result["data"]:
             nfts = result["data"]["nfts"]
             for nft in nfts:
@@ -120,9 +146,9 @@ class xEng(JsonRpcClient):
                 nft_data["owner"] = nft["Owner"]
                 nft_data["taxon"] = nft["Taxon"]
                 nft_data["sequence"] = nft["Sequence"]
-                nft_data["transfer_fee"] = xrp_format_to_nft_fee(
-                    nft["TransferFee"])
-                # nft_data["flags"] = nft["Flags"]
+                nft_data["transfer_fee"] = xrp_format_to_nft_fee(nft["TransferFee"])
+                if flags:
+                    nft_data["flags"] = nft["Flags"]
                 nft_data["uri"] = validate_hex_to_symbol(nft["URI"])
                 created_nfts.append(nft_data)
         return created_nfts
@@ -10,6 +10,9 @@ from xrpl.wallet import Wallet
 from .Misc import (amm_fee_to_xrp_format, mm,
                   validate_hex_to_symbol)
 from .x_constants import M_SOURCE_TAG
+from .Books import OrderBook
+from .Offers import account_offer_json, best_offer_json, decode_account_offers, decode_book_offers
+from .Pool import xrpl_pool
 
 """
 Swap objects
@@ -26,103 +29,45 @@ class xOrderBookExchange(JsonRpcClient):
         self.network_url = network_url
         self.account_url = account_url
         self.txn_url = txn_url
-        self.client = JsonRpcClient(network_url)
+        self.client = xrpl_pool.client(network_url)
+        self.async_client = xrpl_pool.async_client(network_url)
 
     def toTestnet(self) -> bool:
         self.network_url = "https://s.altnet.rippletest.net:51234"
         self.account_url = "https://testnet.xrpl.org/accounts/"
         self.txn_url = "https://testnet.xrpl.org/transactions/"
-        self.client = JsonRpcClient(self.network_url)
+        self.client = xrpl_pool.client(self.network_url)
+        self.async_client = xrpl_pool.async_client(self.network_url)
         return True
 
     def toMainnet(self) -> bool:
         self.network_url = "https://xrplcluster.com"
         self.account_url = "https://livenet.xrpl.org/accounts/"
         self.txn_url = "https://livenet.xrpl.org/transactions/"
-        self.client = JsonRpcClient(self.network_url)
+        self.client = xrpl_pool.client(self.network_url)
+        self.async_client = xrpl_pool.async_client(self.network_url)
         return True
     
     def sort_best_offer(self, buy: Union[XRP, IssuedCurrency], sell: Union[XRP, IssuedCurrency], best_buy: bool = False, best_sell: bool = False, limit: int = None) -> dict:
         """return all available orders and best {option} first, choose either best_buy or best_sell"""
+        if not (best_buy or best_sell):
+            return {}
+        req = BookOffers(taker_gets=sell, taker_pays=buy, ledger_index="validated", limit=limit)
+        # best_buy wins when both are set, one fetch either way
+        return self._sort_best_offer(self.client.request(req).result, reverse=not best_buy)
+
+    async def async_sort_best_offer(self, buy: Union[XRP, IssuedCurrency], sell: Union[XRP, IssuedCurrency], best_buy: bool = False, best_sell: bool = False, limit: int = None) -> dict:
+        if not (best_buy or best_sell):
+            return {}
+        req = BookOffers(taker_gets=sell, taker_pays=buy, ledger_index="validated", limit=limit)
+        return self._sort_best_offer((await self.async_client.request(req)).result, reverse=not best_buy)
+
+    def _sort_best_offer(self, result: dict, reverse: bool) -> dict:
+        """highest rate first when `reverse`, lowest rate first otherwise"""
         best = {}
-
-        if best_sell:
-            req = BookOffers(taker_gets=sell, taker_pays=buy, ledger_index="validated", limit=limit)
-            response = self.client.request(req)
-            result = response.result
-            if "offers" in result:
-                offers: list = result["offers"]
-                # sort offer list and return highest rate first
-                offers.sort(key=lambda object: object["quality"], reverse=True)
-                index = 0
-                for offer in offers:
-                    of = {}
-                    of["creator"] = offer["Account"]
-                    of["offer_id"] = offer["index"]
-                    of["flags"] = offer["Flags"]
-                    of["sequence"] = offer["Sequence"] # offer id
-                    of["rate"] = offer["quality"]
-                    of["creator_liquidity"] = ""
-                    if "owner_funds" in offer:
-                        of["creator_liquidity"] = offer["owner_funds"] # available amount the offer creator of `sell_token` is currently holding
-                    if isinstance(offer["TakerPays"], dict):
-                        of["buy_token"] = validate_hex_to_symbol(offer["TakerPays"]["currency"])
-                        of["buy_issuer"] = offer["TakerPays"]["issuer"]
-                        of["buy_amount"] = offer["TakerPays"]["value"]
-                    elif isinstance(offer["TakerPays"], str):
-                        of["buy_token"] = "XRP"
-                        of["buy_issuer"] = ""
-                        of["buy_amount"] = str(drops_to_xrp(offer["TakerPays"]))
-
-                    if isinstance(offer["TakerGets"], dict):
-                        of["sell_token"] = validate_hex_to_symbol(offer["TakerGets"]["currency"])
-                        of["sell_issuer"] = offer["TakerGets"]["issuer"]
-                        of["sell_amount"] = offer["TakerGets"]["value"]
-                    elif isinstance(offer["TakerGets"], str):
-                        of["sell_token"] = "XRP"
-                        of["sell_issuer"] = ""
-                        of["sell_amount"] = str(drops_to_xrp(offer["TakerGets"]))                    
-                    index += 1
-                    best[index] = of
-
-        if best_buy:
-            req = BookOffers(taker_gets=sell, taker_pays=buy, ledger_index="validated", limit=limit)
-            response = self.client.request(req)
-            result = response.result
-            if "offers" in result:
-                offers: list = result["offers"]
-                # sort offer list and return lowest rate first
-                offers.sort(key=lambda object: object["quality"])
-                index = 0
-                for offer in offers:
-                    of = {}
-                    of["creator"] = offer["Account"]
-                    of["offer_id"] = offer["index"]
-                    of["flags"] = offer["Flags"]
-                    of["sequence"] = offer["Sequence"] # offer id
-                    of["rate"] = offer["quality"]
-                    of["creator_liquidity"] = ""
-                    if "owner_funds" in offer:
-                        of["creator_liquidity"] = offer["owner_funds"] # available amount the offer creator is currently holding
-                    if isinstance(offer["TakerPays"], dict):
-                        of["buy_token"] = validate_hex_to_symbol(offer["TakerPays"]["currency"])
-                        of["buy_issuer"] = offer["TakerPays"]["issuer"]
-                        of["buy_amount"] = offer["TakerPays"]["value"]
-                    elif isinstance(offer["TakerPays"], str):
-                        of["buy_token"] = "XRP"
-                        of["buy_issuer"] = ""
-                        of["buy_amount"] = str(drops_to_xrp(offer["TakerPays"]))
-
-                    if isinstance(offer["TakerGets"], dict):
-                        of["sell_token"] = validate_hex_to_symbol(offer["TakerGets"]["currency"])
-                        of["sell_issuer"] = offer["TakerGets"]["issuer"]
-                        of["sell_amount"] = offer["TakerGets"]["value"]
-                    elif isinstance(offer["TakerGets"], str):
-                        of["sell_token"] = "XRP"
-                        of["sell_issuer"] = ""
-                        of["sell_amount"] = str(drops_to_xrp(offer["TakerGets"]))                    
-                    index += 1
-                    best[index] = of
+        if "offers" in result:
+            records = decode_book_offers(OrderBook(result["offers"]).depth(reverse=reverse))
+            best = {index: best_offer_json(record) for index, record in enumerate(records, 1)}
         return best
     
     def create_order_book_liquidity(self, sender_addr: str, buy: Union[float, IssuedCurrencyAmount], sell: Union[float, IssuedCurrencyAmount], expiry_date: int = None, fee: str = None) -> dict:
@@ -142,36 +87,17 @@ class xOrderBookExchange(JsonRpcClient):
     
     def get_account_order_book_liquidity(self, wallet_addr: str, limit: int = None) -> list:
         """return all offers that are liquidity an account created"""
-        offer_list = []
         req = AccountOffers(account=wallet_addr, ledger_index="validated", limit=limit)
-        response = self.client.request(req)
-        result = response.result
+        return self._account_order_book_liquidity(self.client.request(req).result)
+
+    async def async_get_account_order_book_liquidity(self, wallet_addr: str, limit: int = None) -> list:
+        req = AccountOffers(account=wallet_addr, ledger_index="validated", limit=limit)
+        return self._account_order_book_liquidity((await self.async_client.request(req)).result)
+
+    def _account_order_book_liquidity(self, result: dict) -> list:
+        offer_list = []
         if "offers" in result:
-            offers = result["offers"]
-            for offer in offers:
-                if 0x00010000 & offer["flags"] == 0x00010000:
-                    of = {}
-                    of["flags"] = offer["flags"]
-                    of["sequence"] = offer["seq"]
-                    of["quality"] = offer["quality"]# str(drops_to_xrp(offer["quality"])) # rate is subject to error from the blockchain because xrp returned in this call has no decimal  # The exchange rate of the offer, as the ratio of the original taker_pays divided by the original taker_gets. rate = pay/get
-                    if isinstance(offer["taker_pays"], dict):
-                        of["buy_token"] = validate_hex_to_symbol(offer["taker_pays"]["currency"])
-                        of["buy_issuer"] = offer["taker_pays"]["issuer"]
-                        of["buy_amount"] = offer["taker_pays"]["value"]
-                    elif isinstance(offer["taker_pays"], str):
-                        of["buy_token"] = "XRP"
-                        of["buy_issuer"] = ""
-                        of["buy_amount"] = str(drops_to_xrp(offer["taker_pays"]))
-                    if isinstance(offer["taker_gets"], dict):
-                        of["sell_token"] = validate_hex_to_symbol(offer["taker_gets"]["currency"])
-                        of["sell_issuer"] = offer["taker_gets"]["issuer"]
-                        of["sell_amount"] = offer["taker_gets"]["value"]
-                    elif isinstance(offer["taker_gets"], str):
-                        of["sell_token"] = "XRP"
-                        of["sell_issuer"] = ""
-                        of["sell_amount"] = str(drops_to_xrp(offer["taker_gets"]))
-                    of["rate"] = float(of["sell_amount"])/float(of["buy_amount"])
-                    offer_list.append(of)
+            offer_list = [account_offer_json(record) for record in decode_account_offers(result["offers"]) if record.passive]
         return offer_list
 
 
@@ -207,20 +133,23 @@ class xAmm(JsonRpcClient):
         self.network_url = network_url
         self.account_url = account_url
         self.txn_url = txn_url
-        self.client = JsonRpcClient(network_url)
+        self.client = xrpl_pool.client(network_url)
+        self.async_client = xrpl_pool.async_client(network_url)
 
     def toTestnet(self) -> bool:
         self.network_url = "https://s.altnet.rippletest.net:51234"
         self.account_url = "https://testnet.xrpl.org/accounts/"
         self.txn_url = "https://testnet.xrpl.org/transactions/"
-        self.client = JsonRpcClient(self.network_url)
+        self.client = xrpl_pool.client(self.network_url)
+        self.async_client = xrpl_pool.async_client(self.network_url)
         return True
 
     def toMainnet(self) -> bool:
         self.network_url = "https://xrplcluster.com"
         self.account_url = "https://livenet.xrpl.org/accounts/"
         self.txn_url = "https://livenet.xrpl.org/transactions/"
-        self.client = JsonRpcClient(self.network_url)
+        self.client = xrpl_pool.client(self.network_url)
+        self.async_client = xrpl_pool.async_client(self.network_url)
         return True
     
     def create_amm(self, sender_addr: str, token_1: Union[float, IssuedCurrencyAmount], token_2: Union[float, IssuedCurrencyAmount], trading_fee: float, fee: str = None) -> dict:
@@ -0,0 +1,457 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from xrpl.asyncio.clients.exceptions import XRPLRequestFailureException
+from xrpl.core.addresscodec import is_valid_classic_address
+
+from .Classifier import classify
+from .Paging import decode_cursor, encode_cursor
+from .Stream import XrplStream, xrpl_stream
+from .x_constants import (HISTORY_LIMIT, HISTORY_MAX_LIMIT, INDEX_IDLE_AFTER,
+                          INDEX_MAX_PAGES, INDEX_MAX_WALLETS, INDEX_PAGE_SIZE,
+                          INDEX_RETRY_DELAY)
+
+"""
+wallet history served from a local index instead of account_tx on every view
+
+a wallet is indexed the first time someone asks for its history. its account is
+subscribed first, so nothing validated from then on is missed, then account_tx
+is read newest first from the saved marker down to the wallet's first
+transaction. a wallet indexed before catches up forward from the newest ledger
+it has, and again after every reconnect. the store keeps one record per
+(wallet, network, txid) so reading a page twice costs nothing, the rows are
+Classifier records
+
+anyone can start indexing a wallet, so at most `max_wallets` are followed (the
+least recently asked about is dropped for a new one), a follow backfills
+`max_pages` pages at most and a wallet nobody asks about stops being followed,
+backfill included
+"""
+
+logger = logging.getLogger(__name__)
+
+
+def _network(mainnet: bool) -> str:
+    return "mainnet" if mainnet else "testnet"
+
+
+def index_record(wallet: str, network: str, tx: Dict[str, Any], meta: Dict[str, Any], ledger_index: int = None) -> Dict[str, Any]:
+    """the row stored for `tx` in `wallet`'s history"""
+    return {"wallet": wallet, "network": network, **classify(tx, meta, wallet, ledger_index).as_dict()}
+
+
+def affected_accounts(tx: Dict[str, Any], meta: Dict[str, Any]) -> Set[str]:
+    """every account a transaction touched, the wallets it belongs in the history of"""
+    accounts = {tx.get("Account"), tx.get("Destination")}
+    for node in meta.get("AffectedNodes", []):
+        entry = next(iter(node.values()))
+        for fields in (entry.get("FinalFields"), entry.get("NewFields")):
+            if not fields:
+                continue
+            accounts.update((fields.get("Account"), fields.get("Owner"), fields.get("Destination")))
+            for limit in ("HighLimit", "LowLimit"):
+                if limit in fields:
+                    accounts.add(fields[limit].get("issuer"))
+    accounts.discard(None)
+    return accounts
+
+
+def _aware(date: Optional[datetime]) -> Optional[datetime]:
+    if date is not None and date.tzinfo is None:
+        return date.replace(tzinfo=timezone.utc)
+    return date
+
+
+def _new_state() -> Dict[str, Any]:
+    return {"marker": None, "complete": False, "newest_ledger": None, "oldest_ledger": None}
+
+
+class MemoryTxStore:
+    """the index kept in this process, for tests and running without a database"""
+
+    def __init__(self):
+        self.records: Dict[Tuple[str, str], Dict[str, Dict[str, Any]]] = {}
+        self.states: Dict[Tuple[str, str], Dict[str, Any]] = {}
+
+    async def add(self, records: List[Dict[str, Any]]) -> int:
+        added = 0
+        for record in records:
+            wallet = self.records.setdefault((record["wallet"], record["network"]), {})
+            if record["txid"] not in wallet:
+                wallet[record["txid"]] = dict(record)
+                added += 1
+        return added
+
+    async def state(self, wallet: str, network: str) -> Dict[str, Any]:
+        return dict(self.states.get((wallet, network)) or _new_state())
+
+    async def save_state(self, wallet: str, network: str, **changes) -> None:
+        self.states.setdefault((wallet, network), _new_state()).update(changes)
+
+    async def history(
+        self, wallet: str, network: str, limit: int, cursor: Tuple[int, int] = None,
+        start: datetime = None, end: datetime = None, **filters
+    ) -> Tuple[List[Dict[str, Any]], Optional[Tuple[int, int]]]:
+        records = sorted(
+            self.records.get((wallet, network), {}).values(),
+            key=lambda record: (record["ledger_index"], record["tx_index"]), reverse=True,
+        )
+        page = []
+        for record in records:
+            if cursor is not None and (record["ledger_index"], record["tx_index"]) >= tuple(cursor):
+                continue
+            if any(value is not None and record[name] != value for name, value in filters.items()):
+                continue
+            if (start is not None and record["date"] < start) or (end is not None and record["date"] > end):
+                continue
+            page.append(dict(record))
+            if len(page) > limit:
+                break
+        if len(page) <= limit:
+            return page, None
+        page = page[:limit]
+        return page, (page[-1]["ledger_index"], page[-1]["tx_index"])
+
+
+class DatabaseTxStore:
+    """the index in the wallet_transactions and indexed_wallets tables"""
+
+    def __init__(self, session_factory: Callable):
+        # crud needs the app's settings, so it's only imported when the database is used
+        import crud
+        self.session_factory = session_factory
+        self._crud = crud.wallet_transaction
+
+    def _run(self, call: Callable) -> Any:
+        db = self.session_factory()
+        try:
+            return call(db)
+        finally:
+            db.close()
+
+    @staticmethod
+    def _row(row: Any) -> Dict[str, Any]:
+        return {column.name: getattr(row, column.name) for column in row.__table__.columns if column.name != "id"}
+
+    async def add(self, records: List[Dict[str, Any]]) -> int:
+        return await asyncio.to_thread(self._run, lambda db: self._crud.add_many(db, records=records))
+
+    async def state(self, wallet: str, network: str) -> Dict[str, Any]:
+        row = await asyncio.to_thread(self._run, lambda db: self._crud.get_state(db, wallet=wallet, network=network))
+        if row is None:
+            return _new_state()
+        return {key: getattr(row, key) for key in _new_state()}
+
+    async def save_state(self, wallet: str, network: str, **changes) -> None:
+        await asyncio.to_thread(self._run, lambda db: self._crud.save_state(db, wallet=wallet, network=network, **changes))
+
+    async def history(self, wallet: str, network: str, limit: int, **options) -> Tuple[List[Dict[str, Any]], Optional[Tuple[int, int]]]:
+        def read(db):
+            rows, cursor = self._crud.history(db, wallet=wallet, network=network, limit=limit, **options)
+            return [self._row(row) for row in rows], cursor
+        return await asyncio.to_thread(self._run, read)
+
+
+class WalletIndex:
+    __slots__ = ("wallet", "network", "mainnet", "task", "live", "resume", "synced", "newest", "last_used", "error")
+
+    def __init__(self, wallet: str, mainnet: bool):
+        self.wallet = wallet
+        self.network = _network(mainnet)
+        self.mainnet = mainnet
+        self.task: asyncio.Task = None
+        # live transactions move the newest ledger only once there is no gap behind them
+        self.live = False
+        # was live when the stream dropped, to catch up once it is subscribed again
+        self.resume = False
+        self.synced = False
+        self.newest: int = None
+        self.last_used = time.monotonic()
+        self.error: str = None
+
+
+def _dedicated_stream(mainnet: bool) -> XrplStream:
+    """its own connection, the account hub unsubscribes accounts on the shared one"""
+    return XrplStream(xrpl_stream(mainnet).url)
+
+
+class TxIndexer:
+    """keeps the history of every wallet someone looked at in `store`"""
+
+    def __init__(
+        self,
+        store: Any = None,
+        stream_factory: Callable[[bool], XrplStream] = _dedicated_stream,
+        page_size: int = INDEX_PAGE_SIZE,
+        retry_delay: float = INDEX_RETRY_DELAY,
+        idle_after: float = INDEX_IDLE_AFTER,
+        max_wallets: int = INDEX_MAX_WALLETS,
+        max_pages: int = INDEX_MAX_PAGES,
+    ):
+        self.store = store if store is not None else MemoryTxStore()
+        self.stream_factory = stream_factory
+        self.page_size = page_size
+        self.retry_delay = retry_delay
+        self.idle_after = idle_after
+        self.max_wallets = max_wallets
+        self.max_pages = max_pages
+        self._streams: Dict[bool, XrplStream] = {}
+        self._connects: Dict[bool, int] = {}
+        self._wallets: Dict[Tuple[str, str], WalletIndex] = {}
+        # live adds, resumes and unsubscribes, the loop only keeps weak references to tasks
+        self._tasks: Set[asyncio.Task] = set()
+
+    def configure(self, **options) -> None:
+        for key, value in options.items():
+            if not hasattr(self, key) or key.startswith("_"):
+                raise ValueError(f"unknown indexer option {key}")
+            setattr(self, key, value)
+
+    def _spawn(self, coroutine) -> None:
+        task = asyncio.ensure_future(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._task_done)
+
+    def _task_done(self, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("indexer task failed", exc_info=task.exception())
+
+    def _stream(self, mainnet: bool) -> XrplStream:
+        stream = self._streams.get(mainnet)
+        if stream is None:
+            stream = self._streams[mainnet] = self.stream_factory(mainnet)
+            stream.on("transaction", lambda message: self._on_transaction(mainnet, message))
+            stream.on("connected", lambda message: self._on_connected(mainnet))
+        return stream
+
+    def ensure(self, wallet: str, mainnet: bool = True) -> WalletIndex:
+        """index `wallet` in the background unless it already is"""
+        key = (wallet, _network(mainnet))
+        index = self._wallets.get(key)
+        if index is None:
+            if not is_valid_classic_address(wallet):
+                raise ValueError(f"{wallet} isn't a wallet address")
+            while len(self._wallets) >= self.max_wallets:
+                self._drop(min(self._wallets.values(), key=lambda index: index.last_used))
+            index = self._wallets[key] = WalletIndex(wallet, mainnet)
+            index.task = asyncio.ensure_future(self._follow(index))
+        index.last_used = time.monotonic()
+        return index
+
+    def _drop(self, index: WalletIndex) -> None:
+        """stop following a wallet, its index stays"""
+        del self._wallets[(index.wallet, index.network)]
+        index.task.cancel()
+
+    def _idle(self, index: WalletIndex) -> bool:
+        return time.monotonic() - index.last_used >= self.idle_after
+
+    async def history(
+        self, wallet: str, mainnet: bool = True, limit: int = HISTORY_LIMIT, cursor: str = None,
+        start: datetime = None, end: datetime = None, **filters
+    ) -> Dict[str, Any]:
+        """a page of what is indexed so far, newest first, with the cursor of the next page
+        and how far indexing got. filters: kind, tx_type, currency, issuer, counterparty, direction"""
+        index = self.ensure(wallet, mainnet)
+        position = decode_cursor(cursor)
+        transactions, next_position = await self.store.history(
+            wallet, index.network, limit=max(1, min(limit, HISTORY_MAX_LIMIT)),
+            cursor=tuple(position) if position else None, start=_aware(start), end=_aware(end), **filters,
+        )
+        return {
+            "transactions": transactions,
+            "cursor": encode_cursor(list(next_position) if next_position else None),
+            "index": await self.status(wallet, mainnet),
+        }
+
+    async def status(self, wallet: str, mainnet: bool = True) -> Dict[str, Any]:
+        state = await self.store.state(wallet, _network(mainnet))
+        index = self._wallets.get((wallet, _network(mainnet)))
+        return {
+            "complete": state["complete"],
+            "newest_ledger": state["newest_ledger"],
+            "oldest_ledger": state["oldest_ledger"],
+            "following": index is not None,
+            "syncing": index is not None and not index.synced,
+            "error": index.error if index is not None else None,
+        }
+
+    async def _follow(self, index: WalletIndex) -> None:
+        stream = self._stream(index.mainnet)
+        try:
+            while True:
+                try:
+                    await self._sync(stream, index)
+                    index.error = None
+                    break
+                except Exception as exception:
+                    index.error = str(exception) or type(exception).__name__
+                    if self._idle(index):
+                        return
+                    await asyncio.sleep(self.retry_delay)
+            while True:
+                idle = time.monotonic() - index.last_used
+                if idle >= self.idle_after:
+                    break
+                await asyncio.sleep(self.idle_after - idle)
+        finally:
+            if self._wallets.get((index.wallet, index.network)) is index:
+                del self._wallets[(index.wallet, index.network)]
+            self._spawn(self._unsubscribe(stream, index.wallet))
+
+    async def _sync(self, stream: XrplStream, index: WalletIndex) -> None:
+        await stream.subscribe(accounts=[index.wallet])
+        await self._catch_up(stream, index)
+        await self._backfill(stream, index)
+        index.synced = True
+
+    async def _account_tx(self, stream: XrplStream, index: WalletIndex, marker: Any = None, **options) -> Dict[str, Any]:
+        request = {"command": "account_tx", "account": index.wallet, "limit": self.page_size, **options}
+        if marker is not None:
+            request["marker"] = marker
+        result = await stream.request(request)
+        await self._add(index, result.get("transactions", []))
+        return result
+
+    async def _catch_up(self, stream: XrplStream, index: WalletIndex) -> None:
+        """what was validated after the newest indexed ledger"""
+        state = await self.store.state(index.wallet, index.network)
+        newest = state["newest_ledger"]
+        if newest is None:
+            # never indexed, the backfill's first page is the newest
+            return
+        marker, top = None, newest
+        while True:
+            try:
+                result = await self._account_tx(
+                    stream, index, marker, ledger_index_min=newest + 1, ledger_index_max=-1, forward=True,
+                )
+            except XRPLRequestFailureException as exception:
+                if "lgrIdxsInvalid" not in str(exception):
+                    raise
+                # no validated ledger after the newest one yet
+                break
+            top = max(top, result.get("ledger_index_max", top))
+            marker = result.get("marker")
+            if marker is None:
+                break
+        await self._set_newest(index, top)
+        index.live = True
+
+    async def _backfill(self, stream: XrplStream, index: WalletIndex) -> None:
+        """newest first from the saved marker, the marker is saved after every page"""
+        state = await self.store.state(index.wallet, index.network)
+        marker = state["marker"]
+        for _ in range(self.max_pages):
+            if state["complete"] or self._idle(index):
+                break
+            result = await self._account_tx(stream, index, marker, ledger_index_min=-1, ledger_index_max=-1, forward=False)
+            marker = result.get("marker")
+            ledgers = [entry["tx"]["ledger_index"] for entry in result.get("transactions", []) if "tx" in entry]
+            if state["oldest_ledger"] is not None:
+                ledgers.append(state["oldest_ledger"])
+            changes = {"marker": marker, "complete": marker is None, "oldest_ledger": min(ledgers) if ledgers else None}
+            if state["newest_ledger"] is None:
+                # the account was subscribed before this page, later ones come in live
+                changes["newest_ledger"] = index.newest = result.get("ledger_index_max")
+                index.live = True
+            state.update(changes)
+            await self.store.save_state(index.wallet, index.network, **changes)
+
+    async def _add(self, index: WalletIndex, entries: List[Dict[str, Any]]) -> None:
+        records = [
+            index_record(index.wallet, index.network, entry["tx"], entry["meta"])
+            for entry in entries
+            if entry.get("validated", True) and isinstance(entry.get("meta"), dict)
+        ]
+        await self.store.add(records)
+
+    async def _set_newest(self, index: WalletIndex, ledger_index: int) -> None:
+        if ledger_index is None or (index.newest is not None and ledger_index <= index.newest):
+            return
+        index.newest = ledger_index
+        await self.store.save_state(index.wallet, index.network, newest_ledger=ledger_index)
+
+    async def _add_live(self, index: WalletIndex, tx: Dict[str, Any], meta: Dict[str, Any], ledger_index: int) -> None:
+        await self.store.add([index_record(index.wallet, index.network, tx, meta, ledger_index)])
+        if index.live:
+            await self._set_newest(index, ledger_index)
+
+    def _on_transaction(self, mainnet: bool, message: Dict[str, Any]) -> None:
+        if not message.get("validated") or not self._wallets:
+            return
+        tx, meta = message["transaction"], message["meta"]
+        network = _network(mainnet)
+        for account in affected_accounts(tx, meta):
+            index = self._wallets.get((account, network))
+            if index is not None:
+                self._spawn(self._add_live(index, tx, meta, message.get("ledger_index")))
+
+    async def _on_connected(self, mainnet: bool) -> None:
+        self._connects[mainnet] = self._connects.get(mainnet, 0) + 1
+        if self._connects[mainnet] == 1:
+            # the first connect, the subscribes waiting on it do the rest
+            return
+        connect = self._connects[mainnet]
+        indexes = [index for index in self._wallets.values() if index.mainnet == mainnet]
+        for index in indexes:
+            if index.live:
+                # whatever went by while we were away is caught up once subscribed
+                index.live = False
+                index.resume = True
+        stream = self._streams[mainnet]
+        while indexes:
+            try:
+                await stream.subscribe(accounts=[index.wallet for index in indexes])
+                break
+            except Exception as exception:
+                error = str(exception) or type(exception).__name__
+                logger.warning("resubscribing %s wallets on %s failed, retrying in %ss: %s", len(indexes), stream.url, self.retry_delay, error)
+                for index in indexes:
+                    index.error = error
+                await asyncio.sleep(self.retry_delay)
+                if self._connects[mainnet] != connect:
+                    # a newer connect took over
+                    return
+                indexes = [index for index in indexes if self._wallets.get((index.wallet, index.network)) is index]
+        for index in indexes:
+            if index.resume:
+                self._spawn(self._resume(stream, index))
+
+    async def _resume(self, stream: XrplStream, index: WalletIndex) -> None:
+        try:
+            await self._catch_up(stream, index)
+            index.resume = False
+            index.error = None
+        except Exception as exception:
+            index.error = str(exception) or type(exception).__name__
+            logger.warning("catching %s up on %s failed: %s", index.wallet, stream.url, index.error)
+
+    async def _unsubscribe(self, stream: XrplStream, wallet: str) -> None:
+        if not stream.connected:
+            return
+        try:
+            await stream.unsubscribe(accounts=[wallet])
+        except Exception as exception:
+            logger.warning("unsubscribing %s on %s failed: %r", wallet, stream.url, exception)
+
+    async def close(self) -> None:
+        for index in list(self._wallets.values()):
+            index.task.cancel()
+        self._wallets.clear()
+        while self._streams:
+            _, stream = self._streams.popitem()
+            await stream.close()
+
+    def stats(self) -> dict:
+        return {
+            "following": len(self._wallets),
+            "syncing": sum(1 for index in self._wallets.values() if not index.synced),
+        }
+
+
+tx_indexer = TxIndexer()
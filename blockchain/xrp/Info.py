@@ -1,17 +1,29 @@
-import requests
+import asyncio
+
 from xrpl.clients import JsonRpcClient
 from xrpl.models import AccountInfo, LedgerEntry, Tx
 from xrpl.models.requests.ledger_entry import Offer
 from xrpl.utils import drops_to_xrp, ripple_time_to_datetime
 
-from .Misc import (hex_to_symbol, token_market_info, validate_hex_to_symbol,
+from .DataApi import data_api
+from .Media import nft_media
+from .Misc import (async_token_market_info, hex_to_symbol, token_market_info, validate_hex_to_symbol,
                   xrp_format_to_nft_fee, xrp_format_to_transfer_fee)
+from .Offers import decode_book_offers, offer_info_json
+from .Pool import xrpl_pool
 
 def status(txid: str, mainnet: bool = True) -> dict:
+    client = xrpl_pool.client(xrpl_pool.network_url(mainnet))
+    return _status(client.request(Tx(transaction=txid)).result)
+
+
+async def async_status(txid: str, mainnet: bool = True) -> dict:
+    client = xrpl_pool.async_client(xrpl_pool.network_url(mainnet))
+    return _status((await client.request(Tx(transaction=txid))).result)
+
+
+def _status(result: dict) -> str:
     response = ""
-    query = Tx(transaction=txid)
-    client = JsonRpcClient("https://xrplcluster.com") if mainnet else JsonRpcClient("https://s.altnet.rippletest.net:51234")
-    result = client.request(query).result
     if "Account" in result:
         response = result["meta"]["TransactionResult"]
     return response
@@ -22,27 +34,36 @@ class xInfo(JsonRpcClient):
         self.network_url = network_url
         self.account_url = account_url
         self.txn_url = txn_url
-        self.client = JsonRpcClient(network_url)
+        self.client = xrpl_pool.client(network_url)
+        self.async_client = xrpl_pool.async_client(network_url)
 
     def toTestnet(self) -> bool:
         self.network_url = "https://s.altnet.rippletest.net:51234"
         self.account_url = "https://testnet.xrpl.org/accounts/"
         self.txn_url = "https://testnet.xrpl.org/transactions/"
-        self.client = JsonRpcClient(self.network_url)
+        self.client = xrpl_pool.client(self.network_url)
+        self.async_client = xrpl_pool.async_client(self.network_url)
         return True
 
     def toMainnet(self) -> bool:
         self.network_url = "https://xrplcluster.com"
         self.account_url = "https://livenet.xrpl.org/accounts/"
         self.txn_url = "https://livenet.xrpl.org/transactions/"
-        self.client = JsonRpcClient(self.network_url)
+        self.client = xrpl_pool.client(self.network_url)
+        self.async_client = xrpl_pool.async_client(self.network_url)
         return True
     
     def get_account_info(self, wallet_addr: str) -> dict:
         """returns information about an account"""
-        account_info = {}
         query = AccountInfo(account=wallet_addr, ledger_index="validated")
-        result = self.client.request(query).result
+        return self._account_info(self.client.request(query).result)
+
+    async def async_get_account_info(self, wallet_addr: str) -> dict:
+        query = AccountInfo(account=wallet_addr, ledger_index="validated")
+        return self._account_info((await self.async_client.request(query)).result)
+
+    def _account_info(self, result: dict) -> dict:
+        account_info = {}
         if "account_data" in result:
             account_data = result["account_data"]
             account_info["index"] = account_data["index"]
@@ -74,43 +95,36 @@ class xInfo(JsonRpcClient):
         if use_id is True, make use of only the offer_id param, else use both sequence and creator\n
         either cannot go together
         """
-        offer_info = {}
-        query = LedgerEntry(ledger_index="validated", offer=Offer(account=offer_creator, seq=sequence))
+        query = self._offer_query(use_id, offer_id, offer_creator, sequence)
+        return self._offer_info(self.client.request(query).result)
+
+    async def async_get_offer_info(self, use_id: bool = False, offer_id: str = None, offer_creator: str = None, sequence: int = None) -> dict:
+        query = self._offer_query(use_id, offer_id, offer_creator, sequence)
+        return self._offer_info((await self.async_client.request(query)).result)
+
+    def _offer_query(self, use_id: bool, offer_id: str, offer_creator: str, sequence: int) -> LedgerEntry:
         if use_id:
-            query = LedgerEntry(ledger_index="validated", offer=offer_id)
-        result = self.client.request(query).result
+            return LedgerEntry(ledger_index="validated", offer=offer_id)
+        return LedgerEntry(ledger_index="validated", offer=Offer(account=offer_creator, seq=sequence))
+
+    def _offer_info(self, result: dict) -> dict:
+        offer_info = {}
         if "node" in result:
-            offer_info["offer_id"] = result["index"]
-            offer_info["creator"] = result["node"]["Account"]
-            offer_info["sequence"] = result["node"]["Sequence"]
-            offer_info["object_type"] = result["node"]["LedgerEntryType"]
-            offer_info["expiry_date"] = str(ripple_time_to_datetime(result["node"]["Expiration"])) if "Expiration" in result["node"] else ""
-            offer_info["flags"] = result["node"]["Flags"]
-
-            if isinstance(result["node"]["TakerPays"], dict):
-                offer_info["buy_token"] = validate_hex_to_symbol(result["node"]["TakerPays"]["currency"])
-                offer_info["buy_issuer"] = result["node"]["TakerPays"]["issuer"]
-                offer_info["buy_amount"] = result["node"]["TakerPays"]["value"]
-            elif isinstance(result["node"]["TakerPays"], str):
-                offer_info["buy_token"] = "XRP"
-                offer_info["buy_issuer"] = ""
-                offer_info["buy_amount"] = str(drops_to_xrp(result["node"]["TakerPays"])) 
-            
-            if isinstance(result["node"]["TakerGets"], dict):
-                offer_info["sell_token"] = validate_hex_to_symbol(result["node"]["TakerGets"]["currency"])
-                offer_info["sell_issuer"] = result["node"]["TakerGets"]["issuer"]
-                offer_info["sell_amount"] = result["node"]["TakerGets"]["value"]
-            elif isinstance(result["node"]["TakerGets"], str):
-                offer_info["sell_token"] = "XRP"
-                offer_info["sell_issuer"] = ""
-                offer_info["sell_amount"] = str(drops_to_xrp(result["node"]["TakerGets"])) 
+            record = decode_book_offers([{**result["node"], "index": result["index"]}])[0]
+            offer_info = offer_info_json(record, result["node"]["LedgerEntryType"])
         return offer_info    
 
     def get_xrp_escrow_info(self, escrow_id: str) -> dict:
         """returns information about an escrow"""
-        escrow_info = {}
         query = LedgerEntry(ledger_index="validated", escrow=escrow_id)
-        result = self.client.request(query).result
+        return self._xrp_escrow_info(self.client.request(query).result)
+
+    async def async_get_xrp_escrow_info(self, escrow_id: str) -> dict:
+        query = LedgerEntry(ledger_index="validated", escrow=escrow_id)
+        return self._xrp_escrow_info((await self.async_client.request(query)).result)
+
+    def _xrp_escrow_info(self, result: dict) -> dict:
+        escrow_info = {}
         if "Account" in result["node"] and isinstance(result["node"]["Amount"], str):
             escrow_info["index"] = result["index"]
             escrow_info["sender"] = result["node"]["Account"]
@@ -134,9 +148,15 @@ class xInfo(JsonRpcClient):
 
     def get_check_info(self, check_id: str) -> dict:
         """returns information on a check"""
-        check_info = {}
         query = LedgerEntry(ledger_index="validated", check=check_id)
-        result = self.client.request(query).result
+        return self._check_info(self.client.request(query).result)
+
+    async def async_get_check_info(self, check_id: str) -> dict:
+        query = LedgerEntry(ledger_index="validated", check=check_id)
+        return self._check_info((await self.async_client.request(query)).result)
+
+    def _check_info(self, result: dict) -> dict:
+        check_info = {}
         if "Account" in result["node"]:
             check_info["index"] = result["index"]
             check_info["sender"] = result["node"]["Account"]
@@ -159,15 +179,26 @@ class xInfo(JsonRpcClient):
 
     def get_token_info(self, issuer: str, token: str) -> dict:
         """returns information about a token"""
-        token_info = {}
         market = token_market_info(token, issuer)
+        query = AccountInfo(account=issuer, ledger_index="validated")
+        return self._token_info(self.client.request(query).result, market)
+
+    async def async_get_token_info(self, issuer: str, token: str) -> dict:
+        query = AccountInfo(account=issuer, ledger_index="validated")
+        market, response = await asyncio.gather(
+            async_token_market_info(token, issuer),
+            self.async_client.request(query),
+        )
+        return self._token_info(response.result, market)
+
+    def _token_info(self, result: dict, market: dict) -> dict:
+        token_info = {}
         metrics = {}
+        tk = {}
         if "metrics" in market:
             metrics = market["metrics"]
         if "meta" in market and "token" in market["meta"]:
             tk = market["meta"]["token"]
-        query = AccountInfo(account=issuer, ledger_index="validated")
-        result = self.client.request(query).result
         if "account_data" in result:
             account_data = result["account_data"]
             token_info["index"] = account_data["index"]
@@ -207,8 +238,13 @@ class xInfo(JsonRpcClient):
     def get_nft_info(self, nft_id: str, mainnet: bool = True) -> dict: # external api
         """returns information about an NFT \n this method uses an external api\n
         will probably only work on mainnet"""
+        return self._nft_info(data_api.xrpldata(f"xls20-nfts/nft/{nft_id}", mainnet))
+
+    async def async_get_nft_info(self, nft_id: str, mainnet: bool = True) -> dict:
+        return self._nft_info(await data_api.async_xrpldata(f"xls20-nfts/nft/{nft_id}", mainnet))
+
+    def _nft_info(self, response: dict) -> dict:
         nft_info = {}
-        response = requests.get(f'https://api.xrpldata.com/api/v1/xls20-nfts/nft/{nft_id}').json()  if mainnet else requests.get(f'https://test-api.xrpldata.com/api/v1/xls20-nfts/nft/{nft_id}').json()
         if "data" in response and isinstance(response["data"]["nft"], dict):
             nft = response["data"]["nft"]
             nft_info["issuer"] = nft["Issuer"]
@@ -219,26 +255,25 @@ class xInfo(JsonRpcClient):
             nft_info["uri"] = validate_hex_to_symbol(nft["URI"])
             nft_info["flags"] = nft["Flags"] # parse flags
         return nft_info
-    
 
     def get_nft_metadata(self, nft_id: str, mainnet: bool = True):
         """get nft metadata"""
-        nft_request = "https://api.xrpldata.com/api/v1/xls20-nfts/nft/" + nft_id if mainnet else "https://test-api.xrpldata.com/api/v1/xls20-nfts/nft/" + nft_id
-        r = requests.get(nft_request)
-        uri_metadata = r.json()
-        URI = bytearray.fromhex(uri_metadata['data']['nft']['URI']).decode()
-        if URI.startswith("https://ipfs.io/"):
-            URI_ONXRP = URI.replace("https://ipfs.io/", "https://onxrp.infura-ipfs.io/")
-        else:
-            URI_ONXRP = URI.replace("ipfs://", "https://onxrp.infura-ipfs.io/ipfs/")
-        r = requests.get(URI_ONXRP)
-        nft_info = r.json()
-        return nft_info
-    
+        uri_metadata = data_api.xrpldata(f"xls20-nfts/nft/{nft_id}", mainnet)
+        return data_api.get(nft_media.url(uri_metadata['data']['nft']['URI']))
+
+    async def async_get_nft_metadata(self, nft_id: str, mainnet: bool = True):
+        uri_metadata = await data_api.async_xrpldata(f"xls20-nfts/nft/{nft_id}", mainnet)
+        return await nft_media.metadata(uri_metadata['data']['nft']['URI'])
+
     def get_nft_offer_info(self, offer_id: str, mainnet: bool = True) -> dict:
         """return information about an nft offer"""
+        return self._nft_offer_info(data_api.xrpldata(f"xls20-nfts/offer/id/{offer_id}", mainnet))
+
+    async def async_get_nft_offer_info(self, offer_id: str, mainnet: bool = True) -> dict:
+        return self._nft_offer_info(await data_api.async_xrpldata(f"xls20-nfts/offer/id/{offer_id}", mainnet))
+
+    def _nft_offer_info(self, response: dict) -> dict:
         offer_info = {}
-        response = requests.get(f'https://api.xrpldata.com/api/v1/xls20-nfts/offer/id/{offer_id}').json() if mainnet else requests.get(f'https://test-api.xrpldata.com/api/v1/xls20-nfts/offer/id/{offer_id}').json()
         if "data" in response and isinstance(response["data"]["offer"], dict):
             offer = response["data"]["offer"]
             offer_info["offer_id"] = offer["OfferID"]
@@ -258,14 +293,18 @@ class xInfo(JsonRpcClient):
             if "Destination" in offer:
                 offer_info["receiver"] = offer["Destination"]
             if "Expiration" in offer and offer["Expiration"] != None:
-                offer["expiry_date"] = str(ripple_time_to_datetime(offer["Expiration"]))
+                offer_info["expiry_date"] = str(ripple_time_to_datetime(offer["Expiration"]))
         return offer_info
 
     def pay_txn_info(self, txid: str) -> dict:
         """return more information on a single pay transaction"""
+        return self._pay_txn_info(self.client.request(Tx(transaction=txid)).result)
+
+    async def async_pay_txn_info(self, txid: str) -> dict:
+        return self._pay_txn_info((await self.async_client.request(Tx(transaction=txid))).result)
+
+    def _pay_txn_info(self, result: dict) -> dict:
         pay_dict = {}
-        query = Tx(transaction=txid)
-        result = self.client.request(query).result
         if "Account" in result:
                 pay_dict["sender"] = result["Account"]
                 pay_dict["receiver"] = result["Destination"]
@@ -0,0 +1,487 @@
+import asyncio
+import base64
+import hashlib
+import io
+import ipaddress
+import json
+import os
+import re
+import socket
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
+from urllib.parse import unquote_to_bytes, urljoin, urlsplit
+
+import httpx
+
+from .Coalesce import AsyncSingleflight
+from .Pool import retire_async_client
+from .x_constants import (NFT_IPFS_GATEWAY, NFT_MEDIA_CONCURRENCY,
+                          NFT_MEDIA_MAX_BYTES, NFT_MEDIA_MAX_NAMES,
+                          NFT_MEDIA_MEMORY_BYTES, NFT_MEDIA_TIMEOUT,
+                          NFT_THUMBNAIL_SIZE)
+
+try:
+    from PIL import Image
+except ImportError:  # optional, without it thumbnails are the full image
+    Image = None
+
+"""
+nft metadata and media, fetched once and kept by content
+
+whatever a uri points at never changes (ipfs is content addressed, and nft
+metadata on http is treated the same way), so the first fetch is the only one.
+bodies are stored under their sha256 with an LRU tier in memory in front of
+the disk, uris map to the digest of their body. ipfs:// uris and links to
+public ipfs gateways go through `gateway`, so a local node can serve them
+
+uris come from the ledger and from metadata anyone can write, so anything but
+the gateway has to resolve to public addresses (redirects included), and only
+images and json are ever served back
+"""
+
+_GATEWAY_PATH = re.compile(r"^https?://[^/]+/ipfs/(.+)$")
+_CID = re.compile(r"^(Qm[1-9A-HJ-NP-Za-km-z]{44}|b[a-z2-7]{58,})(/.*)?$")
+_HEX = re.compile(r"^(?:[0-9a-fA-F]{2})+$")
+_MAX_REDIRECTS = 5
+_MAGIC = (
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+)
+
+
+def decode_uri(uri: str) -> str:
+    """an NFToken URI as text, hex as stored on ledger or already decoded"""
+    if not uri:
+        return ""
+    if _HEX.match(uri):
+        try:
+            return bytes.fromhex(uri).decode("utf-8").rstrip("\x00").strip()
+        except UnicodeDecodeError:
+            pass
+    return uri.strip()
+
+
+def gateway_url(uri: str, gateway: str = NFT_IPFS_GATEWAY) -> str:
+    """where to fetch `uri` from, ipfs goes through `gateway`"""
+    gateway = gateway.rstrip("/")
+    if uri.startswith("ipfs://"):
+        path = uri[len("ipfs://"):]
+        if path.startswith("ipfs/"):
+            path = path[len("ipfs/"):]
+        return f"{gateway}/ipfs/{path}"
+    match = _GATEWAY_PATH.match(uri)
+    if match is not None:
+        return f"{gateway}/ipfs/{match.group(1)}"
+    if _CID.match(uri):
+        return f"{gateway}/ipfs/{uri}"
+    return uri
+
+
+def _data_uri(uri: str) -> Tuple[str, bytes]:
+    """(content type, body) of a data: uri"""
+    header, _, data = uri[len("data:"):].partition(",")
+    content_type = header.split(";")[0] or "text/plain"
+    if header.endswith(";base64"):
+        return content_type, base64.b64decode(data)
+    return content_type, unquote_to_bytes(data)
+
+
+def sniff(body: bytes, declared: str) -> str:
+    """the type of a body going by its first bytes, what the server said only for other images"""
+    for magic, known in _MAGIC:
+        if body.startswith(magic):
+            return known
+    if body[:4] == b"RIFF" and body[8:12] == b"WEBP":
+        return "image/webp"
+    head = body[:1024].lstrip()
+    if head.startswith(b"<svg") or (head.startswith(b"<?xml") and b"<svg" in head):
+        return "image/svg+xml"
+    try:
+        json.loads(body)
+        return "application/json"
+    except ValueError:
+        pass
+    if declared.startswith("image/"):
+        return declared
+    return "application/octet-stream"
+
+
+def servable(content_type: str) -> bool:
+    """what the media endpoint hands out, never html or scripts"""
+    return content_type.startswith("image/") or content_type == "application/json"
+
+
+async def _public(url: str) -> None:
+    """raise unless every address `url`'s host resolves to is a public one"""
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise ValueError(f"can't fetch {url}")
+    port = parts.port or (443 if parts.scheme == "https" else 80)
+    try:
+        addresses = await asyncio.get_running_loop().getaddrinfo(parts.hostname, port, type=socket.SOCK_STREAM)
+    except OSError:
+        raise ValueError(f"can't resolve {parts.hostname}")
+    for *_, sockaddr in addresses:
+        address = ipaddress.ip_address(sockaddr[0].split("%")[0])
+        if isinstance(address, ipaddress.IPv6Address) and address.ipv4_mapped is not None:
+            address = address.ipv4_mapped
+        if not address.is_global or address.is_multicast:
+            raise ValueError(f"{parts.hostname} isn't a public address")
+
+
+class ContentStore:
+    """bodies by sha256, in memory up to `memory_bytes` and in `directory` when it is set"""
+
+    def __init__(self, directory: str = None, memory_bytes: int = NFT_MEDIA_MEMORY_BYTES, max_names: int = NFT_MEDIA_MAX_NAMES):
+        self.directory = directory
+        self.memory_bytes = memory_bytes
+        self.max_names = max_names
+        self._bodies: "OrderedDict[str, Tuple[str, bytes]]" = OrderedDict()
+        self._size = 0
+        self._names: "OrderedDict[str, str]" = OrderedDict()
+        # the names of every body in memory, without a directory they go when it is evicted
+        self._aliases: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(os.path.join(directory, "names"), exist_ok=True)
+
+    def _body_path(self, digest: str) -> str:
+        return os.path.join(self.directory, "bodies", digest[:2], digest)
+
+    def _name_path(self, name: str) -> str:
+        return os.path.join(self.directory, "names", hashlib.sha256(name.encode()).hexdigest())
+
+    def _remember(self, digest: str, content_type: str, body: bytes) -> None:
+        with self._lock:
+            if digest in self._bodies:
+                self._bodies.move_to_end(digest)
+                return
+            self._bodies[digest] = (content_type, body)
+            self._size += len(body)
+            while self._size > self.memory_bytes and len(self._bodies) > 1:
+                evicted, (_, evicted_body) = self._bodies.popitem(last=False)
+                self._size -= len(evicted_body)
+                if not self.directory:
+                    for name in self._aliases.pop(evicted, ()):
+                        self._names.pop(name, None)
+
+    def _name(self, name: str, digest: str) -> None:
+        with self._lock:
+            previous = self._names.pop(name, None)
+            if previous is not None:
+                self._unalias(previous, name)
+            self._names[name] = digest
+            self._aliases.setdefault(digest, set()).add(name)
+            while len(self._names) > self.max_names:
+                self._unalias(*reversed(self._names.popitem(last=False)))
+
+    def _unalias(self, digest: str, name: str) -> None:
+        aliases = self._aliases.get(digest)
+        if aliases is not None:
+            aliases.discard(name)
+            if not aliases:
+                del self._aliases[digest]
+
+    def forget(self, name: str) -> None:
+        """drop what `name` points at, the next fetch of it goes out again"""
+        with self._lock:
+            digest = self._names.pop(name, None)
+            if digest is not None:
+                self._unalias(digest, name)
+        if self.directory:
+            try:
+                os.remove(self._name_path(name))
+            except OSError:
+                pass
+
+    def put(self, name: str, content_type: str, body: bytes) -> str:
+        """store `body` as what `name` points at, returns its digest"""
+        digest = hashlib.sha256(body).hexdigest()
+        self._remember(digest, content_type, body)
+        self._name(name, digest)
+        if self.directory:
+            path = self._body_path(digest)
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                self._write(path, body)
+                self._write(f"{path}.type", content_type.encode())
+            self._write(self._name_path(name), digest.encode())
+        return digest
+
+    @staticmethod
+    def _write(path: str, data: bytes) -> None:
+        partial = f"{path}.{os.getpid()}.{threading.get_ident()}"
+        with open(partial, "wb") as file:
+            file.write(data)
+        os.replace(partial, path)
+
+    def digest(self, name: str) -> Optional[str]:
+        """the digest `name` points at, None when it was never fetched"""
+        with self._lock:
+            digest = self._names.get(name)
+            if digest is not None:
+                self._names.move_to_end(name)
+                return digest
+        if not self.directory:
+            return None
+        try:
+            with open(self._name_path(name)) as file:
+                digest = file.read()
+        except OSError:
+            return None
+        self._name(name, digest)
+        return digest
+
+    def get(self, digest: str) -> Optional[Tuple[str, bytes]]:
+        """(content type, body) of a digest"""
+        with self._lock:
+            entry = self._bodies.get(digest)
+            if entry is not None:
+                self._bodies.move_to_end(digest)
+                return entry
+        if not self.directory or not re.fullmatch(r"[0-9a-f]{64}", digest):
+            return None
+        path = self._body_path(digest)
+        try:
+            with open(path, "rb") as file:
+                body = file.read()
+            with open(f"{path}.type") as file:
+                content_type = file.read()
+        except OSError:
+            return None
+        self._remember(digest, content_type, body)
+        return content_type, body
+
+
+def _thumbnail(body: bytes, size: int) -> Optional[bytes]:
+    """a png at most `size` pixels wide and high, None when `body` isn't an image pillow reads"""
+    try:
+        with Image.open(io.BytesIO(body)) as image:
+            image.thumbnail((size, size))
+            out = io.BytesIO()
+            image.save(out, format="PNG")
+            return out.getvalue()
+    except Exception:
+        return None
+
+
+class NftMediaResolver:
+    """nft metadata, images and thumbnails through the content store\n
+    `transport` is only meant for tests, `media_path` is prefixed to digests in gallery items"""
+
+    def __init__(
+        self,
+        gateway: str = NFT_IPFS_GATEWAY,
+        cache_dir: str = None,
+        concurrency: int = NFT_MEDIA_CONCURRENCY,
+        timeout: float = NFT_MEDIA_TIMEOUT,
+        max_bytes: int = NFT_MEDIA_MAX_BYTES,
+        memory_bytes: int = NFT_MEDIA_MEMORY_BYTES,
+        thumbnail_size: int = NFT_THUMBNAIL_SIZE,
+        media_path: str = "",
+        transport: httpx.AsyncBaseTransport = None,
+    ):
+        self.gateway = gateway
+        self.cache_dir = cache_dir
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.memory_bytes = memory_bytes
+        self.thumbnail_size = thumbnail_size
+        self.media_path = media_path
+        self.transport = transport
+        self.store = ContentStore(cache_dir, memory_bytes)
+        self.flights = AsyncSingleflight()
+        # where a digest came from, (uri, thumbnail), so it can be made again once it fell out of memory
+        self._sources: "OrderedDict[str, Tuple[str, bool]]" = OrderedDict()
+        self._http: Optional[Tuple[asyncio.AbstractEventLoop, httpx.AsyncClient]] = None
+        # closes of replaced clients still running
+        self._closing: Set[asyncio.Future] = set()
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+        self.hits = 0
+        self.fetches = 0
+
+    def configure(self, **options) -> None:
+        for key, value in options.items():
+            if not hasattr(self, key) or key.startswith("_"):
+                raise ValueError(f"unknown nft media option {key}")
+            setattr(self, key, value)
+        self.store = ContentStore(self.cache_dir, self.memory_bytes)
+        self._sources.clear()
+        self._semaphores = weakref.WeakKeyDictionary()
+        if self._http is not None:
+            retire_async_client(*self._http, self._closing)
+        self._http = None
+
+    def _source(self, digest: str, uri: str, thumbnail: bool = False) -> None:
+        self._sources.pop(digest, None)
+        self._sources[digest] = (uri, thumbnail)
+        while len(self._sources) > self.store.max_names:
+            self._sources.popitem(last=False)
+
+    def url(self, uri: str) -> str:
+        """where a (hex or text) uri is fetched from"""
+        return gateway_url(decode_uri(uri), self.gateway)
+
+    def _client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        if self._http is None or self._http[0] is not loop:
+            if self._http is not None:
+                retire_async_client(*self._http, self._closing)
+            # redirects are followed by hand, each hop is checked like the first
+            self._http = (loop, httpx.AsyncClient(timeout=self.timeout, transport=self.transport))
+        return self._http[1]
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.concurrency)
+        return semaphore
+
+    async def fetch(self, uri: str) -> str:
+        """the digest of what `uri` points at, fetched the first time only"""
+        uri = decode_uri(uri)
+        if not uri:
+            raise ValueError("nft has no uri")
+        digest = self.store.digest(uri)
+        if digest is not None:
+            self.hits += 1
+            return digest
+        digest = await self.flights.do(uri, lambda: self._fetch(uri))
+        self._source(digest, uri)
+        return digest
+
+    async def body(self, uri: str) -> Tuple[str, bytes]:
+        """(content type, body) of what `uri` points at, fetched again when it fell out of memory"""
+        entry = await self._get(await self.fetch(uri))
+        if entry is None:
+            self.store.forget(decode_uri(uri))
+            entry = await self._get(await self.fetch(uri))
+        if entry is None:
+            raise ValueError(f"{decode_uri(uri)} isn't cached")
+        return entry
+
+    async def _get(self, digest: str) -> Optional[Tuple[str, bytes]]:
+        if self.cache_dir:
+            return await asyncio.to_thread(self.store.get, digest)
+        return self.store.get(digest)
+
+    async def _fetch(self, uri: str) -> str:
+        if uri.startswith("data:"):
+            declared, body = _data_uri(uri)
+        else:
+            url = gateway_url(uri, self.gateway)
+            if not url.startswith(("http://", "https://")):
+                raise ValueError(f"can't fetch {uri}")
+            self.fetches += 1
+            async with self._semaphore():
+                declared, body = await self._download(url)
+        return await self._put(uri, sniff(body, declared), body)
+
+    async def _put(self, name: str, content_type: str, body: bytes) -> str:
+        # with a cache dir the body is written to disk, off the loop
+        if self.cache_dir:
+            return await asyncio.to_thread(self.store.put, name, content_type, body)
+        return self.store.put(name, content_type, body)
+
+    async def _download(self, url: str) -> Tuple[str, bytes]:
+        """(declared content type, body), only the gateway may be on a private address"""
+        gateway = urlsplit(self.gateway).hostname
+        for _ in range(_MAX_REDIRECTS + 1):
+            if urlsplit(url).hostname != gateway:
+                await _public(url)
+            async with self._client().stream("GET", url) as response:
+                if response.is_redirect:
+                    url = urljoin(url, response.headers["location"])
+                    continue
+                if not response.is_success:
+                    raise ValueError(f"{url} answered {response.status_code}")
+                body = bytearray()
+                async for chunk in response.aiter_bytes():
+                    body += chunk
+                    if len(body) > self.max_bytes:
+                        raise ValueError(f"{url} is over {self.max_bytes} bytes")
+                return response.headers.get("content-type", "application/octet-stream").split(";")[0], bytes(body)
+        raise ValueError(f"{url} redirects more than {_MAX_REDIRECTS} times")
+
+    async def metadata(self, uri: str) -> Optional[Dict[str, Any]]:
+        """the json an nft uri points at, None when it points at something else (an image usually)"""
+        content_type, body = await self.body(uri)
+        try:
+            metadata = json.loads(body)
+        except ValueError:
+            return None
+        return metadata if isinstance(metadata, dict) else None
+
+    async def thumbnail(self, uri: str) -> str:
+        """the digest of a thumbnail of the image at `uri`, the image itself without pillow"""
+        _, body = await self.body(uri)
+        digest = await self.fetch(uri)
+        if Image is None:
+            return digest
+        name = f"thumbnail:{self.thumbnail_size}:{digest}"
+        thumbnail = self.store.digest(name)
+        if thumbnail is not None:
+            return thumbnail
+        small = await asyncio.to_thread(_thumbnail, body, self.thumbnail_size)
+        if small is None:
+            return digest
+        thumbnail = await self._put(name, "image/png", small)
+        self._source(thumbnail, uri, thumbnail=True)
+        return thumbnail
+
+    async def resolve(self, nft: Dict[str, Any]) -> Dict[str, Any]:
+        """an account_nfts entry with its metadata, image and thumbnail"""
+        uri = decode_uri(nft.get("uri", ""))
+        item = {**nft, "uri": uri, "metadata": None, "name": None, "image": None, "thumbnail": None, "source": None, "error": None}
+        try:
+            metadata = await self.metadata(uri)
+            if metadata is None:
+                # the uri is the media
+                image = uri
+            else:
+                item["metadata"] = metadata
+                item["name"] = metadata.get("name")
+                image = metadata.get("image") or metadata.get("image_url") or metadata.get("animation_url")
+            if image:
+                item["source"] = gateway_url(image, self.gateway) if not image.startswith("data:") else None
+                item["image"] = self.media_path + await self.fetch(image)
+                item["thumbnail"] = self.media_path + await self.thumbnail(image)
+        except Exception as exception:
+            item["error"] = str(exception) or type(exception).__name__
+        return item
+
+    async def gallery(self, nfts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """resolve every nft, `concurrency` fetches at a time"""
+        return await asyncio.gather(*[self.resolve(nft) for nft in nfts])
+
+    async def media(self, digest: str) -> Optional[Tuple[str, bytes]]:
+        """(content type, body) of a digest the gallery returned, made again when it fell out of memory"""
+        entry = await self._get(digest)
+        if entry is not None or digest not in self._sources:
+            return entry
+        uri, thumbnail = self._sources[digest]
+        try:
+            await (self.thumbnail(uri) if thumbnail else self.body(uri))
+        except Exception:
+            return None
+        return await self._get(digest)
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "fetches": self.fetches, "memory_bytes": self.store._size}
+
+    async def aclose(self) -> None:
+        if self._http is not None:
+            if self._http[0] is asyncio.get_running_loop():
+                await self._http[1].aclose()
+            else:
+                retire_async_client(*self._http, self._closing)
+        self._http = None
+
+
+nft_media = NftMediaResolver()
@@ -1,12 +1,13 @@
 import random
+import threading
+from collections import OrderedDict
 from datetime import datetime
 from os import urandom
 from typing import Union
 
-import requests
-
 # from cryptoconditions import PreimageSha256
 from xrpl.account import does_account_exist
+from xrpl.asyncio.clients import AsyncJsonRpcClient
 from xrpl.clients import JsonRpcClient
 from xrpl.core.addresscodec import (
     classic_address_to_xaddress,
@@ -22,15 +23,19 @@ from xrpl.utils import (
 )
 from xrpl.wallet import Wallet, generate_faucet_wallet
 
+from .DataApi import data_api
 from .x_constants import (
     ACCOUNT_ROOT_FLAGS,
+    CURRENCY_CACHE_SIZE,
     D_DATA,
     D_TYPE,
     NFTOKEN_FLAGS,
     NFTOKEN_OFFER_FLAGS,
     OFFER_FLAGS,
     PAYMENT_FLAGS,
+    POPULAR_CURRENCIES,
 )
+from .Pool import xrpl_pool
 
 # Memo(
 #     memo_type=hex_to_str(),
@@ -86,8 +91,7 @@ def __convert_rippletime_datetime(obj: int) -> datetime:
 
 def get_test_xrp(wallet: Wallet) -> None:
     """fund your account with free 1000 test xrp"""
-    testnet_url = "https://s.altnet.rippletest.net:51234"
-    client = JsonRpcClient(testnet_url)
+    client = xrpl_pool.client(xrpl_pool.network_url(mainnet=False))
     generate_faucet_wallet(client, wallet)
 
 
@@ -106,34 +110,119 @@ def hex_to_symbol(hex: str = None) -> str:
         return bytes_string.rstrip("\x00")
     return hex
 
+
+_HEX_DIGITS = frozenset("0123456789abcdefABCDEF")
+
+
+class CurrencyCache:
+    """interned currency code <-> symbol lookups\n
+    only 40 char codes and the symbols they encode are kept, other hex such as
+    domains and uris is decoded every time. lookups, counters and inserts share one
+    lock, decoding runs outside it. inserts evict the oldest entry past `max_entries`,
+    seeded symbols are never evicted"""
+
+    def __init__(self, max_entries: int = CURRENCY_CACHE_SIZE, seed: list = ()):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._pinned_symbols: dict = {}  # code -> (symbol, decodes)
+        self._pinned_codes: dict = {}  # symbol -> code
+        self._symbols: "OrderedDict[str, tuple]" = OrderedDict()
+        self._codes: "OrderedDict[str, str]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        for symbol in seed:
+            code = symbol_to_hex(symbol)
+            self._pinned_symbols[code] = (symbol, True)
+            self._pinned_codes[symbol] = code
+
+    def _get(self, pinned: dict, entries: OrderedDict, key: str):
+        """the cached value or None, counted as a hit or a miss"""
+        with self._lock:
+            value = pinned.get(key) or entries.get(key)
+            if value is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+            return value
+
+    def _put(self, entries: OrderedDict, key: str, value) -> None:
+        with self._lock:
+            entries[key] = value
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+
+    def lookup(self, code: str) -> tuple:
+        """(symbol, decodes) of a currency code, never raises\n
+        a code that isn't valid hex or utf-8 comes back unchanged with decodes False"""
+        if len(code) != 40:
+            try:
+                return hex_to_symbol(code), True
+            except Exception:
+                return code, False
+        entry = self._get(self._pinned_symbols, self._symbols, code)
+        if entry is not None:
+            return entry
+        entry = (code, False)
+        if _HEX_DIGITS.issuperset(code):
+            try:
+                entry = (bytes.fromhex(code).decode("utf-8").rstrip("\x00"), True)
+            except UnicodeDecodeError:
+                pass
+        self._put(self._symbols, code, entry)
+        return entry
+
+    def symbol(self, code: str) -> str:
+        return self.lookup(code)[0]
+
+    def code(self, symbol: str) -> str:
+        """40 char code of a symbol, 3 letter codes are returned as they are"""
+        if len(symbol) <= 3 or len(symbol) > 20:
+            return symbol_to_hex(symbol)
+        code = self._get(self._pinned_codes, self._codes, symbol)
+        if code is not None:
+            return code
+        code = symbol_to_hex(symbol)
+        self._put(self._codes, symbol, code)
+        return code
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits, misses = self.hits, self.misses
+            size = len(self._symbols) + len(self._codes) + len(self._pinned_codes)
+        lookups = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "size": size,
+        }
+
+
+currency_cache = CurrencyCache(seed=POPULAR_CURRENCIES)
+
+
+def is_currency_hex(code: str) -> bool:
+    """True when `code` decodes to a symbol, no exceptions involved"""
+    return isinstance(code, str) and currency_cache.lookup(code)[1]
+
+
 def is_hex(hex: str = None):
-    result = None
-    try:
-        query = hex_to_symbol(hex)
-    except Exception as e:
-        result = e
-    return result
-        
+    """None when `hex` decodes, else the error (returned, not raised)"""
+    if isinstance(hex, str) and currency_cache.lookup(hex)[1]:
+        return None
+    return ValueError(f"{hex} is not a hex encoded symbol")
 
 
 def validate_hex_to_symbol(hex: str = None) -> str:
-    result = ""
-    try:
-        result = hex_to_symbol(hex)
-    except Exception as e:
-        result = hex
-    finally:
-        return result
+    if not isinstance(hex, str):
+        return hex
+    return currency_cache.symbol(hex)
 
 
 def validate_symbol_to_hex(symbol: str = None) -> str:
-    result = ""
-    try:
-        result = symbol_to_hex(symbol)
-    except Exception as e:
-        result = symbol
-    finally:
-        return result
+    if not isinstance(symbol, str):
+        return symbol
+    return currency_cache.code(symbol)
 
 
 """nft and token fees min decimal = 0.00
@@ -211,17 +300,27 @@ def token_market_info(token: str, issuer: str) -> dict:
     """retrieve token market info, use to retrieve token price; image; \n
     see x_constants.market_info_type\n
     will probably only work on mainnet"""
-    return requests.get(
-        f"https://s1.xrplmeta.org/token/{validate_symbol_to_hex(token)}:{issuer}"
-    ).json()
+    return data_api.xrplmeta(f"token/{validate_symbol_to_hex(token)}:{issuer}")
+
+
+async def async_token_market_info(token: str, issuer: str) -> dict:
+    return await data_api.async_xrplmeta(f"token/{validate_symbol_to_hex(token)}:{issuer}")
 
 
 def account_is_amm(client: JsonRpcClient, wallet_addr: str) -> bool:
     """check if an address is an amm instance, should evaluate to false if sending token or xrp\n
     if true, dont send token"""
-    amm_flag = False
     acc_info = AccountInfo(account=wallet_addr, ledger_index="validated")
-    result = client.request(acc_info).result
+    return _account_is_amm(client.request(acc_info).result)
+
+
+async def async_account_is_amm(client: AsyncJsonRpcClient, wallet_addr: str) -> bool:
+    acc_info = AccountInfo(account=wallet_addr, ledger_index="validated")
+    return _account_is_amm((await client.request(acc_info)).result)
+
+
+def _account_is_amm(result: dict) -> bool:
+    amm_flag = False
     if "account_data" in result:
         flag = result["account_data"]["Flags"]
         for root_flags in ACCOUNT_ROOT_FLAGS:
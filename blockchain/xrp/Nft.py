@@ -1,6 +1,6 @@
-from typing import Union
+import asyncio
+from typing import Any, AsyncIterator, Tuple, Union
 
-import requests
 from xrpl.clients import JsonRpcClient
 from xrpl.models import (AccountObjects, IssuedCurrencyAmount, NFTBuyOffers,
                          NFTokenAcceptOffer, NFTokenCancelOffer,
@@ -8,30 +8,61 @@ from xrpl.models import (AccountObjects, IssuedCurrencyAmount, NFTBuyOffers,
                          NFTSellOffers)
 from xrpl.utils import drops_to_xrp, ripple_time_to_datetime, xrp_to_drops
 
+from .DataApi import data_api
 from .Misc import mm
 from .x_constants import M_SOURCE_TAG
+from .Paging import paginate
+from .Pool import xrpl_pool
 
 """nft handler"""
 
+
+def nft_offer_json(nft_offer: dict, nftoken_id: str) -> dict:
+    """an entry of nft_buy_offers / nft_sell_offers, their fields are lowercase"""
+    offer = {}
+    offer["offer_id"] = nft_offer["nft_offer_index"]
+    offer["nftoken_id"] = nftoken_id
+    offer["owner"] = nft_offer["owner"]
+    offer["flag"] = nft_offer["flags"]
+    offer["expiry_date"] = ""
+    offer["receiver"] = ""
+    if isinstance(nft_offer["amount"], str):
+        offer["token"] = "XRP"
+        offer["issuer"] = ""
+        offer["amount"] = str(drops_to_xrp(nft_offer["amount"]))
+    if isinstance(nft_offer["amount"], dict):
+        offer["token"] = nft_offer["amount"]["currency"]
+        offer["issuer"] = nft_offer["amount"]["issuer"]
+        offer["amount"] = nft_offer["amount"]["value"]
+    if "destination" in nft_offer:
+        offer["receiver"] = nft_offer["destination"]
+    if "expiration" in nft_offer:
+        offer["expiry_date"] = str(ripple_time_to_datetime(nft_offer["expiration"]))
+    return offer
+
+
 class xNFT(JsonRpcClient):
     def __init__(self, network_url: str, account_url: str, txn_url: str):
         self.network_url = network_url
         self.account_url = account_url
         self.txn_url = txn_url
-        self.client = JsonRpcClient(network_url)
+        self.client = xrpl_pool.client(network_url)
+        self.async_client = xrpl_pool.async_client(network_url)
 
     def toTestnet(self) -> bool:
         self.network_url = "https://s.altnet.rippletest.net:51234"
         self.account_url = "https://testnet.xrpl.org/accounts/"
         self.txn_url = "https://testnet.xrpl.org/transactions/"
-        self.client = JsonRpcClient(self.network_url)
+        self.client = xrpl_pool.client(self.network_url)
+        self.async_client = xrpl_pool.async_client(self.network_url)
         return True
 
     def toMainnet(self) -> bool:
         self.network_url = "https://xrplcluster.com"
         self.account_url = "https://livenet.xrpl.org/accounts/"
         self.txn_url = "https://livenet.xrpl.org/transactions/"
-        self.client = JsonRpcClient(self.network_url)
+        self.client = xrpl_pool.client(self.network_url)
+        self.async_client = xrpl_pool.async_client(self.network_url)
         return True
     
     def create_sell_offer(self, sender_addr: str, nftoken_id: str, get: Union[float, IssuedCurrencyAmount], expiry_date: int = None, receiver: str = None, fee: str = None) -> dict:
@@ -82,15 +113,36 @@ class xNFT(JsonRpcClient):
         
     def account_nft_offers(self, wallet_addr: str, mainnet: bool = True, limit: int = None) -> dict:
         """return all nft offers an account has created and received"""
+        req = AccountObjects(account=wallet_addr, type="nft_offer", limit=limit)
+        result = self.client.request(req).result
+        return self._account_nft_offers(result, self._destination_offers(wallet_addr, mainnet))
+
+    async def async_account_nft_offers(self, wallet_addr: str, mainnet: bool = True, limit: int = None) -> dict:
+        req = AccountObjects(account=wallet_addr, type="nft_offer", limit=limit)
+        response, received = await asyncio.gather(
+            self.async_client.request(req),
+            data_api.async_xrpldata(f"xls20-nfts/offers/offerdestination/{wallet_addr}", mainnet),
+        )
+        return self._account_nft_offers(response.result, received)
+
+    async def created_nft_offers_pages(self, wallet_addr: str, limit: int = None, marker: Any = None) -> AsyncIterator[Tuple[dict, Any]]:
+        """yield ({"created_sell", "created_buy"}, next_marker) a page at a time\n
+        offers received come from xrpldata, which has no marker, see account_nft_offers"""
+        req = AccountObjects(account=wallet_addr, type="nft_offer", limit=limit, marker=marker)
+        async for result, next_marker in paginate(self.async_client, req):
+            offers = self._account_nft_offers(result, {})
+            yield {"created_sell": offers["created_sell"], "created_buy": offers["created_buy"]}, next_marker
+
+    def _destination_offers(self, wallet_addr: str, mainnet: bool = True) -> dict:
+        """return all offers with wallet addr as the 'destination/receiver"""
+        return data_api.xrpldata(f"xls20-nfts/offers/offerdestination/{wallet_addr}", mainnet)
+
+    def _account_nft_offers(self, result: dict, received: dict) -> dict:
         created_buy = []
         created_sell = []
         received_buy = []
         received_sell = []
         offer_dict = {}
-
-        req = AccountObjects(account=wallet_addr, type="nft_offer", limit=limit)
-        response = self.client.request(req)
-        result = response.result
         if "account_objects" in result:
             nft_offers = result["account_objects"]
             for nft_offer in nft_offers:
@@ -121,8 +173,7 @@ class xNFT(JsonRpcClient):
         offer_dict["created_sell"] = created_sell
         offer_dict["created_buy"] = created_buy
 
-        """return all offers with wallet addr as the 'destination/receiver"""
-        result = requests.get(f"https://api.xrpldata.com/api/v1/xls20-nfts/offers/offerdestination/{wallet_addr}").json() if mainnet else requests.get(f"https://test-api.xrpldata.com/api/v1/xls20-nfts/offers/offerdestination/{wallet_addr}").json()
+        result = received
         if "data" in result and isinstance(result["data"], dict):
             account_offers = result["data"]["offers"]
             for account_offer in account_offers:
@@ -158,65 +209,21 @@ class xNFT(JsonRpcClient):
 
     def all_nft_offers(self, nftoken_id: str) -> dict:
         """return all available nft offers to buy and sell an nft"""
+        buy_result = self.client.request(NFTBuyOffers(nft_id=nftoken_id, id="validated")).result
+        sell_result = self.client.request(NFTSellOffers(nft_id=nftoken_id, id="validated")).result
+        return self._all_nft_offers(buy_result, sell_result)
+
+    async def async_all_nft_offers(self, nftoken_id: str) -> dict:
+        buy_response, sell_response = await asyncio.gather(
+            self.async_client.request(NFTBuyOffers(nft_id=nftoken_id, id="validated")),
+            self.async_client.request(NFTSellOffers(nft_id=nftoken_id, id="validated")),
+        )
+        return self._all_nft_offers(buy_response.result, sell_response.result)
+
+    def _all_nft_offers(self, buy_result: dict, sell_result: dict) -> dict:
         offer_dict = {}
-        buy = []
-        sell = []
-        buy_req = NFTBuyOffers(nft_id=nftoken_id, id="validated")
-        buy_response = self.client.request(buy_req)
-        buy_result = buy_response.result
-        if "offers" in buy_result:
-            buy_offers = buy_result["offers"]
-            for buy_offer in buy_offers:
-                offer = {}
-                offer["offer_id"] = buy_offer["nft_offer_index"]
-                offer["nftoken_id"] = buy_result["nft_id"]
-                offer["owner"] = buy_offer["owner"]
-                offer["flag"] = buy_offer["flags"]
-                offer["expiry_date"] = ""
-                offer["receiver"] = ""
-                if isinstance(buy_offer["amount"], str):
-                    offer["token"] = "XRP"
-                    offer["issuer"] = ""
-                    offer["amount"] = str(drops_to_xrp(buy_offer["Amount"]))
-                if isinstance(buy_offer["amount"], dict):
-                    offer["token"] = buy_offer["amount"]["currency"]
-                    offer["issuer"] = buy_offer["amount"]["issuer"]
-                    offer["amount"] = buy_offer["amount"]["value"]
-                if "Destination" in buy_offer:
-                    offer["receiver"] = buy_offer["Destination"]
-                if "Expiration" in buy_offer:
-                    offer["expiry_date"] = str(ripple_time_to_datetime(buy_offer["Expiration"]))
-                buy.append(offer)
-
-        sell_req = NFTSellOffers(nft_id=nftoken_id, id="validated")
-        sell_response = self.client.request(sell_req)
-        sell_result = sell_response.result
-        if "offers" in sell_result:
-            sell_offers = sell_result["offers"]
-            for sell_offer in sell_offers:
-                offer = {}
-                offer["offer_id"] = sell_offer["nft_offer_index"]
-                offer["nftoken_id"] = sell_result["nft_id"]
-                offer["owner"] = sell_offer["owner"]
-                offer["flag"] = sell_offer["flags"]
-                offer["expiry_date"] = ""
-                offer["receiver"] = ""
-                if isinstance(sell_offer["amount"], str):
-                    offer["token"] = "XRP"
-                    offer["issuer"] = ""
-                    offer["amount"] = str(drops_to_xrp(sell_offer["amount"]))
-                if isinstance(sell_offer["amount"], dict):
-                    offer["token"] = sell_offer["amount"]["currency"]
-                    offer["issuer"] = sell_offer["amount"]["issuer"]
-                    offer["amount"] = sell_offer["amount"]["value"]
-                if "Destination" in sell_offer:
-                    offer["receiver"] = sell_offer["Destination"]
-                if "Expiration" in sell_offer:
-                    offer["expiry_date"] = str(ripple_time_to_datetime(sell_offer["Expiration"]))
-                sell.append(offer)
-
-        offer_dict["buy"] = buy
-        offer_dict["sell"] = sell
+        offer_dict["buy"] = [nft_offer_json(offer, buy_result["nft_id"]) for offer in buy_result.get("offers", [])]
+        offer_dict["sell"] = [nft_offer_json(offer, sell_result["nft_id"]) for offer in sell_result.get("offers", [])]
         return offer_dict
 
 
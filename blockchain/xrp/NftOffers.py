@@ -0,0 +1,301 @@
+import asyncio
+import logging
+import time
+import weakref
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Set, Tuple
+
+from xrpl.models.requests import GenericRequest
+from xrpl.utils import posix_to_ripple_time, ripple_time_to_posix
+
+from .Coalesce import AsyncSingleflight
+from .Nft import nft_offer_json
+from .Pool import xrpl_pool
+from .Stream import XrplStream, xrpl_stream
+from .x_constants import (NFT_OFFERS_CACHE_SIZE, NFT_OFFERS_CALLER_RATE,
+                          NFT_OFFERS_CALLERS, NFT_OFFERS_CONCURRENCY,
+                          NFT_OFFERS_MAX_IDS, NFT_OFFERS_PAGE_SIZE,
+                          NFT_OFFERS_RATE, NFT_OFFERS_TTL)
+
+"""
+floor, best bid and offer counts of many nfts at once
+
+buy and sell offers of every nft are read concurrently, `concurrency` requests
+in flight and no more than `rate` started per second, following markers to the
+last page. summaries are cached until an offer of the nft is created, cancelled
+or accepted (or the nft burned), which the `transactions` stream tells, or until
+`ttl` runs out or the first of its offers expires, whichever comes first. only
+what was read while the stream was subscribed is cached, nothing would invalidate
+it otherwise. after a reconnect the network's summaries are dropped, invalidations
+may have been missed
+
+floor and best bid are in xrp, offers in tokens are counted but not priced
+
+`rate` bounds what reaches rippled from everyone, each caller also gets
+`caller_rate` nfts per second (`max_ids` at once) so one of them can't take it all
+"""
+
+logger = logging.getLogger(__name__)
+
+class TooManyRequests(ValueError):
+    """a caller asked for more nfts than its share"""
+
+
+_INVALIDATING = frozenset(("NFTokenCreateOffer", "NFTokenCancelOffer", "NFTokenAcceptOffer", "NFTokenBurn"))
+
+
+def _dedicated_stream(mainnet: bool) -> XrplStream:
+    """its own connection, the tx tracker unsubscribes transactions on the shared one"""
+    return XrplStream(xrpl_stream(mainnet).url)
+
+
+def offer_nfts(tx: Dict[str, Any], meta: Dict[str, Any]) -> Set[str]:
+    """the nfts whose offers a transaction changed"""
+    if tx.get("TransactionType") not in _INVALIDATING:
+        return set()
+    nfts = {tx["NFTokenID"]} if "NFTokenID" in tx else set()
+    for node in meta.get("AffectedNodes", []):
+        entry = next(iter(node.values()))
+        if entry.get("LedgerEntryType") != "NFTokenOffer":
+            continue
+        for fields in ("NewFields", "FinalFields", "PreviousFields"):
+            if "NFTokenID" in entry.get(fields, {}):
+                nfts.add(entry[fields]["NFTokenID"])
+    return nfts
+
+
+def summarize(nftoken_id: str, buy_offers: List[dict], sell_offers: List[dict], now: int = None) -> Dict[str, Any]:
+    """floor (cheapest sell) and best bid (highest buy) of an nft's live offers, `now` in ripple time"""
+    now = posix_to_ripple_time(time.time()) if now is None else now
+    buy_offers = [offer for offer in buy_offers if offer.get("expiration", now + 1) > now]
+    sell_offers = [offer for offer in sell_offers if offer.get("expiration", now + 1) > now]
+    buy_xrp = [offer for offer in buy_offers if isinstance(offer["amount"], str)]
+    sell_xrp = [offer for offer in sell_offers if isinstance(offer["amount"], str)]
+    floor = min(sell_xrp, key=lambda offer: int(offer["amount"]), default=None)
+    best_bid = max(buy_xrp, key=lambda offer: int(offer["amount"]), default=None)
+    expirations = [offer["expiration"] for offer in buy_offers + sell_offers if "expiration" in offer]
+    return {
+        "nftoken_id": nftoken_id,
+        "floor": nft_offer_json(floor, nftoken_id) if floor is not None else None,
+        "best_bid": nft_offer_json(best_bid, nftoken_id) if best_bid is not None else None,
+        "sell_offers": len(sell_offers),
+        "buy_offers": len(buy_offers),
+        "token_offers": len(buy_offers) + len(sell_offers) - len(buy_xrp) - len(sell_xrp),
+        "next_expiry": min(expirations, default=None),
+    }
+
+
+class NftOfferCache:
+    """offer summaries of nfts by (network, nftoken_id)"""
+
+    def __init__(
+        self,
+        stream_factory: Callable[[bool], XrplStream] = _dedicated_stream,
+        concurrency: int = NFT_OFFERS_CONCURRENCY,
+        rate: float = NFT_OFFERS_RATE,
+        page_size: int = NFT_OFFERS_PAGE_SIZE,
+        ttl: float = NFT_OFFERS_TTL,
+        max_entries: int = NFT_OFFERS_CACHE_SIZE,
+        max_ids: int = NFT_OFFERS_MAX_IDS,
+        caller_rate: float = NFT_OFFERS_CALLER_RATE,
+        max_callers: int = NFT_OFFERS_CALLERS,
+    ):
+        self.stream_factory = stream_factory
+        self.concurrency = concurrency
+        self.rate = rate
+        self.page_size = page_size
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_ids = max_ids
+        self.caller_rate = caller_rate
+        self.max_callers = max_callers
+        self.flights = AsyncSingleflight()
+        self._entries: "OrderedDict[Tuple[bool, str], Tuple[dict, float]]" = OrderedDict()
+        # nfts being fetched, False when the summary can't be cached: the stream wasn't subscribed
+        # when the read started or the nft was invalidated meanwhile
+        self._fetching: Dict[Tuple[bool, str], bool] = {}
+        self._streams: Dict[bool, XrplStream] = {}
+        self._subscribed: Set[bool] = set()
+        self._subscribing: Dict[bool, asyncio.Future] = {}
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+        self._next_start = 0.0
+        # nfts each caller may still ask for and when that was counted
+        self._callers: "OrderedDict[Any, Tuple[float, float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.requests = 0
+        self.invalidated = 0
+
+    def configure(self, **options) -> None:
+        for key, value in options.items():
+            if not hasattr(self, key) or key.startswith("_"):
+                raise ValueError(f"unknown nft offers option {key}")
+            setattr(self, key, value)
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.concurrency)
+        return semaphore
+
+    async def _throttle(self) -> None:
+        # every request reserves the next start slot, `rate` of them per second
+        if self.rate <= 0:
+            return
+        now = time.monotonic()
+        start = max(now, self._next_start)
+        self._next_start = start + 1 / self.rate
+        if start > now:
+            await asyncio.sleep(start - now)
+
+    def _allow(self, caller: Any, count: int) -> None:
+        """take `count` nfts from the caller's bucket, refilled at `caller_rate` up to `max_ids`"""
+        if caller is None or self.caller_rate <= 0:
+            return
+        now = time.monotonic()
+        tokens, counted = self._callers.pop(caller, (self.max_ids, now))
+        tokens = min(self.max_ids, tokens + (now - counted) * self.caller_rate)
+        if tokens < count:
+            self._callers[caller] = (tokens, now)
+            raise TooManyRequests(f"too many nfts, try again in {(count - tokens) / self.caller_rate:.0f}s")
+        self._callers[caller] = (tokens - count, now)
+        while len(self._callers) > self.max_callers:
+            self._callers.popitem(last=False)
+
+    async def _offers(self, method: str, nftoken_id: str, mainnet: bool) -> List[dict]:
+        """every page of nft_buy_offers or nft_sell_offers"""
+        client = xrpl_pool.async_client(xrpl_pool.network_url(mainnet))
+        params = {"method": method, "nft_id": nftoken_id, "ledger_index": "validated", "limit": self.page_size}
+        offers = []
+        while True:
+            async with self._semaphore():
+                await self._throttle()
+                self.requests += 1
+                response = await client.request(GenericRequest(**params))
+            result = response.result
+            if not response.is_successful():
+                if result.get("error") == "objectNotFound":
+                    # no offers at all
+                    return offers
+                raise ValueError(f"{method} {nftoken_id} failed, {result.get('error_message') or result.get('error')}")
+            offers.extend(result.get("offers", []))
+            if result.get("marker") is None:
+                return offers
+            params["marker"] = result["marker"]
+            # later pages from the ledger the first came from
+            if isinstance(result.get("ledger_index"), int):
+                params["ledger_index"] = result["ledger_index"]
+
+    async def _fetch(self, key: Tuple[bool, str]) -> dict:
+        mainnet, nftoken_id = key
+        self._fetching[key] = mainnet in self._subscribed
+        try:
+            buy_offers, sell_offers = await asyncio.gather(
+                self._offers("nft_buy_offers", nftoken_id, mainnet),
+                self._offers("nft_sell_offers", nftoken_id, mainnet),
+            )
+        finally:
+            current = self._fetching.pop(key)
+        summary = summarize(nftoken_id, buy_offers, sell_offers)
+        if current:
+            expires = time.time() + self.ttl
+            if summary["next_expiry"] is not None:
+                expires = min(expires, ripple_time_to_posix(summary["next_expiry"]))
+            self._entries[key] = (summary, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return summary
+
+    async def summary(self, nftoken_id: str, mainnet: bool = True) -> dict:
+        key = (mainnet, nftoken_id.upper())
+        entry = self._entries.get(key)
+        if entry is not None and entry[1] > time.time():
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry[0]
+        self.misses += 1
+        self._follow(mainnet)
+        return await self.flights.do(key, lambda: self._fetch(key))
+
+    async def summaries(self, nftoken_ids: List[str], mainnet: bool = True, caller: Any = None) -> List[dict]:
+        """a summary per nft in order, an nft that fails gets an `error` entry instead of failing the batch\n
+        `caller` (the client's address) is held to its share, TooManyRequests when it's used up"""
+        if len(nftoken_ids) > self.max_ids:
+            raise ValueError(f"at most {self.max_ids} nfts per call")
+        self._allow(caller, len(nftoken_ids))
+
+        async def summary(nftoken_id: str) -> dict:
+            try:
+                return {**await self.summary(nftoken_id, mainnet), "error": None}
+            except Exception as exception:
+                return {"nftoken_id": nftoken_id, "error": str(exception)}
+
+        return await asyncio.gather(*[summary(nftoken_id) for nftoken_id in nftoken_ids])
+
+    def invalidate(self, nftoken_id: str, mainnet: bool = True) -> None:
+        key = (mainnet, nftoken_id.upper())
+        if key in self._fetching:
+            self._fetching[key] = False
+        if self._entries.pop(key, None) is not None:
+            self.invalidated += 1
+
+    def _on_transaction(self, mainnet: bool, message: dict) -> None:
+        if not message.get("validated"):
+            return
+        for nftoken_id in offer_nfts(message.get("transaction", {}), message.get("meta", {})):
+            self.invalidate(nftoken_id, mainnet)
+
+    def _follow(self, mainnet: bool) -> None:
+        """subscribe to the network's transactions in the background, caching still works on ttl when it can't"""
+        if mainnet in self._subscribed or mainnet in self._subscribing:
+            return
+        self._subscribing[mainnet] = asyncio.ensure_future(self._subscribe(mainnet))
+
+    async def _subscribe(self, mainnet: bool) -> None:
+        try:
+            stream = self._streams.get(mainnet)
+            if stream is None:
+                stream = self._streams[mainnet] = self.stream_factory(mainnet)
+                stream.on("transaction", lambda message: self._on_transaction(mainnet, message))
+                stream.on("connected", lambda message: self._on_connected(mainnet))
+            await stream.subscribe(streams=["transactions"])
+            self._subscribed.add(mainnet)
+        except Exception:
+            # the next miss tries again, until then summaries aren't cached
+            logger.warning("can't follow %s nft offers", "mainnet" if mainnet else "testnet", exc_info=True)
+        finally:
+            self._subscribing.pop(mainnet, None)
+
+    def _on_connected(self, mainnet: bool) -> None:
+        if mainnet not in self._subscribed:
+            # the first connect, the subscribe waiting on it does the rest
+            return
+        self._subscribed.discard(mainnet)
+        # whatever happened while we were away is unknown
+        for key in [key for key in self._entries if key[0] == mainnet]:
+            del self._entries[key]
+        for key in [key for key in self._fetching if key[0] == mainnet]:
+            self._fetching[key] = False
+        self._follow(mainnet)
+
+    async def close(self) -> None:
+        for task in list(self._subscribing.values()):
+            task.cancel()
+        self._subscribing.clear()
+        self._subscribed.clear()
+        while self._streams:
+            _, stream = self._streams.popitem()
+            await stream.close()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "nfts": len(self._entries), "hits": self.hits, "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0, "requests": self.requests, "invalidated": self.invalidated,
+        }
+
+
+nft_offer_cache = NftOfferCache()
@@ -1,5 +1,5 @@
 from decimal import Decimal
-from typing import Union
+from typing import Any, AsyncIterator, Tuple, Union
 
 from xrpl.clients import JsonRpcClient
 from xrpl.models import (XRP, AccountObjects, AccountOffers, BookOffers,
@@ -11,6 +11,9 @@ from xrpl.utils import drops_to_xrp, ripple_time_to_datetime, xrp_to_drops
 
 from .Misc import mm, validate_hex_to_symbol, validate_symbol_to_hex
 from .x_constants import M_SOURCE_TAG
+from .Offers import account_offer_json, book_offer_json, decode_account_offers, decode_book_offers
+from .Paging import paginate
+from .Pool import xrpl_pool
 
 
 
@@ -19,20 +22,23 @@ class xObject(JsonRpcClient):
         self.network_url = network_url
         self.account_url = account_url
         self.txn_url = txn_url
-        self.client = JsonRpcClient(network_url)
+        self.client = xrpl_pool.client(network_url)
+        self.async_client = xrpl_pool.async_client(network_url)
 
     def toTestnet(self) -> bool:
         self.network_url = "https://s.altnet.rippletest.net:51234"
         self.account_url = "https://testnet.xrpl.org/accounts/"
         self.txn_url = "https://testnet.xrpl.org/transactions/"
-        self.client = JsonRpcClient(self.network_url)
+        self.client = xrpl_pool.client(self.network_url)
+        self.async_client = xrpl_pool.async_client(self.network_url)
         return True
 
     def toMainnet(self) -> bool:
         self.network_url = "https://xrplcluster.com"
         self.account_url = "https://livenet.xrpl.org/accounts/"
         self.txn_url = "https://livenet.xrpl.org/transactions/"
-        self.client = JsonRpcClient(self.network_url)
+        self.client = xrpl_pool.client(self.network_url)
+        self.async_client = xrpl_pool.async_client(self.network_url)
         return True
 
     def create_xrp_check(self, sender_addr: str, receiver_addr: str, amount: Union[int, float, Decimal], expiry_date: int = None, fee: str = None) -> dict:
@@ -42,12 +48,23 @@ class xObject(JsonRpcClient):
         
     def account_checks(self, wallet_addr: str, limit: int = None) -> dict:
         """return a dict of checks an account sent or received"""
+        req = AccountObjects(account=wallet_addr, ledger_index="validated", type="check", limit=limit)
+        return self._account_checks(self.client.request(req).result, wallet_addr)
+
+    async def async_account_checks(self, wallet_addr: str, limit: int = None) -> dict:
+        req = AccountObjects(account=wallet_addr, ledger_index="validated", type="check", limit=limit)
+        return self._account_checks((await self.async_client.request(req)).result, wallet_addr)
+
+    async def account_checks_pages(self, wallet_addr: str, limit: int = None, marker: Any = None) -> AsyncIterator[Tuple[dict, Any]]:
+        """yield (checks, next_marker) a page at a time, see Paging.paginate"""
+        req = AccountObjects(account=wallet_addr, ledger_index="validated", type="check", limit=limit, marker=marker)
+        async for result, next_marker in paginate(self.async_client, req):
+            yield self._account_checks(result, wallet_addr), next_marker
+
+    def _account_checks(self, result: dict, wallet_addr: str) -> dict:
         checks_dict = {}
         sent = []
         receive = []
-        req = AccountObjects(account=wallet_addr, ledger_index="validated", type="check", limit=limit)
-        response = self.client.request(req)
-        result = response.result
         if "account_objects" in result:
             account_checks = result["account_objects"]
             for check in account_checks:
@@ -118,12 +135,22 @@ class xObject(JsonRpcClient):
 
     def account_xrp_escrows(self, wallet_addr: str, limit: int = None) -> dict:
         """returns all account escrows, used for returning scheduled payments"""
+        req = AccountObjects(account=wallet_addr, ledger_index="validated", type="escrow", limit=limit)
+        return self._account_xrp_escrows(self.client.request(req).result, wallet_addr)
+
+    async def async_account_xrp_escrows(self, wallet_addr: str, limit: int = None) -> dict:
+        req = AccountObjects(account=wallet_addr, ledger_index="validated", type="escrow", limit=limit)
+        return self._account_xrp_escrows((await self.async_client.request(req)).result, wallet_addr)
+
+    async def account_xrp_escrows_pages(self, wallet_addr: str, limit: int = None, marker: Any = None) -> AsyncIterator[Tuple[dict, Any]]:
+        req = AccountObjects(account=wallet_addr, ledger_index="validated", type="escrow", limit=limit, marker=marker)
+        async for result, next_marker in paginate(self.async_client, req):
+            yield self._account_xrp_escrows(result, wallet_addr), next_marker
+
+    def _account_xrp_escrows(self, result: dict, wallet_addr: str) -> dict:
         escrow_dict = {}
         sent = []
         received = []
-        req = AccountObjects(account=wallet_addr, ledger_index="validated", type="escrow", limit=limit)
-        response = self.client.request(req)
-        result = response.result
         if "account_objects" in result:
             escrows = result["account_objects"]
             for escrow in escrows:
@@ -156,12 +183,15 @@ class xObject(JsonRpcClient):
     
     def r_seq_dict(self, prev_txn_id: str) -> dict:
         """return escrow seq or ticket sequence for finishing or cancelling \n use seq_back_up if seq is null"""
+        return self._r_seq_dict(self.client.request(Tx(transaction=prev_txn_id)).result)
+
+    async def async_r_seq_dict(self, prev_txn_id: str) -> dict:
+        return self._r_seq_dict((await self.async_client.request(Tx(transaction=prev_txn_id))).result)
+
+    def _r_seq_dict(self, result: dict) -> dict:
         info_dict = {}
         info_dict["sequence"] = ""
         info_dict["seq_back_up"] = ""
-        req = Tx(transaction=prev_txn_id)
-        response = self.client.request(req)
-        result = response.result
         if "Sequence" in result:
             info_dict["sequence"] = result["Sequence"]
         if "TicketSequence" in result:
@@ -170,10 +200,13 @@ class xObject(JsonRpcClient):
     
     def r_sequence(self, prev_txn_id: str) -> int:
         """return escrow seq for finishing or cancelling escrow"""
+        return self._r_sequence(self.client.request(Tx(transaction=prev_txn_id)).result)
+
+    async def async_r_sequence(self, prev_txn_id: str) -> int:
+        return self._r_sequence((await self.async_client.request(Tx(transaction=prev_txn_id))).result)
+
+    def _r_sequence(self, result: dict) -> int:
         seq = 0
-        req = Tx(transaction=prev_txn_id)
-        response = self.client.request(req)
-        result = response.result
         if "Sequence" in result:
             seq = result["Sequence"]
         return seq
@@ -218,37 +251,22 @@ class xObject(JsonRpcClient):
     
     def account_offers(self, wallet_addr: str, limit: int = None) -> list:
         """return all offers an account created"""
-        offer_list = []
         req = AccountOffers(account=wallet_addr, ledger_index="validated", limit=limit)
-        response = self.client.request(req)
-        result = response.result
+        return self._account_offers(self.client.request(req).result)
+
+    async def async_account_offers(self, wallet_addr: str, limit: int = None) -> list:
+        req = AccountOffers(account=wallet_addr, ledger_index="validated", limit=limit)
+        return self._account_offers((await self.async_client.request(req)).result)
+
+    async def account_offers_pages(self, wallet_addr: str, limit: int = None, marker: Any = None) -> AsyncIterator[Tuple[list, Any]]:
+        req = AccountOffers(account=wallet_addr, ledger_index="validated", limit=limit, marker=marker)
+        async for result, next_marker in paginate(self.async_client, req):
+            yield self._account_offers(result), next_marker
+
+    def _account_offers(self, result: dict) -> list:
+        offer_list = []
         if "offers" in result:
-            offers = result["offers"]
-            for offer in offers:
-                of = {}
-                of["flags"] = offer["flags"]
-                of["sequence"] = offer["seq"]
-                of["quality"] = offer["quality"]# str(drops_to_xrp(offer["quality"])) # rate is subject to error from the blockchain because xrp returned in this call has no decimal  # The exchange rate of the offer, as the ratio of the original taker_pays divided by the original taker_gets. rate = pay/get
-                if isinstance(offer["taker_pays"], dict):
-                    of["buy_token"] = validate_hex_to_symbol(offer["taker_pays"]["currency"])
-                    of["buy_issuer"] = offer["taker_pays"]["issuer"]
-                    of["buy_amount"] = offer["taker_pays"]["value"]
-                elif isinstance(offer["taker_pays"], str):
-                    of["buy_token"] = "XRP"
-                    of["buy_issuer"] = ""
-                    of["buy_amount"] = str(drops_to_xrp(offer["taker_pays"]))
-
-                if isinstance(offer["taker_gets"], dict):
-                    of["sell_token"] = validate_hex_to_symbol(offer["taker_gets"]["currency"])
-                    of["sell_issuer"] = offer["taker_gets"]["issuer"]
-                    of["sell_amount"] = offer["taker_gets"]["value"]
-                elif isinstance(offer["taker_gets"], str):
-                    of["sell_token"] = "XRP"
-                    of["sell_issuer"] = ""
-                    of["sell_amount"] = str(drops_to_xrp(offer["taker_gets"]))
-
-                of["rate"] = float(of["sell_amount"])/float(of["buy_amount"])
-                offer_list.append(of)
+            offer_list = [account_offer_json(record) for record in decode_account_offers(result["offers"])]
         return offer_list
     
     def cancel_offer(self, sender_addr: str, offer_seq: int, fee: str = None) -> dict:
@@ -258,42 +276,17 @@ class xObject(JsonRpcClient):
 
     def all_offers(self, pay: Union[XRP, IssuedCurrency], receive: Union[XRP, IssuedCurrency], limit: int = None) -> list:
         """returns all offers for 2 pairs"""
-        all_offers_list = []
         req = BookOffers(taker_gets=pay, taker_pays=receive, ledger_index="validated", limit=limit)
-        response = self.client.request(req)
-        result = response.result
+        return self._all_offers(self.client.request(req).result)
+
+    async def async_all_offers(self, pay: Union[XRP, IssuedCurrency], receive: Union[XRP, IssuedCurrency], limit: int = None) -> list:
+        req = BookOffers(taker_gets=pay, taker_pays=receive, ledger_index="validated", limit=limit)
+        return self._all_offers((await self.async_client.request(req)).result)
+
+    def _all_offers(self, result: dict) -> list:
+        all_offers_list = []
         if "offers" in result:
-            offers = result["offers"]
-            for offer in offers:
-                of = {}
-                of["creator"] = offer["Account"]
-                of["offer_id"] = offer["index"]
-                of["sequence"] = offer["Sequence"] # offer id
-                of["rate"] = offer["quality"]
-                of["flags"] = offer["Flags"]
-                of["creator_liquidity"] = ""
-                if "owner_funds" in offer and isinstance(offer["TakerGets"], str):
-                    of["creator_liquidity"] = f'{float(drops_to_xrp(offer["owner_funds"]))} XRP' # Amount of the TakerGets currency the side placing the offer has available to be traded.
-                if "owner_funds" in offer and isinstance(offer["TakerGets"], dict):
-                    of["creator_liquidity"] = f'{offer["owner_funds"]}  {validate_hex_to_symbol(offer["TakerGets"]["currency"])}' # Amount of the TakerGets currency the side placing the offer has available to be traded.
-                if isinstance(offer["TakerPays"], dict):
-                    of["buy_token"] = validate_hex_to_symbol(offer["TakerPays"]["currency"])
-                    of["buy_issuer"] = offer["TakerPays"]["issuer"]
-                    of["buy_amount"] = offer["TakerPays"]["value"]
-                elif isinstance(offer["TakerPays"], str):
-                    of["buy_token"] = "XRP"
-                    of["buy_issuer"] = ""
-                    of["buy_amount"] = str(drops_to_xrp(offer["TakerPays"]))
-
-                if isinstance(offer["TakerGets"], dict):
-                    of["sell_token"] = validate_hex_to_symbol(offer["TakerGets"]["currency"])
-                    of["sell_issuer"] = offer["TakerGets"]["issuer"]
-                    of["sell_amount"] = offer["TakerGets"]["value"]
-                elif isinstance(offer["TakerGets"], str):
-                    of["sell_token"] = "XRP"
-                    of["sell_issuer"] = ""
-                    of["sell_amount"] = str(drops_to_xrp(offer["TakerGets"]))
-                all_offers_list.append(of)
+            all_offers_list = [book_offer_json(record) for record in decode_book_offers(result["offers"])]
         return all_offers_list
     
 # from xrpl.wallet import Wallet
@@ -0,0 +1,171 @@
+from decimal import Decimal, localcontext
+from typing import Dict, Iterable, List, Union
+
+from xrpl.utils import ripple_time_to_datetime
+from xrpl.utils.xrp_conversions import DROPS_DECIMAL_CONTEXT, ONE_DROP
+
+from .Misc import validate_hex_to_symbol
+
+"""
+one decoder for every offer shaped result
+
+BookOffers, AccountOffers and ledger_entry offers are decoded a page at a time
+into compact records. currency codes are decoded once per page instead of once
+per offer and drops are converted without re-validating every amount. the
+records only turn into the json the api has always returned at the edge, in
+the *_json helpers
+"""
+
+PASSIVE = 0x00010000
+
+
+class OfferAmount:
+    """one side of an offer, `amount` is in xrp (not drops) for xrp"""
+
+    __slots__ = ("token", "issuer", "amount")
+
+    def __init__(self, token: str, issuer: str, amount: str):
+        self.token = token
+        self.issuer = issuer
+        self.amount = amount
+
+    @property
+    def is_xrp(self) -> bool:
+        return self.token == "XRP" and self.issuer == ""
+
+
+class OfferRecord:
+    """a decoded offer, `buy` is TakerPays and `sell` is TakerGets"""
+
+    __slots__ = ("creator", "offer_id", "flags", "sequence", "quality", "owner_funds", "expiration", "buy", "sell")
+
+    def __init__(self, creator: str, offer_id: str, flags: int, sequence: int, quality: str, owner_funds: str, expiration: int, buy: OfferAmount, sell: OfferAmount):
+        self.creator = creator
+        self.offer_id = offer_id
+        self.flags = flags
+        self.sequence = sequence
+        self.quality = quality
+        self.owner_funds = owner_funds
+        self.expiration = expiration
+        self.buy = buy
+        self.sell = sell
+
+    @property
+    def passive(self) -> bool:
+        return self.flags & PASSIVE == PASSIVE
+
+    def rate(self) -> float:
+        """sell amount per buy amount"""
+        return float(self.sell.amount) / float(self.buy.amount)
+
+
+class OfferDecoder:
+    """decodes one page of offers, the currency memo lives as long as the decoder"""
+
+    def __init__(self):
+        self._symbols: Dict[str, str] = {}
+
+    def symbol(self, currency: str) -> str:
+        symbol = self._symbols.get(currency)
+        if symbol is None:
+            symbol = self._symbols[currency] = validate_hex_to_symbol(currency)
+        return symbol
+
+    def amount(self, amount: Union[str, dict]) -> OfferAmount:
+        if isinstance(amount, str):
+            with localcontext(DROPS_DECIMAL_CONTEXT):
+                return OfferAmount("XRP", "", str(Decimal(amount) * ONE_DROP))
+        return OfferAmount(self.symbol(amount["currency"]), amount["issuer"], amount["value"])
+
+    def book_offers(self, offers: Iterable[dict]) -> List[OfferRecord]:
+        """BookOffers entries and ledger Offer objects"""
+        amount = self.amount
+        return [
+            OfferRecord(
+                offer["Account"], offer.get("index"), offer["Flags"], offer["Sequence"], offer.get("quality"),
+                offer.get("owner_funds"), offer.get("Expiration"), amount(offer["TakerPays"]), amount(offer["TakerGets"]),
+            )
+            for offer in offers
+        ]
+
+    def account_offers(self, offers: Iterable[dict]) -> List[OfferRecord]:
+        """AccountOffers entries, lower case and without the creator"""
+        amount = self.amount
+        return [
+            OfferRecord(
+                None, None, offer["flags"], offer["seq"], offer["quality"], None, offer.get("expiration"),
+                amount(offer["taker_pays"]), amount(offer["taker_gets"]),
+            )
+            for offer in offers
+        ]
+
+
+def decode_book_offers(offers: Iterable[dict]) -> List[OfferRecord]:
+    return OfferDecoder().book_offers(offers)
+
+
+def decode_account_offers(offers: Iterable[dict]) -> List[OfferRecord]:
+    return OfferDecoder().account_offers(offers)
+
+
+def _sides(of: dict, record: OfferRecord) -> dict:
+    of["buy_token"] = record.buy.token
+    of["buy_issuer"] = record.buy.issuer
+    of["buy_amount"] = record.buy.amount
+    of["sell_token"] = record.sell.token
+    of["sell_issuer"] = record.sell.issuer
+    of["sell_amount"] = record.sell.amount
+    return of
+
+
+def best_offer_json(record: OfferRecord) -> dict:
+    """sort_best_offer entry"""
+    return _sides({
+        "creator": record.creator,
+        "offer_id": record.offer_id,
+        "flags": record.flags,
+        "sequence": record.sequence,
+        "rate": record.quality,
+        # available amount the offer creator of `sell_token` is currently holding
+        "creator_liquidity": record.owner_funds if record.owner_funds is not None else "",
+    }, record)
+
+
+def book_offer_json(record: OfferRecord) -> dict:
+    """all_offers entry"""
+    liquidity = ""
+    if record.owner_funds is not None:
+        # owner_funds is in drops when TakerGets is xrp
+        if record.sell.is_xrp:
+            with localcontext(DROPS_DECIMAL_CONTEXT):
+                liquidity = f"{float(Decimal(record.owner_funds) * ONE_DROP)} XRP"
+        else:
+            liquidity = f"{record.owner_funds}  {record.sell.token}"
+    return _sides({
+        "creator": record.creator,
+        "offer_id": record.offer_id,
+        "sequence": record.sequence,
+        "rate": record.quality,
+        "flags": record.flags,
+        "creator_liquidity": liquidity,
+    }, record)
+
+
+def account_offer_json(record: OfferRecord) -> dict:
+    """account_offers / pending_offers entry"""
+    # quality is TakerPays/TakerGets as rippled reports it, rate is sell/buy
+    of = _sides({"flags": record.flags, "sequence": record.sequence, "quality": record.quality}, record)
+    of["rate"] = record.rate()
+    return of
+
+
+def offer_info_json(record: OfferRecord, object_type: str = "Offer") -> dict:
+    """ledger_entry offer"""
+    return _sides({
+        "offer_id": record.offer_id,
+        "creator": record.creator,
+        "sequence": record.sequence,
+        "object_type": object_type,
+        "expiry_date": str(ripple_time_to_datetime(record.expiration)) if record.expiration is not None else "",
+        "flags": record.flags,
+    }, record)
@@ -0,0 +1,58 @@
+import base64
+import dataclasses
+import json
+from typing import Any, AsyncIterator, Dict, Tuple
+
+from xrpl.asyncio.clients import AsyncJsonRpcClient
+from xrpl.models import AccountTx
+from xrpl.models.requests.request import Request
+
+"""
+marker based pagination for rippled list calls
+
+`paginate` follows the `marker` of AccountTx, AccountLines, AccountObjects,
+AccountOffers, AccountNFTs... one page at a time, so memory stays flat no
+matter how big the account is. markers travel to the browser as opaque cursors
+"""
+
+
+def encode_cursor(marker: Any) -> str:
+    """opaque url safe cursor for a rippled marker, None when there are no more pages"""
+    if marker is None:
+        return None
+    return base64.urlsafe_b64encode(json.dumps(marker, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Any:
+    if not cursor:
+        return None
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except Exception:
+        raise ValueError("invalid cursor")
+
+
+async def paginate(client: AsyncJsonRpcClient, request: Request) -> AsyncIterator[Tuple[Dict[str, Any], Any]]:
+    """yield (result, next_marker) for every page of `request`\n
+    pages after the first are pinned to the ledger the first page came from"""
+    while True:
+        result = (await client.request(request)).result
+        marker = result.get("marker")
+        yield result, marker
+        if marker is None:
+            return
+        changes = {"marker": marker}
+        # account_tx pages through a ledger range instead
+        if not isinstance(request, AccountTx) and isinstance(result.get("ledger_index"), int):
+            changes["ledger_index"] = result["ledger_index"]
+        request = dataclasses.replace(request, **changes)
+
+
+async def page(pages: AsyncIterator[Tuple[Any, Any]]) -> Dict[str, Any]:
+    """take one parsed page off a `*_pages` generator as {"result", "cursor"}"""
+    try:
+        async for result, marker in pages:
+            return {"result": result, "cursor": encode_cursor(marker)}
+        return {"result": None, "cursor": None}
+    finally:
+        await pages.aclose()
@@ -0,0 +1,303 @@
+import asyncio
+import logging
+import math
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Tuple, Union
+
+from xrpl.models import XRP, IssuedCurrency, RipplePathFind
+
+from .Books import book_spec
+from .Pool import xrpl_pool
+from .Quote import _value
+from .Stream import XrplStream, xrpl_stream
+from .x_constants import (PATH_AMOUNT_DIGITS, PATH_CACHE_SIZE, PATH_FIND_CONCURRENCY,
+                          PATH_MAX_SUBSCRIPTIONS, PATH_PROMOTE_AFTER, PATH_TTL)
+
+"""
+multi-hop swap quotes from rippled's pathfinder
+
+rippled keeps one path_find per websocket, so a live pair gets a connection
+of its own that rippled re-runs every ledger, pushing the new alternatives
+which are kept in memory. a pair turns live after PATH_PROMOTE_AFTER quotes,
+at most PATH_MAX_SUBSCRIPTIONS at once, the least recently quoted goes first.
+cold pairs take a one shot ripple_path_find over the http pool, PATH_FIND_CONCURRENCY
+at a time since pathfinding is expensive for the server, kept for PATH_TTL seconds
+
+a quote is for a swap to self: `amount` of `buy` delivered, `sell` spent. pairs are
+searched for `amount` rounded up to PATH_AMOUNT_DIGITS significant digits (the
+quoted amount), so every amount in a bucket shares one search and one feed, costs
+are scaled back to `amount`
+"""
+
+logger = logging.getLogger(__name__)
+
+PathKey = Tuple[bool, str, str, str, float]
+
+
+def _currency_key(currency: Union[XRP, IssuedCurrency]) -> str:
+    return "XRP" if isinstance(currency, XRP) else f"{currency.currency}.{currency.issuer}"
+
+
+def amount_bucket(amount: float, digits: int = PATH_AMOUNT_DIGITS) -> float:
+    """`amount` rounded up to `digits` significant digits"""
+    step = 10 ** (math.floor(math.log10(amount)) - digits + 1)
+    return float(f"{math.ceil(amount / step - 1e-9) * step:.{digits}g}")
+
+
+def _amount(currency: Union[XRP, IssuedCurrency], value: float) -> Union[str, dict]:
+    if isinstance(currency, XRP):
+        return str(round(value * 1000000))
+    return {"currency": currency.currency, "issuer": currency.issuer, "value": f"{value:.15g}"}
+
+
+def _is(amount: Union[str, dict], currency: Union[XRP, IssuedCurrency]) -> bool:
+    if isinstance(currency, XRP):
+        return isinstance(amount, str)
+    return isinstance(amount, dict) and amount.get("currency") == currency.currency and amount.get("issuer") == currency.issuer
+
+
+def best_paths(alternatives: List[dict], sell: Union[XRP, IssuedCurrency], amount: float) -> List[dict]:
+    """alternatives paid in `sell`, cheapest first"""
+    paths = []
+    for alternative in alternatives:
+        source = alternative.get("source_amount")
+        if source is None or not _is(source, sell):
+            continue
+        cost = _value(source)
+        computed = alternative.get("paths_computed", [])
+        paths.append({
+            "source_amount": source,
+            "cost": cost,
+            "price": cost / amount,
+            "hops": max((len(path) for path in computed), default=0),
+            "paths": computed,
+        })
+    paths.sort(key=lambda path: path["cost"])
+    return paths
+
+
+class PathFeed:
+    """a path_find kept open on a websocket of its own"""
+
+    def __init__(self, stream: XrplStream, request: dict):
+        self.stream = stream
+        self.request = request
+        self.alternatives: List[dict] = []
+        self.full_reply = False
+        self.updated = 0.0
+        self.ready = asyncio.Event()
+        stream.on("connected", self._create)
+        stream.on("path_find", self._update)
+
+    @property
+    def live(self) -> bool:
+        # the first reply can come back empty while rippled is still searching
+        return self.stream.connected and self.updated > 0 and (self.full_reply or bool(self.alternatives))
+
+    async def start(self) -> None:
+        await self.stream.start()
+        await asyncio.wait_for(self.ready.wait(), self.stream.request_timeout)
+
+    async def _create(self, message: dict) -> None:
+        # path_find doesn't survive a reconnect, ask again. what was found before is
+        # forgotten so nothing is served as live until rippled answers the new one
+        self.alternatives = []
+        self.full_reply = False
+        self.updated = 0.0
+        try:
+            self._update(await self.stream.request({"command": "path_find", "subcommand": "create", **self.request}))
+        except Exception as exception:
+            logger.warning("path_find create on %s failed: %r", self.stream.url, exception)
+
+    def _update(self, message: dict) -> None:
+        if "alternatives" not in message:
+            return
+        self.alternatives = message["alternatives"]
+        self.full_reply = message.get("full_reply", True)
+        self.updated = time.monotonic()
+        self.ready.set()
+
+    async def close(self) -> None:
+        if self.stream.connected:
+            try:
+                await self.stream.request({"command": "path_find", "subcommand": "close"})
+            except Exception:
+                pass
+        await self.stream.close()
+
+
+def _dedicated_stream(mainnet: bool) -> XrplStream:
+    """a fresh connection to the network's websocket, not the shared xrpl_stream"""
+    return XrplStream(xrpl_stream(mainnet).url)
+
+
+class PathCache:
+    """best path quotes from live path_find feeds, one shot ripple_path_find for the rest"""
+
+    def __init__(
+        self,
+        ttl: float = PATH_TTL,
+        concurrency: int = PATH_FIND_CONCURRENCY,
+        max_subscriptions: int = PATH_MAX_SUBSCRIPTIONS,
+        promote_after: int = PATH_PROMOTE_AFTER,
+        max_entries: int = PATH_CACHE_SIZE,
+        stream_factory: Callable[[bool], XrplStream] = _dedicated_stream,
+        account: str = None,
+    ):
+        """`account` is who the quotes are for when the caller doesn't say, rippled
+        only finds paths the account could use so it should hold the usual currencies"""
+        self.account = account
+        self.ttl = ttl
+        self.concurrency = concurrency
+        self.max_subscriptions = max_subscriptions
+        self.promote_after = promote_after
+        self.max_entries = max_entries
+        self.stream_factory = stream_factory
+        self._feeds: "OrderedDict[PathKey, PathFeed]" = OrderedDict()
+        self._results: "OrderedDict[PathKey, Tuple[float, List[dict]]]" = OrderedDict()
+        self._counts: "OrderedDict[PathKey, int]" = OrderedDict()
+        self._semaphores: Dict[asyncio.AbstractEventLoop, asyncio.Semaphore] = {}
+        self._starting = set()
+        self.live_hits = 0
+        self.cached_hits = 0
+        self.path_finds = 0
+
+    def configure(self, **options) -> None:
+        for key, value in options.items():
+            if not hasattr(self, key) or key.startswith("_"):
+                raise ValueError(f"unknown path cache option {key}")
+            setattr(self, key, value)
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            self._semaphores.clear()
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.concurrency)
+        return semaphore
+
+    async def quote(
+        self, buy: Union[XRP, IssuedCurrency], sell: Union[XRP, IssuedCurrency],
+        amount: float, account: str = None, mainnet: bool = False,
+    ) -> dict:
+        """paths to receive `amount` of `buy` paying `sell`, cheapest first"""
+        if amount <= 0:
+            raise ValueError("amount must be positive")
+        account = account or self.account
+        if not account:
+            raise ValueError("path quotes need an account")
+        quoted = amount_bucket(amount)
+        key = (mainnet, account, _currency_key(buy), _currency_key(sell), quoted)
+        feed = self._feeds.get(key)
+        if feed is not None and feed.live:
+            self._feeds.move_to_end(key)
+            self.live_hits += 1
+            return self._result(buy, sell, amount, quoted, feed.alternatives, "path_find", feed.full_reply)
+        cached = self._results.get(key)
+        if cached is not None and time.monotonic() - cached[0] < self.ttl:
+            self.cached_hits += 1
+            source, alternatives = "cache", cached[1]
+        else:
+            source, alternatives = "ripple_path_find", await self._path_find(account, buy, sell, quoted, mainnet)
+            self._results.pop(key, None)
+            self._results[key] = (time.monotonic(), alternatives)
+            while len(self._results) > self.max_entries:
+                self._results.popitem(last=False)
+        if self._popular(key):
+            # the quote doesn't wait for the subscription, the next ones are served from it
+            task = asyncio.ensure_future(self.subscribe(account, buy, sell, quoted, mainnet))
+            self._starting.add(task)
+            task.add_done_callback(self._started)
+        return self._result(buy, sell, amount, quoted, alternatives, source, True)
+
+    def _started(self, task: asyncio.Task) -> None:
+        self._starting.discard(task)
+        if not task.cancelled():
+            # a feed that didn't start was dropped, the pair is promoted again later
+            task.exception()
+
+    def _popular(self, key: PathKey) -> bool:
+        if key in self._feeds or not self.max_subscriptions:
+            return False
+        count = self._counts.pop(key, 0) + 1
+        self._counts[key] = count
+        while len(self._counts) > self.max_entries:
+            self._counts.popitem(last=False)
+        return count >= self.promote_after
+
+    async def _path_find(self, account: str, buy, sell, amount: float, mainnet: bool) -> List[dict]:
+        client = xrpl_pool.async_client(xrpl_pool.network_url(mainnet))
+        request = RipplePathFind(
+            source_account=account, destination_account=account,
+            destination_amount=_amount(buy, amount), source_currencies=[sell], ledger_index="validated",
+        )
+        async with self._semaphore():
+            self.path_finds += 1
+            response = await client.request(request)
+        if not response.is_successful():
+            raise ValueError(response.result.get("error_message") or response.result.get("error"))
+        return response.result.get("alternatives", [])
+
+    async def subscribe(self, account: str, buy, sell, amount: float, mainnet: bool = False) -> PathFeed:
+        """keep a path_find open for the pair, dropping the least recently quoted one when full\n
+        raises when rippled doesn't answer the path_find, the feed isn't kept then"""
+        amount = amount_bucket(amount)
+        key = (mainnet, account, _currency_key(buy), _currency_key(sell), amount)
+        feed = self._feeds.get(key)
+        if feed is not None:
+            return feed
+        request = {
+            "source_account": account, "destination_account": account,
+            "destination_amount": _amount(buy, amount), "source_currencies": [book_spec(sell)],
+        }
+        feed = self._feeds[key] = PathFeed(self.stream_factory(mainnet), request)
+        self._counts.pop(key, None)
+        while len(self._feeds) > self.max_subscriptions:
+            _, oldest = self._feeds.popitem(last=False)
+            await oldest.close()
+        try:
+            await feed.start()
+        except BaseException:
+            if self._feeds.get(key) is feed:
+                del self._feeds[key]
+            await feed.close()
+            raise
+        return feed
+
+    def _result(self, buy, sell, amount: float, quoted: float, alternatives: List[dict], source: str, full_reply: bool) -> dict:
+        """`alternatives` were found for `quoted`, costs are scaled to `amount`"""
+        paths = best_paths(alternatives, sell, quoted)
+        if quoted != amount:
+            for path in paths:
+                path["cost"] = path["price"] * amount
+        best = paths[0] if paths else None
+        return {
+            "destination_amount": _amount(buy, amount),
+            "quoted_amount": _amount(buy, quoted),
+            "cost": best["cost"] if best else None,
+            "price": best["price"] if best else None,
+            "best": best,
+            "alternatives": paths,
+            "source": source,
+            "full_reply": full_reply,
+        }
+
+    async def close(self) -> None:
+        for task in list(self._starting):
+            task.cancel()
+        while self._feeds:
+            _, feed = self._feeds.popitem()
+            await feed.close()
+
+    def stats(self) -> dict:
+        return {
+            "live": sum(1 for feed in self._feeds.values() if feed.live),
+            "subscriptions": len(self._feeds),
+            "live_hits": self.live_hits,
+            "cached_hits": self.cached_hits,
+            "path_finds": self.path_finds,
+        }
+
+
+path_cache = PathCache()
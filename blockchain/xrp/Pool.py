@@ -0,0 +1,234 @@
+import asyncio
+import copy
+import threading
+from json import JSONDecodeError
+from typing import Dict, Optional, Set, Tuple
+
+import httpx
+from xrpl.asyncio.clients import AsyncJsonRpcClient
+from xrpl.asyncio.clients.exceptions import XRPLRequestFailureException
+from xrpl.asyncio.clients.utils import json_to_response, request_to_json_rpc
+from xrpl.clients import JsonRpcClient
+from xrpl.models.requests.request import Request
+from xrpl.models.response import Response
+
+from .Cache import ResponseCache
+from .Coalesce import AsyncSingleflight, Singleflight, request_key
+from .x_constants import (POOL_KEEPALIVE_EXPIRY, POOL_MAX_CONNECTIONS,
+                          POOL_MAX_KEEPALIVE_CONNECTIONS, POOL_TIMEOUT, XURLS_)
+
+"""
+process wide pool of keep-alive http clients for the xrpl json rpc
+
+xrpl-py opens a brand new httpx client (and tls handshake) for every request,
+every x* wrapper borrows its clients from `xrpl_pool` instead
+"""
+
+
+def retire_async_client(owner: asyncio.AbstractEventLoop, http: httpx.AsyncClient, closing: Set[asyncio.Future]) -> None:
+    """close an async client that was replaced, on its own loop while that one still runs,
+    closes started on the running loop are kept in `closing` until they are done"""
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if owner is not running and owner.is_running():
+        asyncio.run_coroutine_threadsafe(http.aclose(), owner)
+    elif running is not None:
+        task = running.create_task(http.aclose())
+        closing.add(task)
+        task.add_done_callback(closing.discard)
+    else:
+        asyncio.run(http.aclose())
+
+
+def _to_json(response: httpx.Response) -> dict:
+    """decode a raw json rpc http response"""
+    try:
+        return response.json()
+    except JSONDecodeError:
+        raise XRPLRequestFailureException(
+            {"error": response.status_code, "error_message": response.text}
+        )
+
+
+class PooledJsonRpcClient(JsonRpcClient):
+    """sync json rpc client that reuses the pool's keep-alive connections"""
+
+    def __init__(self, url: str, pool: "ClientPool"):
+        super().__init__(url)
+        self.pool = pool
+
+    def _fetch(self, request: Request) -> dict:
+        response = self.pool.http_client(self.url).post(
+            self.url, json=request_to_json_rpc(request)
+        )
+        return _to_json(response)
+
+    def request(self, request: Request) -> Response:
+        key = request_key(self.url, request) if self.pool.coalesce else None
+        if key is None:
+            return json_to_response(self._fetch(request))
+        # json_to_response edits the dict it is given, every caller gets its own copy
+        return json_to_response(copy.deepcopy(self.pool.flights.do(key, lambda: self._fetch(request))))
+
+    async def request_impl(self, request: Request) -> Response:
+        # xrpl's sync helpers (get_fee, does_account_exist, autofill) run this inside asyncio.run
+        return self.request(request)
+
+
+class PooledAsyncJsonRpcClient(AsyncJsonRpcClient):
+    """async json rpc client that reuses the pool's keep-alive connections"""
+
+    def __init__(self, url: str, pool: "ClientPool"):
+        super().__init__(url)
+        self.pool = pool
+
+    async def _fetch(self, request: Request, cache_key: str = None) -> dict:
+        response = await self.pool.async_http_client(self.url).post(
+            self.url, json=request_to_json_rpc(request)
+        )
+        raw = _to_json(response)
+        if cache_key is not None and raw.get("result", {}).get("status") == "success":
+            await self.pool.cache.set(cache_key, raw)
+        return raw
+
+    async def request_impl(self, request: Request) -> Response:
+        cache = self.pool.cache
+        cache_key = cache.key(self.url, request) if cache is not None else None
+        if cache_key is not None:
+            cached = await cache.get(cache_key)
+            if cached is not None:
+                return json_to_response(cached)
+        key = request_key(self.url, request) if self.pool.coalesce else None
+        if key is None:
+            return json_to_response(await self._fetch(request, cache_key))
+        raw = await self.pool.async_flights.do(key, lambda: self._fetch(request, cache_key))
+        return json_to_response(copy.deepcopy(raw))
+
+
+class ClientPool:
+    """network keyed pool of keep-alive http clients\n
+    `transport` and `async_transport` are only meant for tests and benchmarks,
+    `cache` is an optional Cache.ResponseCache for the async clients,
+    `coalesce` shares identical in flight requests (see Coalesce)"""
+
+    def __init__(
+        self,
+        max_connections: int = POOL_MAX_CONNECTIONS,
+        max_keepalive_connections: int = POOL_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry: float = POOL_KEEPALIVE_EXPIRY,
+        timeout: float = POOL_TIMEOUT,
+        transport: httpx.BaseTransport = None,
+        async_transport: httpx.AsyncBaseTransport = None,
+        cache: "ResponseCache" = None,
+        coalesce: bool = True,
+    ):
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.timeout = timeout
+        self.transport = transport
+        self.async_transport = async_transport
+        self.cache = cache
+        self.coalesce = coalesce
+        self.flights = Singleflight()
+        self.async_flights = AsyncSingleflight()
+        self._lock = threading.Lock()
+        self._http: Dict[str, httpx.Client] = {}
+        # an httpx.AsyncClient is bound to the loop it was first used on
+        self._async_http: Dict[str, Tuple[asyncio.AbstractEventLoop, httpx.AsyncClient]] = {}
+        # closes of replaced async clients still running
+        self._closing: Set[asyncio.Future] = set()
+        self._clients: Dict[str, PooledJsonRpcClient] = {}
+        self._async_clients: Dict[str, PooledAsyncJsonRpcClient] = {}
+
+    def _limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+
+    def configure(self, **options) -> None:
+        """change pool limits, open http clients are dropped and rebuilt lazily"""
+        for key, value in options.items():
+            if not hasattr(self, key) or key.startswith("_"):
+                raise ValueError(f"unknown pool option {key}")
+            setattr(self, key, value)
+        self.close()
+
+    def http_client(self, url: str) -> httpx.Client:
+        """return the shared sync http client for a network url"""
+        http = self._http.get(url)
+        if http is None:
+            with self._lock:
+                http = self._http.get(url)
+                if http is None:
+                    http = httpx.Client(
+                        timeout=self.timeout, limits=self._limits(), transport=self.transport
+                    )
+                    self._http[url] = http
+        return http
+
+    def async_http_client(self, url: str) -> httpx.AsyncClient:
+        """return the shared async http client for a network url on the running loop"""
+        loop = asyncio.get_running_loop()
+        entry = self._async_http.get(url)
+        if entry is None or entry[0] is not loop:
+            http = httpx.AsyncClient(
+                timeout=self.timeout, limits=self._limits(), transport=self.async_transport
+            )
+            self._async_http[url] = (loop, http)
+            if entry is not None:
+                retire_async_client(*entry, self._closing)
+            return http
+        return entry[1]
+
+    def client(self, url: str) -> PooledJsonRpcClient:
+        """return the sync json rpc client for a network url"""
+        client = self._clients.get(url)
+        if client is None:
+            client = self._clients.setdefault(url, PooledJsonRpcClient(url, self))
+        return client
+
+    def async_client(self, url: str) -> PooledAsyncJsonRpcClient:
+        """return the async json rpc client for a network url"""
+        client = self._async_clients.get(url)
+        if client is None:
+            client = self._async_clients.setdefault(url, PooledAsyncJsonRpcClient(url, self))
+        return client
+
+    def stats(self) -> dict:
+        """coalescing and cache hit rates"""
+        return {
+            "coalesce": {"sync": self.flights.stats(), "async": self.async_flights.stats()},
+            "cache": self.cache.stats() if self.cache is not None else None,
+        }
+
+    def network_url(self, mainnet: bool = True) -> str:
+        return XURLS_["MAINNET_URL"] if mainnet else XURLS_["TESTNET_URL"]
+
+    def close(self) -> None:
+        """close every client, async ones in the background (see aclose)"""
+        with self._lock:
+            http, self._http = self._http, {}
+            async_http, self._async_http = self._async_http, {}
+        for client in http.values():
+            client.close()
+        for owner, client in async_http.values():
+            retire_async_client(owner, client, self._closing)
+
+    async def aclose(self) -> None:
+        """close every client, waiting for those owned by the running loop"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            async_http = self._async_http
+            self._async_http = {k: v for k, v in async_http.items() if v[0] is not loop}
+        self.close()
+        for owner, client in async_http.values():
+            if owner is loop:
+                await client.aclose()
+
+
+xrpl_pool = ClientPool()
@@ -0,0 +1,181 @@
+import asyncio
+from bisect import bisect_left
+from typing import AsyncIterator, Dict, Iterable, List, Union
+
+from xrpl.models import XRP, AccountInfo, BookOffers, IssuedCurrency
+
+from .Books import OrderBook, book_manager
+from .Pool import xrpl_pool
+
+"""
+swap quotes off the order book
+
+a QuoteBook is built once per book version (a ledger), it keeps what every
+offer can really deliver, after owner_funds / taker_gets_funded and the
+issuer's transfer rate, as prefix sums. a quote is then a binary search, so it
+can be recomputed on every keystroke
+
+amounts are in xrp (not drops) or token units, prices are `sell` paid per
+`buy` received. the book is BookOffers(taker_gets=buy, taker_pays=sell)
+"""
+
+TRANSFER_RATE_BASE = 1000000000
+
+
+def _value(amount: Union[str, dict]) -> float:
+    """xrp for drops, value for tokens"""
+    if isinstance(amount, str):
+        return int(amount) / 1000000
+    return float(amount["value"])
+
+
+def _funds(offer: dict, funds: str) -> float:
+    """owner_funds is in drops when TakerGets is xrp"""
+    if isinstance(offer["TakerGets"], str):
+        return int(funds) / 1000000
+    return float(funds)
+
+
+def transfer_rate(result: dict) -> float:
+    """issuer transfer rate of an AccountInfo result as a multiplier, 1.0 when unset"""
+    rate = result.get("account_data", {}).get("TransferRate", 0)
+    return rate / TRANSFER_RATE_BASE if rate else 1.0
+
+
+async def async_transfer_rate(currency: Union[XRP, IssuedCurrency], mainnet: bool = False) -> float:
+    if isinstance(currency, XRP):
+        return 1.0
+    client = xrpl_pool.async_client(xrpl_pool.network_url(mainnet))
+    return transfer_rate((await client.request(AccountInfo(account=currency.issuer, ledger_index="validated"))).result)
+
+
+class QuoteBook:
+    """deliverable liquidity of one book, best offer first"""
+
+    __slots__ = ("gets", "pays", "prices", "cum_gets", "cum_pays", "buy_rate", "sell_rate", "ledger_index")
+
+    def __init__(self, offers: Iterable[dict], buy_rate: float = 1.0, sell_rate: float = 1.0, ledger_index: int = 0):
+        """`offers` best first (OrderBook.depth()), `buy_rate` is the transfer rate of what
+        the offers deliver, `sell_rate` the one of what the taker pays"""
+        self.buy_rate = buy_rate
+        self.sell_rate = sell_rate
+        self.ledger_index = ledger_index
+        self.gets: List[float] = []
+        self.pays: List[float] = []
+        self.prices: List[float] = []
+        self.cum_gets: List[float] = []
+        self.cum_pays: List[float] = []
+        remaining: Dict[str, float] = {}
+        total_gets = 0.0
+        total_pays = 0.0
+        for offer in offers:
+            gets = _value(offer["TakerGets"])
+            pays = _value(offer["TakerPays"])
+            if gets <= 0:
+                continue
+            price = pays / gets
+            if "taker_gets_funded" in offer:
+                gets = min(gets, _value(offer["taker_gets_funded"]))
+            owner = offer.get("Account")
+            # owner_funds is only on an owner's best offer, their later offers share what is left
+            if "owner_funds" in offer:
+                remaining[owner] = _funds(offer, offer["owner_funds"])
+            if owner in remaining:
+                # an owner selling someone else's token pays the transfer fee on top
+                rate = buy_rate if isinstance(offer["TakerGets"], dict) and offer["TakerGets"]["issuer"] != owner else 1.0
+                gets = min(gets, remaining[owner] / rate)
+                remaining[owner] -= gets * rate
+            if gets <= 0:
+                continue
+            pays = gets * price
+            total_gets += gets
+            total_pays += pays
+            self.gets.append(gets)
+            self.pays.append(pays)
+            self.prices.append(price)
+            self.cum_gets.append(total_gets)
+            self.cum_pays.append(total_pays)
+
+    @classmethod
+    def from_book(cls, book: OrderBook, buy_rate: float = 1.0, sell_rate: float = 1.0, ledger_index: int = 0) -> "QuoteBook":
+        return cls(book.depth(), buy_rate, sell_rate, ledger_index)
+
+    def __len__(self) -> int:
+        return len(self.gets)
+
+    @property
+    def depth(self) -> float:
+        """everything the book can deliver"""
+        return self.cum_gets[-1] if self.gets else 0.0
+
+    def quote(self, amount: float, side: str = "buy") -> dict:
+        """walk the book for `amount` of `buy` to receive (side "buy") or
+        `amount` of `sell` to spend, transfer fee included (side "sell")"""
+        if side not in ("buy", "sell"):
+            raise ValueError("side must be buy or sell")
+        if amount <= 0:
+            raise ValueError("amount must be positive")
+        if not self.gets:
+            return self._result(amount, side, 0.0, 0.0, 0, None)
+        if side == "buy":
+            cumulative, partial = self.cum_gets, amount
+        else:
+            cumulative, partial = self.cum_pays, amount / self.sell_rate
+        index = bisect_left(cumulative, partial)
+        if index >= len(cumulative):
+            return self._result(amount, side, self.cum_gets[-1], self.cum_pays[-1], len(cumulative), self.prices[-1])
+        before_gets = self.cum_gets[index - 1] if index else 0.0
+        before_pays = self.cum_pays[index - 1] if index else 0.0
+        price = self.prices[index]
+        if side == "buy":
+            filled = amount
+            cost = before_pays + (amount - before_gets) * price
+        else:
+            cost = partial
+            filled = before_gets + (partial - before_pays) / price
+        return self._result(amount, side, filled, cost, index + 1, price)
+
+    def _result(self, amount: float, side: str, filled: float, cost: float, consumed: int, worst: float) -> dict:
+        best = self.prices[0] if self.prices else None
+        average = cost / filled if filled else None
+        done = filled if side == "buy" else cost * self.sell_rate
+        return {
+            "side": side,
+            "requested": amount,
+            "filled": filled,
+            "cost": cost * self.sell_rate,
+            "transfer_fee": cost * (self.sell_rate - 1),
+            "best_price": best,
+            "average_price": average,
+            "worst_price": worst,
+            "slippage": average / best - 1 if average is not None and best else None,
+            "fully_filled": done >= amount * (1 - 1e-12),
+            "offers_consumed": consumed,
+            "depth": self.depth,
+            "ledger_index": self.ledger_index,
+        }
+
+
+async def quote_book(buy: Union[XRP, IssuedCurrency], sell: Union[XRP, IssuedCurrency], mainnet: bool = False) -> QuoteBook:
+    """QuoteBook for swapping `sell` into `buy`, from the live book when it is streamed"""
+    client = xrpl_pool.async_client(xrpl_pool.network_url(mainnet))
+
+    async def book():
+        feed = book_manager.book(buy, sell, mainnet)
+        if feed is not None:
+            return feed.book, feed.ledger_index
+        result = (await client.request(BookOffers(taker_gets=buy, taker_pays=sell, ledger_index="validated"))).result
+        return OrderBook(result.get("offers", [])), result.get("ledger_index", 0)
+
+    (offers, ledger_index), buy_rate, sell_rate = await asyncio.gather(
+        book(), async_transfer_rate(buy, mainnet), async_transfer_rate(sell, mainnet)
+    )
+    return QuoteBook.from_book(offers, buy_rate, sell_rate, ledger_index)
+
+
+async def stream_quote_book(buy: Union[XRP, IssuedCurrency], sell: Union[XRP, IssuedCurrency], mainnet: bool = False) -> AsyncIterator[QuoteBook]:
+    """a fresh QuoteBook every time the book changes on the ledger"""
+    buy_rate, sell_rate = await asyncio.gather(async_transfer_rate(buy, mainnet), async_transfer_rate(sell, mainnet))
+    async with book_manager.watch(buy, sell, mainnet) as subscription:
+        async for feed in subscription:
+            yield QuoteBook.from_book(feed.book, buy_rate, sell_rate, feed.ledger_index)
@@ -0,0 +1,265 @@
+import asyncio
+import math
+import time
+from typing import Dict, Optional, Tuple, Union
+
+from xrpl.models import XRP, AMMInfo, IssuedCurrency
+
+from .Books import book_manager
+from .Pool import xrpl_pool
+from .Quote import QuoteBook, _value, quote_book
+from .x_constants import ROUTE_CACHE_SIZE, ROUTE_TTL
+
+"""
+best execution across an amm pool and the order book
+
+rippled's payment engine already splits an OfferCreate between the pool of a
+pair and its offers, so one transaction is all there is to submit. this works
+out the split it will take ahead of time: the book is walked best offer first
+and before each offer the pool is drained until its marginal price reaches that
+offer's price, whatever is left after the book comes from the pool. with a
+constant product pool that point has a closed form, so a route costs a walk over
+the offers it consumes and nothing is fetched per quote
+
+amounts and prices are like in Quote, `sell` paid per `buy` received
+"""
+
+AMM_FEE_BASE = 100000
+
+
+class AmmPool:
+    """one amm instance seen from the taker, `reserve_in` is the asset paid in (sell),
+    `reserve_out` the one taken out (buy), `fee` is 0.003 for 0.3%"""
+
+    __slots__ = ("account", "reserve_in", "reserve_out", "fee", "trading_fee")
+
+    def __init__(self, reserve_in: float, reserve_out: float, trading_fee: int = 0, account: str = None):
+        self.account = account
+        self.reserve_in = reserve_in
+        self.reserve_out = reserve_out
+        self.trading_fee = trading_fee
+        self.fee = trading_fee / AMM_FEE_BASE
+
+    @classmethod
+    def from_amm_info(cls, result: dict, buy: Union[XRP, IssuedCurrency]) -> Optional["AmmPool"]:
+        """the pool of an AMMInfo result, None when the pair has no amm"""
+        amm = result.get("amm")
+        if not amm:
+            return None
+        first, second = amm["amount"], amm["amount2"]
+        if _is(first, buy):
+            reserve_out, reserve_in = first, second
+        else:
+            reserve_out, reserve_in = second, first
+        reserve_in, reserve_out = _value(reserve_in), _value(reserve_out)
+        if reserve_in <= 0 or reserve_out <= 0:
+            return None
+        return cls(reserve_in, reserve_out, amm.get("trading_fee", 0), amm.get("account"))
+
+    @property
+    def spot_price(self) -> float:
+        """price of the first unit out, fee included"""
+        return self.reserve_in / (self.reserve_out * (1 - self.fee))
+
+    def price(self, out: float) -> float:
+        """marginal price once `out` has been taken"""
+        left = self.reserve_out - out
+        return self.reserve_in * self.reserve_out / (left * left * (1 - self.fee))
+
+    def cost(self, out: float) -> float:
+        """what has to be paid in, fee included, to take `out`"""
+        return (self.reserve_in * self.reserve_out / (self.reserve_out - out) - self.reserve_in) / (1 - self.fee)
+
+    def output(self, paid: float) -> float:
+        """what `paid` takes out"""
+        effective = paid * (1 - self.fee)
+        return self.reserve_out * effective / (self.reserve_in + effective)
+
+    def output_at(self, price: float) -> float:
+        """how much can be taken out before the marginal price reaches `price`"""
+        if price <= self.spot_price:
+            return 0.0
+        return self.reserve_out - math.sqrt(self.reserve_in * self.reserve_out / (price * (1 - self.fee)))
+
+    def to_json(self) -> dict:
+        return {
+            "account": self.account,
+            "reserve_in": self.reserve_in,
+            "reserve_out": self.reserve_out,
+            "trading_fee": self.fee * 100,
+            "spot_price": self.spot_price,
+        }
+
+
+def _is(amount: Union[str, dict], currency: Union[XRP, IssuedCurrency]) -> bool:
+    if isinstance(currency, XRP):
+        return isinstance(amount, str)
+    return isinstance(amount, dict) and amount["currency"] == currency.currency and amount["issuer"] == currency.issuer
+
+
+class SwapRouter:
+    """a QuoteBook and the pair's AmmPool (if any) as of one ledger"""
+
+    __slots__ = ("book", "pool", "ledger_index", "created")
+
+    def __init__(self, book: QuoteBook, pool: AmmPool = None, ledger_index: int = 0):
+        self.book = book
+        self.pool = pool
+        self.ledger_index = ledger_index or book.ledger_index
+        self.created = time.monotonic()
+
+    def route(self, amount: float, side: str = "buy") -> dict:
+        """split `amount` of `buy` to receive (side "buy") or of `sell` to spend,
+        transfer fee included (side "sell"), between the pool and the book"""
+        if side not in ("buy", "sell"):
+            raise ValueError("side must be buy or sell")
+        if amount <= 0:
+            raise ValueError("amount must be positive")
+        book, pool = self.book, self.pool
+        buying = side == "buy"
+        remaining = amount if buying else amount / book.sell_rate
+        amm_in = amm_out = 0.0
+        book_in = book_out = 0.0
+        consumed = 0
+        worst = None
+        for index, price in enumerate(book.prices):
+            if remaining <= 0:
+                break
+            if pool is not None:
+                target = pool.output_at(price)
+                if target > amm_out:
+                    if buying:
+                        take = min(target - amm_out, remaining)
+                        amm_out += take
+                        amm_in = pool.cost(amm_out)
+                    else:
+                        take = min(pool.cost(target) - amm_in, remaining)
+                        amm_in += take
+                        amm_out = pool.output(amm_in)
+                    remaining -= take
+                    worst = pool.price(amm_out)
+                    if remaining <= 0:
+                        break
+            if buying:
+                take = min(book.gets[index], remaining)
+                book_out += take
+                book_in += take * price
+            else:
+                take = min(book.pays[index], remaining)
+                book_in += take
+                book_out += take / price
+            remaining -= take
+            consumed += 1
+            worst = price
+        if remaining > 0 and pool is not None:
+            if buying:
+                # the pool can't be emptied, what it can't give stays unfilled
+                take = min(remaining, (pool.reserve_out - amm_out) * (1 - 1e-9))
+                amm_out += take
+                amm_in = pool.cost(amm_out)
+            else:
+                take = remaining
+                amm_in += take
+                amm_out = pool.output(amm_in)
+            remaining -= take
+            worst = pool.price(amm_out)
+        return self._result(amount, side, book_in, book_out, amm_in, amm_out, consumed, worst)
+
+    def _result(self, amount: float, side: str, book_in: float, book_out: float, amm_in: float, amm_out: float, consumed: int, worst: float) -> dict:
+        book, pool = self.book, self.pool
+        sell_rate = book.sell_rate
+        filled = book_out + amm_out
+        cost = book_in + amm_in
+        bests = [price for price in (book.prices[0] if book.prices else None, pool.spot_price if pool else None) if price]
+        best = min(bests) if bests else None
+        average = cost / filled if filled else None
+        done = filled if side == "buy" else cost * sell_rate
+        return {
+            "side": side,
+            "requested": amount,
+            "filled": filled,
+            "cost": cost * sell_rate,
+            "transfer_fee": cost * (sell_rate - 1),
+            "transfer_rate": sell_rate,
+            "best_price": best,
+            "average_price": average,
+            "worst_price": worst,
+            "slippage": average / best - 1 if average is not None and best else None,
+            "fully_filled": done >= amount * (1 - 1e-12),
+            "route": {
+                "order_book": {"in": book_in * sell_rate, "out": book_out, "offers_consumed": consumed},
+                "amm": {"in": amm_in * sell_rate, "out": amm_out, "trading_fee": amm_in * pool.fee if pool else 0.0},
+                "amm_share": amm_out / filled if filled else 0.0,
+            },
+            "order_book_only": book.quote(amount, side),
+            "amm": pool.to_json() if pool else None,
+            "ledger_index": self.ledger_index,
+        }
+
+
+async def amm_pool(buy: Union[XRP, IssuedCurrency], sell: Union[XRP, IssuedCurrency], mainnet: bool = False) -> Optional[AmmPool]:
+    """the pair's amm, None when there is none"""
+    client = xrpl_pool.async_client(xrpl_pool.network_url(mainnet))
+    response = await client.request(AMMInfo(asset=buy, asset2=sell))
+    if not response.is_successful():
+        # actNotFound, the pair has no amm
+        return None
+    return AmmPool.from_amm_info(response.result, buy)
+
+
+class RouterCache:
+    """SwapRouters by pair, rebuilt after `ttl` seconds or when the streamed book moves to a new ledger"""
+
+    def __init__(self, ttl: float = ROUTE_TTL, max_entries: int = ROUTE_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._routers: Dict[Tuple, SwapRouter] = {}
+        self._building: Dict[Tuple, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _fresh(self, router: SwapRouter, buy, sell, mainnet: bool) -> bool:
+        if time.monotonic() - router.created > self.ttl:
+            return False
+        feed = book_manager.book(buy, sell, mainnet)
+        return feed is None or not feed.ledger_index or feed.ledger_index == router.book.ledger_index
+
+    async def get(self, buy: Union[XRP, IssuedCurrency], sell: Union[XRP, IssuedCurrency], mainnet: bool = False) -> SwapRouter:
+        key = (mainnet, buy, sell)
+        router = self._routers.get(key)
+        if router is not None and self._fresh(router, buy, sell, mainnet):
+            self.hits += 1
+            return router
+        self.misses += 1
+        # concurrent misses on a pair share one rebuild
+        building = self._building.get(key)
+        if building is not None:
+            return await asyncio.shield(building)
+        building = self._building[key] = asyncio.ensure_future(self._build(buy, sell, mainnet))
+        try:
+            router = await asyncio.shield(building)
+        finally:
+            self._building.pop(key, None)
+        self._routers.pop(key, None)
+        self._routers[key] = router
+        while len(self._routers) > self.max_entries:
+            del self._routers[next(iter(self._routers))]
+        return router
+
+    async def _build(self, buy, sell, mainnet: bool) -> SwapRouter:
+        book, pool = await asyncio.gather(quote_book(buy, sell, mainnet), amm_pool(buy, sell, mainnet))
+        return SwapRouter(book, pool)
+
+    def clear(self):
+        self._routers.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {"pairs": len(self._routers), "hits": self.hits, "misses": self.misses, "hit_rate": self.hits / total if total else 0.0}
+
+
+router_cache = RouterCache()
+
+
+async def route_swap(buy: Union[XRP, IssuedCurrency], sell: Union[XRP, IssuedCurrency], amount: float, side: str = "buy", mainnet: bool = False) -> dict:
+    return (await router_cache.get(buy, sell, mainnet)).route(amount, side)
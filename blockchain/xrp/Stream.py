@@ -0,0 +1,175 @@
+import asyncio
+import inspect
+import json
+import logging
+from typing import Any, Callable, Dict, List, Optional, Set
+
+import websockets
+from xrpl.asyncio.clients.exceptions import XRPLRequestFailureException
+
+from .x_constants import (STREAM_MAX_RECONNECT_DELAY, STREAM_RECONNECT_DELAY,
+                          STREAM_REQUEST_TIMEOUT, XURLS_)
+
+"""
+one long lived rippled websocket per network
+
+consumers (order books, account hub, tx tracker...) register listeners for a
+stream message type ("transaction", "ledgerClosed", ...) and for "connected",
+which fires after every (re)connect so they can resubscribe
+"""
+
+logger = logging.getLogger(__name__)
+
+
+class XrplStream:
+    """persistent rippled websocket with request/response matching and reconnects"""
+
+    def __init__(
+        self,
+        url: str,
+        reconnect_delay: float = STREAM_RECONNECT_DELAY,
+        max_reconnect_delay: float = STREAM_MAX_RECONNECT_DELAY,
+        request_timeout: float = STREAM_REQUEST_TIMEOUT,
+    ):
+        self.url = url
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.request_timeout = request_timeout
+        self._listeners: Dict[str, List[Callable]] = {}
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._next_id = 0
+        self._ws = None
+        self._task: Optional[asyncio.Task] = None
+        # running coroutine listeners, the loop only keeps weak references to tasks
+        self._listener_tasks: Set[asyncio.Task] = set()
+        self._connected: Optional[asyncio.Event] = None
+        self._closed = False
+
+    def on(self, message_type: str, callback: Callable) -> None:
+        """call `callback(message)` for every message of `message_type`\n
+        coroutine callbacks are scheduled as tasks so a slow consumer can't stall the reader"""
+        self._listeners.setdefault(message_type, []).append(callback)
+
+    def off(self, message_type: str, callback: Callable) -> None:
+        listeners = self._listeners.get(message_type, [])
+        if callback in listeners:
+            listeners.remove(callback)
+
+    @property
+    def connected(self) -> bool:
+        return self._connected is not None and self._connected.is_set()
+
+    async def start(self) -> None:
+        """start the reader task on the running loop, safe to call repeatedly"""
+        if self._task is None or self._task.done():
+            self._closed = False
+            self._connected = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def request(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """send a command and wait for its result"""
+        await self.start()
+        await asyncio.wait_for(self._connected.wait(), self.request_timeout)
+        self._next_id += 1
+        request_id = self._next_id
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        try:
+            await self._ws.send(json.dumps({**payload, "id": request_id}))
+            message = await asyncio.wait_for(future, self.request_timeout)
+        finally:
+            self._pending.pop(request_id, None)
+        if message.get("status") == "error":
+            raise XRPLRequestFailureException(message)
+        return message.get("result", {})
+
+    async def subscribe(self, **streams) -> Dict[str, Any]:
+        return await self.request({"command": "subscribe", **streams})
+
+    async def unsubscribe(self, **streams) -> Dict[str, Any]:
+        return await self.request({"command": "unsubscribe", **streams})
+
+    async def close(self) -> None:
+        self._closed = True
+        if self._ws is not None:
+            await self._ws.close()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+        self._task = None
+        for task in list(self._listener_tasks):
+            task.cancel()
+
+    async def _run(self) -> None:
+        delay = self.reconnect_delay
+        while not self._closed:
+            try:
+                async with websockets.connect(self.url, max_size=None) as ws:
+                    self._ws = ws
+                    self._connected.set()
+                    delay = self.reconnect_delay
+                    self._dispatch({"type": "connected"})
+                    async for raw in ws:
+                        self._receive(json.loads(raw))
+            except asyncio.CancelledError:
+                raise
+            except Exception as exception:
+                if not self._closed:
+                    logger.warning("lost %s, reconnecting in %ss: %r", self.url, delay, exception)
+            finally:
+                self._connected.clear()
+                self._ws = None
+                self._fail_pending()
+            if not self._closed:
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.max_reconnect_delay)
+
+    def _receive(self, message: Dict[str, Any]) -> None:
+        future = self._pending.get(message.get("id"))
+        if future is not None and message.get("type") == "response":
+            if not future.done():
+                future.set_result(message)
+            return
+        self._dispatch(message)
+
+    def _dispatch(self, message: Dict[str, Any]) -> None:
+        """every listener gets the message, one that raises is logged and doesn't stop the rest"""
+        for callback in list(self._listeners.get(message.get("type"), [])):
+            try:
+                result = callback(message)
+            except Exception:
+                logger.exception("%s listener %r failed on %s", message.get("type"), callback, self.url)
+                continue
+            if inspect.isawaitable(result):
+                task = asyncio.ensure_future(result)
+                self._listener_tasks.add(task)
+                task.add_done_callback(self._listener_done)
+
+    def _listener_done(self, task: asyncio.Task) -> None:
+        self._listener_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("listener failed on %s", self.url, exc_info=task.exception())
+
+    def _fail_pending(self) -> None:
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(ConnectionError(f"lost connection to {self.url}"))
+
+
+_streams: Dict[str, XrplStream] = {}
+
+
+def xrpl_stream(mainnet: bool = True) -> XrplStream:
+    """return the shared stream for a network, built once per process"""
+    url = XURLS_["MAINNET_WSS"] if mainnet else XURLS_["TESTNET_WSS"]
+    if url not in _streams:
+        _streams[url] = XrplStream(url)
+    return _streams[url]
+
+
+async def close_streams() -> None:
+    for stream in list(_streams.values()):
+        await stream.close()
@@ -0,0 +1,282 @@
+import asyncio
+import hashlib
+import logging
+from typing import AsyncIterator, Callable, Dict, Set
+
+from xrpl.asyncio.clients.exceptions import XRPLRequestFailureException
+from xrpl.core.binarycodec import decode
+
+from .Stream import XrplStream, xrpl_stream
+from .x_constants import TRACK_MAX_LEDGERS, TRACK_WAIT_TIMEOUT
+
+"""
+transaction results pushed off the shared stream instead of waited or polled for
+
+a txid is pending until a validated transaction with its hash comes by on the
+`transactions` stream, or until a validated ledger passes its LastLedgerSequence,
+after which it can't make it into a ledger anymore. one subscription per network
+serves every pending txid and is dropped when nothing is pending. after a
+reconnect each pending txid is looked up once, it may have been validated while
+we were away
+"""
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+EXPIRED = "expired"
+
+# the signed transaction's hash prefix, "TXN\0"
+_TXN_PREFIX = bytes.fromhex("54584E00")
+
+
+def tx_hash(tx_blob: str) -> str:
+    """the id of a signed transaction blob"""
+    return hashlib.sha512(_TXN_PREFIX + bytes.fromhex(tx_blob)).digest()[:32].hex().upper()
+
+
+class TrackedTx:
+    __slots__ = ("txid", "last_ledger_sequence", "result", "done", "expiring")
+
+    def __init__(self, txid: str, last_ledger_sequence: int = None):
+        self.txid = txid
+        self.last_ledger_sequence = last_ledger_sequence
+        self.result: dict = None
+        self.done = asyncio.Event()
+        self.expiring = False
+
+    def status(self) -> dict:
+        if self.result is not None:
+            return self.result
+        return {"txid": self.txid, "result": PENDING, "validated": False, "ledger_index": None, "last_ledger_sequence": self.last_ledger_sequence}
+
+
+class TxTracker:
+    """pending transactions of every network, resolved from their streams"""
+
+    def __init__(self, stream_factory: Callable[[bool], XrplStream] = xrpl_stream, max_ledgers: int = TRACK_MAX_LEDGERS):
+        self.stream_factory = stream_factory
+        self.max_ledgers = max_ledgers
+        self._pending: Dict[str, Dict[str, TrackedTx]] = {}
+        self._ledgers: Dict[str, int] = {}
+        self._streams: Dict[str, XrplStream] = {}
+        self._subscribed: Set[str] = set()
+        self._locks: Dict[str, asyncio.Lock] = {}
+        # expiry checks and unsubscribes, the loop only keeps weak references to tasks
+        self._tasks: Set[asyncio.Task] = set()
+        self.resolved = 0
+        self.expired = 0
+
+    def _stream(self, mainnet: bool) -> XrplStream:
+        stream = self.stream_factory(mainnet)
+        if stream.url not in self._streams:
+            self._streams[stream.url] = stream
+            self._pending[stream.url] = {}
+            stream.on("transaction", lambda message: self._on_transaction(stream.url, message))
+            stream.on("ledgerClosed", lambda message: self._on_ledger(stream, message))
+            stream.on("connected", lambda message: self._on_connected(stream))
+        return stream
+
+    def _spawn(self, coroutine) -> None:
+        task = asyncio.ensure_future(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._task_done)
+
+    def _task_done(self, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("tracker task failed", exc_info=task.exception())
+
+    def _lock(self, url: str) -> asyncio.Lock:
+        lock = self._locks.get(url)
+        if lock is None:
+            lock = self._locks[url] = asyncio.Lock()
+        return lock
+
+    async def submit(self, tx_blob: str, mainnet: bool = True) -> dict:
+        """submit a signed blob and start tracking it, returns the preliminary result,
+        `wait` or `follow` the txid for the final one"""
+        stream = self._stream(mainnet)
+        txid = tx_hash(tx_blob)
+        joined = txid in self._pending[stream.url]
+        # tracked before it is submitted, so a quick validation can't slip by
+        tracked = await self.track(txid, decode(tx_blob).get("LastLedgerSequence"), mainnet, lookup=False)
+        try:
+            result = await stream.request({"command": "submit", "tx_blob": tx_blob})
+        except Exception:
+            # it may never have reached rippled, nobody should be told it expired
+            if not joined and self._pending[stream.url].get(txid) is tracked:
+                del self._pending[stream.url][txid]
+                if not self._pending[stream.url]:
+                    self._spawn(self._unsubscribe(stream))
+            raise
+        engine_result = result.get("engine_result", "")
+        if engine_result.startswith("tem"):
+            # malformed, it will never be applied
+            self._resolve(stream.url, txid, engine_result, None, validated=False)
+        return {
+            "txid": txid,
+            "engine_result": engine_result,
+            "engine_result_message": result.get("engine_result_message", ""),
+            "last_ledger_sequence": tracked.last_ledger_sequence,
+        }
+
+    async def submit_and_wait(self, tx_blob: str, mainnet: bool = True, timeout: float = TRACK_WAIT_TIMEOUT) -> dict:
+        submitted = await self.submit(tx_blob, mainnet)
+        return await self.wait(submitted["txid"], submitted["last_ledger_sequence"], mainnet, timeout)
+
+    async def track(self, txid: str, last_ledger_sequence: int = None, mainnet: bool = True, lookup: bool = True) -> TrackedTx:
+        """start tracking a txid (or join whoever already is), `lookup` checks it isn't
+        validated already and reads its LastLedgerSequence when it isn't given"""
+        txid = txid.upper()
+        stream = self._stream(mainnet)
+        pending = self._pending[stream.url]
+        tracked = pending.get(txid)
+        if tracked is not None:
+            if tracked.last_ledger_sequence is None:
+                tracked.last_ledger_sequence = last_ledger_sequence
+            return tracked
+        tracked = pending[txid] = TrackedTx(txid, last_ledger_sequence)
+        try:
+            await self._subscribe(stream)
+        except Exception as exception:
+            if pending.get(txid) is tracked:
+                del pending[txid]
+            raise ValueError(f"can't track {txid}, {exception}")
+        if lookup:
+            await self._lookup(stream, tracked)
+        if tracked.last_ledger_sequence is None and stream.url in self._ledgers:
+            tracked.last_ledger_sequence = self._ledgers[stream.url] + self.max_ledgers
+        return tracked
+
+    async def wait(self, txid: str, last_ledger_sequence: int = None, mainnet: bool = True, timeout: float = TRACK_WAIT_TIMEOUT) -> dict:
+        """the final result, or the pending status after `timeout` seconds"""
+        tracked = await self.track(txid, last_ledger_sequence, mainnet)
+        try:
+            await asyncio.wait_for(tracked.done.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return tracked.status()
+
+    async def follow(self, txid: str, last_ledger_sequence: int = None, mainnet: bool = True) -> AsyncIterator[dict]:
+        """the pending status, then the final result, for websocket feeds"""
+        tracked = await self.track(txid, last_ledger_sequence, mainnet)
+        if not tracked.done.is_set():
+            yield tracked.status()
+            await tracked.done.wait()
+        yield tracked.result
+
+    def pending(self, mainnet: bool = True) -> int:
+        return len(self._pending.get(self.stream_factory(mainnet).url, ()))
+
+    def _resolve(self, url: str, txid: str, result: str, ledger_index: int, validated: bool = True) -> None:
+        tracked = self._pending[url].pop(txid, None)
+        if tracked is None:
+            return
+        tracked.result = {
+            "txid": txid,
+            "result": result,
+            "validated": validated,
+            "ledger_index": ledger_index,
+            "last_ledger_sequence": tracked.last_ledger_sequence,
+        }
+        tracked.done.set()
+        if result == EXPIRED:
+            self.expired += 1
+        else:
+            self.resolved += 1
+        if not self._pending[url]:
+            self._spawn(self._unsubscribe(self._streams[url]))
+
+    def _on_transaction(self, url: str, message: dict) -> None:
+        if not message.get("validated"):
+            return
+        txid = message.get("transaction", {}).get("hash")
+        if txid in self._pending[url]:
+            self._resolve(url, txid, message["meta"]["TransactionResult"], message.get("ledger_index"))
+
+    def _on_ledger(self, stream: XrplStream, message: dict) -> None:
+        # a ledger's transactions come by after its ledgerClosed, so a tx is only past
+        # hope once the ledger after its LastLedgerSequence closed
+        ledger_index = message["ledger_index"]
+        self._ledgers[stream.url] = ledger_index
+        for tracked in list(self._pending[stream.url].values()):
+            if tracked.last_ledger_sequence is None:
+                tracked.last_ledger_sequence = ledger_index + self.max_ledgers
+            elif tracked.last_ledger_sequence < ledger_index and not tracked.expiring:
+                tracked.expiring = True
+                self._spawn(self._expire(stream, tracked))
+
+    async def _expire(self, stream: XrplStream, tracked: TrackedTx) -> None:
+        """make sure it didn't go by while we were away before calling it expired"""
+        answered = await self._lookup(stream, tracked)
+        tracked.expiring = False
+        if answered and not tracked.done.is_set():
+            self._resolve(stream.url, tracked.txid, EXPIRED, self._ledgers.get(stream.url), validated=False)
+
+    async def _lookup(self, stream: XrplStream, tracked: TrackedTx) -> bool:
+        """resolve `tracked` if it is validated, False when rippled couldn't say"""
+        try:
+            result = await stream.request({"command": "tx", "transaction": tracked.txid})
+        except XRPLRequestFailureException as exception:
+            # tooBusy, noNetwork... aren't an answer, only txnNotFound is
+            return exception.error == "txnNotFound"
+        except Exception:
+            return False
+        if result.get("validated") and "meta" in result:
+            self._resolve(stream.url, tracked.txid, result["meta"]["TransactionResult"], result.get("ledger_index"))
+        elif tracked.last_ledger_sequence is None:
+            tracked.last_ledger_sequence = result.get("LastLedgerSequence")
+        return True
+
+    async def _subscribe(self, stream: XrplStream) -> None:
+        async with self._lock(stream.url):
+            if stream.url in self._subscribed:
+                return
+            result = await stream.subscribe(streams=["transactions", "ledger"])
+            self._subscribed.add(stream.url)
+            if "ledger_index" in result:
+                self._ledgers[stream.url] = result["ledger_index"]
+
+    async def _unsubscribe(self, stream: XrplStream) -> None:
+        async with self._lock(stream.url):
+            if self._pending[stream.url] or stream.url not in self._subscribed:
+                return
+            self._subscribed.discard(stream.url)
+            try:
+                # the ledger stream stays, the response cache may be following it
+                await stream.unsubscribe(streams=["transactions"])
+            except Exception as exception:
+                logger.warning("unsubscribing transactions on %s failed: %r", stream.url, exception)
+
+    async def _on_connected(self, stream: XrplStream) -> None:
+        if stream.url not in self._subscribed:
+            # the first connect, the subscribe waiting on it does the rest
+            return
+        self._subscribed.discard(stream.url)
+        await self._resubscribe(stream)
+
+    async def _resubscribe(self, stream: XrplStream) -> None:
+        """subscribe again and look up what is pending, retried until it works or
+        nothing is pending anymore"""
+        delay = stream.reconnect_delay
+        while self._pending[stream.url]:
+            try:
+                await self._subscribe(stream)
+            except Exception as exception:
+                logger.warning("resubscribing transactions on %s failed, retrying in %ss: %r", stream.url, delay, exception)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, stream.max_reconnect_delay)
+                continue
+            pending = list(self._pending[stream.url].values())
+            await asyncio.gather(*[self._lookup(stream, tracked) for tracked in pending])
+            return
+
+    def stats(self) -> dict:
+        return {
+            "pending": sum(len(pending) for pending in self._pending.values()),
+            "resolved": self.resolved,
+            "expired": self.expired,
+        }
+
+
+tx_tracker = TxTracker()
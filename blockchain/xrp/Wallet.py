@@ -1,6 +1,8 @@
+import asyncio
 from decimal import Decimal
-from typing import Union
+from typing import Any, AsyncIterator, List, Tuple, Union
 
+from xrpl.asyncio.ledger import get_fee as async_get_fee
 from xrpl.clients import JsonRpcClient
 from xrpl.ledger import get_fee
 from xrpl.models import (AccountInfo, AccountLines, AccountNFTs, AccountTx,
@@ -10,9 +12,13 @@ from xrpl.models import (AccountInfo, AccountLines, AccountNFTs, AccountTx,
 from xrpl.utils import drops_to_xrp, ripple_time_to_datetime, xrp_to_drops
 from xrpl.wallet import generate_faucet_wallet
 
-from .Misc import (hex_to_symbol, is_hex, memo_builder, validate_hex_to_symbol, validate_symbol_to_hex,
+from .Classifier import (PAYMENT_TOKEN, PAYMENT_XRP, classify_page, sent_and_received,
+                         xrp_payment_view)
+from .Misc import (currency_cache, hex_to_symbol, is_hex, memo_builder, validate_hex_to_symbol, validate_symbol_to_hex,
                   xrp_format_to_nft_fee)
 from .x_constants import D_DATA, D_TYPE, M_SOURCE_TAG
+from .Paging import paginate
+from .Pool import xrpl_pool
 
 """update add support for modifying fees"""
 
@@ -22,20 +28,23 @@ class xWallet(JsonRpcClient):
         self.network_url = network_url
         self.account_url = account_url
         self.txn_url = txn_url
-        self.client = JsonRpcClient(network_url)
+        self.client = xrpl_pool.client(network_url)
+        self.async_client = xrpl_pool.async_client(network_url)
 
     def toTestnet(self) -> bool:
         self.network_url = "https://s.altnet.rippletest.net:51234"
         self.account_url = "https://testnet.xrpl.org/accounts/"
         self.txn_url = "https://testnet.xrpl.org/transactions/"
-        self.client = JsonRpcClient(self.network_url)
+        self.client = xrpl_pool.client(self.network_url)
+        self.async_client = xrpl_pool.async_client(self.network_url)
         return True
 
     def toMainnet(self) -> bool:
         self.network_url = "https://xrplcluster.com"
         self.account_url = "https://livenet.xrpl.org/accounts/"
         self.txn_url = "https://livenet.xrpl.org/transactions/"
-        self.client = JsonRpcClient(self.network_url)
+        self.client = xrpl_pool.client(self.network_url)
+        self.async_client = xrpl_pool.async_client(self.network_url)
         return True
 
     def show_account_in_explorer(self, wallet_addr: str) -> str:
@@ -50,13 +59,22 @@ class xWallet(JsonRpcClient):
         """return transaction fee, to populate interface and carry out transactions"""
         return get_fee(self.client)
 
+    async def async_get_network_fee(self) -> str:
+        return await async_get_fee(self.async_client)
+
     def xrp_balance(self, wallet_addr: str) -> dict:
         """return xrp balance and objects count"""
+        acc_info = AccountInfo(account=wallet_addr, ledger_index="validated")
+        return self._xrp_balance(self.client.request(acc_info).result)
+
+    async def async_xrp_balance(self, wallet_addr: str) -> dict:
+        acc_info = AccountInfo(account=wallet_addr, ledger_index="validated")
+        return self._xrp_balance((await self.async_client.request(acc_info)).result)
+
+    def _xrp_balance(self, result: dict) -> dict:
         balance = 0
         owner_count = 0
         spend_balance = 0
-        acc_info = AccountInfo(account=wallet_addr, ledger_index="validated")
-        result = self.client.request(acc_info).result
         if "account_data" in result:
             balance = int(result["account_data"]["Balance"]) - 10000000
             owner_count = int(result["account_data"]["OwnerCount"])
@@ -66,101 +84,78 @@ class xWallet(JsonRpcClient):
             "object_count": owner_count,
             "spend_balance": str(drops_to_xrp(str(spend_balance)))}
 
+    async def async_balances(self, wallet_addr: str, tokens: List[dict] = None) -> dict:
+        """xrp balance and token balances of a wallet, every trust line page is read once\n
+        `tokens` is an optional [{"token", "issuer"}] filter, missing tokens come back with amount None"""
+        acc_info = AccountInfo(account=wallet_addr, ledger_index="validated")
+
+        async def lines() -> list:
+            acc_lines = AccountLines(account=wallet_addr, ledger_index="validated", limit=400)
+            return [line async for result, _ in paginate(self.async_client, acc_lines) for line in result.get("lines", [])]
+
+        info, all_lines = await asyncio.gather(self.async_client.request(acc_info), lines())
+        if not info.is_successful():
+            raise ValueError(info.result.get("error_message") or info.result.get("error"))
+        assets = self._account_tokens({"lines": all_lines})
+        if tokens is not None:
+            held = {(asset["token"], asset["issuer"]): asset for asset in assets}
+            assets = []
+            for token in tokens:
+                key = (validate_hex_to_symbol(token["token"]), token["issuer"])
+                assets.append(held.get(key, {"token": key[0], "issuer": key[1], "amount": None, "limit": None, "freeze_status": "", "ripple_status": ""}))
+        return {"address": wallet_addr, "xrp": self._xrp_balance(info.result), "tokens": assets}
+
     def xrp_transactions(self, wallet_addr: str, limit: int = None) -> dict:
         """return all xrp payment transactions an address has carried out"""
-        transactions_dict = {}
-        sent = []
-        received = []
         acc_tx = AccountTx(account=wallet_addr, limit=limit)
-        result = self.client.request(acc_tx).result
-        if "transactions" in result:
-            for transaction in result["transactions"]:
-                if transaction["tx"]["TransactionType"] == "Payment" and isinstance(transaction["meta"]["delivered_amount"], str):
-                    transact = {}
-                    transact["sender"] = transaction["tx"]["Account"]
-                    transact["receiver"] = transaction["tx"]["Destination"]
-                    transact["amount"] = str(drops_to_xrp(str(transaction["meta"]["delivered_amount"])))
-                    transact["fee"] = str(drops_to_xrp(str(transaction["tx"]["Fee"])))
-                    transact["timestamp"] = str(ripple_time_to_datetime(transaction["tx"]["date"]))
-                    transact["result"] = transaction["meta"]["TransactionResult"]
-                    transact["txid"] = transaction["tx"]["hash"]
-                    transact["link"] = f'{self.txn_url}{transaction["tx"]["hash"]}'
-                    transact["tx_type"] = transaction["tx"]["TransactionType"]
-                    # transact["memo"] = transaction["tx"]["Memo"] // this is a list that contains dicts 'parse later'
-                    if transact["sender"] == wallet_addr:
-                        sent.append(transact)
-                    elif transact["sender"] != wallet_addr:
-                        received.append(transact)
-        transactions_dict["sent"] = sent
-        transactions_dict["received"] = received
-        return transactions_dict
+        return self._xrp_transactions(self.client.request(acc_tx).result, wallet_addr)
+
+    async def async_xrp_transactions(self, wallet_addr: str, limit: int = None) -> dict:
+        acc_tx = AccountTx(account=wallet_addr, limit=limit)
+        return self._xrp_transactions((await self.async_client.request(acc_tx)).result, wallet_addr)
+
+    async def xrp_transactions_pages(self, wallet_addr: str, limit: int = None, marker: Any = None) -> AsyncIterator[Tuple[dict, Any]]:
+        """yield (transactions, next_marker) a page at a time, see Paging.paginate"""
+        acc_tx = AccountTx(account=wallet_addr, limit=limit, marker=marker)
+        async for result, next_marker in paginate(self.async_client, acc_tx):
+            yield self._xrp_transactions(result, wallet_addr), next_marker
+
+    def _xrp_transactions(self, result: dict, wallet_addr: str) -> dict:
+        return sent_and_received(classify_page(result, wallet_addr), wallet_addr, self.txn_url, [PAYMENT_XRP], xrp_payment_view)
 
     def token_transactions(self, wallet_addr: str, limit: int = None) -> dict:
         """return all token payment transactions an account has carried out"""
-        transactions_dict = {}
-        sent = []
-        received = []
         acc_tx = AccountTx(account=wallet_addr, limit=limit)
-        result = self.client.request(acc_tx).result
-        if "transactions" in result:
-            for transaction in result["transactions"]:
-                if transaction["tx"]["TransactionType"] == "Payment" and isinstance(transaction["meta"]["delivered_amount"], dict):  
-                    transact = {}
-                    transact["sender"] = transaction["tx"]["Account"]
-                    transact["receiver"] = transaction["tx"]["Destination"]
-                    transact["token"] = validate_hex_to_symbol(transaction["meta"]["delivered_amount"]["currency"])
-                    transact["issuer"] = transaction["meta"]["delivered_amount"]["issuer"]
-                    transact["amount"] = transaction["meta"]["delivered_amount"]["value"]
-                    transact["fee"] = str(drops_to_xrp(str(transaction["tx"]["Fee"])))
-                    transact["timestamp"] = str(ripple_time_to_datetime(transaction["tx"]["date"]))
-                    transact["result"] = transaction["meta"]["TransactionResult"]
-                    transact["txid"] = transaction["tx"]["hash"]
-                    transact["link"] = f'{self.txn_url}{transaction["tx"]["hash"]}'
-                    transact["tx_type"] = transaction["tx"]["TransactionType"]
-                    # transact["memo"] = transaction["tx"]["Memo"] // this is a list that contains dicts 'parse later'
-                    if transact["sender"] == wallet_addr:
-                        sent.append(transact)
-                    elif transact["sender"] != wallet_addr:
-                        received.append(transact)
-        transactions_dict["sent"] = sent
-        transactions_dict["received"] = received
-        return transactions_dict
+        return self._token_transactions(self.client.request(acc_tx).result, wallet_addr)
+
+    async def async_token_transactions(self, wallet_addr: str, limit: int = None) -> dict:
+        acc_tx = AccountTx(account=wallet_addr, limit=limit)
+        return self._token_transactions((await self.async_client.request(acc_tx)).result, wallet_addr)
+
+    async def token_transactions_pages(self, wallet_addr: str, limit: int = None, marker: Any = None) -> AsyncIterator[Tuple[dict, Any]]:
+        acc_tx = AccountTx(account=wallet_addr, limit=limit, marker=marker)
+        async for result, next_marker in paginate(self.async_client, acc_tx):
+            yield self._token_transactions(result, wallet_addr), next_marker
+
+    def _token_transactions(self, result: dict, wallet_addr: str) -> dict:
+        return sent_and_received(classify_page(result, wallet_addr), wallet_addr, self.txn_url, [PAYMENT_TOKEN])
 
     def payment_transactions(self, wallet_addr: str, limit: int = None) -> dict:
         """return all payment transactions for xrp and tokens both sent and received"""
-        transactions_dict = {}
-        sent = []
-        received = []
         acc_tx = AccountTx(account=wallet_addr, limit=limit)
-        result = self.client.request(acc_tx).result
-        if "transactions" in result:
-            for transaction in result["transactions"]:
-                if transaction["tx"]["TransactionType"] == "Payment":
-                    transact = {}
-                    transact["sender"] = transaction["tx"]["Account"]
-                    transact["receiver"] = transaction["tx"]["Destination"]
-                    if isinstance(transaction["meta"]["delivered_amount"], dict):
-                        transact["token"] = validate_hex_to_symbol(transaction["meta"]["delivered_amount"]["currency"])
-                        transact["issuer"] = transaction["meta"]["delivered_amount"]["issuer"]
-                        transact["amount"] = transaction["meta"]["delivered_amount"]["value"]
-                    if isinstance(transaction["meta"]["delivered_amount"], str):
-                        transact["token"] = "XRP"
-                        transact["issuer"] = ""
-                        transact["amount"] = str(drops_to_xrp(str(transaction["meta"]["delivered_amount"])))
-                    transact["fee"] = str(drops_to_xrp(str(transaction["tx"]["Fee"])))
-                    transact["timestamp"] = str(ripple_time_to_datetime(transaction["tx"]["date"]))
-                    transact["result"] = transaction["meta"]["TransactionResult"]
-                    transact["txid"] = transaction["tx"]["hash"]
-                    transact["link"] = f'{self.txn_url}{transaction["tx"]["hash"]}'
-                    transact["tx_type"] = transaction["tx"]["TransactionType"]
-                    # transact["memo"] = transaction["tx"]["Memo"] // this is a list that contains dicts 'parse later'
-                    if transact["sender"] == wallet_addr:
-                        sent.append(transact)
-                    elif transact["sender"] != wallet_addr:
-                        received.append(transact)
-        transactions_dict["sent"] = sent
-        transactions_dict["received"] = received
-        return transactions_dict
+        return self._payment_transactions(self.client.request(acc_tx).result, wallet_addr)
+
+    async def async_payment_transactions(self, wallet_addr: str, limit: int = None) -> dict:
+        acc_tx = AccountTx(account=wallet_addr, limit=limit)
+        return self._payment_transactions((await self.async_client.request(acc_tx)).result, wallet_addr)
+
+    async def payment_transactions_pages(self, wallet_addr: str, limit: int = None, marker: Any = None) -> AsyncIterator[Tuple[dict, Any]]:
+        acc_tx = AccountTx(account=wallet_addr, limit=limit, marker=marker)
+        async for result, next_marker in paginate(self.async_client, acc_tx):
+            yield self._payment_transactions(result, wallet_addr), next_marker
+
+    def _payment_transactions(self, result: dict, wallet_addr: str) -> dict:
+        return sent_and_received(classify_page(result, wallet_addr), wallet_addr, self.txn_url, [PAYMENT_XRP, PAYMENT_TOKEN])
 
     def send_xrp(self, sender_addr: str, receiver_addr: str, amount: Union[float, Decimal, int],
         destination_tag: int = None, memo: Memo = None, fee: str = None) -> dict:
@@ -194,19 +189,28 @@ class xWallet(JsonRpcClient):
 
     def account_tokens(self, wallet_addr: str) -> list:
         """returns all tokens except LP tokens a wallet address is holding with their respective issuers, limit and balances"""
-        assets = []
         acc_info = AccountLines(account=wallet_addr, ledger_index="")
-        response = self.client.request(acc_info)
-        result = response.result
+        return self._account_tokens(self.client.request(acc_info).result)
+
+    async def async_account_tokens(self, wallet_addr: str) -> list:
+        acc_info = AccountLines(account=wallet_addr, ledger_index="")
+        return self._account_tokens((await self.async_client.request(acc_info)).result)
+
+    async def account_tokens_pages(self, wallet_addr: str, limit: int = None, marker: Any = None) -> AsyncIterator[Tuple[list, Any]]:
+        acc_info = AccountLines(account=wallet_addr, ledger_index="validated", limit=limit, marker=marker)
+        async for result, next_marker in paginate(self.async_client, acc_info):
+            yield self._account_tokens(result), next_marker
+
+    def _account_tokens(self, result: dict) -> list:
+        assets = []
         if "lines" in result:
             lines = result["lines"]
             for line in lines:
-                if isinstance(is_hex(line["currency"]), Exception):
-                    pass
-                else:
+                symbol, decodes = currency_cache.lookup(line["currency"])
+                if decodes:
                     asset = {}
                     # filter lp tokens
-                    asset["token"] = validate_hex_to_symbol(line["currency"])
+                    asset["token"] = symbol
                     asset["issuer"] = line["account"]
                     asset["amount"] = line["balance"]
                     asset["limit"] = line["limit"]  # the max an account can handle
@@ -222,10 +226,20 @@ class xWallet(JsonRpcClient):
 
     def account_nfts(self, wallet_addr: str, limit: int = None) -> list:
         "return all nfts an account is holding"
-        account_nft = []
         acc_info = AccountNFTs(account=wallet_addr, id="validated", limit=limit)
-        response = self.client.request(acc_info)
-        result = response.result
+        return self._account_nfts(self.client.request(acc_info).result)
+
+    async def async_account_nfts(self, wallet_addr: str, limit: int = None) -> list:
+        acc_info = AccountNFTs(account=wallet_addr, id="validated", limit=limit)
+        return self._account_nfts((await self.async_client.request(acc_info)).result)
+
+    async def account_nfts_pages(self, wallet_addr: str, limit: int = None, marker: Any = None) -> AsyncIterator[Tuple[list, Any]]:
+        acc_info = AccountNFTs(account=wallet_addr, id="validated", limit=limit, marker=marker)
+        async for result, next_marker in paginate(self.async_client, acc_info):
+            yield self._account_nfts(result), next_marker
+
+    def _account_nfts(self, result: dict) -> list:
+        account_nft = []
         if "account_nfts" in result:
             account_nfts = result["account_nfts"] 
             for nfts in account_nfts:
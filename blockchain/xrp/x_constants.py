@@ -5,8 +5,153 @@ XURLS_ = {
     "MAINNET_TXNS": "https://livenet.xrpl.org/transactions/",
     "MAINNET_ACCOUNT": "https://livenet.xrpl.org/accounts/",
     "TESTNET_ACCOUNT": "https://testnet.xrpl.org/accounts/",
+    "MAINNET_WSS": "wss://xrplcluster.com",
+    "TESTNET_WSS": "wss://s.altnet.rippletest.net:51233",
+    "MAINNET_XRPLDATA": "https://api.xrpldata.com/api/v1/",
+    "TESTNET_XRPLDATA": "https://test-api.xrpldata.com/api/v1/",
+    "XRPLMETA": "https://s1.xrplmeta.org/",
 }
 
+"""
+shared http pool for the json rpc clients, see Pool.ClientPool\n
+limits are per network url
+"""
+POOL_MAX_CONNECTIONS = 100
+POOL_MAX_KEEPALIVE_CONNECTIONS = 20
+POOL_KEEPALIVE_EXPIRY = 30.0
+POOL_TIMEOUT = 10.0
+
+"""
+persistent rippled websocket, see Stream.XrplStream
+
+reconnects back off from STREAM_RECONNECT_DELAY up to STREAM_MAX_RECONNECT_DELAY seconds
+"""
+STREAM_RECONNECT_DELAY = 1.0
+STREAM_MAX_RECONNECT_DELAY = 30.0
+STREAM_REQUEST_TIMEOUT = 10.0
+
+"""
+response cache for validated reads, see Cache.ResponseCache
+
+entries are keyed on the last closed ledger and expire after CACHE_TTL seconds
+"""
+CACHE_TTL = 4.0
+CACHE_MAX_ENTRIES = 10000
+
+"""
+batched balance lookups, at most BATCH_MAX_WALLETS per call with BATCH_CONCURRENCY wallets in flight
+"""
+BATCH_MAX_WALLETS = 100
+BATCH_CONCURRENCY = 8
+
+"""
+currency code interning, see Misc.CurrencyCache\n
+POPULAR_CURRENCIES are decoded at import and never evicted
+"""
+CURRENCY_CACHE_SIZE = 50000
+POPULAR_CURRENCIES = [
+    "SOLO", "CORE", "ELS", "XRPH", "USDC", "USDT", "RLUSD", "CSC", "XPM", "EQ",
+    "ZRPY", "SGB", "FLR", "xSTIK", "VGB", "ARK", "XCORE", "LOVE", "PHNIX", "XRDOGE",
+    "MAG", "BEAR", "DROP", "SEREN",
+]
+
+"""
+amm + order book routing, see Router.SwapRouter
+
+pool and book state is reused for ROUTE_TTL seconds (about a ledger), ROUTE_CACHE_SIZE pairs are kept
+"""
+ROUTE_TTL = 4.0
+ROUTE_CACHE_SIZE = 256
+ROUTE_TOLERANCE = 0.005
+
+"""
+path quotes, see Paths.PathCache
+
+a pair quoted PATH_PROMOTE_AFTER times gets a live path_find, PATH_MAX_SUBSCRIPTIONS at most (one websocket each),
+other pairs run ripple_path_find PATH_FIND_CONCURRENCY at a time and are reused for PATH_TTL seconds,
+amounts are rounded up to PATH_AMOUNT_DIGITS significant digits so nearby amounts share a search
+"""
+PATH_TTL = 10.0
+PATH_FIND_CONCURRENCY = 4
+PATH_MAX_SUBSCRIPTIONS = 8
+PATH_PROMOTE_AFTER = 3
+PATH_CACHE_SIZE = 1024
+PATH_AMOUNT_DIGITS = 2
+
+"""
+transaction tracking, see Tracker.TxTracker
+
+a txid without a LastLedgerSequence gives up TRACK_MAX_LEDGERS validated ledgers after it was first seen,
+callers waiting on a result give up after TRACK_WAIT_TIMEOUT seconds (the tx is still tracked)
+"""
+TRACK_MAX_LEDGERS = 20
+TRACK_WAIT_TIMEOUT = 60.0
+
+"""
+indexed wallet history, see Indexer.TxIndexer
+
+the backfill reads account_tx INDEX_PAGE_SIZE transactions at a time and retries after INDEX_RETRY_DELAY seconds,
+a wallet nobody asked about for INDEX_IDLE_AFTER seconds stops being followed live (its index stays),
+INDEX_MAX_WALLETS are followed at most (the least recently asked about goes first) and a follow backfills
+INDEX_MAX_PAGES pages at most, the next one carries on from the saved marker,
+history pages are HISTORY_LIMIT transactions unless asked for more, HISTORY_MAX_LIMIT at most
+"""
+INDEX_PAGE_SIZE = 400
+INDEX_RETRY_DELAY = 5.0
+INDEX_IDLE_AFTER = 3600.0
+INDEX_MAX_WALLETS = 1000
+INDEX_MAX_PAGES = 50
+HISTORY_LIMIT = 50
+HISTORY_MAX_LIMIT = 500
+
+"""
+external data apis (xrpldata, xrplmeta), see DataApi.DataApiClient
+
+DATA_CONCURRENCY requests in flight at most over DATA_MAX_CONNECTIONS keep-alive connections,
+failed requests are retried DATA_RETRIES times after up to DATA_BACKOFF * 2**attempt seconds,
+answers are cached for DATA_CACHE_TTL seconds, DATA_CACHE_MAX_ENTRIES of them in memory
+"""
+DATA_TIMEOUT = 10.0
+DATA_MAX_CONNECTIONS = 20
+DATA_CONCURRENCY = 16
+DATA_RETRIES = 3
+DATA_BACKOFF = 0.25
+DATA_CACHE_TTL = 60.0
+DATA_CACHE_MAX_ENTRIES = 2048
+
+"""
+nft metadata and media, see Media.NftMediaResolver
+
+ipfs uris are fetched through NFT_IPFS_GATEWAY, NFT_MEDIA_CONCURRENCY fetches at a time,
+bodies over NFT_MEDIA_MAX_BYTES are refused, NFT_MEDIA_MEMORY_BYTES of them are kept in
+memory along with the last NFT_MEDIA_MAX_NAMES uris fetched, thumbnails fit in NFT_THUMBNAIL_SIZE pixels
+"""
+NFT_IPFS_GATEWAY = "https://onxrp.infura-ipfs.io"
+NFT_MEDIA_CONCURRENCY = 8
+NFT_MEDIA_TIMEOUT = 15.0
+NFT_MEDIA_MAX_BYTES = 20 * 1024 * 1024
+NFT_MEDIA_MEMORY_BYTES = 64 * 1024 * 1024
+NFT_MEDIA_MAX_NAMES = 100000
+NFT_THUMBNAIL_SIZE = 256
+
+"""
+bulk nft offer summaries, see NftOffers.NftOfferCache
+
+at most NFT_OFFERS_MAX_IDS nfts per call, NFT_OFFERS_CONCURRENCY requests in flight and
+NFT_OFFERS_RATE started per second, NFT_OFFERS_PAGE_SIZE offers per page. summaries are
+kept NFT_OFFERS_TTL seconds at most, NFT_OFFERS_CACHE_SIZE of them. a caller asks for
+NFT_OFFERS_CALLER_RATE nfts per second on average (NFT_OFFERS_MAX_IDS at once), the last
+NFT_OFFERS_CALLERS callers are remembered
+"""
+NFT_OFFERS_MAX_IDS = 100
+NFT_OFFERS_CALLER_RATE = 20.0
+NFT_OFFERS_CALLERS = 10000
+NFT_OFFERS_CONCURRENCY = 16
+NFT_OFFERS_RATE = 50.0
+NFT_OFFERS_PAGE_SIZE = 250
+NFT_OFFERS_TTL = 300.0
+NFT_OFFERS_CACHE_SIZE = 20000
+
 """
 xrp max decimals is 6
 0.000001
@@ -1,4 +1,5 @@
-from typing import Union
+import asyncio
+from typing import Any, AsyncIterator, Tuple, Union
 import websockets
 
 from xrpl.asyncio.clients import AsyncJsonRpcClient
@@ -9,7 +10,11 @@ from xrpl.models import (XRP, AccountOffers, BookOffers,
                          OfferCreate, AccountLines, OfferCreate, OfferCreateFlag, Tx, GatewayBalances)
 from xrpl.utils import drops_to_xrp, xrp_to_drops
 
-from .Misc import (memo_builder, validate_hex_to_symbol, is_hex, validate_hex_to_symbol)
+from .Misc import currency_cache, memo_builder, validate_hex_to_symbol
+from .Books import OrderBook, book_manager
+from .Offers import account_offer_json, best_offer_json, decode_account_offers, decode_book_offers
+from .Paging import paginate
+from .Pool import xrpl_pool
 
 
 def xm():
@@ -23,7 +28,8 @@ class xObject(JsonRpcClient):
         self.network_url = network_url
         self.account_url = account_url
         self.txn_url = txn_url
-        self.client = JsonRpcClient(network_url)
+        self.client = xrpl_pool.client(network_url)
+        self.async_client = xrpl_pool.async_client(network_url)
     
     def cancel_offer(self, sender_addr: str, offer_seq: int, fee: str = None) -> dict:
         """cancel an offer"""
@@ -47,36 +53,17 @@ class xObject(JsonRpcClient):
 
     def get_account_order_book_liquidity(self, wallet_addr: str, limit: int = None) -> list:
         """return all offers that are liquidity an account created"""
-        offer_list = []
         req = AccountOffers(account=wallet_addr, ledger_index="validated", limit=limit)
-        response = self.client.request(req)
-        result = response.result
+        return self._account_order_book_liquidity(self.client.request(req).result)
+
+    async def async_get_account_order_book_liquidity(self, wallet_addr: str, limit: int = None) -> list:
+        req = AccountOffers(account=wallet_addr, ledger_index="validated", limit=limit)
+        return self._account_order_book_liquidity((await self.async_client.request(req)).result)
+
+    def _account_order_book_liquidity(self, result: dict) -> list:
+        offer_list = []
         if "offers" in result:
-            offers = result["offers"]
-            for offer in offers:
-                if 0x00010000 & offer["flags"] == 0x00010000:
-                    of = {}
-                    of["flags"] = offer["flags"]
-                    of["sequence"] = offer["seq"]
-                    of["quality"] = offer["quality"]# str(drops_to_xrp(offer["quality"])) # rate is subject to error from the blockchain because xrp returned in this call has no decimal  # The exchange rate of the offer, as the ratio of the original taker_pays divided by the original taker_gets. rate = pay/get
-                    if isinstance(offer["taker_pays"], dict):
-                        of["buy_token"] = validate_hex_to_symbol(offer["taker_pays"]["currency"])
-                        of["buy_issuer"] = offer["taker_pays"]["issuer"]
-                        of["buy_amount"] = offer["taker_pays"]["value"]
-                    elif isinstance(offer["taker_pays"], str):
-                        of["buy_token"] = "XRP"
-                        of["buy_issuer"] = ""
-                        of["buy_amount"] = str(drops_to_xrp(offer["taker_pays"]))
-                    if isinstance(offer["taker_gets"], dict):
-                        of["sell_token"] = validate_hex_to_symbol(offer["taker_gets"]["currency"])
-                        of["sell_issuer"] = offer["taker_gets"]["issuer"]
-                        of["sell_amount"] = offer["taker_gets"]["value"]
-                    elif isinstance(offer["taker_gets"], str):
-                        of["sell_token"] = "XRP"
-                        of["sell_issuer"] = ""
-                        of["sell_amount"] = str(drops_to_xrp(offer["taker_gets"]))
-                    of["rate"] = float(of["sell_amount"])/float(of["buy_amount"])
-                    offer_list.append(of)
+            offer_list = [account_offer_json(record) for record in decode_account_offers(result["offers"]) if record.passive]
         return offer_list
 
     def order_book_swap(self, sender_addr: str, buy: Union[float, IssuedCurrencyAmount], sell: Union[float, IssuedCurrencyAmount], tf_sell: bool = False, tf_fill_or_kill: bool = False, tf_immediate_or_cancel: bool = False, fee: str = None) -> dict:
@@ -105,18 +92,23 @@ class xObject(JsonRpcClient):
         return tx_dict
 
     def token_balance(self, wallet_addr: str, name: str, issuer: str) -> list:
+        # only the lines shared with the issuer, not every line of the wallet
+        acc_info = AccountLines(account=wallet_addr, peer=issuer, ledger_index="validated")
+        return self._token_balance(self.client.request(acc_info).result, name, issuer)
+
+    async def async_token_balance(self, wallet_addr: str, name: str, issuer: str) -> list:
+        acc_info = AccountLines(account=wallet_addr, peer=issuer, ledger_index="validated")
+        return self._token_balance((await self.async_client.request(acc_info)).result, name, issuer)
+
+    def _token_balance(self, result: dict, name: str, issuer: str) -> list:
         info = {"token": name, "issuer": issuer, "amount": None, "limit": None, "no_ripple": None, "freeze_status": None}
-        #do here
-        acc_info = AccountLines(account=wallet_addr, ledger_index="")
-        response = self.client.request(acc_info)
-        result = response.result
         if "lines" in result:
             lines = result["lines"]
+            wanted = validate_hex_to_symbol(name)
             for line in lines:
-                if isinstance(is_hex(line["currency"]), Exception):
-                    pass
-                elif validate_hex_to_symbol(line["currency"]) == validate_hex_to_symbol(name) and line["account"] == issuer:
-                    info["token"] = validate_hex_to_symbol(line["currency"])
+                symbol, decodes = currency_cache.lookup(line["currency"])
+                if decodes and symbol == wanted and line["account"] == issuer:
+                    info["token"] = symbol
                     info["issuer"] = line["account"]
                     info["amount"] = line["balance"]
                     info["limit"] = line["limit"]
@@ -125,17 +117,28 @@ class xObject(JsonRpcClient):
         return info
     
     def status(self, txid: str) -> dict:
+        return self._status(self.client.request(Tx(transaction=txid)).result)
+
+    async def async_status(self, txid: str) -> dict:
+        return self._status((await self.async_client.request(Tx(transaction=txid))).result)
+
+    def _status(self, result: dict) -> dict:
         response = None
-        query = Tx(transaction=txid)
-        result = self.client.request(query).result
         if "Account" in result:
             response = result["meta"]["TransactionResult"]
         return response
     
     def token_exists(self, token: str, issuer: str) -> dict:
-        response = {"token": token, "issuer": issuer, "exists": False}
         # client = JsonRpcClient("https://xrplcluster.com") if mainnet else JsonRpcClient("https://s.altnet.rippletest.net:51234")
         result = self.client.request(GatewayBalances(account=issuer, ledger_index="validated")).result
+        return self._token_exists(result, token, issuer)
+
+    async def async_token_exists(self, token: str, issuer: str) -> dict:
+        result = (await self.async_client.request(GatewayBalances(account=issuer, ledger_index="validated"))).result
+        return self._token_exists(result, token, issuer)
+
+    def _token_exists(self, result: dict, token: str, issuer: str) -> dict:
+        response = {"token": token, "issuer": issuer, "exists": False}
         if "obligations" in result:
             obligations = result["obligations"]
             for key, value in obligations.items():
@@ -147,11 +150,17 @@ class xObject(JsonRpcClient):
     
     def xrp_balance(self, wallet_addr: str) -> str:
         """return xrp balance and objects count"""
+        acc_info = AccountInfo(account=wallet_addr, ledger_index="validated")
+        return self._xrp_balance(self.client.request(acc_info).result)
+
+    async def async_xrp_balance(self, wallet_addr: str) -> str:
+        acc_info = AccountInfo(account=wallet_addr, ledger_index="validated")
+        return self._xrp_balance((await self.async_client.request(acc_info)).result)
+
+    def _xrp_balance(self, result: dict) -> str:
         balance = 0
         owner_count = 0
         spend_balance = 0
-        acc_info = AccountInfo(account=wallet_addr, ledger_index="validated")
-        result = self.client.request(acc_info).result
         if "account_data" in result:
             balance = int(result["account_data"]["Balance"]) - 10000000
             owner_count = int(result["account_data"]["OwnerCount"])
@@ -159,120 +168,78 @@ class xObject(JsonRpcClient):
         return spend_balance 
     
     def pending_offers(self, wallet_addr: str) -> list:
-            offer_list = []
             req = AccountOffers(account=wallet_addr, ledger_index="validated")
-            response = self.client.request(req)
-            result = response.result
+            return self._pending_offers(self.client.request(req).result)
+
+    async def async_pending_offers(self, wallet_addr: str) -> list:
+            req = AccountOffers(account=wallet_addr, ledger_index="validated")
+            return self._pending_offers((await self.async_client.request(req)).result)
+
+    async def pending_offers_pages(self, wallet_addr: str, limit: int = None, marker: Any = None) -> AsyncIterator[Tuple[list, Any]]:
+            """yield (offers, next_marker) a page at a time, see Paging.paginate"""
+            req = AccountOffers(account=wallet_addr, ledger_index="validated", limit=limit, marker=marker)
+            async for result, next_marker in paginate(self.async_client, req):
+                yield self._pending_offers(result), next_marker
+
+    def _pending_offers(self, result: dict) -> list:
+            offer_list = []
             if "offers" in result:
-                offers = result["offers"]
-                for offer in offers:
-                    of = {}
-                    of["flags"] = offer["flags"]
-                    of["sequence"] = offer["seq"]
-                    of["quality"] = offer["quality"]# str(drops_to_xrp(offer["quality"])) # rate is subject to error from the blockchain because xrp returned in this call has no decimal  # The exchange rate of the offer, as the ratio of the original taker_pays divided by the original taker_gets. rate = pay/get
-                    if isinstance(offer["taker_pays"], dict):
-                        of["buy_token"] = validate_hex_to_symbol(offer["taker_pays"]["currency"])
-                        of["buy_issuer"] = offer["taker_pays"]["issuer"]
-                        of["buy_amount"] = offer["taker_pays"]["value"]
-                    elif isinstance(offer["taker_pays"], str):
-                        of["buy_token"] = "XRP"
-                        of["buy_issuer"] = ""
-                        of["buy_amount"] = str(drops_to_xrp(offer["taker_pays"]))
-
-                    if isinstance(offer["taker_gets"], dict):
-                        of["sell_token"] = validate_hex_to_symbol(offer["taker_gets"]["currency"])
-                        of["sell_issuer"] = offer["taker_gets"]["issuer"]
-                        of["sell_amount"] = offer["taker_gets"]["value"]
-                    elif isinstance(offer["taker_gets"], str):
-                        of["sell_token"] = "XRP"
-                        of["sell_issuer"] = ""
-                        of["sell_amount"] = str(drops_to_xrp(offer["taker_gets"]))
-
-                    of["rate"] = float(of["sell_amount"])/float(of["buy_amount"])
-                    offer_list.append(of)
+                offer_list = [account_offer_json(record) for record in decode_account_offers(result["offers"])]
             return offer_list
     
 
 async def sort_best_offer(buy: Union[XRP, IssuedCurrency], sell: Union[XRP, IssuedCurrency], best_buy: bool = False, best_sell: bool = False, mainnet: bool = False) -> dict:
-    """return all available orders and best {option} first, choose either best_buy or best_sell"""
+    """return all available orders and best {option} first, choose either best_buy or best_sell\n
+    best_buy wins when both are set, the book is only fetched once either way"""
     best = {}
-    client = AsyncJsonRpcClient("https://xrplcluster.com") if mainnet else AsyncJsonRpcClient("https://s.altnet.rippletest.net:51234")
-
-    if best_sell:
-        req = BookOffers(taker_gets=sell, taker_pays=buy, ledger_index="validated")
-        response = await client.request(req)
-        result = response.result
-        if "offers" in result:
-            offers: list = result["offers"]
-            # sort offer list and return highest rate first
-            offers.sort(key=lambda object: object["quality"], reverse=True)
-            index = 0
-            for offer in offers:
-                of = {}
-                of["creator"] = offer["Account"]
-                of["offer_id"] = offer["index"]
-                of["flags"] = offer["Flags"]
-                of["sequence"] = offer["Sequence"] # offer id
-                of["rate"] = offer["quality"]
-                of["creator_liquidity"] = ""
-                if "owner_funds" in offer:
-                    of["creator_liquidity"] = offer["owner_funds"] # available amount the offer creator of `sell_token` is currently holding
-                if isinstance(offer["TakerPays"], dict):
-                    of["buy_token"] = validate_hex_to_symbol(offer["TakerPays"]["currency"])
-                    of["buy_issuer"] = offer["TakerPays"]["issuer"]
-                    of["buy_amount"] = offer["TakerPays"]["value"]
-                elif isinstance(offer["TakerPays"], str):
-                    of["buy_token"] = "XRP"
-                    of["buy_issuer"] = ""
-                    of["buy_amount"] = str(drops_to_xrp(offer["TakerPays"]))
-
-                if isinstance(offer["TakerGets"], dict):
-                    of["sell_token"] = validate_hex_to_symbol(offer["TakerGets"]["currency"])
-                    of["sell_issuer"] = offer["TakerGets"]["issuer"]
-                    of["sell_amount"] = offer["TakerGets"]["value"]
-                elif isinstance(offer["TakerGets"], str):
-                    of["sell_token"] = "XRP"
-                    of["sell_issuer"] = ""
-                    of["sell_amount"] = str(drops_to_xrp(offer["TakerGets"]))                    
-                index += 1
-                best[index] = of
-
-    if best_buy:
-        req = BookOffers(taker_gets=sell, taker_pays=buy, ledger_index="validated")
-        response = await client.request(req)
-        result = response.result
-        if "offers" in result:
-            offers: list = result["offers"]
-            # sort offer list and return lowest rate first
-            offers.sort(key=lambda object: object["quality"])
-            index = 0
-            for offer in offers:
-                of = {}
-                of["creator"] = offer["Account"]
-                of["offer_id"] = offer["index"]
-                of["flags"] = offer["Flags"]
-                of["sequence"] = offer["Sequence"] # offer id
-                of["rate"] = offer["quality"]
-                of["creator_liquidity"] = ""
-                if "owner_funds" in offer:
-                    of["creator_liquidity"] = offer["owner_funds"] # available amount the offer creator is currently holding
-                if isinstance(offer["TakerPays"], dict):
-                    of["buy_token"] = validate_hex_to_symbol(offer["TakerPays"]["currency"])
-                    of["buy_issuer"] = offer["TakerPays"]["issuer"]
-                    of["buy_amount"] = offer["TakerPays"]["value"]
-                elif isinstance(offer["TakerPays"], str):
-                    of["buy_token"] = "XRP"
-                    of["buy_issuer"] = ""
-                    of["buy_amount"] = str(drops_to_xrp(offer["TakerPays"]))
-
-                if isinstance(offer["TakerGets"], dict):
-                    of["sell_token"] = validate_hex_to_symbol(offer["TakerGets"]["currency"])
-                    of["sell_issuer"] = offer["TakerGets"]["issuer"]
-                    of["sell_amount"] = offer["TakerGets"]["value"]
-                elif isinstance(offer["TakerGets"], str):
-                    of["sell_token"] = "XRP"
-                    of["sell_issuer"] = ""
-                    of["sell_amount"] = str(drops_to_xrp(offer["TakerGets"]))                    
-                index += 1
-                best[index] = of
+    if not (best_buy or best_sell):
+        return best
+    client = xrpl_pool.async_client(xrpl_pool.network_url(mainnet))
+    req = BookOffers(taker_gets=sell, taker_pays=buy, ledger_index="validated")
+    response = await client.request(req)
+    result = response.result
+    if "offers" in result:
+        # lowest rate first for best_buy, highest first for best_sell, ordered on the numeric quality
+        best = _best_offers(OrderBook(result["offers"]).depth(reverse=not best_buy))
     return best
+
+
+async def two_sided_book(buy: Union[XRP, IssuedCurrency], sell: Union[XRP, IssuedCurrency], mainnet: bool = False, limit: int = None) -> dict:
+    """both books of a pair in one call, best offer first on each side\n
+    asks is the sort_best_offer book (taker gets `sell`), bids is the reverse pair.
+    a side that is already streamed (see Books.BookManager) is read from memory,
+    the others are fetched concurrently"""
+    client = xrpl_pool.async_client(xrpl_pool.network_url(mainnet))
+
+    async def side(taker_gets, taker_pays) -> Tuple[OrderBook, int]:
+        feed = book_manager.book(taker_gets, taker_pays, mainnet)
+        if feed is not None:
+            return feed.book, feed.ledger_index
+        req = BookOffers(taker_gets=taker_gets, taker_pays=taker_pays, ledger_index="validated", limit=limit)
+        result = (await client.request(req)).result
+        return OrderBook(result.get("offers", [])), result.get("ledger_index", 0)
+
+    (asks, ask_ledger), (bids, bid_ledger) = await asyncio.gather(side(sell, buy), side(buy, sell))
+    return {
+        "asks": _best_offers(asks.depth(limit)),
+        "bids": _best_offers(bids.depth(limit)),
+        "best_ask": str(asks.best_quality()) if len(asks) else "",
+        "best_bid": str(bids.best_quality()) if len(bids) else "",
+        "ledger_index": max(ask_ledger, bid_ledger),
+    }
+
+
+async def stream_best_offer(buy: Union[XRP, IssuedCurrency], sell: Union[XRP, IssuedCurrency], best_buy: bool = False, best_sell: bool = False, mainnet: bool = False) -> AsyncIterator[dict]:
+    """same output as sort_best_offer, yielded again every time the book changes on the ledger\n
+    the book is shared with every other watcher of the pair, see Books.BookManager"""
+    async with book_manager.watch(sell, buy, mainnet) as subscription:
+        async for book in subscription:
+            best = {}
+            if best_buy or best_sell:
+                best = _best_offers(book.book.depth(reverse=not best_buy))
+            yield best
+
+
+def _best_offers(offers: list) -> dict:
+    """number already ordered BookOffers entries from 1"""
+    return {index: best_offer_json(record) for index, record in enumerate(decode_book_offers(offers), 1)}
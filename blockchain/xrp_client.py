@@ -1,17 +1,24 @@
+import asyncio
 from decimal import Decimal
-from typing import Dict, List, Union
+from typing import AsyncIterator, Dict, List, Union
 
 from xrpl.models import AuthAccount, IssuedCurrency, IssuedCurrencyAmount, XRP
 
 from .xrp.Assets import xAsset
 from .xrp.Eng import xEng
 from .xrp.Exchange import xAmm, xOrderBookExchange
-from .xrp.Info import xInfo, status
+from .xrp.Info import async_status, xInfo, status
+from .xrp.Media import nft_media
 from .xrp.Nft import xNFT
 from .xrp.Objects import xObject
+from .xrp.Paging import decode_cursor, page
+from .xrp.Paths import path_cache
+from .xrp.Quote import QuoteBook, quote_book as Xquote_book, stream_quote_book as Xstream_quote_book
+from .xrp.Router import router_cache
+from .xrp.Tracker import tx_tracker
 from .xrp.Wallet import xWallet
-from .xrp.x_constants import XURLS_
-from .xrp.xamm import xObject as XammObject, sort_best_offer as Xsort_best_offer
+from .xrp.x_constants import BATCH_CONCURRENCY, BATCH_MAX_WALLETS, ROUTE_TOLERANCE, TRACK_WAIT_TIMEOUT, XURLS_
+from .xrp.xamm import xObject as XammObject, sort_best_offer as Xsort_best_offer, stream_best_offer as Xstream_best_offer, two_sided_book as Xtwo_sided_book
 
 test_url = XURLS_["TESTNET_URL"]
 test_txns = XURLS_["TESTNET_TXNS"]
@@ -24,6 +31,9 @@ main_account = XURLS_["MAINNET_ACCOUNT"]
 def transaction_status(txid, mainnet=False):
     return status(txid, mainnet)
 
+async def async_transaction_status(txid, mainnet=False):
+    return await async_status(txid, mainnet)
+
 class XRPWalletClient():
     wallet = xWallet(test_url, test_account, test_txns)
     
@@ -42,11 +52,47 @@ class XRPWalletClient():
         except Exception as exception:
             raise ValueError(f"Error while running get balance, {str(exception)}")
 
+    async def async_get_balance(self, address: str):
+        try:
+            return await self.wallet.async_xrp_balance(address)
+        except Exception as exception:
+            raise ValueError(f"Error while running get balance, {str(exception)}")
+
     def get_transactions(self, address: str):
         try:
             return self.wallet.payment_transactions(address)
         except Exception as exception:
             raise ValueError(f"Error while running get transactions, {str(exception)}")
+
+    async def async_get_transactions(self, address: str):
+        try:
+            return await self.wallet.async_payment_transactions(address)
+        except Exception as exception:
+            raise ValueError(f"Error while running get transactions, {str(exception)}")
+
+    async def async_get_balances(self, addresses: List[str], tokens: List[dict] = None, mainnet: bool = False) -> List[dict]:
+        """xrp and token balances of many wallets, BATCH_CONCURRENCY wallets at a time\n
+        a wallet that fails gets an `error` entry instead of failing the batch"""
+        if len(addresses) > BATCH_MAX_WALLETS:
+            raise ValueError(f"at most {BATCH_MAX_WALLETS} wallets per batch")
+        wallet = xWallet(main_url, main_account, main_txns) if mainnet else xWallet(test_url, test_account, test_txns)
+        semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+        async def balances(address: str) -> dict:
+            async with semaphore:
+                try:
+                    return await wallet.async_balances(address, tokens)
+                except Exception as exception:
+                    return {"address": address, "error": str(exception)}
+
+        return await asyncio.gather(*[balances(address) for address in addresses])
+
+    async def get_transactions_page(self, address: str, limit: int = None, cursor: str = None):
+        """one page of payments and the cursor of the next, None on the last page"""
+        try:
+            return await page(self.wallet.payment_transactions_pages(address, limit, decode_cursor(cursor)))
+        except Exception as exception:
+            raise ValueError(f"Error while running get transactions page, {str(exception)}")
     
     def get_token_transactions(self, address: str, limit: int=0):
         try:
@@ -56,6 +102,21 @@ class XRPWalletClient():
                 f"Error while running get token transactions,\
                 {str(exception)}"
             )
+
+    async def async_get_token_transactions(self, address: str, limit: int=0):
+        try:
+            return await self.wallet.async_token_transactions(address, limit)
+        except Exception as exception:
+            raise ValueError(
+                f"Error while running get token transactions,\
+                {str(exception)}"
+            )
+
+    async def get_token_transactions_page(self, address: str, limit: int = None, cursor: str = None):
+        try:
+            return await page(self.wallet.token_transactions_pages(address, limit, decode_cursor(cursor)))
+        except Exception as exception:
+            raise ValueError(f"Error while running get token transactions page, {str(exception)}")
     
     def get_xrp_transactions(self, address:str, limit: int=0):
         try:
@@ -80,6 +141,20 @@ class XRPWalletClient():
             raise ValueError(
                 f"Error while running get tokens, {str(exception)}"
             )
+
+    async def async_get_tokens(self, address: str):
+        try:
+            return await self.wallet.async_account_tokens(address)
+        except Exception as exception:
+            raise ValueError(
+                f"Error while running get tokens, {str(exception)}"
+            )
+
+    async def get_tokens_page(self, address: str, limit: int = None, cursor: str = None):
+        try:
+            return await page(self.wallet.account_tokens_pages(address, limit, decode_cursor(cursor)))
+        except Exception as exception:
+            raise ValueError(f"Error while running get tokens page, {str(exception)}")
     
     def get_nfts(self, address: str, limit: int=0):
         try:
@@ -89,6 +164,30 @@ class XRPWalletClient():
                 f"Error while running get nfts, {str(exception)}"
             )
 
+    async def async_get_nfts(self, address: str, limit: int=0):
+        try:
+            return await self.wallet.async_account_nfts(address, limit)
+        except Exception as exception:
+            raise ValueError(
+                f"Error while running get nfts, {str(exception)}"
+            )
+
+    async def get_nfts_page(self, address: str, limit: int = None, cursor: str = None):
+        try:
+            return await page(self.wallet.account_nfts_pages(address, limit, decode_cursor(cursor)))
+        except Exception as exception:
+            raise ValueError(f"Error while running get nfts page, {str(exception)}")
+
+    async def get_nft_gallery_page(self, address: str, limit: int = None, cursor: str = None, mainnet: bool = False):
+        """one page of nfts with their metadata, image and thumbnail, an nft whose media fails gets an `error`"""
+        try:
+            wallet = xWallet(main_url, main_account, main_txns) if mainnet else self.wallet
+            nfts = await page(wallet.account_nfts_pages(address, limit, decode_cursor(cursor)))
+            nfts["result"] = await nft_media.gallery(nfts["result"] or [])
+            return nfts
+        except Exception as exception:
+            raise ValueError(f"Error while running get nft gallery page, {str(exception)}")
+
     def get_root_flags(self, address: str):
         try:
             return self.wallet.account_root_flags(address)
@@ -215,6 +314,18 @@ class XRPObjectClient():
             return self.x_object.account_checks(wallet_addr, limit)
         except Exception as exception:
             raise ValueError(f"Error while running account checks, {str(exception)}")
+
+    async def async_account_checks(self, wallet_addr: str, limit: int = None) -> dict:
+        try:
+            return await self.x_object.async_account_checks(wallet_addr, limit)
+        except Exception as exception:
+            raise ValueError(f"Error while running account checks, {str(exception)}")
+
+    async def account_checks_page(self, wallet_addr: str, limit: int = None, cursor: str = None) -> dict:
+        try:
+            return await page(self.x_object.account_checks_pages(wallet_addr, limit, decode_cursor(cursor)))
+        except Exception as exception:
+            raise ValueError(f"Error while running account checks page, {str(exception)}")
     
     def cash_xrp_check(
             self, sender_addr: str, check_id: str, amount: int | Decimal | float, fee: str
@@ -285,6 +396,22 @@ class XRPObjectClient():
             )
         except Exception as exception:
             raise ValueError(f"Error while running account xrp escrows, {str(exception)}")
+
+    async def async_account_xrp_escrows(
+            self, wallet_addr: str, limit: int
+        ) -> dict:
+        try:
+            return await self.x_object.async_account_xrp_escrows(
+                wallet_addr, limit
+            )
+        except Exception as exception:
+            raise ValueError(f"Error while running account xrp escrows, {str(exception)}")
+
+    async def account_xrp_escrows_page(self, wallet_addr: str, limit: int = None, cursor: str = None) -> dict:
+        try:
+            return await page(self.x_object.account_xrp_escrows_pages(wallet_addr, limit, decode_cursor(cursor)))
+        except Exception as exception:
+            raise ValueError(f"Error while running account xrp escrows page, {str(exception)}")
     
     def r_seq_dict(
             self, prev_txn_id: str
@@ -353,6 +480,20 @@ class XRPObjectClient():
             return self.x_object.account_offers(wallet_addr, limit)
         except Exception as exception:
             raise ValueError(f"Error while running account offers, {str(exception)}")
+
+    async def async_account_offers(
+            self, wallet_addr: str, limit: int
+        ) -> list:
+        try:
+            return await self.x_object.async_account_offers(wallet_addr, limit)
+        except Exception as exception:
+            raise ValueError(f"Error while running account offers, {str(exception)}")
+
+    async def account_offers_page(self, wallet_addr: str, limit: int = None, cursor: str = None) -> dict:
+        try:
+            return await page(self.x_object.account_offers_pages(wallet_addr, limit, decode_cursor(cursor)))
+        except Exception as exception:
+            raise ValueError(f"Error while running account offers page, {str(exception)}")
     
     def cancel_offer(
             self, sender_addr: str, offer_seq: int, fee: str
@@ -370,6 +511,14 @@ class XRPObjectClient():
         except Exception as exception:
             raise ValueError(f"Error while running all offers, {str(exception)}")
 
+    async def async_all_offers(
+            self, pay: float, receive: float, limit: int
+        ) -> list:
+        try:
+            return await self.x_object.async_all_offers(pay, receive, limit)
+        except Exception as exception:
+            raise ValueError(f"Error while running all offers, {str(exception)}")
+
 
 class XRPNFTClient():
     x_nft = xNFT(test_url, test_txns, test_account)
@@ -706,15 +855,33 @@ class XRPEngClient():
         except Exception as exception:
             raise ValueError(f"Error running, {exception}")
 
-    def created_taxons(self, wallet_addr: str):
+    async def async_created_nfts(self, wallet_addr: str, mainnet: bool = True):
+        try:
+            return await self.xengine.async_created_nfts(wallet_addr, mainnet)
+        except Exception as exception:
+            raise ValueError(f"Error running, {exception}")
+
+    def created_taxons(self, wallet_addr: str, mainnet: bool = True):
         try:
-            return self.xengine.created_taxons(wallet_addr)
+            return self.xengine.created_taxons(wallet_addr, mainnet)
         except Exception as exception:
             raise ValueError(f"Error running, {exception}")
 
-    def created_nfts_taxon(self, wallet_addr: str, taxon: int):
+    async def async_created_taxons(self, wallet_addr: str, mainnet: bool = True):
         try:
-            return self.xengine.created_nfts_taxon(wallet_addr, taxon)
+            return await self.xengine.async_created_taxons(wallet_addr, mainnet)
+        except Exception as exception:
+            raise ValueError(f"Error running, {exception}")
+
+    def created_nfts_taxon(self, wallet_addr: str, taxon: int, mainnet: bool = True):
+        try:
+            return self.xengine.created_nfts_taxon(wallet_addr, taxon, mainnet)
+        except Exception as exception:
+            raise ValueError(f"Error running, {exception}")
+
+    async def async_created_nfts_taxon(self, wallet_addr: str, taxon: int, mainnet: bool = True):
+        try:
+            return await self.xengine.async_created_nfts_taxon(wallet_addr, taxon, mainnet)
         except Exception as exception:
             raise ValueError(f"Error running, {exception}")
 
@@ -965,6 +1132,16 @@ class XammFinance():
                 f"Error running get account order book liquidity, {exception}"
             )
 
+    async def async_get_account_order_book_liquidity(
+            self, wallet_addr: str, limit: int = 0
+        ) -> list:
+        try:
+            return await self.xAmm.async_get_account_order_book_liquidity(wallet_addr, limit)
+        except Exception as exception:
+            raise ValueError(
+                f"Error running get account order book liquidity, {exception}"
+            )
+
 
     def order_book_swap(
             self, sender_addr: str, buy: Union[float, IssuedCurrencyAmount],
@@ -1000,6 +1177,11 @@ class XammFinance():
         except Exception as exception:
             raise ValueError(f"Error running create order book liquidity, {exception}")
 
+    def _book_pair(self, buy: str, sell: str, buy_issuer = None, sell_issuer = None):
+        buy_currency = XRP() if buy == "xrp" else IssuedCurrency(currency=buy, issuer=buy_issuer)
+        sell_currency = XRP() if sell == "xrp" else IssuedCurrency(currency=sell, issuer=sell_issuer)
+        return buy_currency, sell_currency
+
     async def sort_best_offer(
             self, buy: str,
             sell: str, best_buy: bool = False,
@@ -1012,39 +1194,243 @@ class XammFinance():
         choose either best_buy or best_sell
         """
         try:
-            if buy == "xrp" and sell == "xrp":
-                return await Xsort_best_offer(XRP(), XRP(), best_buy, best_sell, mainnet)
-            elif buy == "xrp" and sell != "xrp":
-                return await Xsort_best_offer(
-                    XRP(), IssuedCurrency(currency=sell, issuer=sell_issuer), best_buy,
-                    best_sell, mainnet
-                )
-            elif buy != "xrp" and sell == "xrp":
-                return await Xsort_best_offer(
-                    IssuedCurrency(currency=buy, issuer=buy_issuer),
-                    XRP(), best_buy, best_sell, mainnet
-                )
-            elif buy != "xrp" and sell != "xrp":
-                return await self.xAmm.sort_best_offer(
-                    IssuedCurrency(currency=buy, issuer=buy_issuer),
-                    IssuedCurrency(currency=sell, issuer=sell_issuer), best_buy,
-                    best_sell, mainnet
-                )
+            buy_currency, sell_currency = self._book_pair(buy, sell, buy_issuer, sell_issuer)
+            return await Xsort_best_offer(buy_currency, sell_currency, best_buy, best_sell, mainnet)
         except Exception as exception:
             raise ValueError(f"Error running sort best offer, {exception}")
+
+    async def order_book(
+            self, buy: str, sell: str,
+            buy_issuer = None, sell_issuer = None,
+            mainnet = True, limit: int = None
+        ) -> Dict:
+        """
+        asks and bids of a pair in one response, both sides fetched concurrently
+        """
+        try:
+            buy_currency, sell_currency = self._book_pair(buy, sell, buy_issuer, sell_issuer)
+            return await Xtwo_sided_book(buy_currency, sell_currency, mainnet, limit)
+        except Exception as exception:
+            raise ValueError(f"Error running order book, {exception}")
+
+    async def stream_best_offer(
+            self, buy: str,
+            sell: str, best_buy: bool = False,
+            best_sell: bool = False,
+            buy_issuer = None, sell_issuer = None,
+            mainnet = True
+        ) -> AsyncIterator[Dict]:
+        """
+        live sort_best_offer, yields the book again whenever it changes
+        """
+        try:
+            buy_currency, sell_currency = self._book_pair(buy, sell, buy_issuer, sell_issuer)
+            async for best in Xstream_best_offer(buy_currency, sell_currency, best_buy, best_sell, mainnet):
+                yield best
+        except Exception as exception:
+            raise ValueError(f"Error running stream best offer, {exception}")
     
+    async def quote_swap(
+            self, buy: str, sell: str, amount: float,
+            side: str = "buy", buy_issuer = None, sell_issuer = None,
+            mainnet = True
+        ) -> Dict:
+        """
+        expected fill, average and worst price and slippage of swapping `sell` into `buy`,
+        `amount` is what to receive (side buy) or to spend (side sell)
+        """
+        try:
+            buy_currency, sell_currency = self._book_pair(buy, sell, buy_issuer, sell_issuer)
+            return (await Xquote_book(buy_currency, sell_currency, mainnet)).quote(amount, side)
+        except Exception as exception:
+            raise ValueError(f"Error running quote swap, {exception}")
+
+    async def check_order_book_swap(
+            self, buy: float, sell: float, tf_sell: bool = False,
+            buy_type: str = "", sell_type: str = "",
+            buy_issuer = None, sell_issuer = None,
+            max_slippage: float = None, mainnet = True
+        ) -> Dict:
+        """
+        quote an order_book_swap before it is built, raises when the book can't fill it
+        within `sell`, when it would get less than `buy` (tf_sell), when it has to cross
+        offers past the OfferCreate's limit rate (`sell` per `buy`, it would be tecKILLED)
+        or slips more than `max_slippage` (0.01 = 1%)
+        """
+        if not buy > 0 or not sell > 0:
+            raise ValueError(f"Error running check order book swap, buy and sell must be positive, got {buy} and {sell}")
+        side, amount = ("sell", sell) if tf_sell else ("buy", buy)
+        quote = await self.quote_swap(buy_type, sell_type, amount, side, buy_issuer, sell_issuer, mainnet)
+        if not quote["fully_filled"]:
+            raise ValueError(f"Error running check order book swap, the book can only fill {quote['filled']} of {amount}")
+        if not tf_sell and quote["cost"] > sell:
+            raise ValueError(f"Error running check order book swap, filling {buy} costs {quote['cost']} which is more than {sell}")
+        if tf_sell and quote["filled"] < buy * (1 - 1e-12):
+            raise ValueError(f"Error running check order book swap, selling {sell} gets {quote['filled']} which is less than {buy}")
+        limit = sell / buy
+        if quote["worst_price"] is not None and quote["worst_price"] > limit * (1 + 1e-12):
+            raise ValueError(
+                f"Error running check order book swap, the fill reaches a price of {quote['worst_price']} "
+                f"past the offer's limit of {limit}"
+            )
+        if max_slippage is not None and quote["slippage"] > max_slippage:
+            raise ValueError(f"Error running check order book swap, slippage {quote['slippage']} is over {max_slippage}")
+        return quote
+
+    async def path_quote(
+            self, buy: str, sell: str, amount: float,
+            buy_issuer = None, sell_issuer = None,
+            account: str = None, mainnet = True
+        ) -> Dict:
+        """
+        cheapest paths to receive `amount` of `buy` paying `sell`, through xrp or any
+        other book rippled finds, not only the direct one
+        """
+        try:
+            buy_currency, sell_currency = self._book_pair(buy, sell, buy_issuer, sell_issuer)
+            return await path_cache.quote(buy_currency, sell_currency, amount, account, mainnet)
+        except Exception as exception:
+            raise ValueError(f"Error running path quote, {exception}")
+
+    async def route_quote(
+            self, buy: str, sell: str, amount: float,
+            side: str = "buy", buy_issuer = None, sell_issuer = None,
+            mainnet = True
+        ) -> Dict:
+        """
+        quote_swap across the pair's amm and its order book, with the split between them
+        """
+        try:
+            buy_currency, sell_currency = self._book_pair(buy, sell, buy_issuer, sell_issuer)
+            return (await router_cache.get(buy_currency, sell_currency, mainnet)).route(amount, side)
+        except Exception as exception:
+            raise ValueError(f"Error running route quote, {exception}")
+
+    async def submit(self, tx_blob: str, wait: bool = True, mainnet = True) -> Dict:
+        """
+        submit a signed blob, with `wait` the final result ("expired" past its
+        LastLedgerSequence) instead of the preliminary one
+        """
+        try:
+            if wait:
+                return await tx_tracker.submit_and_wait(tx_blob, mainnet)
+            return await tx_tracker.submit(tx_blob, mainnet)
+        except Exception as exception:
+            raise ValueError(f"Error running submit, {exception}")
+
+    async def tx_result(
+            self, txid: str, last_ledger_sequence: int = None,
+            timeout: float = TRACK_WAIT_TIMEOUT, mainnet = True
+        ) -> Dict:
+        """
+        a transaction's final result, waits for it up to `timeout` seconds instead of
+        being polled, result is "pending" when it isn't in yet
+        """
+        try:
+            return await tx_tracker.wait(txid, last_ledger_sequence, mainnet, timeout)
+        except Exception as exception:
+            raise ValueError(f"Error running tx result, {exception}")
+
+    def follow_tx(self, txid: str, last_ledger_sequence: int = None, mainnet = True) -> AsyncIterator[Dict]:
+        """the pending status, then the final result"""
+        return tx_tracker.follow(txid, last_ledger_sequence, mainnet)
+
+    async def route_swap(
+            self, sender_addr: str, buy: str, sell: str, amount: float,
+            side: str = "buy", buy_issuer = None, sell_issuer = None,
+            tolerance: float = ROUTE_TOLERANCE, fee: str = None, mainnet = True
+        ) -> Dict:
+        """
+        the route quote and the OfferCreate that executes it, rippled does the split itself.
+        side buy receives exactly `amount` paying at most the quoted cost plus `tolerance`,
+        side sell spends exactly `amount` for at least the quoted fill less `tolerance`
+        """
+        quote = await self.route_quote(buy, sell, amount, side, buy_issuer, sell_issuer, mainnet)
+        if not quote["fully_filled"]:
+            raise ValueError(f"Error running route swap, the pool and the book can only fill {quote['filled']} of {amount}")
+        try:
+            sell_rate = quote["transfer_rate"]
+            if side == "buy":
+                # TakerGets is what reaches the counterparties, the transfer fee comes on top
+                receive, spend = amount, quote["cost"] / sell_rate * (1 + tolerance)
+            else:
+                receive, spend = quote["filled"] * (1 - tolerance), amount / sell_rate
+            txn = self.xAmm.order_book_swap(
+                sender_addr, self._swap_amount(buy, buy_issuer, receive),
+                self._swap_amount(sell, sell_issuer, spend), side == "sell", True, False, fee
+            )
+            return {"quote": quote, "transaction": txn}
+        except Exception as exception:
+            raise ValueError(f"Error running route swap, {exception}")
+
+    def _swap_amount(self, currency: str, issuer: str, value: float) -> Union[float, IssuedCurrencyAmount]:
+        if currency == "xrp":
+            return round(value, 6)
+        return IssuedCurrencyAmount(currency=currency, issuer=issuer, value=f"{value:.15g}")
+
+    async def stream_quote_book(
+            self, buy: str, sell: str,
+            buy_issuer = None, sell_issuer = None,
+            mainnet = True
+        ) -> AsyncIterator[QuoteBook]:
+        """
+        a QuoteBook of the pair after every ledger that changes it
+        """
+        try:
+            buy_currency, sell_currency = self._book_pair(buy, sell, buy_issuer, sell_issuer)
+            async for book in Xstream_quote_book(buy_currency, sell_currency, mainnet):
+                yield book
+        except Exception as exception:
+            raise ValueError(f"Error running stream quote book, {exception}")
+
     def token_balance(self, wallet_addr: str, name: str, issuer_addr: str) -> List:
         try:
             return self.xAmm.token_balance(wallet_addr, name, issuer_addr)
         except Exception as exception:
             raise ValueError(f"Error running token balance, {exception}")
 
+    async def async_token_balance(self, wallet_addr: str, name: str, issuer_addr: str) -> List:
+        try:
+            return await self.xAmm.async_token_balance(wallet_addr, name, issuer_addr)
+        except Exception as exception:
+            raise ValueError(f"Error running token balance, {exception}")
+
     def status(self, txid: str) -> dict:
         response = self.xAmm.status(txid)
         return response
+
+    async def async_status(self, txid: str) -> dict:
+        return await self.xAmm.async_status(txid)
     
     def token_exists(self, token: str, issuer: str) -> dict:
         return self.xAmm.token_exists(token, issuer)
 
+    async def async_token_exists(self, token: str, issuer: str) -> dict:
+        return await self.xAmm.async_token_exists(token, issuer)
+
     def pending_offers(self, wallet_addr: str) -> list:
         return self.xAmm.pending_offers(wallet_addr)
+
+    async def async_pending_offers(self, wallet_addr: str) -> list:
+        return await self.xAmm.async_pending_offers(wallet_addr)
+
+    async def pending_offers_page(self, wallet_addr: str, limit: int = None, cursor: str = None) -> dict:
+        try:
+            return await page(self.xAmm.pending_offers_pages(wallet_addr, limit, decode_cursor(cursor)))
+        except Exception as exception:
+            raise ValueError(f"Error running pending offers page, {exception}")
+
+
+_xamm_clients: Dict[str, XammFinance] = {}
+
+
+def xamm_finance(network: str = "mainnet") -> XammFinance:
+    """return the XammFinance for `network`, built once per process\n
+    every client borrows its connections from the shared xrpl pool"""
+    network = "testnet" if network == "testnet" else "mainnet"
+    if network not in _xamm_clients:
+        if network == "testnet":
+            _xamm_clients[network] = XammFinance(test_url, test_account, test_txns)
+        else:
+            _xamm_clients[network] = XammFinance(main_url, main_account, main_txns)
+    return _xamm_clients[network]
@@ -3,6 +3,9 @@ from typing import Any, Dict, List, Optional, Union
 
 from pydantic import AnyHttpUrl, BaseSettings, EmailStr, HttpUrl, PostgresDsn, validator
 
+from blockchain.xrp.x_constants import (POOL_KEEPALIVE_EXPIRY, POOL_MAX_CONNECTIONS,
+                                        POOL_MAX_KEEPALIVE_CONNECTIONS, POOL_TIMEOUT)
+
 
 class Settings(BaseSettings):
     API_V1_STR: str = "/api/v1"
@@ -81,6 +84,38 @@ class Settings(BaseSettings):
     FIRST_SUPERUSER_PASSWORD: str
     USERS_OPEN_REGISTRATION: bool
 
+    # shared keep-alive pool used by every xrpl json rpc client, limits are per network,
+    # defaults in blockchain.xrp.x_constants
+    XRPL_POOL_MAX_CONNECTIONS: int = POOL_MAX_CONNECTIONS
+    XRPL_POOL_MAX_KEEPALIVE_CONNECTIONS: int = POOL_MAX_KEEPALIVE_CONNECTIONS
+    XRPL_POOL_KEEPALIVE_EXPIRY: float = POOL_KEEPALIVE_EXPIRY
+    XRPL_POOL_TIMEOUT: float = POOL_TIMEOUT
+    # validated reads are cached per ledger, XRPL_CACHE_TTL=0 turns it off
+    XRPL_CACHE_TTL: float = 4.0
+    XRPL_CACHE_MAX_ENTRIES: int = 10000
+    XRPL_CACHE_REDIS_URL: Optional[str] = None
+    XRPL_CACHE_FOLLOW_LEDGER: bool = True
+    # default payer for path quotes, see blockchain.xrp.Paths
+    XRPL_PATH_ACCOUNT: Optional[str] = None
+    XRPL_PATH_MAX_SUBSCRIPTIONS: int = 8
+    # xrpldata / xrplmeta answers are also kept on disk when a directory is set
+    DATA_API_CACHE_DIR: Optional[str] = None
+    DATA_API_CONCURRENCY: int = 16
+    # nft metadata and images, ipfs through this gateway, kept on disk when a directory is set
+    NFT_IPFS_GATEWAY: str = "https://onxrp.infura-ipfs.io"
+    NFT_MEDIA_CACHE_DIR: Optional[str] = None
+    # amqp url of the broker the workers share websocket topics through, unset for one worker
+    PUBSUB_URL: Optional[str] = None
+    PUBSUB_CONNECT_TIMEOUT: float = 10.0
+    # durable notification queues, in memory (lost on restart) when unset
+    NOTIFICATIONS_URL: Optional[str] = None
+    NOTIFICATIONS_PREFETCH: int = 100
+    # dead websockets are found by protocol pings, not application messages
+    # applied by uvicorn.run in main.py (the image runs it), pass --ws-ping-interval and
+    # --ws-ping-timeout when serving the app with the uvicorn command instead
+    WS_PING_INTERVAL: float = 20.0
+    WS_PING_TIMEOUT: float = 20.0
+
     class Config:
         case_sensitive = True
 
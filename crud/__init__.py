@@ -1,5 +1,5 @@
 from .crud_user import user
-from .crud_transaction import transaction
+from .crud_transaction import transaction, wallet_transaction
 from .crud_xamm import xamm_wallet
 # For a new basic set of CRUD operations you could just do
 
@@ -1,11 +1,15 @@
-from typing import List
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
 
 from fastapi.encoders import jsonable_encoder
+from sqlalchemy import tuple_
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session
 
 from .base import CRUDBase
-from models.transaction import Transaction
+from models.transaction import IndexedWallet, Transaction, WalletTransaction
 from schemas.transaction import Transaction as TransactionCreate
+from schemas.transaction import WalletTransaction as WalletTransactionCreate
 
 
 class CRUDTransaction(CRUDBase[Transaction, TransactionCreate, TransactionCreate]):
@@ -32,3 +36,69 @@ class CRUDTransaction(CRUDBase[Transaction, TransactionCreate, TransactionCreate
 
 
 transaction = CRUDTransaction(Transaction)
+
+
+# history filters that match a column as is
+HISTORY_FILTERS = ("kind", "tx_type", "currency", "issuer", "counterparty", "direction")
+
+
+class CRUDWalletTransaction(CRUDBase[WalletTransaction, WalletTransactionCreate, WalletTransactionCreate]):
+    def add_many(self, db: Session, *, records: List[Dict[str, Any]]) -> int:
+        """insert indexed records, the ones already there are skipped, returns how many were new"""
+        if not records:
+            return 0
+        dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+        statement = dialect.insert(WalletTransaction).values(records).on_conflict_do_nothing(
+            index_elements=["wallet", "network", "txid"]
+        )
+        inserted = db.execute(statement).rowcount
+        db.commit()
+        return inserted
+
+    def history(
+        self, db: Session, *, wallet: str, network: str, limit: int, cursor: Optional[Tuple[int, int]] = None,
+        start: datetime = None, end: datetime = None, **filters
+    ) -> Tuple[List[WalletTransaction], Optional[Tuple[int, int]]]:
+        """newest first, `cursor` is the (ledger_index, tx_index) the previous page stopped before,
+        returns the page and the cursor of the next one"""
+        query = db.query(WalletTransaction).filter(
+            WalletTransaction.wallet == wallet, WalletTransaction.network == network
+        )
+        for name in HISTORY_FILTERS:
+            if filters.get(name) is not None:
+                query = query.filter(getattr(WalletTransaction, name) == filters[name])
+        if start is not None:
+            query = query.filter(WalletTransaction.date >= start)
+        if end is not None:
+            query = query.filter(WalletTransaction.date <= end)
+        if cursor is not None:
+            query = query.filter(tuple_(WalletTransaction.ledger_index, WalletTransaction.tx_index) < tuple(cursor))
+        rows = (
+            query.order_by(WalletTransaction.ledger_index.desc(), WalletTransaction.tx_index.desc())
+            .limit(limit + 1)
+            .all()
+        )
+        if len(rows) <= limit:
+            return rows, None
+        rows = rows[:limit]
+        return rows, (rows[-1].ledger_index, rows[-1].tx_index)
+
+    def get_state(self, db: Session, *, wallet: str, network: str) -> Optional[IndexedWallet]:
+        return db.query(IndexedWallet).filter(
+            IndexedWallet.wallet == wallet, IndexedWallet.network == network
+        ).first()
+
+    def save_state(self, db: Session, *, wallet: str, network: str, **changes) -> IndexedWallet:
+        state = self.get_state(db, wallet=wallet, network=network)
+        if state is None:
+            state = IndexedWallet(wallet=wallet, network=network, complete=False)
+            db.add(state)
+        for key, value in changes.items():
+            setattr(state, key, value)
+        state.updated = datetime.now(timezone.utc)
+        db.commit()
+        db.refresh(state)
+        return state
+
+
+wallet_transaction = CRUDWalletTransaction(WalletTransaction)
@@ -3,4 +3,4 @@
 from db.base_class import Base  # noqa
 from models.user import User  # noqa
 from models.wallet import Wallet
-from models.transaction import Transaction
+from models.transaction import IndexedWallet, Transaction, WalletTransaction
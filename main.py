@@ -1,18 +1,33 @@
 import asyncio
 import concurrent.futures
+import json
+import logging
 
 
 import time
 from fastapi import FastAPI,  WebSocket, WebSocketDisconnect
 from starlette.middleware.cors import CORSMiddleware
-from blockchain.xrp_client import XammFinance
+from blockchain.xrp_client import XammFinance, xamm_finance
+from blockchain.xrp.Pool import xrpl_pool
+from blockchain.xrp.Stream import close_streams, xrpl_stream
+from blockchain.xrp.Cache import MemoryBackend, RedisBackend, ResponseCache
+from blockchain.xrp.Paths import path_cache
+from blockchain.xrp.Indexer import DatabaseTxStore, tx_indexer
+from blockchain.xrp.DataApi import data_api
+from blockchain.xrp.Media import nft_media
+from blockchain.xrp.NftOffers import nft_offer_cache
+from notification.websocket_manager import COALESCE, manager
+from notification.pubsub import RabbitPubSub
+from notification.messaging_bq import RabbitMailboxes, mq
 
 
 from api.api_v1.api import api_router
 from core.config import settings
+from db.session import SessionLocal
 
 import uvicorn
 
+logger = logging.getLogger(__name__)
 
 app = FastAPI(
     title=settings.PROJECT_NAME, openapi_url=f"{settings.API_V1_STR}/openapi.json"
@@ -31,24 +46,168 @@ if settings.BACKEND_CORS_ORIGINS:
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
 
+@app.on_event("startup")
+async def configure_xrpl_pool():
+    xrpl_pool.configure(
+        max_connections=settings.XRPL_POOL_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.XRPL_POOL_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.XRPL_POOL_KEEPALIVE_EXPIRY,
+        timeout=settings.XRPL_POOL_TIMEOUT,
+    )
+    path_cache.configure(account=settings.XRPL_PATH_ACCOUNT, max_subscriptions=settings.XRPL_PATH_MAX_SUBSCRIPTIONS)
+    tx_indexer.configure(store=DatabaseTxStore(SessionLocal))
+    data_api.configure(cache_dir=settings.DATA_API_CACHE_DIR, concurrency=settings.DATA_API_CONCURRENCY)
+    nft_media.configure(
+        gateway=settings.NFT_IPFS_GATEWAY,
+        cache_dir=settings.NFT_MEDIA_CACHE_DIR,
+        media_path=f"{settings.API_V1_STR}/xrp/nft-media/",
+    )
+    if settings.PUBSUB_URL:
+        try:
+            await manager.attach(RabbitPubSub(settings.PUBSUB_URL, connect_timeout=settings.PUBSUB_CONNECT_TIMEOUT))
+        except ConnectionError as exception:
+            # feeds then run on every worker, as with one worker
+            logger.warning("websocket topics stay local to this worker, %s", exception)
+    mq.configure(prefetch=settings.NOTIFICATIONS_PREFETCH)
+    if settings.NOTIFICATIONS_URL:
+        mq.configure(mailboxes=RabbitMailboxes(settings.NOTIFICATIONS_URL))
+    if settings.XRPL_CACHE_TTL > 0:
+        backend = (
+            RedisBackend(settings.XRPL_CACHE_REDIS_URL)
+            if settings.XRPL_CACHE_REDIS_URL
+            else MemoryBackend(settings.XRPL_CACHE_MAX_ENTRIES)
+        )
+        cache = ResponseCache(ttl=settings.XRPL_CACHE_TTL, backend=backend)
+        xrpl_pool.configure(cache=cache)
+        if settings.XRPL_CACHE_FOLLOW_LEDGER:
+            for mainnet in (True, False):
+                await cache.follow_ledger(xrpl_stream(mainnet), xrpl_pool.network_url(mainnet))
+
+
+@app.on_event("shutdown")
+async def close_xrpl_pool():
+    await manager.close()
+    await mq.close()
+    await path_cache.close()
+    await tx_indexer.close()
+    await data_api.aclose()
+    await nft_media.aclose()
+    await nft_offer_cache.close()
+    await close_streams()
+    await xrpl_pool.aclose()
+
+
+def _book_request(text: str) -> dict:
+    """a book socket message, ValueError when it isn't one"""
+    try:
+        data = json.loads(text)
+    except ValueError:
+        raise ValueError("expected json")
+    if not isinstance(data, dict):
+        raise ValueError("expected a json object")
+    for name in ("buy", "sell"):
+        if not isinstance(data.get(name), str) or not data[name]:
+            raise ValueError(f"{name} must be a currency code")
+    for name in ("buy_issuer", "sell_issuer"):
+        if data.get(name) is not None and not isinstance(data[name], str):
+            raise ValueError(f"{name} must be an address")
+    for name in ("best_buy", "best_sell", "mainnet"):
+        if name in data and not isinstance(data[name], bool):
+            raise ValueError(f"{name} must be true or false")
+    return data
+
+
+def _quote_request(text: str) -> dict:
+    """a /ws/quote message, ValueError when it isn't one"""
+    data = _book_request(text)
+    amount = data.get("amount")
+    if amount not in (None, "") and (isinstance(amount, bool) or not isinstance(amount, (int, float, str))):
+        raise ValueError("amount must be a number")
+    if data.get("side", "buy") not in ("buy", "sell"):
+        raise ValueError("side must be buy or sell")
+    return data
+
+
 @app.websocket("/ws/sort-best-offer")
 async def sort_best_offer(websocket: WebSocket):
+    """push the selected book on every ledger change, a new message switches the book
+
+    sockets on the same book share one feed, a slow socket only gets the latest book,
+    a message that isn't {buy, sell, best_buy?, best_sell?, buy_issuer?, sell_issuer?, mainnet?} gets {error}"""
+    await manager.connect(websocket)
+    client = xamm_finance()
+    topic = None
+    try:
+        while True:
+            try:
+                data = _book_request(await websocket.receive_text())
+            except ValueError as exception:
+                manager.send(websocket, {"error": str(exception)})
+                continue
+            args = (
+                data["buy"], data["sell"], data.get("best_buy", False), data.get("best_sell", False),
+                data.get("buy_issuer"), data.get("sell_issuer"), data.get("mainnet", True),
+            )
+            if topic is not None:
+                manager.unsubscribe(websocket, topic)
+            topic = "best-offer:" + json.dumps(args)
+            manager.subscribe(websocket, topic, lambda args=args: client.stream_best_offer(*args), COALESCE)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        manager.disconnect(websocket)
+
+@app.websocket("/ws/quote")
+async def quote(websocket: WebSocket):
+    """quote a swap on every message (keystroke), and again whenever the book changes\n
+    messages are {buy, sell, buy_issuer, sell_issuer, mainnet, amount, side}, the book
+    is only re-watched when the pair changes, a message that isn't one gets {error}"""
     await websocket.accept()
-    while True:
-        data = await websocket.receive_json()
-        client = XammFinance()
-        best_offer = await client.sort_best_offer(
-            data["buy"],
-            data["sell"],
-            data["best_buy"],
-            data["best_sell"],
-            data["buy_issuer"],
-            data["sell_issuer"],
-            data["mainnet"],
-        )
-        await websocket.send_json(
-            best_offer
-        )
+    client = xamm_finance()
+    state = {"pair": None, "book": None, "request": None}
+
+    async def send_quote():
+        request, book = state["request"], state["book"]
+        if book is None or not request.get("amount"):
+            return
+        try:
+            await websocket.send_json(book.quote(float(request["amount"]), request.get("side", "buy")))
+        except ValueError as exception:
+            await websocket.send_json({"error": str(exception)})
+
+    async def watch(pair: tuple):
+        try:
+            async for book in client.stream_quote_book(*pair):
+                state["book"] = book
+                await send_quote()
+        except Exception as exception:
+            await websocket.send_json({"error": str(exception)})
+
+    watcher = None
+    try:
+        while True:
+            try:
+                data = _quote_request(await websocket.receive_text())
+            except ValueError as exception:
+                await websocket.send_json({"error": str(exception)})
+                continue
+            state["request"] = data
+            pair = (data["buy"], data["sell"], data.get("buy_issuer"), data.get("sell_issuer"), data.get("mainnet", True))
+            if pair != state["pair"]:
+                if watcher is not None:
+                    watcher.cancel()
+                state["pair"], state["book"] = pair, None
+                watcher = asyncio.create_task(watch(pair))
+            else:
+                await send_quote()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        if watcher is not None:
+            watcher.cancel()
 
 if __name__ == '__main__':
-    uvicorn.run("main:app", host="0.0.0.0", port=8080, reload=True)
+    uvicorn.run(
+        "main:app", host="0.0.0.0", port=8080, reload=True,
+        ws_ping_interval=settings.WS_PING_INTERVAL, ws_ping_timeout=settings.WS_PING_TIMEOUT,
+    )
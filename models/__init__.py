@@ -1,4 +1,4 @@
 from .user import User
 from .wallet import Wallet
-from .transaction import Transaction
+from .transaction import IndexedWallet, Transaction, WalletTransaction
 from .xamm import XAMMWallet
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Float, ForeignKey, Integer, String
+from sqlalchemy import (JSON, BigInteger, Boolean, Column, DateTime, Float, ForeignKey,
+                        Index, Integer, String, UniqueConstraint)
 from sqlalchemy.orm import relationship
 
 from db.base_class import Base
@@ -15,3 +16,55 @@ class Transaction(Base):
     amount = Column(Float, nullable=False)
     transaction_type = Column(String, nullable=False)
     receipient = Column(String, nullable=False)
+
+
+class WalletTransaction(Base):
+    """one validated transaction as seen from one wallet, see blockchain.xrp.Indexer and Classifier"""
+    __tablename__ = 'wallet_transactions'
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    wallet = Column(String, nullable=False)
+    network = Column(String, nullable=False)
+    txid = Column(String, nullable=False)
+    ledger_index = Column(Integer, nullable=False)
+    tx_index = Column(Integer, nullable=False, default=0)
+    date = Column(DateTime(timezone=True), nullable=False)
+    kind = Column(String, nullable=False, default="other")
+    tx_type = Column(String, nullable=False)
+    result = Column(String, nullable=False)
+    direction = Column(String, nullable=False)
+    sender = Column(String, nullable=False)
+    receiver = Column(String, nullable=True)
+    counterparty = Column(String, nullable=True)
+    currency = Column(String, nullable=True)
+    issuer = Column(String, nullable=True)
+    amount = Column(String, nullable=True)
+    fee = Column(String, nullable=False)
+    details = Column(JSON, nullable=True)
+
+    __table_args__ = (
+        UniqueConstraint("wallet", "network", "txid", name="uq_wallet_transactions_wallet_txid"),
+        # history is read newest first, by wallet and optionally one of these
+        Index("ix_wallet_transactions_order", "wallet", "network", "ledger_index", "tx_index"),
+        Index("ix_wallet_transactions_type", "wallet", "network", "tx_type", "ledger_index"),
+        Index("ix_wallet_transactions_kind", "wallet", "network", "kind", "ledger_index"),
+        Index("ix_wallet_transactions_currency", "wallet", "network", "currency", "issuer", "ledger_index"),
+        Index("ix_wallet_transactions_counterparty", "wallet", "network", "counterparty", "ledger_index"),
+        Index("ix_wallet_transactions_date", "wallet", "network", "date"),
+    )
+
+
+class IndexedWallet(Base):
+    """how far a wallet's index goes, `marker` is where the backfill carries on"""
+    __tablename__ = 'indexed_wallets'
+
+    id = Column(Integer, primary_key=True)
+    wallet = Column(String, nullable=False)
+    network = Column(String, nullable=False)
+    marker = Column(JSON, nullable=True)
+    complete = Column(Boolean, nullable=False, default=False)
+    newest_ledger = Column(Integer, nullable=True)
+    oldest_ledger = Column(Integer, nullable=True)
+    updated = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (UniqueConstraint("wallet", "network", name="uq_indexed_wallets_wallet"),)
@@ -0,0 +1,404 @@
+import asyncio
+import json
+import logging
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import count
+from typing import Any, Callable, Deque, Dict, Hashable, List, Set, Tuple
+
+from fastapi import WebSocket
+
+"""
+notifications for users who may not be connected
+
+every user has a queue of their own, on rabbitmq a durable `notifications.user.<id>`
+queue with persistent messages, so nothing is lost while they are offline. a
+connected socket consumes its queue with a prefetch limit, sends what arrived
+within `linger` (up to `batch_size`) as one frame and acks the whole batch with a
+single multiple ack once it is written, a reconnect drains the backlog in a few
+frames instead of a send and an ack per message. whatever isn't acked when the
+socket goes away goes back to the queue
+
+dead sockets are found by the websocket protocol's own ping/pong (uvicorn's
+ws_ping_interval, set from WS_PING_INTERVAL by main.py), the socket is only
+read to notice the disconnect
+"""
+
+logger = logging.getLogger(__name__)
+
+PREFETCH = 100
+BATCH_SIZE = 50
+LINGER = 0.01
+QUEUE_PREFIX = "notifications.user."
+# rabbitmq's default channel_max is 2047, consumers are spread over connections
+CHANNELS_PER_CONNECTION = 1000
+
+Delivery = Tuple[int, str]
+
+
+class Consumer(ABC):
+    """one socket's consumption of a user's queue"""
+
+    def __init__(self):
+        self._deliveries: Deque[Delivery] = deque()
+        self._arrived = asyncio.Event()
+        self._error: Exception = None
+
+    def _put(self, tag: int, text: str) -> None:
+        self._deliveries.append((tag, text))
+        self._arrived.set()
+
+    def _fail(self, exception: Exception) -> None:
+        self._error = exception
+        self._arrived.set()
+
+    async def batch(self, size: int = BATCH_SIZE, linger: float = LINGER) -> List[Delivery]:
+        """the next deliveries, waits for the first and then at most `linger` for more"""
+        deliveries = self._deliveries
+        while not deliveries:
+            if self._error is not None:
+                raise self._error
+            self._arrived.clear()
+            await self._arrived.wait()
+        if len(deliveries) < size and linger > 0 and self._error is None:
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + linger
+            while len(deliveries) < size and self._error is None:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                self._arrived.clear()
+                try:
+                    await asyncio.wait_for(self._arrived.wait(), remaining)
+                except asyncio.TimeoutError:
+                    break
+        # a failure after this is raised on the next call, what arrived is sent first
+        return [deliveries.popleft() for _ in range(min(size, len(deliveries)))]
+
+    @abstractmethod
+    async def ack(self, tag: int) -> None:
+        """ack every delivery up to and including `tag`"""
+        ...
+
+    @abstractmethod
+    async def close(self) -> None:
+        """stop consuming, unacked deliveries go back to the queue"""
+        ...
+
+
+class MemoryConsumer(Consumer):
+    def __init__(self, mailboxes: "MemoryMailboxes", user_id: Hashable, prefetch: int):
+        super().__init__()
+        self.mailboxes = mailboxes
+        self.user_id = user_id
+        self.prefetch = prefetch
+        self.unacked: "OrderedDict[int, str]" = OrderedDict()
+        self._tags = count(1)
+
+    def _fill(self) -> None:
+        ready = self.mailboxes.ready.get(self.user_id)
+        while ready and len(self.unacked) < self.prefetch:
+            tag, text = next(self._tags), ready.popleft()
+            self.unacked[tag] = text
+            self._put(tag, text)
+
+    async def ack(self, tag: int) -> None:
+        self.mailboxes.acks += 1
+        unacked = self.unacked
+        while unacked and next(iter(unacked)) <= tag:
+            unacked.popitem(last=False)
+        self._fill()
+
+    async def close(self) -> None:
+        consumers = self.mailboxes.consumers.get(self.user_id, [])
+        if self in consumers:
+            consumers.remove(self)
+        if self.unacked:
+            self.mailboxes.ready.setdefault(self.user_id, deque()).extendleft(reversed(self.unacked.values()))
+            self.unacked.clear()
+        for consumer in consumers:
+            consumer._fill()
+
+
+class MemoryMailboxes:
+    """the queues in this process, for tests and a single worker without a broker, they
+    survive a socket going away but not a restart"""
+
+    def __init__(self):
+        self.ready: Dict[Hashable, Deque[str]] = {}
+        self.consumers: Dict[Hashable, List[MemoryConsumer]] = {}
+        self.acks = 0
+
+    async def publish(self, user_id: Hashable, text: str) -> None:
+        self.ready.setdefault(user_id, deque()).append(text)
+        for consumer in self.consumers.get(user_id, ()):
+            consumer._fill()
+
+    async def consume(self, user_id: Hashable, prefetch: int) -> MemoryConsumer:
+        consumer = MemoryConsumer(self, user_id, prefetch)
+        self.consumers.setdefault(user_id, []).append(consumer)
+        consumer._fill()
+        return consumer
+
+    def pending(self, user_id: Hashable) -> int:
+        """messages not acked yet, delivered or not"""
+        return len(self.ready.get(user_id, ())) + sum(len(consumer.unacked) for consumer in self.consumers.get(user_id, ()))
+
+    async def close(self) -> None:
+        pass
+
+
+class _Connection:
+    """a BlockingConnection and the thread it lives on, consumer channels are opened,
+    acked and closed on that thread through `call`"""
+
+    def __init__(self, pika, url: str, loop: asyncio.AbstractEventLoop):
+        self.pika = pika
+        self.url = url
+        self.loop = loop
+        self.connection = None
+        self.consumers: Set["RabbitConsumer"] = set()
+        self.closing = False
+        self._ready: Future = Future()
+        self._thread = threading.Thread(target=self._run, name="notifications", daemon=True)
+
+    async def start(self) -> "_Connection":
+        self._thread.start()
+        await asyncio.wrap_future(self._ready)
+        return self
+
+    @property
+    def is_open(self) -> bool:
+        return self.connection is not None and self.connection.is_open and not self.closing
+
+    def _run(self) -> None:
+        try:
+            self.connection = self.pika.BlockingConnection(self.pika.URLParameters(self.url))
+        except Exception as exception:
+            self._ready.set_exception(exception)
+            return
+        self._ready.set_result(None)
+        error: Exception = ConnectionError("notification broker connection closed")
+        try:
+            # also where rabbitmq's heartbeats are answered
+            while not self.closing:
+                self.connection.process_data_events(time_limit=1)
+            self.connection.close()
+        except Exception as exception:
+            error = exception
+        for consumer in list(self.consumers):
+            self.loop.call_soon_threadsafe(consumer._fail, error)
+
+    async def call(self, callback: Callable[[], Any]) -> Any:
+        done: Future = Future()
+
+        def run():
+            try:
+                done.set_result(callback())
+            except Exception as exception:
+                done.set_exception(exception)
+        self.connection.add_callback_threadsafe(run)
+        return await asyncio.wrap_future(done)
+
+    async def close(self) -> None:
+        self.closing = True
+        await self.loop.run_in_executor(None, self._thread.join, 5)
+
+
+class RabbitConsumer(Consumer):
+    def __init__(self, connection: _Connection, queue: str):
+        super().__init__()
+        self.connection = connection
+        self.queue = queue
+        self.channel = None
+
+    async def start(self, prefetch: int) -> "RabbitConsumer":
+        def open_channel():
+            channel = self.connection.connection.channel()
+            channel.queue_declare(self.queue, durable=True)
+            channel.basic_qos(prefetch_count=prefetch)
+            channel.basic_consume(self.queue, self._on_message)
+            self.channel = channel
+        self.connection.consumers.add(self)
+        try:
+            await self.connection.call(open_channel)
+        except Exception:
+            self.connection.consumers.discard(self)
+            raise
+        return self
+
+    def _on_message(self, channel, method, properties, body: bytes) -> None:
+        self.connection.loop.call_soon_threadsafe(self._put, method.delivery_tag, body.decode())
+
+    async def ack(self, tag: int) -> None:
+        # delivery tags are per channel and the channel is this user's, so multiple is safe
+        await self.connection.call(lambda: self.channel.basic_ack(tag, multiple=True))
+
+    async def close(self) -> None:
+        self.connection.consumers.discard(self)
+        if self.channel is not None and self.connection.is_open:
+            try:
+                await self.connection.call(lambda: self.channel.is_open and self.channel.close())
+            except Exception:
+                pass
+
+
+class RabbitMailboxes:
+    """durable queues on rabbitmq, a channel per consuming socket (prefetch and multiple
+    acks are per channel) spread over as many connections as needed"""
+
+    def __init__(self, url: str, channels_per_connection: int = CHANNELS_PER_CONNECTION):
+        import pika  # only needed with a broker
+
+        self.pika = pika
+        self.url = url
+        self.channels_per_connection = channels_per_connection
+        self._connections: List[_Connection] = []
+        self._opening: asyncio.Lock = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="notifications-publish")
+        self._publisher = None
+        self._publish_channel = None
+        self._declared: Set[str] = set()
+
+    def _channel(self):
+        if self._publisher is None or self._publisher.is_closed:
+            self._publisher = self.pika.BlockingConnection(self.pika.URLParameters(self.url))
+            self._publish_channel = self._publisher.channel()
+            self._declared.clear()
+        elif self._publish_channel.is_closed:
+            self._publish_channel = self._publisher.channel()
+        return self._publish_channel
+
+    def _publish(self, queue: str, text: str) -> None:
+        properties = self.pika.BasicProperties(delivery_mode=2, content_type="application/json")
+        for attempt in range(2):
+            try:
+                channel = self._channel()
+                if queue not in self._declared:
+                    channel.queue_declare(queue, durable=True)
+                    self._declared.add(queue)
+                channel.basic_publish("", queue, text.encode(), properties)
+                return
+            except self.pika.exceptions.AMQPConnectionError:
+                self._publisher = None
+                if attempt:
+                    raise
+
+    async def publish(self, user_id: Hashable, text: str) -> None:
+        await asyncio.get_running_loop().run_in_executor(self._executor, self._publish, f"{QUEUE_PREFIX}{user_id}", text)
+
+    async def _connection(self) -> _Connection:
+        if self._opening is None:
+            self._opening = asyncio.Lock()
+        async with self._opening:
+            self._connections = [connection for connection in self._connections if connection.is_open]
+            for connection in self._connections:
+                if len(connection.consumers) < self.channels_per_connection:
+                    return connection
+            connection = await _Connection(self.pika, self.url, asyncio.get_running_loop()).start()
+            self._connections.append(connection)
+            return connection
+
+    async def consume(self, user_id: Hashable, prefetch: int) -> RabbitConsumer:
+        connection = await self._connection()
+        return await RabbitConsumer(connection, f"{QUEUE_PREFIX}{user_id}").start(prefetch)
+
+    async def close(self) -> None:
+        await asyncio.gather(*[connection.close() for connection in self._connections], return_exceptions=True)
+        self._connections = []
+        if self._publisher is not None and self._publisher.is_open:
+            await asyncio.get_running_loop().run_in_executor(self._executor, self._publisher.close)
+        self._executor.shutdown(wait=False)
+
+
+def _is_json(text: str) -> bool:
+    try:
+        json.loads(text)
+    except ValueError:
+        logger.warning("dropped a notification that isn't json: %.100s", text)
+        return False
+    return True
+
+
+class Notifications:
+    """users' notification queues and the sockets draining them, one socket per user,
+    a newer one takes over"""
+
+    def __init__(self, mailboxes=None, prefetch: int = PREFETCH, batch_size: int = BATCH_SIZE, linger: float = LINGER):
+        self.mailboxes = mailboxes or MemoryMailboxes()
+        self.prefetch = prefetch
+        self.batch_size = batch_size
+        self.linger = linger
+        self._sessions: Dict[Hashable, asyncio.Task] = {}
+        self.delivered = 0
+        self.batches = 0
+
+    def configure(self, **options) -> None:
+        for name, value in options.items():
+            if name.startswith("_") or not hasattr(self, name):
+                raise ValueError(f"unknown notifications option {name}")
+            setattr(self, name, value)
+
+    async def notify(self, user_id: Hashable, message: Any) -> None:
+        """queue a message for a user, connected or not"""
+        await self.mailboxes.publish(user_id, json.dumps(message, default=str))
+
+    def connected(self, user_id: Hashable) -> bool:
+        return user_id in self._sessions
+
+    async def serve(self, websocket: WebSocket, user_id: Hashable) -> None:
+        """deliver the user's notifications to an accepted socket until it disconnects"""
+        previous = self._sessions.get(user_id)
+        if previous is not None:
+            previous.cancel()
+        consumer = await self.mailboxes.consume(user_id, self.prefetch)
+        delivering = asyncio.create_task(self._deliver(websocket, consumer))
+        receiving = asyncio.create_task(self._receive(websocket))
+        self._sessions[user_id] = delivering
+        try:
+            await asyncio.wait({delivering, receiving}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            still_open = not receiving.done()
+            taken_over = delivering.cancelled()
+            delivering.cancel()
+            receiving.cancel()
+            await consumer.close()
+            if self._sessions.get(user_id) is delivering:
+                del self._sessions[user_id]
+            if still_open:
+                # a newer socket took over, or the broker went away and the client should reconnect
+                try:
+                    await websocket.close(code=1000 if taken_over else 1011)
+                except Exception:
+                    pass
+
+    async def _deliver(self, websocket: WebSocket, consumer: Consumer) -> None:
+        while True:
+            batch = await consumer.batch(self.batch_size, self.linger)
+            messages = [text for _, text in batch if _is_json(text)]
+            if messages:
+                # the messages are json already, only the envelope is encoded here
+                await websocket.send_text('{"type": "notifications", "messages": [' + ", ".join(messages) + "]}")
+            # what isn't json never will be, it is acked with the rest instead of coming back
+            await consumer.ack(batch[-1][0])
+            self.delivered += len(messages)
+            self.batches += 1
+
+    async def _receive(self, websocket: WebSocket) -> None:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+
+    async def close(self) -> None:
+        for session in list(self._sessions.values()):
+            session.cancel()
+        await self.mailboxes.close()
+
+    def stats(self) -> dict:
+        return {"connected": len(self._sessions), "delivered": self.delivered, "batches": self.batches}
+
+
+mq = Notifications()
@@ -0,0 +1,282 @@
+import asyncio
+import hashlib
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Set
+
+"""
+topic messages between the workers of a deployment
+
+a Broadcaster with a bus publishes a topic update once and every worker with
+subscribers for that topic gets it, see Broadcaster.attach(bus). feeds
+(one rippled subscription per topic) are claimed so only one worker in the
+cluster runs each, the others just relay what it publishes
+
+RabbitPubSub is the real thing over pika, MemoryPubSub keeps several workers
+in one process (tests, a single worker deployment)
+"""
+
+Deliver = Callable[[str, str, str], None]
+
+
+class PubSub(ABC):
+    """what a Broadcaster needs from a bus, `deliver(topic, text, policy)` is called on the loop"""
+
+    @abstractmethod
+    async def start(self, deliver: Deliver) -> None:
+        ...
+
+    @abstractmethod
+    async def publish(self, topic: str, text: str, policy: str) -> None:
+        ...
+
+    @abstractmethod
+    async def bind(self, topic: str) -> None:
+        """start receiving a topic"""
+        ...
+
+    @abstractmethod
+    async def unbind(self, topic: str) -> None:
+        ...
+
+    @abstractmethod
+    async def claim(self, topic: str) -> bool:
+        """try to become the worker running a topic's feed, held until released or disconnected"""
+        ...
+
+    @abstractmethod
+    async def release(self, topic: str) -> None:
+        ...
+
+    async def keepalive(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+
+class MemoryBroker:
+    """the shared state of MemoryPubSub workers"""
+
+    def __init__(self):
+        self.workers: Set["MemoryPubSub"] = set()
+        self.owners: Dict[str, "MemoryPubSub"] = {}
+        self.published = 0
+
+
+class MemoryPubSub(PubSub):
+    def __init__(self, broker: MemoryBroker = None):
+        self.broker = broker or MemoryBroker()
+        self.topics: Set[str] = set()
+        self._deliver: Deliver = None
+
+    async def start(self, deliver: Deliver) -> None:
+        self._deliver = deliver
+        self.broker.workers.add(self)
+
+    async def publish(self, topic: str, text: str, policy: str) -> None:
+        self.broker.published += 1
+        for worker in list(self.broker.workers):
+            if topic in worker.topics:
+                worker._deliver(topic, text, policy)
+
+    async def bind(self, topic: str) -> None:
+        self.topics.add(topic)
+
+    async def unbind(self, topic: str) -> None:
+        self.topics.discard(topic)
+
+    async def claim(self, topic: str) -> bool:
+        owner = self.broker.owners.setdefault(topic, self)
+        return owner is self
+
+    async def release(self, topic: str) -> None:
+        if self.broker.owners.get(topic) is self:
+            del self.broker.owners[topic]
+
+    async def close(self) -> None:
+        """like a dropped connection, claims go with it"""
+        self.broker.workers.discard(self)
+        for topic, owner in list(self.broker.owners.items()):
+            if owner is self:
+                del self.broker.owners[topic]
+        self.topics.clear()
+
+
+def _key(topic: str) -> str:
+    # topics can be longer than the 255 bytes amqp allows for names
+    return hashlib.sha1(topic.encode()).hexdigest()
+
+
+class RabbitPubSub(PubSub):
+    """a direct exchange keyed on the topic, each worker binds an exclusive queue to the
+    topics it has sockets for. a claim is an exclusive queue named after the topic, which
+    the broker lets one connection hold and drops with it
+
+    pika's BlockingConnection isn't thread safe, so the consumer runs on a thread of its
+    own, publishes go through a connection and single thread executor of their own and
+    claims through another, a slow claim never holds up a publish
+
+    start gives up after `connect_timeout` seconds without the broker"""
+
+    def __init__(self, url: str, exchange: str = "myrkle.topics", reconnect_delay: float = 1.0, connect_timeout: float = 10.0):
+        import pika  # only needed when a deployment runs more than one worker
+
+        self.pika = pika
+        self.url = url
+        self.exchange = exchange
+        self.reconnect_delay = reconnect_delay
+        self.connect_timeout = connect_timeout
+        self.topics: Set[str] = set()
+        self._deliver: Deliver = None
+        self._loop: asyncio.AbstractEventLoop = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pubsub-claims")
+        self._publish_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pubsub-publish")
+        self._publisher = None
+        self._publish_channel = None
+        self._claimer = None
+        self._claim_channel = None
+        self._claims: Set[str] = set()
+        self._consumer = None
+        self._consume_channel = None
+        self._queue: str = None
+        self._ready = threading.Event()
+        self._closed = False
+        self._thread: threading.Thread = None
+
+    def _connect(self):
+        connection = self.pika.BlockingConnection(self.pika.URLParameters(self.url))
+        channel = connection.channel()
+        channel.exchange_declare(exchange=self.exchange, exchange_type="direct")
+        return connection, channel
+
+    async def start(self, deliver: Deliver) -> None:
+        self._deliver = deliver
+        self._loop = asyncio.get_running_loop()
+        self._thread = threading.Thread(target=self._consume, name="pubsub-consumer", daemon=True)
+        self._thread.start()
+        if not await self._loop.run_in_executor(None, self._ready.wait, self.connect_timeout):
+            await self.close()
+            raise ConnectionError(f"no broker at {self.url} after {self.connect_timeout}s")
+
+    def _consume(self) -> None:
+        while not self._closed:
+            try:
+                self._consumer, self._consume_channel = self._connect()
+                self._queue = self._consume_channel.queue_declare(queue="", exclusive=True).method.queue
+                for topic in list(self.topics):
+                    self._consume_channel.queue_bind(self._queue, self.exchange, routing_key=_key(topic))
+                self._consume_channel.basic_consume(self._queue, self._on_message, auto_ack=True)
+                self._ready.set()
+                self._consume_channel.start_consuming()
+            except Exception:
+                if self._closed:
+                    break
+                self._ready.clear()
+                threading.Event().wait(self.reconnect_delay)
+
+    def _on_message(self, channel, method, properties, body: bytes) -> None:
+        headers = properties.headers or {}
+        self._loop.call_soon_threadsafe(self._deliver, headers.get("topic"), body.decode(), headers.get("policy"))
+
+    async def _on_consumer(self, callback: Callable[[], None]) -> None:
+        """run `callback` on the consumer's thread, where its channel lives"""
+        if not self._ready.is_set():
+            # rebinds every topic when it reconnects
+            return
+        done: Future = Future()
+
+        def run():
+            try:
+                callback()
+                done.set_result(None)
+            except Exception as exception:
+                done.set_exception(exception)
+        self._consumer.add_callback_threadsafe(run)
+        await asyncio.wrap_future(done)
+
+    async def bind(self, topic: str) -> None:
+        self.topics.add(topic)
+        await self._on_consumer(lambda: self._consume_channel.queue_bind(self._queue, self.exchange, routing_key=_key(topic)))
+
+    async def unbind(self, topic: str) -> None:
+        self.topics.discard(topic)
+        await self._on_consumer(lambda: self._consume_channel.queue_unbind(self._queue, self.exchange, routing_key=_key(topic)))
+
+    def _channel(self):
+        """the publishing channel, only used on the publish executor"""
+        if self._publisher is None or self._publisher.is_closed:
+            self._publisher, self._publish_channel = self._connect()
+        elif self._publish_channel.is_closed:
+            self._publish_channel = self._publisher.channel()
+        return self._publish_channel
+
+    def _claims_channel(self):
+        """the channel claims are held on, only used on the claims executor"""
+        if self._claimer is None or self._claimer.is_closed:
+            self._claimer, self._claim_channel = self._connect()
+            # claims died with the old connection
+            self._claims.clear()
+        elif self._claim_channel.is_closed:
+            self._claim_channel = self._claimer.channel()
+        return self._claim_channel
+
+    def _publish(self, topic: str, text: str, policy: str) -> None:
+        properties = self.pika.BasicProperties(headers={"topic": topic, "policy": policy})
+        try:
+            self._channel().basic_publish(self.exchange, _key(topic), text.encode(), properties)
+        except self.pika.exceptions.AMQPConnectionError:
+            self._publisher = None
+            self._channel().basic_publish(self.exchange, _key(topic), text.encode(), properties)
+
+    def _claim(self, topic: str) -> bool:
+        if topic in self._claims and self._claimer is not None and self._claimer.is_open:
+            return True
+        try:
+            self._claims_channel().queue_declare(queue=f"{self.exchange}.feed.{_key(topic)}", exclusive=True)
+        except self.pika.exceptions.ChannelClosedByBroker:
+            # RESOURCE_LOCKED, another worker has it
+            return False
+        self._claims.add(topic)
+        return True
+
+    def _release(self, topic: str) -> None:
+        if topic in self._claims:
+            self._claims.discard(topic)
+            self._claims_channel().queue_delete(queue=f"{self.exchange}.feed.{_key(topic)}")
+
+    def _keepalive(self, connection) -> None:
+        if connection is not None and connection.is_open:
+            connection.process_data_events(0)
+
+    async def _run(self, function, *args, executor: ThreadPoolExecutor = None):
+        return await asyncio.get_running_loop().run_in_executor(executor or self._executor, function, *args)
+
+    async def publish(self, topic: str, text: str, policy: str) -> None:
+        await self._run(self._publish, topic, text, policy, executor=self._publish_executor)
+
+    async def claim(self, topic: str) -> bool:
+        return await self._run(self._claim, topic)
+
+    async def release(self, topic: str) -> None:
+        await self._run(self._release, topic)
+
+    async def keepalive(self) -> None:
+        await asyncio.gather(
+            self._run(self._keepalive, self._claimer),
+            self._run(lambda: self._keepalive(self._publisher), executor=self._publish_executor),
+        )
+
+    async def close(self) -> None:
+        self._closed = True
+        if self._consumer is not None and self._consumer.is_open:
+            self._consumer.add_callback_threadsafe(self._consume_channel.stop_consuming)
+        if self._thread is not None:
+            await asyncio.get_running_loop().run_in_executor(None, self._thread.join, 5)
+        if self._claimer is not None and self._claimer.is_open:
+            await self._run(self._claimer.close)
+        if self._publisher is not None and self._publisher.is_open:
+            await self._run(self._publisher.close, executor=self._publish_executor)
+        self._executor.shutdown(wait=False)
+        self._publish_executor.shutdown(wait=False)
@@ -0,0 +1,400 @@
+import asyncio
+import json
+import logging
+from collections import OrderedDict
+from itertools import count
+from typing import Any, AsyncIterator, Callable, Dict, Hashable, List, Set, Tuple, Union
+
+from fastapi import WebSocket
+
+from .pubsub import PubSub
+
+"""
+fan out to many websockets without one slow client holding up the rest
+
+every connection gets a bounded outgoing queue and a writer task of its own,
+a publish only puts the (once encoded) message on the queues of the topic's
+subscribers and never awaits a socket. when a queue is full the oldest message
+is dropped (DROP_OLDEST), snapshots that supersede each other (books, balances)
+are published with COALESCE so a queue holds at most the latest one per topic.
+a client that doesn't take a message within `send_timeout` is disconnected
+
+with a bus attached (several workers behind a load balancer) a topic's feed runs
+on the one worker that claims it and its messages go through the bus, which
+hands them to the local publish of every worker with subscribers for the topic
+"""
+
+logger = logging.getLogger(__name__)
+
+DROP_OLDEST = "drop_oldest"
+COALESCE = "coalesce"
+
+QUEUE_SIZE = 64
+SEND_TIMEOUT = 10.0
+# how often unowned feeds are claimed again, a dead worker's feeds move within this
+CLAIM_INTERVAL = 2.0
+
+
+def encode(message: Any) -> str:
+    return message if isinstance(message, str) else json.dumps(message, default=str)
+
+
+class Client:
+    """one connection, its pending messages and its writer"""
+
+    __slots__ = ("websocket", "client_id", "topics", "pending", "dropped", "sent", "sending_since", "_ready", "_writer")
+
+    def __init__(self, websocket: WebSocket, client_id: Hashable = None):
+        self.websocket = websocket
+        self.client_id = client_id
+        self.topics: Set[str] = set()
+        # coalesced messages are keyed on their topic, the others on a sequence number
+        self.pending: "OrderedDict[Hashable, str]" = OrderedDict()
+        self.dropped = 0
+        self.sent = 0
+        self.sending_since = 0.0
+        self._ready = asyncio.Event()
+        self._writer: asyncio.Task = None
+
+    def put(self, text: str, key: Hashable, max_size: int) -> None:
+        pending = self.pending
+        if key in pending:
+            del pending[key]
+            self.dropped += 1
+        pending[key] = text
+        while len(pending) > max_size:
+            pending.popitem(last=False)
+            self.dropped += 1
+        self._ready.set()
+
+
+class Broadcaster:
+    """connections indexed by topic (a pair, a wallet...), publishes only touch a topic's subscribers"""
+
+    def __init__(self, queue_size: int = QUEUE_SIZE, send_timeout: float = SEND_TIMEOUT, claim_interval: float = CLAIM_INTERVAL):
+        self.queue_size = queue_size
+        self.send_timeout = send_timeout
+        self.claim_interval = claim_interval
+        self.bus: PubSub = None
+        self._clients: Dict[WebSocket, Client] = {}
+        self._ids: Dict[Hashable, Client] = {}
+        self._topics: Dict[str, Set[Client]] = {}
+        self._feeds: Dict[str, asyncio.Task] = {}
+        self._latest: Dict[str, str] = {}
+        self._sequence = count()
+        self._sweeper: asyncio.Task = None
+        # feeds of topics with local subscribers, run here only while the bus claim is ours
+        self._wanted: Dict[str, Tuple[Callable[[], AsyncIterator[Any]], str]] = {}
+        # feeds that ran to their end, not started again while the topic has subscribers here
+        self._finished: Set[str] = set()
+        self._bus_ops: asyncio.Queue = None
+        self._bus_task: asyncio.Task = None
+        self._bus_publishes: asyncio.Queue = None
+        self._publish_task: asyncio.Task = None
+
+    async def attach(self, bus: PubSub) -> None:
+        """share topics with the other workers through `bus`, stays local when it can't start"""
+        await bus.start(self._deliver)
+        self.bus = bus
+        self._bus_ops = asyncio.Queue()
+        self._bus_publishes = asyncio.Queue()
+        for topic in self._topics:
+            self._bus_ops.put_nowait(("bind", topic))
+        for topic in list(self._wanted):
+            feed = self._feeds.pop(topic, None)
+            if feed is not None:
+                feed.cancel()
+            self._bus_ops.put_nowait(("claim", topic))
+        self._bus_task = asyncio.create_task(self._run_bus())
+        self._publish_task = asyncio.create_task(self._run_publishes())
+
+    async def connect(self, websocket: WebSocket, client_id: Hashable = None, accept: bool = True) -> Client:
+        if accept:
+            await websocket.accept()
+        client = Client(websocket, client_id)
+        self._clients[websocket] = client
+        if client_id is not None:
+            previous = self._ids.get(client_id)
+            if previous is not None and previous is not client:
+                self.disconnect(previous.websocket)
+            self._ids[client_id] = client
+        client._writer = asyncio.create_task(self._write(client))
+        if self._sweeper is None or self._sweeper.done():
+            self._sweeper = asyncio.create_task(self._sweep())
+        return client
+
+    def disconnect(self, websocket: Union[WebSocket, Hashable]) -> None:
+        """forget a connection, by websocket or by the id it connected with"""
+        client = self.client(websocket)
+        if client is None:
+            return
+        del self._clients[client.websocket]
+        if client.client_id is not None and self._ids.get(client.client_id) is client:
+            del self._ids[client.client_id]
+        for topic in list(client.topics):
+            self._leave(client, topic)
+        if client._writer is not None and client._writer is not asyncio.current_task():
+            client._writer.cancel()
+
+    def client(self, websocket: Union[WebSocket, Hashable]) -> Client:
+        return self._clients.get(websocket) or self._ids.get(websocket)
+
+    def subscribe(self, websocket: WebSocket, topic: str, feed: Callable[[], AsyncIterator[Any]] = None, policy: str = COALESCE) -> None:
+        """add a connection to a topic, `feed` (an async iterator factory) is started for
+        the topic's first subscriber, everything it yields is published, and stopped after the last.
+        with a bus the feed only runs on the worker holding the topic's claim"""
+        client = self._clients[websocket]
+        client.topics.add(topic)
+        self._topics.setdefault(topic, set()).add(client)
+        # a late subscriber starts from the last snapshot instead of waiting for the next one
+        latest = self._latest.get(topic)
+        if latest is not None:
+            client.put(latest, topic, self.queue_size)
+        wanted = feed is not None and topic not in self._wanted and topic not in self._finished
+        if wanted:
+            self._wanted[topic] = (feed, policy)
+        if self.bus is None:
+            if feed is not None and topic not in self._feeds and topic not in self._finished:
+                self._feeds[topic] = asyncio.create_task(self._follow(topic, feed, policy))
+            return
+        if len(self._topics[topic]) == 1:
+            self._bus_ops.put_nowait(("bind", topic))
+        if wanted:
+            self._bus_ops.put_nowait(("claim", topic))
+
+    def unsubscribe(self, websocket: WebSocket, topic: str) -> None:
+        client = self._clients.get(websocket)
+        if client is not None:
+            self._leave(client, topic)
+
+    def _leave(self, client: Client, topic: str) -> None:
+        client.topics.discard(topic)
+        # whatever was coalesced for the topic is of no use anymore
+        client.pending.pop(topic, None)
+        subscribers = self._topics.get(topic)
+        if subscribers is None:
+            return
+        subscribers.discard(client)
+        if not subscribers:
+            del self._topics[topic]
+            self._latest.pop(topic, None)
+            wanted = self._wanted.pop(topic, None)
+            finished = topic in self._finished
+            self._finished.discard(topic)
+            feed = self._feeds.pop(topic, None)
+            if feed is not None:
+                feed.cancel()
+            if self.bus is not None:
+                if wanted is not None or finished:
+                    self._bus_ops.put_nowait(("release", topic))
+                self._bus_ops.put_nowait(("unbind", topic))
+
+    def subscribers(self, topic: str) -> int:
+        return len(self._topics.get(topic, ()))
+
+    def publish(self, topic: str, message: Any, policy: str = DROP_OLDEST) -> int:
+        """queue `message` for the topic's subscribers, returns how many"""
+        subscribers = self._topics.get(topic)
+        if not subscribers:
+            return 0
+        text = encode(message)
+        if policy == COALESCE:
+            self._latest[topic] = text
+            key = topic
+        else:
+            key = next(self._sequence)
+        for client in subscribers:
+            client.put(text, key, self.queue_size)
+        return len(subscribers)
+
+    def send(self, websocket: Union[WebSocket, Hashable], message: Any) -> bool:
+        """queue a message for one connection, False when it isn't connected"""
+        client = self.client(websocket)
+        if client is None:
+            return False
+        client.put(encode(message), next(self._sequence), self.queue_size)
+        return True
+
+    def publish_cluster(self, topic: str, message: Any, policy: str = DROP_OLDEST) -> None:
+        """publish to the topic's subscribers on every worker"""
+        if self.bus is None:
+            self.publish(topic, message, policy)
+        else:
+            self._bus_publishes.put_nowait((topic, encode(message), policy))
+
+    def _deliver(self, topic: str, text: str, policy: str) -> None:
+        self.publish(topic, text, policy)
+
+    def publish_all(self, message: Any) -> int:
+        text = encode(message)
+        key = next(self._sequence)
+        for client in self._clients.values():
+            client.put(text, key, self.queue_size)
+        return len(self._clients)
+
+    async def _follow(self, topic: str, feed: Callable[[], AsyncIterator[Any]], policy: str) -> None:
+        try:
+            async for message in feed():
+                self.publish_cluster(topic, message, policy)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exception:
+            # still wanted, the next claim round starts it again
+            self.publish_cluster(topic, {"error": str(exception)})
+        else:
+            # done for good. the claim is kept until the last subscriber here leaves,
+            # so no other worker starts it again either
+            if self._wanted.pop(topic, None) is not None:
+                self._finished.add(topic)
+        finally:
+            if self._feeds.get(topic) is asyncio.current_task():
+                del self._feeds[topic]
+
+    async def _write(self, client: Client) -> None:
+        pending = client.pending
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                await client._ready.wait()
+                while pending:
+                    _, text = pending.popitem(last=False)
+                    client.sending_since = loop.time()
+                    await client.websocket.send_text(text)
+                    client.sending_since = 0.0
+                    client.sent += 1
+                client._ready.clear()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self.disconnect(client.websocket)
+
+    async def _sweep(self) -> None:
+        """drop clients stuck on a send for longer than send_timeout, one task for every
+        connection rather than a timeout around each send"""
+        loop = asyncio.get_running_loop()
+        while self._clients:
+            await asyncio.sleep(self.send_timeout / 2)
+            deadline = loop.time() - self.send_timeout
+            for client in list(self._clients.values()):
+                if client.sending_since and client.sending_since < deadline:
+                    self.disconnect(client.websocket)
+
+    async def _claim(self, topic: str) -> None:
+        if topic not in self._wanted or topic in self._feeds:
+            return
+        if not await self.bus.claim(topic):
+            return
+        wanted = self._wanted.get(topic)
+        if wanted is None:
+            # everyone left while we were claiming
+            await self.bus.release(topic)
+        elif topic not in self._feeds:
+            self._feeds[topic] = asyncio.create_task(self._follow(topic, *wanted))
+
+    async def _run_publishes(self) -> None:
+        """publishes in order on a task of their own, a publish never waits on the broker
+        and a slow claim round doesn't hold the fan out up"""
+        bus, publishes = self.bus, self._bus_publishes
+        failing = False
+        while True:
+            topic, text, policy = await publishes.get()
+            try:
+                await bus.publish(topic, text, policy)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exception:
+                # the bus reconnects on its own, the next snapshot goes out then. logged
+                # once per outage, every publish fails while it lasts
+                if not failing:
+                    logger.warning("bus publishes are failing, first on %s: %r", topic, exception)
+                failing = True
+            else:
+                if failing:
+                    logger.info("bus publishes go through again")
+                failing = False
+
+    async def _run_bus(self) -> None:
+        """binds and claims in order on one task, so a topic is never unbound before it
+        was bound. unowned feeds are claimed again every `claim_interval`, which is how a
+        feed moves off a worker that went away"""
+        bus, operations = self.bus, self._bus_ops
+        loop = asyncio.get_running_loop()
+        next_round = loop.time() + self.claim_interval
+        while True:
+            try:
+                operation = operations.get_nowait()
+            except asyncio.QueueEmpty:
+                try:
+                    operation = await asyncio.wait_for(operations.get(), max(next_round - loop.time(), 0))
+                except asyncio.TimeoutError:
+                    operation = None
+            try:
+                if loop.time() >= next_round:
+                    next_round = loop.time() + self.claim_interval
+                    for topic in [topic for topic in self._wanted if topic not in self._feeds]:
+                        await self._claim(topic)
+                    await bus.keepalive()
+                if operation is None:
+                    continue
+                if operation[0] == "bind":
+                    await bus.bind(operation[1])
+                elif operation[0] == "unbind":
+                    if operation[1] not in self._topics:
+                        await bus.unbind(operation[1])
+                elif operation[0] == "claim":
+                    await self._claim(operation[1])
+                elif operation[0] == "release":
+                    if operation[1] not in self._feeds:
+                        await bus.release(operation[1])
+            except asyncio.CancelledError:
+                raise
+            except Exception as exception:
+                # the bus reconnects on its own, claims are retried on the next round
+                logger.warning("bus %s failed: %r", operation[0] if operation else "claim round", exception)
+
+    async def close(self) -> None:
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+        for feed in list(self._feeds.values()):
+            feed.cancel()
+        for websocket in list(self._clients):
+            self.disconnect(websocket)
+        if self._bus_task is not None:
+            self._bus_task.cancel()
+            self._bus_task = None
+        if self._publish_task is not None:
+            self._publish_task.cancel()
+            self._publish_task = None
+        if self.bus is not None:
+            await self.bus.close()
+            self.bus = None
+
+    def stats(self) -> dict:
+        clients = self._clients.values()
+        return {
+            "connections": len(self._clients),
+            "topics": len(self._topics),
+            "feeds": len(self._feeds),
+            "wanted": len(self._wanted),
+            "queued": sum(len(client.pending) for client in clients),
+            "dropped": sum(client.dropped for client in clients),
+        }
+
+
+class ConnectionManager(Broadcaster):
+    """the old deps.ConnectionManager interface on top of the broadcaster"""
+
+    @property
+    def active_connections(self) -> List[WebSocket]:
+        return list(self._clients)
+
+    async def send_personal_message(self, message: Any, websocket: WebSocket):
+        if not self.send(websocket, message):
+            # a socket that never went through connect
+            await websocket.send_text(encode(message))
+
+    async def broadcast(self, message: Any):
+        self.publish_all(message)
+
+
+manager = ConnectionManager()
@@ -1,3 +1,4 @@
+from datetime import datetime
 from typing import Optional
 
 from pydantic import BaseModel
@@ -14,3 +15,28 @@ class Transaction(BaseModel):
 
     class Config:
         orm_mode = True
+
+
+class WalletTransaction(BaseModel):
+    """one indexed transaction as seen from `wallet`"""
+    txid: str
+    wallet: str
+    network: str
+    ledger_index: int
+    tx_index: int = 0
+    date: datetime
+    kind: str
+    tx_type: str
+    result: str
+    direction: str
+    sender: str
+    receiver: Optional[str] = None
+    counterparty: Optional[str] = None
+    currency: Optional[str] = None
+    issuer: Optional[str] = None
+    amount: Optional[str] = None
+    fee: str
+    details: Optional[dict] = None
+
+    class Config:
+        orm_mode = True
@@ -41,6 +41,26 @@ class OrderBookSwap(BaseModel):
     sell_type: str = None
     buy_issuer: str = None
     sell_issuer: str = None
+    max_slippage: float = None
+    network: str = "testnet"
+
+
+class RouteSwap(BaseModel):
+    sender_addr: str
+    buy: str
+    sell: str
+    amount: float
+    side: str = "buy"
+    buy_issuer: str = None
+    sell_issuer: str = None
+    tolerance: float = 0.005
+    fee: str = None
+    network: str = "testnet"
+
+
+class SubmitTx(BaseModel):
+    tx_blob: str
+    wait: bool = True
     network: str = "testnet"
 
 
@@ -1,4 +1,4 @@
-from typing import Union
+from typing import List, Union
 from decimal import Decimal
 from pydantic import BaseModel
 
@@ -178,3 +178,17 @@ class AllOffers(BaseModel):
     pay: float
     receive: float
     limit: int
+
+
+class TokenFilter(BaseModel):
+    token: str
+    issuer: str
+
+class BatchBalances(BaseModel):
+    wallets: List[str]
+    tokens: List[TokenFilter] = None
+    mainnet: bool = False
+
+class BatchNftOffers(BaseModel):
+    nftoken_ids: List[str]
+    mainnet: bool = False
@@ -0,0 +1,63 @@
+import asyncio
+import json
+from typing import Callable, Dict, List
+
+import websockets
+
+"""a tiny rippled websocket stand-in, answers commands from `handlers` and can push stream messages"""
+
+
+class FakeRippled:
+    def __init__(self, handlers: Dict[str, Callable[[dict], dict]] = None):
+        self.handlers = handlers or {}
+        self.commands: List[dict] = []
+        self.connections = set()
+        self.server = None
+
+    @property
+    def url(self) -> str:
+        port = self.server.sockets[0].getsockname()[1]
+        return f"ws://127.0.0.1:{port}"
+
+    async def __aenter__(self) -> "FakeRippled":
+        self.server = await websockets.serve(self._serve, "127.0.0.1", 0)
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _serve(self, ws) -> None:
+        self.connections.add(ws)
+        try:
+            async for raw in ws:
+                command = json.loads(raw)
+                self.commands.append(command)
+                handler = self.handlers.get(command["command"], lambda command: {})
+                try:
+                    reply = {"status": "success", "result": handler(command)}
+                except Exception as exception:
+                    # a handler raising is rippled answering with an error
+                    reply = {"status": "error", "error": str(exception)}
+                await ws.send(json.dumps({"id": command["id"], "type": "response", **reply}))
+        finally:
+            self.connections.discard(ws)
+
+    async def push(self, message: dict) -> None:
+        for ws in list(self.connections):
+            await ws.send(json.dumps(message))
+
+    async def drop(self) -> None:
+        """close every client connection, to exercise reconnects"""
+        for ws in list(self.connections):
+            await ws.close()
+
+    def sent(self, command: str) -> List[dict]:
+        return [sent for sent in self.commands if sent["command"] == command]
+
+
+async def wait_for(predicate: Callable[[], bool], timeout: float = 2.0) -> None:
+    async def poll():
+        while not predicate():
+            await asyncio.sleep(0.01)
+    await asyncio.wait_for(poll(), timeout)
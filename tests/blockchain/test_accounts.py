@@ -0,0 +1,115 @@
+import asyncio
+import json
+
+import httpx
+
+from blockchain.xrp.Accounts import AccountHub, trust_line
+from blockchain.xrp.Pool import xrpl_pool
+from blockchain.xrp.Stream import XrplStream
+
+from .fake_rippled import FakeRippled, wait_for
+
+WALLET = "rWalletAAAAAAAAAAAAAAAAAAAAAAAAAA"
+ISSUER = "rhub8VRN55s94qWKDv6jmDy1pUykJzF3wq"
+
+
+def ripple_state(balance: str, wallet_is_low: bool = True, flags: int = 0) -> dict:
+    wallet_limit = {"currency": "USD", "issuer": WALLET, "value": "1000"}
+    issuer_limit = {"currency": "USD", "issuer": ISSUER, "value": "0"}
+    low, high = (wallet_limit, issuer_limit) if wallet_is_low else (issuer_limit, wallet_limit)
+    return {"Balance": {"currency": "USD", "issuer": "rrrrrrrrrrrrrrrrrrrrBZbvji", "value": balance},
+            "LowLimit": low, "HighLimit": high, "Flags": flags}
+
+
+def test_trust_lines_are_read_from_the_wallets_side() -> None:
+    key, line = trust_line(WALLET, ripple_state("12.5", wallet_is_low=True, flags=0x00020000))
+    assert key == ("USD", ISSUER) and line["amount"] == "12.5" and line["ripple_status"] is True
+    _, line = trust_line(WALLET, ripple_state("-12.5", wallet_is_low=False))
+    assert line["amount"] == "12.5" and line["limit"] == "1000" and line["ripple_status"] is False
+
+
+def test_balances_follow_transaction_metadata() -> None:
+    snapshots = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        snapshots.append(body["method"])
+        if body["method"] == "account_info":
+            return httpx.Response(200, json={"result": {"status": "success", "account_data": {"Balance": "50000000", "OwnerCount": 1}}})
+        return httpx.Response(200, json={"result": {"status": "success", "lines": [
+            {"account": ISSUER, "currency": "USD", "balance": "5", "limit": "1000"}]}})
+
+    async def run():
+        async with FakeRippled() as rippled:
+            stream = XrplStream(rippled.url, reconnect_delay=0.01)
+            hub = AccountHub(stream_factory=lambda mainnet: stream)
+            async with hub.watch(WALLET) as first, hub.watch(WALLET) as second:
+                snapshot = await first.__anext__()
+                assert snapshot["type"] == "snapshot" and snapshot["xrp"]["balance"] == 50000000
+                assert snapshot["tokens"][0]["amount"] == "5"
+                await second.__anext__()
+                assert rippled.sent("subscribe")[0]["accounts"] == [WALLET] and len(rippled.sent("subscribe")) == 1
+
+                await rippled.push({
+                    "type": "transaction", "validated": True, "ledger_index": 9,
+                    "transaction": {"hash": "ABC"},
+                    "meta": {"AffectedNodes": [
+                        {"ModifiedNode": {"LedgerEntryType": "AccountRoot", "FinalFields": {"Account": WALLET, "Balance": "49999988", "OwnerCount": 1}}},
+                        {"ModifiedNode": {"LedgerEntryType": "RippleState", "FinalFields": ripple_state("7")}},
+                        {"ModifiedNode": {"LedgerEntryType": "AccountRoot", "FinalFields": {"Account": "rSomeoneElse", "Balance": "1"}}},
+                    ]},
+                })
+                for subscription in (first, second):
+                    update = await asyncio.wait_for(subscription.__anext__(), 2)
+                    assert update["type"] == "update" and update["ledger_index"] == 9
+                    assert update["xrp"]["balance"] == 49999988
+                    assert [(token["token"], token["amount"]) for token in update["tokens"]] == [("USD", "7")]
+                    assert update["transactions"] == ["ABC"]
+                assert hub.watching(True) == [WALLET]
+            await wait_for(lambda: len(rippled.sent("unsubscribe")) == 1)
+            assert hub.watching(True) == []
+            await stream.close()
+
+    xrpl_pool.configure(async_transport=httpx.MockTransport(handler))
+    try:
+        asyncio.run(run())
+        # one snapshot for both sockets
+        assert sorted(snapshots) == ["account_info", "account_lines"]
+    finally:
+        xrpl_pool.configure(async_transport=None)
+
+
+def test_an_address_that_cant_be_resubscribed_is_stale_until_a_retry_works() -> None:
+    answers = [{}, RuntimeError("tooBusy"), {}]
+
+    def subscribe(command):
+        answer = answers.pop(0) if answers else {}
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if json.loads(request.content)["method"] == "account_info":
+            return httpx.Response(200, json={"result": {"status": "success", "account_data": {"Balance": "50000000", "OwnerCount": 0}}})
+        return httpx.Response(200, json={"result": {"status": "success", "lines": []}})
+
+    async def run():
+        async with FakeRippled({"subscribe": subscribe}) as rippled:
+            stream = XrplStream(rippled.url, reconnect_delay=0.01)
+            hub = AccountHub(stream_factory=lambda mainnet: stream)
+            async with hub.watch(WALLET) as subscription:
+                assert (await subscription.__anext__())["type"] == "snapshot"
+                await rippled.drop()
+                stale = await asyncio.wait_for(subscription.__anext__(), 2)
+                assert stale["type"] == "stale" and "tooBusy" in stale["error"]
+                # retried without another reconnect
+                again = await asyncio.wait_for(subscription.__anext__(), 2)
+                assert again["type"] == "snapshot" and again["xrp"]["balance"] == 50000000
+                assert len(rippled.sent("subscribe")) == 3
+            await stream.close()
+
+    xrpl_pool.configure(async_transport=httpx.MockTransport(handler))
+    try:
+        asyncio.run(run())
+    finally:
+        xrpl_pool.configure(async_transport=None)
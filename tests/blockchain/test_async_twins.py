@@ -0,0 +1,58 @@
+import asyncio
+import json
+
+import httpx
+
+from blockchain.xrp.Objects import xObject
+from blockchain.xrp.Pool import xrpl_pool
+from blockchain.xrp.xamm import xObject as XammObject
+
+URL = "https://rippled.test"
+ACCOUNT = "rPT1Sjq2YGrBMTttX4GZHjKu9dyfzbpAYe"
+
+RESULTS = {
+    "account_offers": {
+        "offers": [
+            {"flags": 0x00010000, "seq": 7, "quality": "2", "taker_pays": "2000000",
+             "taker_gets": {"currency": "USD", "issuer": ACCOUNT, "value": "1"}},
+        ]
+    },
+    "account_lines": {
+        "lines": [{"account": ACCOUNT, "currency": "USD", "balance": "10", "limit": "100"}]
+    },
+}
+
+
+def handler(request: httpx.Request) -> httpx.Response:
+    method = json.loads(request.content)["method"]
+    return httpx.Response(200, json={"result": {"status": "success", **RESULTS[method]}})
+
+
+def with_mock_pool(test):
+    def run():
+        xrpl_pool.configure(transport=httpx.MockTransport(handler), async_transport=httpx.MockTransport(handler))
+        try:
+            test()
+        finally:
+            xrpl_pool.configure(transport=None, async_transport=None)
+    return run
+
+
+@with_mock_pool
+def test_async_twins_match_sync_results() -> None:
+    objects = xObject(URL, "", "")
+    amm = XammObject(URL, "", "")
+
+    async def run():
+        return await asyncio.gather(
+            objects.async_account_offers(ACCOUNT),
+            amm.async_get_account_order_book_liquidity(ACCOUNT),
+            amm.async_token_balance(ACCOUNT, "USD", ACCOUNT),
+        )
+
+    offers, liquidity, balance = asyncio.run(run())
+    assert offers == objects.account_offers(ACCOUNT)
+    assert liquidity == amm.get_account_order_book_liquidity(ACCOUNT)
+    assert balance == amm.token_balance(ACCOUNT, "USD", ACCOUNT)
+    assert balance["amount"] == "10"
+    assert liquidity[0]["sequence"] == 7
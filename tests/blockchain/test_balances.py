@@ -0,0 +1,52 @@
+import asyncio
+import json
+
+import httpx
+
+from blockchain.xrp.Pool import xrpl_pool
+from blockchain.xrp_client import XRPWalletClient
+
+ISSUER = "rhub8VRN55s94qWKDv6jmDy1pUykJzF3wq"
+WALLETS = [f"rWallet{i}" for i in range(6)]
+
+
+def line(currency: str, balance: str) -> dict:
+    return {"account": ISSUER, "currency": currency, "balance": balance, "limit": "1000"}
+
+
+def test_batch_reads_every_wallet_once_with_bounded_concurrency() -> None:
+    calls = []
+    in_flight = [0, 0]
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        params = body["params"][0]
+        calls.append((body["method"], params["account"], params.get("marker")))
+        in_flight[0] += 1
+        in_flight[1] = max(in_flight)
+        await asyncio.sleep(0.01)
+        in_flight[0] -= 1
+        if params["account"] == "rWallet5":
+            return httpx.Response(200, json={"result": {"status": "error", "error": "actNotFound"}})
+        if body["method"] == "account_info":
+            return httpx.Response(200, json={"result": {"status": "success", "account_data": {"Balance": "50000000", "OwnerCount": 1}}})
+        if params.get("marker") is None:
+            return httpx.Response(200, json={"result": {"status": "success", "ledger_index": 9, "marker": "m", "lines": [line("USD", "5")]}})
+        return httpx.Response(200, json={"result": {"status": "success", "ledger_index": 9, "lines": [line("EUR", "7")]}})
+
+    xrpl_pool.configure(async_transport=httpx.MockTransport(handler))
+    try:
+        client = XRPWalletClient()
+        tokens = [{"token": "EUR", "issuer": ISSUER}, {"token": "BTC", "issuer": ISSUER}]
+        results = asyncio.run(client.async_get_balances(WALLETS, tokens))
+        assert [result["address"] for result in results] == WALLETS
+        first = results[0]
+        assert first["xrp"]["balance"] == 50000000
+        assert [(token["token"], token["amount"]) for token in first["tokens"]] == [("EUR", "7"), ("BTC", None)]
+        assert "error" in results[5]
+        # one account_info and one walk over the trust line pages per wallet
+        assert sum(1 for method, account, _ in calls if account == "rWallet0") == 3
+        # two requests per wallet, BATCH_CONCURRENCY wallets at a time
+        assert in_flight[1] <= 16
+    finally:
+        xrpl_pool.configure(async_transport=None)
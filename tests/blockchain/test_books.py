@@ -0,0 +1,144 @@
+import asyncio
+from decimal import Decimal
+
+from xrpl.models import XRP, IssuedCurrency
+
+from blockchain.xrp.Books import BookManager, OrderBook
+from blockchain.xrp.Stream import XrplStream
+
+from .fake_rippled import FakeRippled, wait_for
+
+ISSUER = "rhub8VRN55s94qWKDv6jmDy1pUykJzF3wq"
+USD = IssuedCurrency(currency="USD", issuer=ISSUER)
+
+
+def offer(index: str, gets: str, pays: str) -> dict:
+    return {
+        "index": index, "Account": ISSUER, "Flags": 0, "Sequence": 1,
+        "TakerGets": {"currency": "USD", "issuer": ISSUER, "value": gets}, "TakerPays": pays,
+    }
+
+
+def created(index: str, gets: str, pays: str) -> dict:
+    fields = offer(index, gets, pays)
+    del fields["index"]
+    return {"CreatedNode": {"LedgerEntryType": "Offer", "LedgerIndex": index, "NewFields": fields}}
+
+
+def test_watchers_share_one_subscription_and_follow_the_stream() -> None:
+    snapshot = [offer("A", "1", "2000000"), offer("B", "1", "10000000")]
+
+    async def run():
+        async with FakeRippled({"subscribe": lambda command: {"offers": snapshot}}) as rippled:
+            stream = XrplStream(rippled.url, reconnect_delay=0.01)
+            manager = BookManager(stream_factory=lambda mainnet: stream)
+            async with manager.watch(USD, XRP()) as first, manager.watch(USD, XRP()) as second:
+                book = await first.__anext__()
+                assert [o["index"] for o in book.book.depth()] == ["A", "B"]
+                await second.__anext__()
+                assert len(rippled.sent("subscribe")) == 1
+
+                await rippled.push({
+                    "type": "transaction", "validated": True, "ledger_index": 7,
+                    "meta": {"AffectedNodes": [
+                        created("C", "1", "1000000"),
+                        {"DeletedNode": {"LedgerEntryType": "Offer", "LedgerIndex": "B",
+                                         "FinalFields": offer("B", "0", "0")}},
+                    ]},
+                })
+                for subscription in (first, second):
+                    book = await asyncio.wait_for(subscription.__anext__(), 2)
+                    assert [o["index"] for o in book.book.depth()] == ["C", "A"]
+                    assert book.ledger_index == 7
+            await wait_for(lambda: len(rippled.sent("unsubscribe")) == 1)
+            await stream.close()
+
+    asyncio.run(run())
+
+
+def test_books_are_reloaded_after_a_reconnect() -> None:
+    snapshots = [[offer("A", "1", "2000000")], [offer("Z", "1", "3000000")]]
+
+    async def run():
+        async with FakeRippled({"subscribe": lambda command: {"offers": snapshots.pop(0)}}) as rippled:
+            stream = XrplStream(rippled.url, reconnect_delay=0.01)
+            manager = BookManager(stream_factory=lambda mainnet: stream)
+            async with manager.watch(USD, XRP()) as subscription:
+                await subscription.__anext__()
+                await rippled.drop()
+                book = await asyncio.wait_for(subscription.__anext__(), 2)
+                assert [o["index"] for o in book.book] == ["Z"]
+            await stream.close()
+
+    asyncio.run(run())
+
+
+def test_a_book_that_cant_be_reloaded_is_dropped_and_its_watchers_told() -> None:
+    answers = [{"offers": [offer("A", "1", "2000000")]}]
+
+    def subscribe(command):
+        if not answers:
+            raise RuntimeError("tooBusy")
+        return answers.pop()
+
+    async def run():
+        async with FakeRippled({"subscribe": subscribe}) as rippled:
+            stream = XrplStream(rippled.url, reconnect_delay=0.01)
+            manager = BookManager(stream_factory=lambda mainnet: stream)
+            async with manager.watch(USD, XRP()) as subscription:
+                await subscription.__anext__()
+                assert manager.book(USD, XRP()) is not None
+                await rippled.drop()
+                try:
+                    await asyncio.wait_for(subscription.__anext__(), 2)
+                except Exception as exception:
+                    assert "tooBusy" in str(exception)
+                else:
+                    raise AssertionError("the stale book was served as live")
+                assert manager.book(USD, XRP()) is None
+            await stream.close()
+
+    asyncio.run(run())
+
+
+def test_order_book_orders_on_numeric_quality() -> None:
+    # "9" > "10" as strings, the book must not care
+    book = OrderBook([offer("A", "1", "9"), offer("B", "1", "10"), offer("C", "2", "3")])
+    assert [o["index"] for o in book.depth()] == ["C", "A", "B"]
+    assert [o["index"] for o in book.depth(2, reverse=True)] == ["B", "A"]
+    assert book.best()["index"] == "C"
+    assert book.total_gets == Decimal(4)
+
+    book.apply("ModifiedNode", {"LedgerEntryType": "Offer", "LedgerIndex": "B",
+                                "FinalFields": {"TakerGets": {"currency": "USD", "issuer": ISSUER, "value": "1"},
+                                                "TakerPays": "1"}})
+    assert book.best()["index"] == "B"
+    assert book.best_quality() == Decimal(1)
+    book.remove("B")
+    assert len(book) == 2 and "B" not in book
+    assert book.liquidity(Decimal("1.5")) == (Decimal(2), Decimal(3))
+    levels = book.cumulative()
+    assert [(level["quality"], level["gets"]) for level in levels] == [(Decimal("1.5"), Decimal(2)), (Decimal(9), Decimal(3))]
+
+
+def test_liquidity_and_levels_follow_changes_and_share_one_prefix_sum_per_version() -> None:
+    book = OrderBook([offer(f"I{n}", "1", str(1000 + n // 2)) for n in range(5000)])
+    assert book.liquidity(Decimal(1001)) == (Decimal(4), Decimal(1000 * 2 + 1001 * 2))
+    assert book.liquidity(Decimal(999)) == (Decimal(0), Decimal(0))
+    first, second = book.cumulative(2)
+    assert (first["count"], first["gets"], second["count"], second["gets"]) == (2, Decimal(2), 2, Decimal(4))
+
+    book.upsert(offer("cheap", "3", "2997"))
+    book.remove("I0")
+    assert book.liquidity(Decimal(1000)) == (Decimal(4), Decimal(3997))
+    assert book.cumulative(1)[0] == {"quality": Decimal(999), "count": 1, "gets": Decimal(3), "pays": Decimal(2997)}
+
+    # queries between changes read the same sums, a change has them built again once
+    sums = book._sums
+    for n in range(1000):
+        book.liquidity(Decimal(1000 + n))
+        book.cumulative(5)
+    assert book._sums is sums
+    book.upsert(offer("later", "1", "5000"))
+    assert book._sums is None
+    assert book.liquidity() == book.liquidity(Decimal(5000)) and book._sums is not sums
@@ -0,0 +1,99 @@
+import asyncio
+import json
+
+import httpx
+
+from blockchain.xrp.Cache import MemoryBackend, ResponseCache
+from blockchain.xrp.Pool import xrpl_pool
+from blockchain.xrp.Stream import XrplStream
+from blockchain.xrp.Wallet import xWallet
+
+from .fake_rippled import FakeRippled, wait_for
+
+URL = "https://rippled.test"
+ACCOUNT = "rPT1Sjq2YGrBMTttX4GZHjKu9dyfzbpAYe"
+
+
+def account_info_handler(calls: list):
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(json.loads(request.content)["params"][0])
+        return httpx.Response(200, json={"result": {
+            "status": "success", "ledger_index": 80,
+            "account_data": {"Account": ACCOUNT, "Balance": str(100000000 * len(calls)), "OwnerCount": 0},
+        }})
+    return handler
+
+
+def test_validated_reads_are_cached_until_the_ledger_closes() -> None:
+    calls = []
+    cache = ResponseCache(ttl=60)
+    xrpl_pool.configure(async_transport=httpx.MockTransport(account_info_handler(calls)), cache=cache)
+    try:
+        wallet = xWallet(URL, "", "")
+
+        async def run():
+            first = await wallet.async_xrp_balance(ACCOUNT)
+            second = await wallet.async_xrp_balance(ACCOUNT)
+            assert first == second and len(calls) == 1
+            cache.ledger_closed(URL, 81)
+            third = await wallet.async_xrp_balance(ACCOUNT)
+            assert third != first and len(calls) == 2
+            # older ledgers never move the key back
+            cache.ledger_closed(URL, 79)
+            assert await wallet.async_xrp_balance(ACCOUNT) == third and len(calls) == 2
+
+        asyncio.run(run())
+        assert cache.stats()["hits"] == 2 and cache.stats()["misses"] == 2
+    finally:
+        xrpl_pool.configure(async_transport=None, cache=None)
+
+
+def test_memory_backend_expires_and_evicts() -> None:
+    async def run():
+        backend = MemoryBackend(max_entries=2)
+        await backend.set("a", "1", 60)
+        await backend.set("b", "2", 60)
+        await backend.set("c", "3", 60)
+        assert await backend.get("a") is None and await backend.get("c") == "3"
+        await backend.set("d", "4", -1)
+        assert await backend.get("d") is None
+
+    asyncio.run(run())
+
+
+def test_a_failed_ledger_subscribe_caches_on_ttl_until_a_retry_works() -> None:
+    cache = ResponseCache()
+    cache.ledgers[URL] = 80
+    retried_with = []
+
+    def subscribe(command):
+        if not retried_with:
+            retried_with.append(dict(cache.ledgers))
+            raise RuntimeError("tooBusy")
+        retried_with.append(dict(cache.ledgers))
+        return {"ledger_index": 90}
+
+    async def run():
+        async with FakeRippled({"subscribe": subscribe}) as rippled:
+            stream = XrplStream(rippled.url, reconnect_delay=0.01)
+            await cache.follow_ledger(stream, URL)
+            await wait_for(lambda: cache.ledgers.get(URL) == 90)
+            # the stale index was dropped before the retry
+            assert retried_with == [{URL: 80}, {}]
+            await stream.close()
+
+    asyncio.run(run())
+
+
+def test_follow_ledger_tracks_closed_ledgers() -> None:
+    async def run():
+        async with FakeRippled({"subscribe": lambda command: {"ledger_index": 90}}) as rippled:
+            cache = ResponseCache()
+            stream = XrplStream(rippled.url, reconnect_delay=0.01)
+            await cache.follow_ledger(stream, URL)
+            await wait_for(lambda: cache.ledgers.get(URL) == 90)
+            await rippled.push({"type": "ledgerClosed", "ledger_index": 91})
+            await wait_for(lambda: cache.ledgers.get(URL) == 91)
+            await stream.close()
+
+    asyncio.run(run())
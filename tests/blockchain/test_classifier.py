@@ -0,0 +1,58 @@
+from blockchain.xrp.Classifier import (AMM, CHECK, NFT, OFFER, PAYMENT_TOKEN, PAYMENT_XRP, TRUST_SET, classify,
+                                       classify_page)
+from blockchain.xrp.Wallet import xWallet
+
+WALLET = "rhub8VRN55s94qWKDv6jmDy1pUykJzF3wq"
+PEER = "rPT1Sjq2YGrBMTttX4GZHjKu9dyfzbpAYe"
+ISSUER = "rvYAfWj5gh67oV6fW32ZzP3Aw4Eubs59B"
+USD = {"currency": "USD", "issuer": ISSUER, "value": "100"}
+
+
+def entry(n: int, meta: dict = None, **tx) -> dict:
+    tx = {"Account": WALLET, "Fee": "12", "hash": f"{n:064X}", "ledger_index": 100 + n, "date": 750000000, **tx}
+    return {"tx": tx, "meta": {"TransactionResult": "tesSUCCESS", "TransactionIndex": n, **(meta or {})}, "validated": True}
+
+
+def test_every_transaction_is_decoded_once_into_a_typed_record() -> None:
+    page = {"transactions": [
+        # a partial payment delivers less than its Amount
+        entry(1, {"delivered_amount": {**USD, "value": "40"}}, TransactionType="Payment", Destination=PEER, Amount=USD),
+        entry(2, {"delivered_amount": "5000000"}, TransactionType="Payment", Account=PEER, Destination=WALLET, Amount="5000000"),
+        entry(3, TransactionType="OfferCreate", TakerGets="1000000", TakerPays=USD),
+        entry(4, {"nftoken_id": "AB" * 32}, TransactionType="NFTokenMint", NFTokenTaxon=0),
+        entry(5, TransactionType="TrustSet", LimitAmount=USD),
+        entry(6, {"delivered_amount": {**USD, "value": "7"}}, TransactionType="CheckCash", Account=PEER, CheckID="CD" * 32, DeliverMin=USD),
+        entry(7, TransactionType="AMMDeposit", Asset={"currency": "XRP"}, Amount="10", Amount2=USD),
+        entry(8, TransactionType="AccountSet"),
+    ]}
+    records = classify_page(page, WALLET)
+    assert [record.kind for record in records] == [PAYMENT_TOKEN, PAYMENT_XRP, OFFER, NFT, TRUST_SET, CHECK, AMM, "other"]
+    token, xrp, offer, nft, trust, check, amm, _ = records
+    assert (token.amount, token.direction, token.counterparty) == ("40", "sent", PEER)
+    assert (xrp.currency, xrp.amount, xrp.direction, xrp.counterparty) == ("XRP", "5.000000", "received", PEER)
+    assert offer.amount == "1.000000" and offer.details == {"taker_pays": USD}
+    assert nft.details == {"nftoken_id": "AB" * 32}
+    assert trust.counterparty == ISSUER and trust.amount == "100"
+    assert check.amount == "7" and check.direction == "other"
+    assert amm.details == {"amount2": USD}
+    assert token.fee == "0.000012" and token.tx_index == 1 and str(token.date) == "2023-10-07 13:20:00+00:00"
+
+
+def test_the_history_views_are_projections_of_the_records() -> None:
+    wallet = xWallet("http://localhost", "", "https://livenet.xrpl.org/transactions/")
+    page = {"transactions": [
+        entry(1, {"delivered_amount": USD}, TransactionType="Payment", Destination=PEER, Amount=USD),
+        entry(2, {"delivered_amount": "5000000"}, TransactionType="Payment", Account=PEER, Destination=WALLET, Amount="5000000"),
+        entry(3, TransactionType="OfferCreate", TakerGets="1000000", TakerPays=USD),
+    ]}
+    payments = wallet._payment_transactions(page, WALLET)
+    assert [view["txid"][-1] for view in payments["sent"] + payments["received"]] == ["1", "2"]
+    assert payments["received"][0] == {
+        "sender": PEER, "receiver": WALLET, "token": "XRP", "issuer": "", "amount": "5.000000", "fee": "0.000012",
+        "timestamp": "2023-10-07 13:20:00+00:00", "result": "tesSUCCESS", "txid": f"{2:064X}",
+        "link": f"https://livenet.xrpl.org/transactions/{2:064X}", "tx_type": "Payment",
+    }
+    xrp = wallet._xrp_transactions(page, WALLET)
+    assert xrp["sent"] == [] and "token" not in xrp["received"][0]
+    tokens = wallet._token_transactions(page, WALLET)
+    assert tokens["received"] == [] and tokens["sent"][0]["token"] == "USD" and tokens["sent"][0]["issuer"] == ISSUER
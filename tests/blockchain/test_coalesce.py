@@ -0,0 +1,94 @@
+import asyncio
+import json
+import threading
+
+import httpx
+
+from blockchain.xrp.Coalesce import AsyncSingleflight
+from blockchain.xrp.Pool import xrpl_pool
+from blockchain.xrp.xamm import xObject
+
+URL = "https://rippled.test"
+ISSUER = "rhub8VRN55s94qWKDv6jmDy1pUykJzF3wq"
+
+
+def gateway_balances() -> dict:
+    return {"result": {"status": "success", "ledger_index": 80, "obligations": {"USD": "100"}}}
+
+
+def test_concurrent_async_reads_share_one_upstream_call() -> None:
+    calls = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(json.loads(request.content)["method"])
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, json=gateway_balances())
+
+    xrpl_pool.configure(async_transport=httpx.MockTransport(handler))
+    before = xrpl_pool.async_flights.stats()
+    try:
+        amm = xObject(URL, "", "")
+
+        async def run():
+            return await asyncio.gather(*[amm.async_token_exists("USD", ISSUER) for _ in range(10)])
+
+        results = asyncio.run(run())
+        assert calls == ["gateway_balances"]
+        assert all(result == {"token": "USD", "issuer": ISSUER, "exists": True} for result in results)
+        after = xrpl_pool.async_flights.stats()
+        assert after["coalesced"] - before["coalesced"] == 9
+
+        # nothing is kept once the call is done
+        asyncio.run(run())
+        assert len(calls) == 2
+    finally:
+        xrpl_pool.configure(async_transport=None)
+
+
+def test_a_cancelled_first_caller_doesnt_cancel_the_others() -> None:
+    calls = []
+
+    async def fetch():
+        calls.append("fetch")
+        await asyncio.sleep(0.05)
+        return "ledger"
+
+    async def run():
+        flights = AsyncSingleflight()
+        first = asyncio.ensure_future(flights.do("key", fetch))
+        await asyncio.sleep(0.01)
+        second = asyncio.ensure_future(flights.do("key", fetch))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        assert await second == "ledger" and calls == ["fetch"]
+        assert first.cancelled() and flights._calls[asyncio.get_running_loop()] == {}
+
+    asyncio.run(run())
+
+
+def test_concurrent_sync_reads_share_one_upstream_call() -> None:
+    calls = []
+    release = threading.Event()
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(json.loads(request.content)["method"])
+        release.wait(2)
+        return httpx.Response(200, json=gateway_balances())
+
+    xrpl_pool.configure(transport=httpx.MockTransport(handler))
+    followers = xrpl_pool.flights.followers
+    try:
+        amm = xObject(URL, "", "")
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(amm.token_exists("USD", ISSUER))) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        while xrpl_pool.flights.followers - followers < 4 and any(thread.is_alive() for thread in threads):
+            threading.Event().wait(0.01)
+        release.set()
+        for thread in threads:
+            thread.join(2)
+        assert calls == ["gateway_balances"]
+        assert len(results) == 5 and all(result["exists"] for result in results)
+    finally:
+        xrpl_pool.configure(transport=None)
@@ -0,0 +1,30 @@
+from blockchain.xrp.Misc import (CurrencyCache, currency_cache, is_currency_hex, is_hex,
+                                 validate_hex_to_symbol, validate_symbol_to_hex)
+
+SOLO = "534F4C4F00000000000000000000000000000000"
+LP_TOKEN = "03ADB868027B0185A6577C34F857236E359E88D0"
+
+
+def test_decoding_matches_the_old_helpers_without_raising() -> None:
+    assert validate_hex_to_symbol(SOLO) == "SOLO"
+    assert validate_hex_to_symbol("USD") == "USD"
+    assert validate_hex_to_symbol(LP_TOKEN) == LP_TOKEN
+    assert validate_hex_to_symbol(None) is None
+    assert is_hex(SOLO) is None and isinstance(is_hex(LP_TOKEN), Exception)
+    assert is_currency_hex(SOLO) and not is_currency_hex(LP_TOKEN)
+    assert validate_symbol_to_hex("SOLO") == SOLO and validate_symbol_to_hex("USD") == "USD"
+    # non currency hex (domains, uris) is still decoded
+    assert validate_hex_to_symbol("6578616D706C652E636F6D") == "example.com"
+
+
+def test_cache_is_bounded_and_counts_hits() -> None:
+    cache = CurrencyCache(max_entries=2, seed=["SOLO"])
+    codes = [("%02X" % n) * 20 for n in range(0x41, 0x45)]
+    for code in codes:
+        cache.symbol(code)
+    assert cache.stats()["misses"] == 4 and len(cache._symbols) == 2
+    cache.symbol(SOLO)
+    cache.symbol(codes[-1])
+    assert cache.stats()["hits"] == 2
+    assert cache.symbol(SOLO) == "SOLO" and SOLO not in cache._symbols
+    assert currency_cache.stats()["size"] > 0
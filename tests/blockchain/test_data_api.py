@@ -0,0 +1,72 @@
+import asyncio
+
+import httpx
+
+from blockchain.xrp.DataApi import DataApiClient
+
+NFT = {"data": {"nft": {"NFTokenID": "00080000", "URI": "697066733A2F2F"}}}
+
+
+def test_failures_are_retried_and_answers_cached(tmp_path) -> None:
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(str(request.url))
+        if len(calls) < 3:
+            return httpx.Response(503, text="busy")
+        return httpx.Response(200, json=NFT)
+
+    client = DataApiClient(backoff=0, cache_dir=str(tmp_path), transport=httpx.MockTransport(handler))
+    assert client.xrpldata("xls20-nfts/nft/00080000") == NFT
+    assert calls == ["https://api.xrpldata.com/api/v1/xls20-nfts/nft/00080000"] * 3
+    assert client.xrpldata("xls20-nfts/nft/00080000") == NFT
+    assert client.xrpldata_url("xls20-nfts/nft/1", mainnet=False).startswith("https://test-api.xrpldata.com/")
+    assert len(calls) == 3 and client.stats()["retried"] == 2 and client.stats()["memory_hits"] == 1
+
+    # a new process finds it on disk
+    restarted = DataApiClient(cache_dir=str(tmp_path), transport=httpx.MockTransport(handler))
+    assert restarted.xrpldata("xls20-nfts/nft/00080000") == NFT
+    assert len(calls) == 3 and restarted.stats()["disk_hits"] == 1
+    client.close()
+    restarted.close()
+
+
+def test_a_gallery_is_fetched_concurrency_at_a_time() -> None:
+    in_flight = []
+    most = []
+    calls = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.path)
+        in_flight.append(1)
+        most.append(len(in_flight))
+        await asyncio.sleep(0.01)
+        in_flight.pop()
+        if request.url.path.endswith("/bad"):
+            return httpx.Response(500, text="down")
+        return httpx.Response(200, json={"path": request.url.path})
+
+    async def run():
+        client = DataApiClient(concurrency=4, retries=1, backoff=0, async_transport=httpx.MockTransport(handler))
+        urls = [client.xrpldata_url(f"xls20-nfts/nft/{n % 20}") for n in range(40)] + [client.xrpldata_url("bad")]
+        results = await client.async_get_many(urls)
+        assert [result["path"] for result in results[:20]] == [f"/api/v1/xls20-nfts/nft/{n}" for n in range(20)]
+        assert isinstance(results[-1], ValueError)
+        # 20 distinct nfts plus the failing url twice, the repeats were shared or cached
+        assert len(calls) == 22 and max(most) == 4
+        await client.aclose()
+
+    asyncio.run(run())
+
+
+def test_a_client_left_behind_by_a_loop_or_close_is_closed() -> None:
+    client = DataApiClient(async_transport=httpx.MockTransport(lambda request: httpx.Response(404)))
+
+    async def http():
+        return client.async_http_client()
+
+    first = asyncio.run(http())
+    second = asyncio.run(http())
+    assert first is not second and first.is_closed and not second.is_closed
+    client.configure(timeout=5.0)
+    assert second.is_closed
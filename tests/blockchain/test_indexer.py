@@ -0,0 +1,150 @@
+import asyncio
+
+from blockchain.xrp.Indexer import MemoryTxStore, TxIndexer
+from blockchain.xrp.Stream import XrplStream
+
+from .fake_rippled import FakeRippled, wait_for
+
+WALLET = "rhub8VRN55s94qWKDv6jmDy1pUykJzF3wq"
+OTHER = "rPT1Sjq2YGrBMTttX4GZHjKu9dyfzbpAYe"
+ISSUER = "rvYAfWj5gh67oV6fW32ZzP3Aw4Eubs59B"
+
+
+def payment(n: int, sender: str = WALLET, receiver: str = OTHER, amount=None) -> dict:
+    tx = {
+        "TransactionType": "Payment", "Account": sender, "Destination": receiver, "Fee": "12",
+        "Amount": amount or str(n * 1_000_000), "hash": f"{n:064X}", "ledger_index": 100 + n, "date": 750000000 + n,
+    }
+    return {"tx": tx, "meta": {"TransactionResult": "tesSUCCESS", "TransactionIndex": 0}, "validated": True}
+
+
+def account_tx(history: list, page_size: int):
+    """newest first pages of `history` (oldest first), the marker is an offset"""
+    def handler(command: dict) -> dict:
+        entries = [entry for entry in history if entry["tx"]["ledger_index"] >= command["ledger_index_min"]]
+        if not command["forward"]:
+            entries = entries[::-1]
+        start = command.get("marker", 0)
+        result = {"transactions": entries[start:start + page_size], "ledger_index_max": 100 + len(history)}
+        if start + page_size < len(entries):
+            result["marker"] = start + page_size
+        return result
+    return handler
+
+
+def test_a_wallet_is_backfilled_by_pages_and_kept_current_from_its_account() -> None:
+    history = [payment(n) if n % 2 else payment(n, OTHER, WALLET, {"currency": "USD", "issuer": ISSUER, "value": "5"})
+               for n in range(1, 8)]
+
+    async def run():
+        async with FakeRippled({"account_tx": account_tx(history, 3)}) as rippled:
+            stream = XrplStream(rippled.url, reconnect_delay=0.01)
+            store = MemoryTxStore()
+            indexer = TxIndexer(store, stream_factory=lambda mainnet: stream, page_size=3)
+            first = await indexer.history(WALLET)
+            assert first["index"]["following"]
+            await wait_for(lambda: store.states.get((WALLET, "mainnet"), {}).get("complete"))
+            assert rippled.sent("subscribe")[0]["accounts"] == [WALLET]
+            assert [command.get("marker") for command in rippled.sent("account_tx")] == [None, 3, 6]
+
+            live = payment(9)
+            await rippled.push({"type": "transaction", "validated": True, "ledger_index": 109,
+                                "transaction": live["tx"], "meta": live["meta"]})
+            await wait_for(lambda: len(store.records[(WALLET, "mainnet")]) == 8)
+
+            page = await indexer.history(WALLET, limit=5)
+            assert [record["ledger_index"] for record in page["transactions"]] == [109, 107, 106, 105, 104]
+            assert page["index"] == {"complete": True, "newest_ledger": 109, "oldest_ledger": 101,
+                                     "following": True, "syncing": False, "error": None}
+            rest = await indexer.history(WALLET, limit=5, cursor=page["cursor"])
+            assert [record["ledger_index"] for record in rest["transactions"]] == [103, 102, 101] and rest["cursor"] is None
+
+            received = await indexer.history(WALLET, direction="received", currency="USD")
+            assert [record["amount"] for record in received["transactions"]] == ["5"] * 3
+            assert all(record["counterparty"] == OTHER for record in received["transactions"])
+            assert (await indexer.history(WALLET, kind="payment_xrp", limit=500))["transactions"][0]["amount"] == "9.000000"
+            await indexer.close()
+
+    asyncio.run(run())
+
+
+def test_an_indexed_wallet_only_catches_up_on_what_is_newer() -> None:
+    history = [payment(n) for n in range(1, 6)]
+
+    async def run():
+        store = MemoryTxStore()
+        await store.add([])
+        await store.save_state(WALLET, "mainnet", complete=True, newest_ledger=103, oldest_ledger=101)
+        async with FakeRippled({"account_tx": account_tx(history, 10)}) as rippled:
+            stream = XrplStream(rippled.url, reconnect_delay=0.01)
+            indexer = TxIndexer(store, stream_factory=lambda mainnet: stream)
+            indexer.ensure(WALLET)
+            await wait_for(lambda: store.states[(WALLET, "mainnet")]["newest_ledger"] == 105)
+            (request,) = rippled.sent("account_tx")
+            assert request["ledger_index_min"] == 104 and request["forward"] is True
+            assert sorted(record["ledger_index"] for record in store.records[(WALLET, "mainnet")].values()) == [104, 105]
+
+            # after a reconnect the account is subscribed again and the gap read
+            history.append(payment(6))
+            await rippled.drop()
+            await wait_for(lambda: store.states[(WALLET, "mainnet")]["newest_ledger"] == 106)
+            assert len(rippled.sent("subscribe")) == 2 and rippled.sent("account_tx")[-1]["ledger_index_min"] == 106
+            await indexer.close()
+
+    asyncio.run(run())
+
+
+def test_followed_wallets_and_backfill_depth_are_capped() -> None:
+    history = [payment(n) for n in range(1, 8)]
+
+    async def run():
+        async with FakeRippled({"account_tx": account_tx(history, 2)}) as rippled:
+            stream = XrplStream(rippled.url, reconnect_delay=0.01)
+            store = MemoryTxStore()
+            indexer = TxIndexer(store, stream_factory=lambda mainnet: stream, page_size=2, max_wallets=1, max_pages=2)
+            try:
+                indexer.ensure("not a wallet")
+            except ValueError:
+                pass
+            else:
+                raise AssertionError("indexed a malformed address")
+
+            first = indexer.ensure(WALLET)
+            await wait_for(lambda: first.synced)
+            # two pages and no more, the next follow carries on from the marker
+            assert [command.get("marker") for command in rippled.sent("account_tx")] == [None, 2]
+            assert store.states[(WALLET, "mainnet")]["complete"] is False
+
+            indexer.ensure(OTHER)
+            assert indexer.stats()["following"] == 1 and (await indexer.status(WALLET))["following"] is False
+            await wait_for(lambda: first.task.done())
+            await indexer.close()
+
+    asyncio.run(run())
+
+
+def test_a_failed_resubscribe_is_retried_and_the_gap_still_read() -> None:
+    history = [payment(n) for n in range(1, 4)]
+    answers = [{}, RuntimeError("tooBusy"), {}]
+
+    def subscribe(command):
+        answer = answers.pop(0) if answers else {}
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+    async def run():
+        store = MemoryTxStore()
+        async with FakeRippled({"account_tx": account_tx(history, 10), "subscribe": subscribe}) as rippled:
+            stream = XrplStream(rippled.url, reconnect_delay=0.01)
+            indexer = TxIndexer(store, stream_factory=lambda mainnet: stream, retry_delay=0.01)
+            indexer.ensure(WALLET)
+            await wait_for(lambda: store.states.get((WALLET, "mainnet"), {}).get("complete"))
+            history.append(payment(4))
+            await rippled.drop()
+            await wait_for(lambda: store.states[(WALLET, "mainnet")]["newest_ledger"] == 104)
+            await wait_for(lambda: not indexer._tasks)
+            assert len(rippled.sent("subscribe")) == 3 and (await indexer.status(WALLET))["error"] is None
+            await indexer.close()
+
+    asyncio.run(run())
@@ -0,0 +1,143 @@
+import asyncio
+import json
+
+import httpx
+
+from blockchain.xrp.Media import NftMediaResolver, decode_uri, gateway_url, servable
+
+GATEWAY = "http://gateway.test"
+CID = "QmYwAPJzv5CZsnA625s3Xf2nemtYgPpHdWEz79ojWnPbdG"
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 64
+
+
+def hex_uri(uri: str) -> str:
+    return uri.encode().hex().upper()
+
+
+def test_uris_are_decoded_and_ipfs_goes_through_the_gateway() -> None:
+    assert decode_uri(hex_uri("ipfs://" + CID)) == "ipfs://" + CID
+    assert decode_uri("https://example.com/1.json") == "https://example.com/1.json"
+    assert gateway_url(f"ipfs://{CID}/1.json", GATEWAY) == f"{GATEWAY}/ipfs/{CID}/1.json"
+    assert gateway_url(f"ipfs://ipfs/{CID}", GATEWAY) == f"{GATEWAY}/ipfs/{CID}"
+    assert gateway_url(f"https://ipfs.io/ipfs/{CID}", GATEWAY + "/") == f"{GATEWAY}/ipfs/{CID}"
+    assert gateway_url(CID, GATEWAY) == f"{GATEWAY}/ipfs/{CID}"
+    assert gateway_url("https://example.com/1.json", GATEWAY) == "https://example.com/1.json"
+
+
+def test_a_gallery_fetches_each_uri_once_and_reads_from_disk_after_a_restart(tmp_path) -> None:
+    calls = []
+    in_flight = []
+    most = []
+    files = {
+        f"/ipfs/{CID}/{n}.json": (json.dumps({"name": f"#{n}", "image": f"ipfs://{CID}/art.png"}).encode(), "application/json")
+        for n in range(6)
+    }
+    files[f"/ipfs/{CID}/art.png"] = (PNG, "image/png")
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.path)
+        in_flight.append(request)
+        most.append(len(in_flight))
+        await asyncio.sleep(0.01)
+        in_flight.remove(request)
+        if request.url.path not in files:
+            return httpx.Response(404)
+        body, content_type = files[request.url.path]
+        return httpx.Response(200, content=body, headers={"content-type": content_type})
+
+    nfts = [{"id": str(n), "uri": hex_uri(f"ipfs://{CID}/{n}.json")} for n in range(6)]
+    nfts.append({"id": "missing", "uri": hex_uri(f"ipfs://{CID}/missing.json")})
+
+    async def run():
+        resolver = NftMediaResolver(GATEWAY, cache_dir=str(tmp_path), concurrency=2, media_path="/media/",
+                                    transport=httpx.MockTransport(handler))
+        gallery = await resolver.gallery(nfts)
+        assert max(most) <= 2
+        assert sorted(calls) == sorted(list(files) + [f"/ipfs/{CID}/missing.json"])
+        assert [item["name"] for item in gallery[:6]] == [f"#{n}" for n in range(6)]
+        digest = gallery[0]["image"][len("/media/"):]
+        assert all(item["image"] == f"/media/{digest}" for item in gallery[:6])
+        assert gallery[0]["source"] == f"{GATEWAY}/ipfs/{CID}/art.png" and gallery[0]["uri"] == f"ipfs://{CID}/0.json"
+        assert await resolver.media(digest) == ("image/png", PNG)
+        assert gallery[6]["error"] and gallery[6]["image"] is None
+        await resolver.aclose()
+
+        # a new process serves the same gallery from disk
+        restarted = NftMediaResolver(GATEWAY, cache_dir=str(tmp_path), media_path="/media/",
+                                     transport=httpx.MockTransport(handler))
+        again = await restarted.gallery(nfts[:6])
+        assert [item["image"] for item in again] == [item["image"] for item in gallery[:6]]
+        assert restarted.stats()["fetches"] == 0 and await restarted.media(digest) == ("image/png", PNG)
+        await restarted.aclose()
+
+    asyncio.run(run())
+    assert len(calls) == 8
+
+
+def test_bodies_evicted_from_memory_are_fetched_again() -> None:
+    calls = []
+    metadata = json.dumps({"name": "art", "image": f"ipfs://{CID}/art.png"}).encode()
+    files = {f"/ipfs/{CID}/1.json": (metadata, "application/json"), f"/ipfs/{CID}/art.png": (PNG * 20, "image/png")}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.path)
+        body, content_type = files[request.url.path]
+        return httpx.Response(200, content=body, headers={"content-type": content_type})
+
+    async def run():
+        # room for one body at a time, the image pushes the metadata out and back
+        resolver = NftMediaResolver(GATEWAY, memory_bytes=1000, transport=httpx.MockTransport(handler))
+        nft = {"id": "1", "uri": hex_uri(f"ipfs://{CID}/1.json")}
+        first = await resolver.resolve(nft)
+        again = await resolver.resolve(nft)
+        assert first["error"] is None and again["error"] is None and again["image"] == first["image"]
+        assert calls.count(f"/ipfs/{CID}/1.json") == 2
+        assert await resolver.media(first["image"]) == ("image/png", PNG * 20)
+        assert len(resolver.store._names) <= 2
+        await resolver.aclose()
+
+    asyncio.run(run())
+
+
+def test_only_the_gateway_may_be_private_and_only_images_and_json_are_served() -> None:
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(str(request.url))
+        if request.url.path == "/ipfs/moved":
+            return httpx.Response(302, headers={"location": "http://10.0.0.1/secret"})
+        if request.url.path == "/ipfs/page.html":
+            return httpx.Response(200, content=b"<html><script>alert(1)</script></html>", headers={"content-type": "text/html"})
+        return httpx.Response(200, content=PNG, headers={"content-type": "application/octet-stream"})
+
+    async def run():
+        resolver = NftMediaResolver(GATEWAY, transport=httpx.MockTransport(handler))
+        for uri in ("http://127.0.0.1:8080/x", "http://169.254.169.254/latest/meta-data", "http://[::1]/x", "ipfs://moved"):
+            try:
+                await resolver.fetch(uri)
+            except ValueError as exception:
+                assert "public address" in str(exception)
+            else:
+                raise AssertionError(f"{uri} was fetched")
+        assert calls == [f"{GATEWAY}/ipfs/moved"]
+
+        page = await resolver.media(await resolver.fetch("ipfs://page.html"))
+        image = await resolver.media(await resolver.fetch("ipfs://art.png"))
+        assert page[0] == "application/octet-stream" and not servable(page[0])
+        assert image == ("image/png", PNG) and servable(image[0])
+        await resolver.aclose()
+
+    asyncio.run(run())
+
+
+def test_a_client_left_behind_by_a_loop_or_configure_is_closed() -> None:
+    resolver = NftMediaResolver(GATEWAY, transport=httpx.MockTransport(lambda request: httpx.Response(404)))
+
+    async def client():
+        return resolver._client()
+
+    first = asyncio.run(client())
+    second = asyncio.run(client())
+    assert first is not second and first.is_closed and not second.is_closed
+    resolver.configure(timeout=5.0)
+    assert second.is_closed
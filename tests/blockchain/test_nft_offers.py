@@ -0,0 +1,136 @@
+import asyncio
+import copy
+import json
+
+import httpx
+
+from blockchain.xrp.Nft import xNFT
+from blockchain.xrp.NftOffers import NftOfferCache, TooManyRequests
+from blockchain.xrp.Pool import xrpl_pool
+from blockchain.xrp.Stream import XrplStream
+
+from .fake_rippled import FakeRippled, wait_for
+
+LISTED = "000800006203F49C21D5D6E022CB16DE3538F248662FC73C00000001"
+UNLISTED = "000800006203F49C21D5D6E022CB16DE3538F248662FC73C00000002"
+BROKEN = "000800006203F49C21D5D6E022CB16DE3538F248662FC73C00000003"
+OWNER = "rPT1Sjq2YGrBMTttX4GZHjKu9dyfzbpAYe"
+ISSUER = "rvYAfWj5gh67oV6fW32ZzP3Aw4Eubs59B"
+
+
+def offer(n: int, amount, **fields) -> dict:
+    return {"nft_offer_index": f"{n:064X}", "owner": OWNER, "flags": 0, "amount": amount, **fields}
+
+
+OFFERS = {
+    ("nft_sell_offers", LISTED): [
+        [offer(1, "30000000"), offer(2, "12000000"), offer(3, "1000000", expiration=1)],
+        [offer(4, "15000000", destination=ISSUER), offer(5, {"currency": "USD", "issuer": ISSUER, "value": "1"})],
+    ],
+    ("nft_buy_offers", LISTED): [[offer(6, "9000000"), offer(7, "11000000")]],
+}
+
+
+def rpc_handler(offers: dict, calls: list, in_flight: list, most: list):
+    async def handler(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        method, params = body["method"], body["params"][0]
+        calls.append((method, params))
+        in_flight.append(request)
+        most.append(len(in_flight))
+        await asyncio.sleep(0.01)
+        in_flight.remove(request)
+        if params["nft_id"] == BROKEN:
+            return httpx.Response(200, json={"result": {"status": "error", "error": "slowDown"}})
+        pages = offers.get((method, params["nft_id"]))
+        if pages is None:
+            return httpx.Response(200, json={"result": {"status": "error", "error": "objectNotFound"}})
+        number = params.get("marker", 0)
+        result = {"status": "success", "nft_id": params["nft_id"], "offers": pages[number], "ledger_index": 90}
+        if number + 1 < len(pages):
+            result["marker"] = number + 1
+        return httpx.Response(200, json={"result": result})
+    return handler
+
+
+def test_many_nfts_are_summarized_concurrently_and_cached_until_an_offer_changes() -> None:
+    offers, calls, in_flight, most = copy.deepcopy(OFFERS), [], [], []
+    xrpl_pool.configure(async_transport=httpx.MockTransport(rpc_handler(offers, calls, in_flight, most)))
+
+    async def run():
+        async with FakeRippled() as rippled:
+            stream = XrplStream(rippled.url, reconnect_delay=0.01)
+            cache = NftOfferCache(stream_factory=lambda mainnet: stream, concurrency=3, rate=0)
+            listed, unlisted, broken = await cache.summaries([LISTED, UNLISTED, BROKEN])
+            assert max(most) <= 3
+
+            assert listed["floor"]["amount"] == "12.000000" and listed["floor"]["offer_id"] == f"{2:064X}"
+            assert listed["best_bid"]["amount"] == "11.000000" and listed["best_bid"]["token"] == "XRP"
+            # the expired offer is gone, the usd one is counted but not priced
+            assert (listed["sell_offers"], listed["buy_offers"], listed["token_offers"]) == (4, 2, 1)
+            pages = [params for method, params in calls if method == "nft_sell_offers" and params["nft_id"] == LISTED]
+            assert pages[0]["ledger_index"] == "validated" and (pages[1]["marker"], pages[1]["ledger_index"]) == (1, 90)
+            assert unlisted["floor"] is None and unlisted["best_bid"] is None and unlisted["error"] is None
+            assert unlisted["sell_offers"] == unlisted["buy_offers"] == 0
+            assert broken["error"] and "slowDown" in broken["error"]
+
+            await wait_for(lambda: cache._subscribed)
+            assert rippled.sent("subscribe")[0]["streams"] == ["transactions"]
+            # read before the stream was subscribed, nothing would have invalidated them
+            assert cache.stats()["nfts"] == 0
+            await cache.summaries([LISTED, UNLISTED])
+            requests = len(calls)
+            await cache.summaries([LISTED, UNLISTED])
+            assert len(calls) == requests and cache.stats()["hits"] == 2
+
+            # someone lists it cheaper, only that nft is read again
+            offers[("nft_sell_offers", LISTED)][0].append(offer(8, "5000000"))
+            await rippled.push({
+                "type": "transaction", "validated": True, "ledger_index": 91,
+                "transaction": {"TransactionType": "NFTokenCreateOffer", "NFTokenID": LISTED, "Account": OWNER, "Flags": 1},
+                "meta": {"TransactionResult": "tesSUCCESS", "AffectedNodes": []},
+            })
+            await wait_for(lambda: cache.stats()["invalidated"] == 1)
+            listed, unlisted = await cache.summaries([LISTED, UNLISTED])
+            assert listed["floor"]["amount"] == "5.000000" and len(calls) == requests + 3
+            await cache.close()
+
+    try:
+        asyncio.run(run())
+    finally:
+        xrpl_pool.configure(async_transport=None)
+
+
+def test_each_caller_gets_its_own_share() -> None:
+    offers, calls = {}, []
+    xrpl_pool.configure(async_transport=httpx.MockTransport(rpc_handler(offers, calls, [], [])))
+
+    async def run():
+        # no stream, nothing is cached and every call reads again
+        cache = NftOfferCache(stream_factory=lambda mainnet: XrplStream("ws://127.0.0.1:1"), rate=0, max_ids=2, caller_rate=1)
+        assert len(await cache.summaries([LISTED, UNLISTED], caller="10.0.0.1")) == 2
+        try:
+            await cache.summaries([LISTED], caller="10.0.0.1")
+        except TooManyRequests as exception:
+            assert "try again in 1s" in str(exception)
+        else:
+            raise AssertionError("the caller went over its share")
+        assert len(await cache.summaries([LISTED, UNLISTED], caller="10.0.0.2")) == 2
+        await asyncio.sleep(1.05)
+        assert len(await cache.summaries([LISTED], caller="10.0.0.1")) == 1
+        assert len(calls) == 10
+        await cache.close()
+
+    try:
+        asyncio.run(run())
+    finally:
+        xrpl_pool.configure(async_transport=None)
+
+
+def test_all_nft_offers_reads_the_lowercase_fields() -> None:
+    buy = {"nft_id": LISTED, "offers": [offer(1, "2500000", destination=ISSUER, expiration=750000000)]}
+    offers = xNFT("https://rippled.test", "", "")._all_nft_offers(buy, {"error": "objectNotFound"})
+    assert offers["sell"] == []
+    (bid,) = offers["buy"]
+    assert (bid["token"], bid["amount"], bid["receiver"]) == ("XRP", "2.500000", ISSUER)
+    assert bid["expiry_date"] == "2023-10-07 13:20:00+00:00"
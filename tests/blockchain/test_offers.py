@@ -0,0 +1,36 @@
+from blockchain.xrp.Offers import (account_offer_json, book_offer_json, decode_account_offers,
+                                   decode_book_offers, OfferDecoder)
+
+ISSUER = "rhub8VRN55s94qWKDv6jmDy1pUykJzF3wq"
+SOLO = "534F4C4F00000000000000000000000000000000"
+
+
+def test_book_offers_decode_to_the_api_shape() -> None:
+    offers = [
+        {"Account": "rA", "index": "I1", "Flags": 0, "Sequence": 7, "quality": "2000000", "owner_funds": "3000000",
+         "TakerGets": "1500000", "TakerPays": {"currency": SOLO, "issuer": ISSUER, "value": "3"}},
+        {"Account": "rB", "index": "I2", "Flags": 0, "Sequence": 8, "quality": "0.5",
+         "TakerGets": {"currency": SOLO, "issuer": ISSUER, "value": "4"}, "TakerPays": {"currency": "USD", "issuer": ISSUER, "value": "2"}},
+    ]
+    first, second = [book_offer_json(record) for record in decode_book_offers(offers)]
+    assert first["creator_liquidity"] == "3.0 XRP"
+    assert (first["buy_token"], first["buy_amount"]) == ("SOLO", "3")
+    assert (first["sell_token"], first["sell_issuer"], first["sell_amount"]) == ("XRP", "", "1.500000")
+    assert second["creator_liquidity"] == ""
+    assert list(second) == ["creator", "offer_id", "sequence", "rate", "flags", "creator_liquidity",
+                            "buy_token", "buy_issuer", "buy_amount", "sell_token", "sell_issuer", "sell_amount"]
+
+
+def test_account_offers_keep_rate_and_passive_flag() -> None:
+    offers = [{"flags": 0x00010000, "seq": 3, "quality": "2", "taker_gets": {"currency": "USD", "issuer": ISSUER, "value": "5"},
+               "taker_pays": "10000000"}]
+    record, = decode_account_offers(offers)
+    assert record.passive
+    assert account_offer_json(record)["rate"] == 0.5
+
+
+def test_currencies_are_decoded_once_per_page() -> None:
+    decoder = OfferDecoder()
+    decoder.book_offers([{"Account": "rA", "Flags": 0, "Sequence": n, "TakerGets": "1",
+                          "TakerPays": {"currency": SOLO, "issuer": ISSUER, "value": "1"}} for n in range(50)])
+    assert decoder._symbols == {SOLO: "SOLO"}
@@ -0,0 +1,65 @@
+import asyncio
+import json
+
+import httpx
+
+from blockchain.xrp.Objects import xObject
+from blockchain.xrp.Paging import decode_cursor, encode_cursor, page
+from blockchain.xrp.Pool import xrpl_pool
+
+URL = "https://rippled.test"
+ACCOUNT = "rPT1Sjq2YGrBMTttX4GZHjKu9dyfzbpAYe"
+
+
+def account_offer(seq: int) -> dict:
+    return {"flags": 0, "seq": seq, "quality": "1", "taker_pays": "1000000",
+            "taker_gets": {"currency": "USD", "issuer": ACCOUNT, "value": "1"}}
+
+
+def paged_handler(calls: list):
+    def handler(request: httpx.Request) -> httpx.Response:
+        params = json.loads(request.content)["params"][0]
+        calls.append(params)
+        marker = params.get("marker")
+        seq = 0 if marker is None else marker["seq"]
+        result = {"status": "success", "ledger_index": 80, "offers": [account_offer(seq), account_offer(seq + 1)]}
+        if seq < 4:
+            result["marker"] = {"seq": seq + 2}
+        return httpx.Response(200, json={"result": result})
+    return handler
+
+
+def test_pages_follow_the_marker_on_one_ledger() -> None:
+    calls = []
+    xrpl_pool.configure(async_transport=httpx.MockTransport(paged_handler(calls)))
+    try:
+        objects = xObject(URL, "", "")
+
+        async def run():
+            return [(offers, marker) async for offers, marker in objects.account_offers_pages(ACCOUNT, limit=2)]
+
+        pages = asyncio.run(run())
+        assert [[offer["sequence"] for offer in offers] for offers, _ in pages] == [[0, 1], [2, 3], [4, 5]]
+        assert [marker for _, marker in pages] == [{"seq": 2}, {"seq": 4}, None]
+        assert calls[0]["ledger_index"] == "validated"
+        assert calls[1]["ledger_index"] == 80 and calls[1]["marker"] == {"seq": 2}
+
+        calls.clear()
+        first = asyncio.run(page(objects.account_offers_pages(ACCOUNT, limit=2)))
+        assert len(calls) == 1
+        assert decode_cursor(first["cursor"]) == {"seq": 2}
+        last = asyncio.run(page(objects.account_offers_pages(ACCOUNT, 2, decode_cursor(encode_cursor({"seq": 4})))))
+        assert last["cursor"] is None
+        assert [offer["sequence"] for offer in last["result"]] == [4, 5]
+    finally:
+        xrpl_pool.configure(async_transport=None)
+
+
+def test_bad_cursors_are_rejected() -> None:
+    assert decode_cursor(None) is None
+    try:
+        decode_cursor("not-a-cursor")
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("bad cursor accepted")
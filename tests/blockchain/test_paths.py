@@ -0,0 +1,156 @@
+import asyncio
+import json
+
+import httpx
+from xrpl.models import IssuedCurrency
+
+from blockchain.xrp.Paths import PathCache, amount_bucket, best_paths
+from blockchain.xrp.Pool import xrpl_pool
+from blockchain.xrp.Stream import XrplStream
+
+from .fake_rippled import FakeRippled, wait_for
+
+ISSUER = "rhub8VRN55s94qWKDv6jmDy1pUykJzF3wq"
+EUR_ISSUER = "rLNaPoKeeBjZe2qs6x52yVPZpZ8td4dc6w"
+USD = IssuedCurrency(currency="USD", issuer=ISSUER)
+EUR = IssuedCurrency(currency="EUR", issuer=EUR_ISSUER)
+
+
+def eur(value: str) -> dict:
+    return {"currency": "EUR", "issuer": EUR_ISSUER, "value": value}
+
+
+XRP_BRIDGE = [[{"currency": "XRP"}, {"currency": "USD", "issuer": ISSUER}]]
+
+
+def test_alternatives_in_the_sold_currency_cheapest_first() -> None:
+    alternatives = [
+        {"source_amount": eur("9.5"), "paths_computed": XRP_BRIDGE},
+        {"source_amount": "12000000", "paths_computed": []},
+        {"source_amount": eur("9.2"), "paths_computed": [[{"account": "rHop"}]]},
+    ]
+    paths = best_paths(alternatives, EUR, 10)
+    assert [path["cost"] for path in paths] == [9.2, 9.5]
+    assert paths[1]["hops"] == 2 and abs(paths[0]["price"] - 0.92) < 1e-12
+
+
+def test_cold_pairs_share_a_bounded_path_find_pool() -> None:
+    in_flight = [0, 0]
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        params = json.loads(request.content)["params"][0]
+        in_flight[0] += 1
+        in_flight[1] = max(in_flight)
+        await asyncio.sleep(0.01)
+        in_flight[0] -= 1
+        assert params["source_currencies"] == [{"currency": "EUR", "issuer": EUR_ISSUER}]
+        value = float(params["destination_amount"]["value"])
+        return httpx.Response(200, json={"result": {"status": "success", "alternatives": [
+            {"source_amount": eur(str(value * 0.9)), "paths_computed": XRP_BRIDGE}]}})
+
+    xrpl_pool.configure(async_transport=httpx.MockTransport(handler))
+    try:
+        paths = PathCache(concurrency=2, max_subscriptions=0, account="rTaker")
+
+        async def quotes():
+            first = await asyncio.gather(*[paths.quote(USD, EUR, amount) for amount in range(1, 9)])
+            again = await paths.quote(USD, EUR, 4)
+            return first, again
+
+        first, again = asyncio.run(quotes())
+        assert in_flight[1] == 2 and paths.path_finds == 8
+        assert abs(first[3]["cost"] - 3.6) < 1e-9 and first[3]["source"] == "ripple_path_find"
+        assert again["source"] == "cache" and paths.path_finds == 8
+    finally:
+        xrpl_pool.configure(async_transport=None)
+
+
+def test_popular_pairs_are_served_from_a_live_path_find() -> None:
+    http_calls = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        http_calls.append(request)
+        return httpx.Response(200, json={"result": {"status": "success", "alternatives": [
+            {"source_amount": eur("11"), "paths_computed": []}]}})
+
+    def create(command: dict) -> dict:
+        assert command["subcommand"] in ("create", "close")
+        return {"alternatives": [{"source_amount": eur("10"), "paths_computed": XRP_BRIDGE}], "full_reply": True}
+
+    async def scenario():
+        async with FakeRippled({"path_find": create}) as rippled:
+            paths = PathCache(ttl=0, promote_after=2, account="rTaker", stream_factory=lambda mainnet: XrplStream(rippled.url, reconnect_delay=0.01))
+            assert (await paths.quote(USD, EUR, 10))["source"] == "ripple_path_find"
+            await paths.quote(USD, EUR, 10)
+            await wait_for(lambda: paths.stats()["live"] == 1)
+            live = await paths.quote(USD, EUR, 10)
+            assert live["source"] == "path_find" and live["cost"] == 10
+            # rippled re-runs the search every ledger and pushes what changed
+            await rippled.push({"type": "path_find", "full_reply": True, "alternatives": [
+                {"source_amount": eur("9.8"), "paths_computed": XRP_BRIDGE}]})
+            await wait_for(lambda: paths._feeds and next(iter(paths._feeds.values())).alternatives[0]["source_amount"]["value"] == "9.8")
+            assert (await paths.quote(USD, EUR, 10))["cost"] == 9.8
+            assert len(http_calls) == 2 and paths.stats()["live_hits"] == 2
+            await paths.close()
+            return rippled.sent("path_find")
+
+    xrpl_pool.configure(async_transport=httpx.MockTransport(handler))
+    try:
+        sent = asyncio.run(scenario())
+        assert [command["subcommand"] for command in sent] == ["create", "close"]
+        assert sent[0]["destination_amount"]["value"] == "10" and sent[0]["source_account"] == "rTaker"
+        assert sent[0]["source_currencies"] == [{"currency": "EUR", "issuer": EUR_ISSUER}]
+    finally:
+        xrpl_pool.configure(async_transport=None)
+
+
+def test_nearby_amounts_share_a_search_and_a_feed_that_never_answers_is_dropped() -> None:
+    searched = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        value = json.loads(request.content)["params"][0]["destination_amount"]["value"]
+        searched.append(value)
+        return httpx.Response(200, json={"result": {"status": "success", "alternatives": [
+            {"source_amount": eur(str(float(value) * 0.9)), "paths_computed": XRP_BRIDGE}]}})
+
+    async def scenario():
+        # nobody listens there, the path_find never answers
+        stream = XrplStream("ws://127.0.0.1:1", reconnect_delay=0.01, request_timeout=0.1)
+        paths = PathCache(promote_after=2, account="rTaker", stream_factory=lambda mainnet: stream)
+        first = await paths.quote(USD, EUR, 123.4)
+        second = await paths.quote(USD, EUR, 125)
+        assert searched == ["130"] and second["source"] == "cache"
+        assert abs(first["cost"] - 111.06) < 1e-9 and abs(second["cost"] - 112.5) < 1e-9
+        assert second["quoted_amount"]["value"] == "130" and second["destination_amount"]["value"] == "125"
+        await wait_for(lambda: not paths._starting)
+        assert paths.stats()["subscriptions"] == 0
+        await paths.close()
+
+    xrpl_pool.configure(async_transport=httpx.MockTransport(handler))
+    try:
+        assert [amount_bucket(amount) for amount in (10, 10.5, 0.123, 99.1)] == [10, 11, 0.13, 100]
+        asyncio.run(scenario())
+    finally:
+        xrpl_pool.configure(async_transport=None)
+
+
+def test_a_feed_whose_create_fails_after_a_reconnect_isnt_live() -> None:
+    answers = [{"alternatives": [{"source_amount": eur("10"), "paths_computed": XRP_BRIDGE}], "full_reply": True}]
+
+    def create(command: dict) -> dict:
+        if not answers:
+            raise RuntimeError("tooBusy")
+        return answers.pop()
+
+    async def scenario():
+        async with FakeRippled({"path_find": create}) as rippled:
+            paths = PathCache(account="rTaker", stream_factory=lambda mainnet: XrplStream(rippled.url, reconnect_delay=0.01))
+            feed = await paths.subscribe("rTaker", USD, EUR, 10)
+            assert feed.live
+            await rippled.drop()
+            # the create is sent after the old paths were forgotten
+            await wait_for(lambda: len(rippled.sent("path_find")) == 2)
+            assert feed.stream.connected and not feed.live and feed.alternatives == []
+            await paths.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,63 @@
+import asyncio
+import json
+
+import httpx
+from xrpl.models import AccountInfo
+
+from blockchain.xrp.Pool import ClientPool
+
+URL = "https://rippled.test"
+
+
+def rippled_transport(calls: list):
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(json.loads(request.content))
+        return httpx.Response(200, json={"result": {"status": "success", "account_data": {"Balance": "25000000"}}})
+    return handler
+
+
+def test_sync_clients_share_one_http_client() -> None:
+    calls = []
+    pool = ClientPool(transport=httpx.MockTransport(rippled_transport(calls)))
+    client = pool.client(URL)
+    assert pool.client(URL) is client
+    for _ in range(3):
+        result = client.request(AccountInfo(account="rPT1Sjq2YGrBMTttX4GZHjKu9dyfzbpAYe")).result
+        assert result["account_data"]["Balance"] == "25000000"
+    assert len(calls) == 3
+    assert calls[0]["method"] == "account_info"
+    assert pool.http_client(URL) is pool.http_client(URL)
+    pool.close()
+
+
+def test_async_client_is_rebuilt_per_event_loop() -> None:
+    calls = []
+    pool = ClientPool(async_transport=httpx.MockTransport(rippled_transport(calls)))
+    client = pool.async_client(URL)
+
+    async def run():
+        first = pool.async_http_client(URL)
+        await client.request(AccountInfo(account="rPT1Sjq2YGrBMTttX4GZHjKu9dyfzbpAYe"))
+        assert pool.async_http_client(URL) is first
+        return first
+
+    first = asyncio.run(run())
+    second = asyncio.run(run())
+    assert first is not second
+    assert len(calls) == 2
+    # the client of the finished loop isn't left open
+    assert first.is_closed and not second.is_closed
+    pool.close()
+    assert second.is_closed
+
+
+def test_configure_rejects_unknown_options() -> None:
+    pool = ClientPool()
+    pool.configure(max_connections=5)
+    assert pool.max_connections == 5
+    try:
+        pool.configure(max_sockets=5)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("unknown option accepted")
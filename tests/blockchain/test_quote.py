@@ -0,0 +1,105 @@
+import asyncio
+import bisect
+import json
+
+import httpx
+
+from blockchain.xrp import Quote
+from blockchain.xrp.Books import OrderBook
+from blockchain.xrp.Pool import xrpl_pool
+from blockchain.xrp.Quote import QuoteBook, transfer_rate
+from blockchain.xrp_client import XammFinance
+
+ISSUER = "rhub8VRN55s94qWKDv6jmDy1pUykJzF3wq"
+
+
+def usd_offer(index: str, account: str, gets: str, pays_drops: int, **extra) -> dict:
+    return {"index": index, "Account": account, "Flags": 0, "Sequence": 1,
+            "TakerGets": {"currency": "USD", "issuer": ISSUER, "value": gets}, "TakerPays": str(pays_drops), **extra}
+
+
+def test_quotes_walk_funded_liquidity() -> None:
+    book = OrderBook([
+        usd_offer("A", "rAlice", "10", 10000000, owner_funds="15"),  # 1 XRP per USD
+        usd_offer("B", "rAlice", "10", 20000000),  # alice only has 5 USD left for this one
+        usd_offer("C", "rBob", "10", 30000000, taker_gets_funded={"currency": "USD", "issuer": ISSUER, "value": "4"}),
+    ])
+    quotes = QuoteBook.from_book(book)
+    assert quotes.gets == [10, 5, 4] and quotes.depth == 19
+
+    quote = quotes.quote(12)
+    assert quote["fully_filled"] and quote["offers_consumed"] == 2
+    assert quote["cost"] == 10 + 2 * 2
+    assert quote["best_price"] == 1 and quote["worst_price"] == 2
+    assert abs(quote["slippage"] - (14 / 12 - 1)) < 1e-12
+
+    spend = quotes.quote(20, side="sell")
+    assert spend["filled"] == 15 and spend["fully_filled"]
+
+    too_much = quotes.quote(50)
+    assert not too_much["fully_filled"] and too_much["filled"] == 19
+
+
+def test_transfer_rates_are_applied_on_both_sides() -> None:
+    assert transfer_rate({"account_data": {"TransferRate": 1002000000}}) == 1.002
+    assert transfer_rate({"account_data": {}}) == 1.0
+    # alice holds 10.2 USD, delivering it costs her 2% on top
+    book = OrderBook([usd_offer("A", "rAlice", "20", 20000000, owner_funds="10.2")])
+    quotes = QuoteBook.from_book(book, buy_rate=1.02, sell_rate=1.0)
+    assert abs(quotes.depth - 10) < 1e-9
+
+
+def test_a_quote_is_one_binary_search_on_deep_books(monkeypatch) -> None:
+    book = OrderBook([usd_offer(f"I{n}", f"r{n}", "1", 1000000 + n) for n in range(5000)])
+    quotes = QuoteBook.from_book(book)
+    searches = []
+
+    def counting(*args):
+        searches.append(args)
+        return bisect.bisect_left(*args)
+
+    monkeypatch.setattr(Quote, "bisect_left", counting)
+    for amount in (0.5, 4.5, 2500.25, 4999):
+        whole, part = int(amount), amount - int(amount)
+        # every offer delivers 1 USD for 1 + n/1000000 XRP
+        walked = sum(1 + n / 1000000 for n in range(whole)) + part * (1 + whole / 1000000)
+        assert abs(quotes.quote(amount)["cost"] - walked) < 1e-6
+    assert len(searches) == 4
+
+
+def test_a_streamed_fill_drops_the_snapshots_funding() -> None:
+    book = OrderBook([usd_offer("A", "rAlice", "10", 10000000, owner_funds="10",
+                                taker_gets_funded={"currency": "USD", "issuer": ISSUER, "value": "4"})])
+    assert QuoteBook.from_book(book).depth == 4
+    fields = {key: value for key, value in usd_offer("A", "rAlice", "6", 6000000).items() if key != "index"}
+    book.apply("ModifiedNode", {"LedgerEntryType": "Offer", "LedgerIndex": "A", "FinalFields": fields})
+    assert not set(book.get("A")) & {"owner_funds", "taker_gets_funded", "taker_pays_funded"}
+    assert QuoteBook.from_book(book).depth == 6
+
+
+def test_a_swap_the_offer_limit_would_kill_is_refused_up_front() -> None:
+    offers = [usd_offer("A", "rAlice", "10", 10000000), usd_offer("B", "rBob", "10", 20000000)]
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        method = json.loads(request.content)["method"]
+        result = {"offers": offers, "ledger_index": 80} if method == "book_offers" else {"account_data": {}}
+        return httpx.Response(200, json={"result": {"status": "success", **result}})
+
+    async def check(buy: float, sell: float, tf_sell: bool) -> str:
+        try:
+            await XammFinance().check_order_book_swap(buy, sell, tf_sell, "USD", "xrp", ISSUER, mainnet=False)
+        except ValueError as exception:
+            return str(exception)
+        return ""
+
+    xrpl_pool.configure(async_transport=httpx.MockTransport(handler), coalesce=False)
+    try:
+        # 15 usd for 25 xrp costs 20, but its second half is past the 25 / 15 limit
+        assert "past the offer's limit" in asyncio.run(check(15, 25, False))
+        assert asyncio.run(check(15, 30, False)) == ""
+        # selling 30 xrp gets 20 usd, not the 21 asked for
+        assert "less than 21" in asyncio.run(check(21, 30, True))
+        assert asyncio.run(check(15, 30, True)) == ""
+        assert "must be positive" in asyncio.run(check(0, 30, True))
+    finally:
+        xrpl_pool.configure(async_transport=None, coalesce=True)
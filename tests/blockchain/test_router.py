@@ -0,0 +1,103 @@
+import asyncio
+import json
+
+import httpx
+from xrpl.models import IssuedCurrency
+
+from blockchain.xrp.Books import OrderBook
+from blockchain.xrp.Pool import xrpl_pool
+from blockchain.xrp.Quote import QuoteBook
+from blockchain.xrp.Router import AmmPool, SwapRouter, router_cache
+from blockchain.xrp_client import XammFinance
+
+ISSUER = "rhub8VRN55s94qWKDv6jmDy1pUykJzF3wq"
+USD = IssuedCurrency(currency="USD", issuer=ISSUER)
+
+
+def usd_offer(index: str, gets: str, pays_drops: int) -> dict:
+    return {"index": index, "Account": f"r{index}", "Flags": 0, "Sequence": 1,
+            "TakerGets": {"currency": "USD", "issuer": ISSUER, "value": gets}, "TakerPays": str(pays_drops)}
+
+
+def amm_info(xrp_drops: str, usd: str, fee: int = 500) -> dict:
+    return {"amm": {"account": "rAMM", "amount": xrp_drops, "amount2": {"currency": "USD", "issuer": ISSUER, "value": usd}, "trading_fee": fee}}
+
+
+BOOK = OrderBook([usd_offer("A", "10", 10000000), usd_offer("B", "10", 12000000), usd_offer("C", "50", 75000000)])
+
+
+def test_pool_math_is_constant_product() -> None:
+    pool = AmmPool(1000, 1000, 1000)  # 1% fee
+    out = pool.output(100)
+    assert abs(pool.cost(out) - 100) < 1e-9
+    # what is taken out never breaks x * y, fee aside
+    assert (1000 + 100 * 0.99) * (1000 - out) >= 1000 * 1000 - 1e-6
+    assert abs(pool.price(pool.output_at(1.2)) - 1.2) < 1e-9
+    assert pool.output_at(pool.spot_price) == 0
+
+
+def test_route_equalizes_marginal_prices() -> None:
+    pool = AmmPool(100, 100, 0)  # spot 1 XRP per USD
+    router = SwapRouter(QuoteBook.from_book(BOOK), pool)
+    quote = router.route(30)
+    split = quote["route"]
+    assert quote["fully_filled"] and abs(quote["filled"] - 30) < 1e-9
+    assert abs(split["order_book"]["out"] + split["amm"]["out"] - 30) < 1e-9
+    # the last unit from the pool costs what the last offer used does, or less
+    assert pool.price(split["amm"]["out"]) <= quote["worst_price"] + 1e-9
+    # and no other split of the 30 is cheaper
+    for amm_out in range(0, 30):
+        book_cost = QuoteBook.from_book(BOOK).quote(30 - amm_out)["cost"]
+        assert quote["cost"] <= book_cost + pool.cost(amm_out) + 1e-9
+    assert quote["cost"] < quote["order_book_only"]["cost"]
+
+
+def test_sell_side_spends_the_amount() -> None:
+    router = SwapRouter(QuoteBook.from_book(BOOK, sell_rate=1.0), AmmPool(100, 100, 300))
+    bought = router.route(25)
+    spent = router.route(bought["cost"], side="sell")
+    assert abs(spent["filled"] - 25) < 1e-6
+    # without a pool it is the plain book quote
+    alone = SwapRouter(QuoteBook.from_book(BOOK)).route(25)
+    assert alone["cost"] == QuoteBook.from_book(BOOK).quote(25)["cost"] and alone["amm"] is None
+
+
+def test_reserves_follow_the_swap_direction() -> None:
+    pool = AmmPool.from_amm_info(amm_info("100000000", "250"), USD)
+    assert (pool.reserve_in, pool.reserve_out, pool.fee) == (100, 250, 0.005)
+    assert AmmPool.from_amm_info({"error": "actNotFound"}, USD) is None
+
+
+def test_route_swap_reuses_state_and_builds_one_offer() -> None:
+    calls = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        calls.append(body["method"])
+        if body["method"] == "amm_info":
+            return httpx.Response(200, json={"result": {"status": "success", **amm_info("200000000", "200")}})
+        if body["method"] == "book_offers":
+            return httpx.Response(200, json={"result": {"status": "success", "ledger_index": 7, "offers": BOOK.depth()}})
+        return httpx.Response(200, json={"result": {"status": "success", "account_data": {}}})
+
+    xrpl_pool.configure(async_transport=httpx.MockTransport(handler))
+    router_cache.clear()
+    try:
+        client = XammFinance()
+
+        async def swaps():
+            first = await client.route_swap("rTaker", "USD", "xrp", 20, buy_issuer=ISSUER, mainnet=False)
+            second = await client.route_quote("USD", "xrp", 40, buy_issuer=ISSUER, mainnet=False)
+            return first, second
+
+        first, second = asyncio.run(swaps())
+        # book, pool and the usd transfer rate once, the second quote is served from memory
+        assert sorted(calls) == ["account_info", "amm_info", "book_offers"]
+        assert second["route"]["amm"]["out"] > 0
+        txn = first["transaction"]
+        assert txn["TransactionType"] == "OfferCreate"
+        assert txn["TakerPays"]["value"] == "20"
+        assert int(txn["TakerGets"]) / 1000000 >= first["quote"]["cost"]
+    finally:
+        router_cache.clear()
+        xrpl_pool.configure(async_transport=None)
@@ -0,0 +1,40 @@
+import asyncio
+import logging
+
+from blockchain.xrp.Stream import XrplStream
+
+from .fake_rippled import FakeRippled, wait_for
+
+
+def test_a_failing_listener_is_logged_and_the_others_still_run(caplog) -> None:
+    received = []
+
+    def broken(message):
+        raise KeyError("meta")
+
+    async def slow(message):
+        await asyncio.sleep(0.01)
+        received.append(("slow", message["ledger_index"]))
+
+    async def failing(message):
+        raise ValueError("bad ledger")
+
+    async def run():
+        async with FakeRippled() as rippled:
+            stream = XrplStream(rippled.url, reconnect_delay=0.01)
+            stream.on("ledgerClosed", broken)
+            stream.on("ledgerClosed", slow)
+            stream.on("ledgerClosed", failing)
+            stream.on("ledgerClosed", lambda message: received.append(("sync", message["ledger_index"])))
+            await stream.subscribe(streams=["ledger"])
+            await rippled.push({"type": "ledgerClosed", "ledger_index": 7})
+            await wait_for(lambda: ("slow", 7) in received)
+            assert received == [("sync", 7), ("slow", 7)] and not stream._listener_tasks
+            assert stream.connected
+            await stream.close()
+
+    with caplog.at_level(logging.ERROR, logger="blockchain.xrp.Stream"):
+        asyncio.run(run())
+    messages = [record.getMessage() + str(record.exc_info[1]) for record in caplog.records]
+    assert any("'meta'" in message for message in messages)
+    assert any("bad ledger" in message for message in messages)
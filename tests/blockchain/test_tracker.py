@@ -0,0 +1,162 @@
+import asyncio
+
+from xrpl.core.binarycodec import encode
+
+from blockchain.xrp.Stream import XrplStream
+from blockchain.xrp.Tracker import EXPIRED, TxTracker, tx_hash
+
+from .fake_rippled import FakeRippled, wait_for
+
+ACCOUNT = "rhub8VRN55s94qWKDv6jmDy1pUykJzF3wq"
+
+
+def blob(sequence: int, last_ledger_sequence: int = 105) -> str:
+    return encode({
+        "TransactionType": "Payment", "Account": ACCOUNT, "Destination": "rPT1Sjq2YGrBMTttX4GZHjKu9dyfzbpAYe",
+        "Amount": "1000", "Fee": "12", "Sequence": sequence, "LastLedgerSequence": last_ledger_sequence,
+        "SigningPubKey": "",
+    })
+
+
+def validated(txid: str, result: str = "tesSUCCESS", ledger_index: int = 101) -> dict:
+    return {"type": "transaction", "validated": True, "ledger_index": ledger_index,
+            "transaction": {"hash": txid}, "meta": {"TransactionResult": result}}
+
+
+def handlers(found: dict = None) -> dict:
+    found = {} if found is None else found
+    return {
+        "subscribe": lambda command: {"ledger_index": 100} if "ledger" in command.get("streams", []) else {},
+        "submit": lambda command: {"engine_result": "tesSUCCESS", "engine_result_message": "applied"},
+        "tx": lambda command: found.get(command["transaction"], {}),
+    }
+
+
+def test_many_submissions_resolve_from_one_subscription() -> None:
+    async def run():
+        async with FakeRippled(handlers()) as rippled:
+            stream = XrplStream(rippled.url, reconnect_delay=0.01)
+            tracker = TxTracker(stream_factory=lambda mainnet: stream)
+            blobs = [blob(sequence) for sequence in range(1, 4)]
+            waiters = [asyncio.ensure_future(tracker.submit_and_wait(tx_blob)) for tx_blob in blobs]
+            await wait_for(lambda: tracker.pending() == 3 and len(rippled.sent("submit")) == 3)
+            assert len(rippled.sent("subscribe")) == 1
+
+            txids = [tx_hash(tx_blob) for tx_blob in blobs]
+            await rippled.push({**validated(txids[0]), "validated": False})
+            await rippled.push(validated(txids[0]))
+            await rippled.push(validated(txids[1], "tecUNFUNDED_PAYMENT"))
+            await rippled.push(validated("SOMEONE ELSES"))
+            await rippled.push(validated(txids[2]))
+            results = await asyncio.wait_for(asyncio.gather(*waiters), 2)
+            assert [result["result"] for result in results] == ["tesSUCCESS", "tecUNFUNDED_PAYMENT", "tesSUCCESS"]
+            assert results[0]["txid"] == txids[0] and results[0]["last_ledger_sequence"] == 105
+            # nothing pending, nothing to listen to
+            await wait_for(lambda: len(rippled.sent("unsubscribe")) == 1)
+            assert rippled.sent("unsubscribe")[0]["streams"] == ["transactions"]
+            await stream.close()
+
+    asyncio.run(run())
+
+
+def test_transactions_expire_after_their_last_ledger() -> None:
+    async def run():
+        async with FakeRippled(handlers()) as rippled:
+            stream = XrplStream(rippled.url, reconnect_delay=0.01)
+            tracker = TxTracker(stream_factory=lambda mainnet: stream)
+            following = tracker.follow("ab" * 32, last_ledger_sequence=105)
+            assert (await following.__anext__())["result"] == "pending"
+            final = asyncio.ensure_future(following.__anext__())
+            await rippled.push({"type": "ledgerClosed", "ledger_index": 105})
+            await asyncio.sleep(0.05)
+            assert not final.done()
+            await rippled.push({"type": "ledgerClosed", "ledger_index": 106})
+            result = await asyncio.wait_for(final, 2)
+            assert result["result"] == EXPIRED and result["validated"] is False and result["ledger_index"] == 106
+            # looked up once before giving up on it
+            assert len(rippled.sent("tx")) == 2
+            assert tracker.stats() == {"pending": 0, "resolved": 0, "expired": 1}
+            await stream.close()
+
+    asyncio.run(run())
+
+
+def test_pending_transactions_are_looked_up_after_a_reconnect() -> None:
+    found = {}
+
+    async def run():
+        async with FakeRippled(handlers(found)) as rippled:
+            stream = XrplStream(rippled.url, reconnect_delay=0.01)
+            tracker = TxTracker(stream_factory=lambda mainnet: stream)
+            txid = "CD" * 32
+            waiter = asyncio.ensure_future(tracker.wait(txid, 120, timeout=2))
+            await wait_for(lambda: tracker.pending() == 1 and len(rippled.sent("tx")) == 1)
+            # validated while we were away
+            found[txid] = {"validated": True, "ledger_index": 102, "meta": {"TransactionResult": "tesSUCCESS"}}
+            await rippled.drop()
+            result = await asyncio.wait_for(waiter, 2)
+            assert result["result"] == "tesSUCCESS" and result["ledger_index"] == 102
+            assert len(rippled.sent("subscribe")) == 2
+            await stream.close()
+
+    asyncio.run(run())
+
+
+def test_a_failed_submit_isnt_tracked_and_only_txn_not_found_is_an_answer() -> None:
+    async def run():
+        def submit(command):
+            raise RuntimeError("tooBusy")
+
+        def tx(command):
+            raise RuntimeError("tooBusy" if command["transaction"] == "EF" * 32 else "txnNotFound")
+
+        async with FakeRippled({**handlers(), "submit": submit, "tx": tx}) as rippled:
+            stream = XrplStream(rippled.url, reconnect_delay=0.01)
+            tracker = TxTracker(stream_factory=lambda mainnet: stream)
+            try:
+                await tracker.submit(blob(1))
+            except Exception as exception:
+                assert "tooBusy" in str(exception)
+            else:
+                raise AssertionError("the submit failed")
+            assert tracker.pending() == 0
+            await wait_for(lambda: len(rippled.sent("unsubscribe")) == 1)
+
+            busy = asyncio.ensure_future(tracker.wait("EF" * 32, 105, timeout=2))
+            gone = asyncio.ensure_future(tracker.wait("AB" * 32, 105, timeout=2))
+            await wait_for(lambda: len(rippled.sent("tx")) == 2)
+            await rippled.push({"type": "ledgerClosed", "ledger_index": 106})
+            assert (await asyncio.wait_for(gone, 2))["result"] == EXPIRED
+            # rippled was too busy to say, it stays pending
+            await wait_for(lambda: len(rippled.sent("tx")) == 4)
+            assert not busy.done() and tracker.pending() == 1 and not tracker._tasks
+            busy.cancel()
+            await stream.close()
+
+    asyncio.run(run())
+
+
+def test_a_failed_resubscribe_is_retried() -> None:
+    found = {}
+    answers = [{"ledger_index": 100}, RuntimeError("noNetwork"), {}]
+
+    def subscribe(command):
+        answer = answers.pop(0) if answers else {}
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+    async def run():
+        async with FakeRippled({**handlers(found), "subscribe": subscribe}) as rippled:
+            stream = XrplStream(rippled.url, reconnect_delay=0.01)
+            tracker = TxTracker(stream_factory=lambda mainnet: stream)
+            txid = "CD" * 32
+            waiter = asyncio.ensure_future(tracker.wait(txid, 120, timeout=2))
+            await wait_for(lambda: tracker.pending() == 1 and len(rippled.sent("tx")) == 1)
+            found[txid] = {"validated": True, "ledger_index": 102, "meta": {"TransactionResult": "tesSUCCESS"}}
+            await rippled.drop()
+            result = await asyncio.wait_for(waiter, 2)
+            assert result["result"] == "tesSUCCESS" and len(rippled.sent("subscribe")) == 3
+            await stream.close()
+
+    asyncio.run(run())
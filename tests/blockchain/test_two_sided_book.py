@@ -0,0 +1,50 @@
+import asyncio
+import json
+
+import httpx
+from xrpl.models import XRP, IssuedCurrency
+
+from blockchain.xrp.Pool import xrpl_pool
+from blockchain.xrp.xamm import sort_best_offer, two_sided_book
+
+ISSUER = "rhub8VRN55s94qWKDv6jmDy1pUykJzF3wq"
+USD = IssuedCurrency(currency="USD", issuer=ISSUER)
+
+
+def book_offer(index: str, gets, pays, quality: str) -> dict:
+    return {"index": index, "Account": ISSUER, "Flags": 0, "Sequence": 1,
+            "TakerGets": gets, "TakerPays": pays, "quality": quality}
+
+
+def usd(value: str) -> dict:
+    return {"currency": "USD", "issuer": ISSUER, "value": value}
+
+
+def test_sides_are_fetched_once_each() -> None:
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        params = json.loads(request.content)["params"][0]
+        calls.append(params)
+        if params["taker_gets"]["currency"] == "USD":
+            offers = [book_offer("ASK2", usd("1"), "10000000", "10000000"),
+                      book_offer("ASK1", usd("1"), "9000000", "9000000")]
+        else:
+            offers = [book_offer("BID1", "1000000", usd("0.12"), "0.00000012")]
+        return httpx.Response(200, json={"result": {"status": "success", "ledger_index": 5, "offers": offers}})
+
+    xrpl_pool.configure(async_transport=httpx.MockTransport(handler))
+    try:
+        book = asyncio.run(two_sided_book(XRP(), USD, mainnet=False))
+        assert len(calls) == 2
+        assert [offer["offer_id"] for offer in book["asks"].values()] == ["ASK1", "ASK2"]
+        assert [offer["offer_id"] for offer in book["bids"].values()] == ["BID1"]
+        assert book["best_ask"] == "9000000"
+        assert book["ledger_index"] == 5
+
+        calls.clear()
+        best = asyncio.run(sort_best_offer(XRP(), USD, best_buy=True, best_sell=True))
+        assert len(calls) == 1
+        assert [offer["offer_id"] for offer in best.values()] == ["ASK1", "ASK2"]
+    finally:
+        xrpl_pool.configure(async_transport=None)
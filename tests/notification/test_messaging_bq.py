@@ -0,0 +1,120 @@
+import asyncio
+import json
+
+from notification.messaging_bq import MemoryMailboxes, Notifications
+
+
+class UserSocket:
+    """a connected client, `close()` is the client going away"""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.frames = []
+        self.closed_with = None
+        self._gone = asyncio.Event()
+
+    async def send_text(self, text: str) -> None:
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.frames.append(json.loads(text)["messages"])
+
+    async def receive(self) -> dict:
+        await self._gone.wait()
+        return {"type": "websocket.disconnect", "code": 1000}
+
+    async def close(self, code: int = 1000) -> None:
+        self.closed_with = code
+
+    def leave(self) -> None:
+        self._gone.set()
+
+    @property
+    def messages(self) -> list:
+        return [message for frame in self.frames for message in frame]
+
+
+def test_the_backlog_is_delivered_in_batches_and_acked_per_batch() -> None:
+    async def run():
+        mailboxes = MemoryMailboxes()
+        notifications = Notifications(mailboxes, prefetch=10, batch_size=4, linger=0)
+        for n in range(10):
+            await notifications.notify(7, {"n": n})
+        socket = UserSocket()
+        session = asyncio.create_task(notifications.serve(socket, 7))
+        await asyncio.sleep(0.05)
+        assert socket.messages == [{"n": n} for n in range(10)]
+        assert [len(frame) for frame in socket.frames] == [4, 4, 2]
+        assert mailboxes.acks == 3 and mailboxes.pending(7) == 0
+
+        await notifications.notify(7, "live")
+        await asyncio.sleep(0.01)
+        assert socket.frames[-1] == ["live"]
+        socket.leave()
+        await session
+        assert not notifications.connected(7)
+
+    asyncio.run(run())
+
+
+def test_prefetch_bounds_what_is_in_flight_and_unacked_messages_survive_a_disconnect() -> None:
+    async def run():
+        mailboxes = MemoryMailboxes()
+        notifications = Notifications(mailboxes, prefetch=3, batch_size=3, linger=0)
+        for n in range(8):
+            await notifications.notify("u", n)
+        slow = UserSocket(delay=10)
+        session = asyncio.create_task(notifications.serve(slow, "u"))
+        await asyncio.sleep(0.02)
+        consumer = mailboxes.consumers["u"][0]
+        assert len(consumer.unacked) == 3 and len(mailboxes.ready["u"]) == 5
+        # gone before the first batch was written
+        slow.leave()
+        await session
+        assert mailboxes.pending("u") == 8 and mailboxes.consumers["u"] == []
+
+        back = UserSocket()
+        session = asyncio.create_task(notifications.serve(back, "u"))
+        await asyncio.sleep(0.05)
+        assert back.messages == list(range(8))
+        back.leave()
+        await session
+
+    asyncio.run(run())
+
+
+def test_a_new_socket_takes_the_users_queue_over() -> None:
+    async def run():
+        notifications = Notifications(MemoryMailboxes(), linger=0)
+        phone, laptop = UserSocket(), UserSocket()
+        first = asyncio.create_task(notifications.serve(phone, 1))
+        await asyncio.sleep(0.01)
+        second = asyncio.create_task(notifications.serve(laptop, 1))
+        await first
+        assert phone.closed_with == 1000
+        await notifications.notify(1, "hello")
+        await asyncio.sleep(0.01)
+        assert laptop.messages == ["hello"] and phone.messages == []
+        laptop.leave()
+        await second
+
+    asyncio.run(run())
+
+
+def test_a_message_that_isnt_json_is_dropped_and_the_frame_still_parses() -> None:
+    async def run():
+        mailboxes = MemoryMailboxes()
+        notifications = Notifications(mailboxes, batch_size=10, linger=0)
+        await notifications.notify(1, {"n": 1})
+        # published straight to the queue by something other than notify()
+        await mailboxes.publish(1, '{"n": 2')
+        await mailboxes.publish(1, "not json")
+        await notifications.notify(1, {"n": 3})
+        socket = UserSocket()
+        session = asyncio.create_task(notifications.serve(socket, 1))
+        await asyncio.sleep(0.05)
+        assert socket.messages == [{"n": 1}, {"n": 3}]
+        assert mailboxes.pending(1) == 0 and notifications.stats()["delivered"] == 2
+        socket.leave()
+        await session
+
+    asyncio.run(run())
@@ -0,0 +1,174 @@
+import asyncio
+import json
+
+from notification import websocket_manager
+from notification.websocket_manager import COALESCE, Broadcaster, ConnectionManager
+
+
+class FakeSocket:
+    """records what it is sent, `delay` makes it a slow reader and a `gate` one that
+    reads nothing until it is set"""
+
+    def __init__(self, delay: float = 0.0, gate: asyncio.Event = None):
+        self.delay = delay
+        self.gate = gate
+        self.accepted = False
+        self.received = []
+
+    async def accept(self) -> None:
+        self.accepted = True
+
+    async def send_text(self, text: str) -> None:
+        if self.gate is not None:
+            await self.gate.wait()
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.received.append(json.loads(text))
+
+
+async def drain() -> None:
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+async def wait_for(predicate, timeout: float = 2.0) -> None:
+    async def poll():
+        while not predicate():
+            await asyncio.sleep(0.001)
+    await asyncio.wait_for(poll(), timeout)
+
+
+def test_a_slow_client_only_loses_its_own_oldest_messages() -> None:
+    async def run():
+        broadcaster = Broadcaster(queue_size=4)
+        gate = asyncio.Event()
+        fast, slow = FakeSocket(), FakeSocket(gate=gate)
+        for socket in (fast, slow):
+            await broadcaster.connect(socket)
+            broadcaster.subscribe(socket, "trades")
+        for n in range(20):
+            broadcaster.publish("trades", {"n": n})
+            await asyncio.sleep(0)
+        # the slow one hasn't written anything and held nobody up
+        await wait_for(lambda: len(fast.received) == 20)
+        assert [message["n"] for message in fast.received] == list(range(20)) and slow.received == []
+        gate.set()
+        await wait_for(lambda: len(slow.received) == 5)
+        # the writer took the first one right away, then only the newest four fit
+        assert [message["n"] for message in slow.received] == [0, 16, 17, 18, 19]
+        assert broadcaster.stats()["dropped"] == 15
+        await broadcaster.close()
+
+    asyncio.run(run())
+
+
+def test_stuck_clients_are_dropped() -> None:
+    async def run():
+        broadcaster = Broadcaster(send_timeout=0.05)
+        stuck, fine = FakeSocket(delay=10), FakeSocket()
+        for socket in (stuck, fine):
+            await broadcaster.connect(socket)
+            broadcaster.subscribe(socket, "trades")
+        broadcaster.publish("trades", {"n": 1})
+        await asyncio.sleep(0.2)
+        assert broadcaster.client(stuck) is None and broadcaster.client(fine) is not None
+        assert fine.received == [{"n": 1}] and broadcaster.subscribers("trades") == 1
+        await broadcaster.close()
+
+    asyncio.run(run())
+
+
+def test_snapshots_coalesce_and_late_subscribers_get_the_latest() -> None:
+    async def run():
+        broadcaster = Broadcaster()
+        first, late, other = FakeSocket(delay=0.05), FakeSocket(), FakeSocket()
+        for socket in (first, late, other):
+            await broadcaster.connect(socket)
+        broadcaster.subscribe(first, "book:XRP/USD")
+        broadcaster.subscribe(other, "wallet:rA")
+        for version in range(10):
+            assert broadcaster.publish("book:XRP/USD", {"version": version}, COALESCE) == 1
+        broadcaster.subscribe(late, "book:XRP/USD")
+        await asyncio.sleep(0.2)
+        assert first.received == [{"version": 9}]
+        assert late.received == [{"version": 9}]
+        assert other.received == []
+        await broadcaster.close()
+
+    asyncio.run(run())
+
+
+def test_feeds_run_while_a_topic_has_subscribers() -> None:
+    async def run():
+        broadcaster = Broadcaster()
+        started, stopped = [], []
+
+        async def feed():
+            started.append(1)
+            try:
+                for version in range(3):
+                    yield {"version": version}
+                    await asyncio.sleep(0.01)
+                await asyncio.sleep(10)
+            finally:
+                stopped.append(1)
+
+        sockets = [FakeSocket() for _ in range(3)]
+        for socket in sockets:
+            await broadcaster.connect(socket)
+            broadcaster.subscribe(socket, "book", feed)
+        await asyncio.sleep(0.1)
+        assert started == [1] and all(socket.received[-1] == {"version": 2} for socket in sockets)
+        broadcaster.unsubscribe(sockets[0], "book")
+        broadcaster.disconnect(sockets[1])
+        await drain()
+        assert stopped == [] and broadcaster.subscribers("book") == 1
+        broadcaster.disconnect(sockets[2])
+        await drain()
+        assert stopped == [1] and broadcaster.stats()["feeds"] == 0
+
+    asyncio.run(run())
+
+
+def test_connection_manager_keeps_its_interface() -> None:
+    async def run():
+        manager = ConnectionManager()
+        first, second, stranger = FakeSocket(), FakeSocket(), FakeSocket()
+        await manager.connect(first)
+        await manager.connect(second)
+        assert first.accepted and manager.active_connections == [first, second]
+        await manager.broadcast('"hello"')
+        await manager.send_personal_message('"just you"', first)
+        await manager.send_personal_message('"not connected"', stranger)
+        await drain()
+        assert first.received == ["hello", "just you"] and second.received == ["hello"]
+        assert stranger.received == ["not connected"]
+        manager.disconnect(first)
+        assert manager.active_connections == [second]
+        await manager.close()
+
+    asyncio.run(run())
+
+
+def test_publish_is_cheap_on_many_sockets(monkeypatch) -> None:
+    encodes, puts = [], []
+    encode, put = websocket_manager.encode, websocket_manager.Client.put
+    monkeypatch.setattr(websocket_manager, "encode", lambda message: encodes.append(message) or encode(message))
+    monkeypatch.setattr(websocket_manager.Client, "put", lambda self, *args: puts.append(self) or put(self, *args))
+
+    async def run():
+        broadcaster = Broadcaster()
+        sockets = [FakeSocket() for _ in range(10000)]
+        for socket in sockets:
+            await broadcaster.connect(socket, accept=False)
+            broadcaster.subscribe(socket, "book")
+        broadcaster.subscribe(sockets[0], "quiet")
+        # one encode and a queue append per subscriber, nothing per unrelated socket
+        assert broadcaster.publish("quiet", {"n": 1}) == 1
+        assert len(encodes) == 1 and puts == [broadcaster.client(sockets[0])]
+        assert broadcaster.publish("book", {"n": 1}, COALESCE) == 10000
+        assert len(encodes) == 2 and len(puts) == 10001
+        await wait_for(lambda: all(socket.received == [{"n": 1}] for socket in sockets[1:]))
+        await broadcaster.close()
+
+    asyncio.run(run())